@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Lote, Hidrometro, Leitura
+from .models import Lote, Hidrometro, Leitura, ConsumoDiario, ConsumoMensal, HidrometroEstado, Exportacao
 
 
 @admin.register(Lote)
@@ -21,10 +21,53 @@ class HidrometroAdmin(admin.ModelAdmin):
 
 @admin.register(Leitura)
 class LeituraAdmin(admin.ModelAdmin):
-    list_display = ['hidrometro', 'leitura', 'data_leitura', 'periodo', 'responsavel']
+    list_display = ['hidrometro', 'leitura', 'consumo_litros', 'data_leitura', 'periodo', 'responsavel']
     list_filter = ['periodo', 'data_leitura', 'hidrometro__lote__tipo']
     search_fields = ['hidrometro__numero', 'hidrometro__lote__numero', 'responsavel']
     ordering = ['-data_leitura']
     date_hierarchy = 'data_leitura'
-    readonly_fields = ['criado_em', 'atualizado_em']
+    readonly_fields = ['consumo_m3', 'consumo_litros', 'criado_em', 'atualizado_em']
 
+
+
+@admin.register(ConsumoDiario)
+class ConsumoDiarioAdmin(admin.ModelAdmin):
+    list_display = ['hidrometro', 'lote', 'data', 'litros', 'n_leituras', 'atualizado_em']
+    list_filter = ['data', 'lote__tipo']
+    search_fields = ['hidrometro__numero', 'lote__numero']
+    ordering = ['-data']
+    date_hierarchy = 'data'
+    readonly_fields = ['hidrometro', 'lote', 'data', 'litros', 'n_leituras', 'atualizado_em']
+
+
+@admin.register(ConsumoMensal)
+class ConsumoMensalAdmin(admin.ModelAdmin):
+    list_display = ['hidrometro', 'lote', 'mes', 'litros', 'n_leituras', 'fechado', 'atualizado_em']
+    list_filter = ['fechado', 'mes', 'lote__tipo']
+    search_fields = ['hidrometro__numero', 'lote__numero']
+    ordering = ['-mes']
+    date_hierarchy = 'mes'
+    readonly_fields = ['hidrometro', 'lote', 'mes', 'litros', 'n_leituras', 'fechado', 'atualizado_em']
+
+
+@admin.register(HidrometroEstado)
+class HidrometroEstadoAdmin(admin.ModelAdmin):
+    list_display = ['hidrometro', 'ultima_leitura', 'ultima_data_leitura', 'dia', 'leituras_dia', 'litros_mes', 'atualizado_em']
+    search_fields = ['hidrometro__numero', 'hidrometro__lote__numero']
+    ordering = ['hidrometro__numero']
+    readonly_fields = [
+        'hidrometro', 'ultima_leitura', 'ultima_data_leitura', 'ultimo_periodo', 'dia',
+        'primeira_leitura_dia', 'leituras_dia', 'mes', 'litros_mes', 'atualizado_em',
+    ]
+
+
+@admin.register(Exportacao)
+class ExportacaoAdmin(admin.ModelAdmin):
+    list_display = ['id', 'relatorio', 'formato', 'lote', 'status', 'tentativas', 'tamanho', 'criado_em', 'concluido_em']
+    list_filter = ['status', 'relatorio', 'formato']
+    search_fields = ['lote__numero', 'sha256']
+    ordering = ['-criado_em']
+    readonly_fields = [
+        'relatorio', 'formato', 'lote', 'parametros', 'chave', 'tentativas', 'sha256',
+        'tamanho', 'nome_arquivo', 'erro', 'criado_em', 'iniciado_em', 'concluido_em',
+    ]
@@ -0,0 +1,405 @@
+"""
+Motor de agregação de consumo.
+
+Carrega as leituras de um conjunto de hidrômetros em uma única consulta,
+ordenada por (hidrometro_id, data_leitura), e acumula em uma só passagem o
+consumo por dia, por mês, por hidrômetro e por lote.
+
+Há três backends, escolhidos por implantação em settings.CONSUMO_AGREGACAO:
+- 'python': percorre as leituras e subtrai vizinhas em Python (padrão);
+- 'sql': calcula os deltas no banco com LAG() OVER (PARTITION BY hidrometro_id
+  ORDER BY data_leitura) e agrega com GROUP BY, trafegando apenas as linhas
+  agregadas (PostgreSQL e SQLite >= 3.25);
+- 'numpy': carrega (hidrometro_id, lote_id, dia, leitura) em arrays e calcula
+  deltas e somas por dia, mês, hidrômetro e lote com np.diff/np.bincount/
+  np.add.reduceat, sem laço Python por leitura.
+
+calcular_consumo_consolidado() lê as consolidações (ConsumoMensal para os meses
+inteiros da janela, ConsumoDiario para as bordas) em vez das leituras brutas; é
+o caminho usado pelas páginas de gráficos. consumo_por_ano() e
+comparativo_anual() leem apenas ConsumoMensal (no máximo 12 linhas por
+hidrômetro e ano).
+
+As funções com prefixo "a" (acalcular_consumo_consolidado, aconsumo_total_lotes,
+acomparativo_anual) são as versões para views assíncronas: montam as mesmas
+consultas, percorridas com o ORM assíncrono (as independentes com
+asyncio.gather), e reaproveitam o mesmo código de acumulação.
+"""
+import asyncio
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, F, Q, Sum, Window
+from django.db.models.expressions import RowRange
+from django.db.models.functions import ExtractYear, FirstValue, Lag, LastValue, TruncDate, TruncMonth
+from django.utils import timezone
+
+from .models import ConsumoDiario, ConsumoMensal, Leitura
+
+
+class ResultadoConsumo:
+    """Acumuladores de consumo (em litros) produzidos por uma passagem sobre as leituras"""
+
+    def __init__(self):
+        self.total = 0.0
+        self.por_dia = defaultdict(float)
+        self.por_mes = defaultdict(float)
+        self.por_hidrometro = defaultdict(float)
+        self.por_lote = defaultdict(float)
+        self.primeira = {}
+        self.ultima = {}
+        self.total_leituras = defaultdict(int)
+
+    def adicionar(self, hidrometro_id, lote_id, data_leitura, consumo_litros):
+        """Soma um delta de consumo em todos os acumuladores"""
+        dia = timezone.localtime(data_leitura).date()
+        self.total += consumo_litros
+        self.por_dia[dia] += consumo_litros
+        self.por_mes[(dia.year, dia.month)] += consumo_litros
+        self.por_hidrometro[hidrometro_id] += consumo_litros
+        self.por_lote[lote_id] += consumo_litros
+
+    def consumo_liquido_litros(self, hidrometro_id):
+        """Diferença entre a última e a primeira leitura do período (exige duas leituras)"""
+        if self.total_leituras.get(hidrometro_id, 0) < 2:
+            return 0.0
+        return float(self.ultima[hidrometro_id] - self.primeira[hidrometro_id]) * 1000
+
+
+def filtrar_periodo(leituras, data_inicio, data_fim):
+    """Aplica a janela do período: datetimes filtram por instante, dates pelo dia local"""
+    if isinstance(data_inicio, datetime):
+        return leituras.filter(data_leitura__gte=data_inicio, data_leitura__lte=data_fim)
+    return leituras.filter(data_leitura__date__gte=data_inicio, data_leitura__date__lte=data_fim)
+
+
+def calcular_consumo(hidrometros, data_inicio, data_fim, backend=None):
+    """Calcula o consumo de vários hidrômetros no período com uma única consulta.
+
+    Deltas negativos (troca ou correção de hidrômetro) são ignorados.
+    """
+    backend = backend or getattr(settings, 'CONSUMO_AGREGACAO', 'python')
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend de agregação desconhecido: {backend}")
+    return BACKENDS[backend](hidrometros, data_inicio, data_fim)
+
+
+def _leituras_periodo(hidrometros, data_inicio, data_fim):
+    return filtrar_periodo(
+        Leitura.objects.filter(hidrometro__in=hidrometros),
+        data_inicio,
+        data_fim,
+    )
+
+
+def calcular_consumo_python(hidrometros, data_inicio, data_fim):
+    """Backend 'python': subtrai leituras vizinhas em uma passagem sobre a consulta ordenada"""
+    leituras = (
+        _leituras_periodo(hidrometros, data_inicio, data_fim)
+        .order_by('hidrometro_id', 'data_leitura')
+        .values_list('hidrometro_id', 'hidrometro__lote_id', 'data_leitura', 'leitura')
+    )
+
+    resultado = ResultadoConsumo()
+    hidrometro_anterior = None
+    valor_anterior = None
+
+    for hidrometro_id, lote_id, data_leitura, valor in leituras.iterator(chunk_size=2000):
+        resultado.total_leituras[hidrometro_id] += 1
+        if hidrometro_id != hidrometro_anterior:
+            resultado.primeira[hidrometro_id] = valor
+            hidrometro_anterior = hidrometro_id
+        else:
+            diferenca = float(valor - valor_anterior)
+            if diferenca > 0:
+                resultado.adicionar(hidrometro_id, lote_id, data_leitura, diferenca * 1000)
+        resultado.ultima[hidrometro_id] = valor
+        valor_anterior = valor
+
+    return resultado
+
+
+def calcular_consumo_sql(hidrometros, data_inicio, data_fim):
+    """Backend 'sql': deltas por função de janela e agregação por GROUP BY no banco"""
+    por_hidrometro = [F('hidrometro_id')]
+    ordem = F('data_leitura').asc()
+    leituras = _leituras_periodo(hidrometros, data_inicio, data_fim).order_by().values(
+        hid=F('hidrometro_id'),
+        lote=F('hidrometro__lote_id'),
+        dia=TruncDate('data_leitura'),
+        valor=F('leitura'),
+        anterior=Window(Lag('leitura'), partition_by=por_hidrometro, order_by=ordem),
+        primeira=Window(FirstValue('leitura'), partition_by=por_hidrometro, order_by=ordem),
+        ultima=Window(
+            LastValue('leitura'),
+            partition_by=por_hidrometro,
+            order_by=ordem,
+            frame=RowRange(start=None, end=None),
+        ),
+        n=Window(Count('id'), partition_by=por_hidrometro),
+    )
+    sql_leituras, params = leituras.query.sql_with_params()
+
+    # Uma única ida ao banco: totais por dia e totais por hidrômetro
+    delta = 'CASE WHEN d.valor > d.anterior THEN d.valor - d.anterior ELSE 0 END'
+    sql = f"""
+        WITH d AS ({sql_leituras})
+        SELECT 'dia', NULL, NULL, d.dia, SUM({delta}), NULL, NULL, NULL
+          FROM d GROUP BY d.dia
+        UNION ALL
+        SELECT 'hidrometro', d.hid, d.lote, NULL, SUM({delta}), MAX(d.n), MAX(d.primeira), MAX(d.ultima)
+          FROM d GROUP BY d.hid, d.lote
+    """
+
+    resultado = ResultadoConsumo()
+    with connections[leituras.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        linhas = cursor.fetchall()
+
+    for tipo, hidrometro_id, lote_id, dia, soma, n, primeira, ultima in linhas:
+        consumo_litros = float(soma or 0) * 1000
+        if tipo == 'dia':
+            if consumo_litros > 0:
+                if isinstance(dia, str):
+                    dia = date.fromisoformat(dia)
+                resultado.por_dia[dia] += consumo_litros
+                resultado.por_mes[(dia.year, dia.month)] += consumo_litros
+            continue
+
+        resultado.total_leituras[hidrometro_id] = int(n)
+        resultado.primeira[hidrometro_id] = primeira
+        resultado.ultima[hidrometro_id] = ultima
+        if consumo_litros > 0:
+            resultado.total += consumo_litros
+            resultado.por_hidrometro[hidrometro_id] += consumo_litros
+            resultado.por_lote[lote_id] += consumo_litros
+
+    return resultado
+
+
+def _meses_inteiros(data_inicio, data_fim):
+    """Primeiro e último mês contidos inteiramente em [data_inicio, data_fim], ou None"""
+    primeiro = data_inicio if data_inicio.day == 1 else _proximo_mes(data_inicio)
+    if _proximo_mes(data_fim) - timedelta(days=1) == data_fim:
+        ultimo = data_fim.replace(day=1)
+    else:
+        ultimo = (data_fim.replace(day=1) - timedelta(days=1)).replace(day=1)
+    if primeiro > ultimo:
+        return None
+    return primeiro, ultimo
+
+
+def _proximo_mes(dia):
+    return (dia.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _somar_grupos(linhas):
+    return linhas.order_by().annotate(total_litros=Sum('litros'), total_leituras=Sum('n_leituras'))
+
+
+def calcular_consumo_numpy(hidrometros, data_inicio, data_fim):
+    """Backend 'numpy': deltas e agrupamentos vetorizados sobre a consulta ordenada"""
+    import numpy as np
+
+    linhas = list(
+        _leituras_periodo(hidrometros, data_inicio, data_fim)
+        .order_by('hidrometro_id', 'data_leitura')
+        .values_list('hidrometro_id', 'hidrometro__lote_id', TruncDate('data_leitura'), 'leitura')
+    )
+    resultado = ResultadoConsumo()
+    if not linhas:
+        return resultado
+
+    hidrometro_ids, lote_ids, dias, valores = zip(*linhas)
+    hid = np.array(hidrometro_ids, dtype=np.int64)
+    lote = np.array(lote_ids, dtype=np.int64)
+    dia = np.array(dias, dtype='datetime64[D]')
+    # Leituras têm 3 casas decimais: em litros inteiros os deltas são exatos
+    litros = np.rint(np.array(valores, dtype=np.float64) * 1000).astype(np.int64)
+
+    inicio_hidrometro = np.flatnonzero(np.r_[True, hid[1:] != hid[:-1]])
+    delta = np.diff(litros, prepend=litros[0])
+    delta[inicio_hidrometro] = 0
+    delta = np.clip(delta, 0, None).astype(np.float64)
+
+    dias_unicos, indice_dia = np.unique(dia, return_inverse=True)
+    for valor_dia, soma in zip(dias_unicos.tolist(), np.bincount(indice_dia, weights=delta)):
+        if soma > 0:
+            resultado.por_dia[valor_dia] = float(soma)
+
+    meses_unicos, indice_mes = np.unique(dia.astype('datetime64[M]'), return_inverse=True)
+    for valor_mes, soma in zip(meses_unicos.tolist(), np.bincount(indice_mes, weights=delta)):
+        if soma > 0:
+            resultado.por_mes[(valor_mes.year, valor_mes.month)] = float(soma)
+
+    fim_hidrometro = np.r_[inicio_hidrometro[1:], len(hid)] - 1
+    somas_hidrometro = np.add.reduceat(delta, inicio_hidrometro)
+    for inicio, fim, soma in zip(inicio_hidrometro.tolist(), fim_hidrometro.tolist(), somas_hidrometro):
+        hidrometro_id = hidrometro_ids[inicio]
+        resultado.total_leituras[hidrometro_id] = fim - inicio + 1
+        resultado.primeira[hidrometro_id] = valores[inicio]
+        resultado.ultima[hidrometro_id] = valores[fim]
+        if soma > 0:
+            resultado.por_hidrometro[hidrometro_id] = float(soma)
+
+    lotes_unicos, indice_lote = np.unique(lote[inicio_hidrometro], return_inverse=True)
+    for lote_id, soma in zip(lotes_unicos.tolist(), np.bincount(indice_lote, weights=somas_hidrometro)):
+        if soma > 0:
+            resultado.por_lote[lote_id] = float(soma)
+
+    resultado.total = float(delta.sum())
+    return resultado
+
+
+def _consultas_consolidado(hidrometros, data_inicio, data_fim):
+    """Somas agrupadas (independentes entre si) de calcular_consumo_consolidado:
+    (por hidrômetro, por mês, por dia), as duas primeiras em pares mensal/bordas"""
+    if isinstance(data_inicio, datetime):
+        data_inicio = timezone.localtime(data_inicio).date()
+    if isinstance(data_fim, datetime):
+        data_fim = timezone.localtime(data_fim).date()
+
+    diarios = ConsumoDiario.objects.filter(
+        hidrometro__in=hidrometros,
+        data__gte=data_inicio,
+        data__lte=data_fim,
+    )
+    meses = _meses_inteiros(data_inicio, data_fim)
+    if meses:
+        primeiro, ultimo = meses
+        mensais = ConsumoMensal.objects.filter(hidrometro__in=hidrometros, mes__gte=primeiro, mes__lte=ultimo)
+        bordas = diarios.filter(Q(data__lt=primeiro) | Q(data__gte=_proximo_mes(ultimo)))
+    else:
+        mensais = ConsumoMensal.objects.none()
+        bordas = diarios
+
+    return (
+        (
+            _somar_grupos(mensais.values('hidrometro_id', 'lote_id')),
+            _somar_grupos(bordas.values('hidrometro_id', 'lote_id')),
+        ),
+        (
+            _somar_grupos(mensais.values('mes')),
+            _somar_grupos(bordas.annotate(mes=TruncMonth('data')).values('mes')),
+        ),
+        _somar_grupos(diarios.values('data')),
+    )
+
+
+def _resultado_consolidado(por_hidrometro, por_mes, por_dia):
+    resultado = ResultadoConsumo()
+    for linhas in por_hidrometro:
+        for linha in linhas:
+            hidrometro_id = linha['hidrometro_id']
+            resultado.total_leituras[hidrometro_id] += linha['total_leituras']
+            consumo_litros = float(linha['total_litros'])
+            if consumo_litros > 0:
+                resultado.total += consumo_litros
+                resultado.por_hidrometro[hidrometro_id] += consumo_litros
+                resultado.por_lote[linha['lote_id']] += consumo_litros
+
+    for linhas in por_mes:
+        for linha in linhas:
+            if linha['total_litros'] > 0:
+                resultado.por_mes[(linha['mes'].year, linha['mes'].month)] += float(linha['total_litros'])
+
+    for linha in por_dia:
+        if linha['total_litros'] > 0:
+            resultado.por_dia[linha['data']] += float(linha['total_litros'])
+
+    return resultado
+
+
+async def _alistar(consulta):
+    return [linha async for linha in consulta]
+
+
+def calcular_consumo_consolidado(hidrometros, data_inicio, data_fim):
+    """Consumo do período a partir das consolidações mensal e diária.
+
+    Os meses inteiros da janela vêm de ConsumoMensal e só os dias das bordas de
+    ConsumoDiario, tudo somado no banco. Diferente das leituras brutas, o dia
+    inicial inclui o delta em relação à última leitura anterior ao período.
+    Não preenche primeira/última leitura.
+    """
+    por_hidrometro, por_mes, por_dia = _consultas_consolidado(hidrometros, data_inicio, data_fim)
+    return _resultado_consolidado(por_hidrometro, por_mes, por_dia)
+
+
+async def acalcular_consumo_consolidado(hidrometros, data_inicio, data_fim):
+    """Versão assíncrona de calcular_consumo_consolidado: as cinco somas com asyncio.gather"""
+    (mensal_h, bordas_h), (mensal_m, bordas_m), por_dia = _consultas_consolidado(hidrometros, data_inicio, data_fim)
+    linhas = await asyncio.gather(*map(_alistar, (mensal_h, bordas_h, mensal_m, bordas_m, por_dia)))
+    return _resultado_consolidado(linhas[0:2], linhas[2:4], linhas[4])
+
+
+def _consulta_total_lotes(lote_ids, data_inicio, data_fim):
+    diarios = ConsumoDiario.objects.filter(hidrometro__ativo=True, data__range=[data_inicio, data_fim])
+    if lote_ids is not None:
+        diarios = diarios.filter(lote_id__in=lote_ids)
+    return _somar_grupos(diarios.values('lote_id'))
+
+
+def consumo_total_lotes(lote_ids, data_inicio, data_fim):
+    """Consumo total (L) dos hidrômetros ativos de cada lote no período: {lote_id: litros}.
+
+    Uma consulta agrupada sobre a consolidação diária; lote_ids=None considera todos.
+    """
+    return {
+        linha['lote_id']: float(linha['total_litros'])
+        for linha in _consulta_total_lotes(lote_ids, data_inicio, data_fim)
+    }
+
+
+async def aconsumo_total_lotes(lote_ids, data_inicio, data_fim):
+    """Versão assíncrona de consumo_total_lotes"""
+    return {
+        linha['lote_id']: float(linha['total_litros'])
+        async for linha in _consulta_total_lotes(lote_ids, data_inicio, data_fim)
+    }
+
+
+def consumo_por_ano(hidrometros, anos):
+    """Consumo total (L) de cada ano pedido, somado sobre a consolidação mensal"""
+    totais = {ano: 0.0 for ano in anos}
+    linhas = _somar_grupos(
+        ConsumoMensal.objects.filter(hidrometro__in=hidrometros, mes__year__in=list(totais))
+        .annotate(ano=ExtractYear('mes'))
+        .values('ano')
+    )
+    for linha in linhas:
+        totais[linha['ano']] = float(linha['total_litros'])
+    return totais
+
+
+def _consulta_comparativo(hidrometros, ano):
+    return _somar_grupos(
+        ConsumoMensal.objects.filter(hidrometro__in=hidrometros, mes__year__in=[ano - 1, ano]).values('mes')
+    )
+
+
+def _montar_comparativo(linhas, ano):
+    comparativo = {'atual': [0.0] * 12, 'anterior': [0.0] * 12}
+    for linha in linhas:
+        serie = 'atual' if linha['mes'].year == ano else 'anterior'
+        comparativo[serie][linha['mes'].month - 1] = float(linha['total_litros'])
+    return comparativo
+
+
+def comparativo_anual(hidrometros, ano):
+    """Consumo (L) mês a mês do ano e do ano anterior: {'atual': [12], 'anterior': [12]}"""
+    return _montar_comparativo(_consulta_comparativo(hidrometros, ano), ano)
+
+
+async def acomparativo_anual(hidrometros, ano):
+    """Versão assíncrona de comparativo_anual"""
+    return _montar_comparativo(await _alistar(_consulta_comparativo(hidrometros, ano)), ano)
+
+
+BACKENDS = {
+    'python': calcular_consumo_python,
+    'sql': calcular_consumo_sql,
+    'numpy': calcular_consumo_numpy,
+}
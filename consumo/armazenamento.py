@@ -0,0 +1,112 @@
+"""
+Armazenamento dos arquivos da fila de exportação no banco de dados.
+
+O servidor web e o processador da fila rodam em serviços separados no Render,
+cada um com o seu disco, e os discos são apagados a cada deploy: um arquivo
+gravado pelo processador no MEDIA_ROOT não existe para o serviço web. O banco é
+o que os dois compartilham. ArmazenamentoBanco é um Storage do Django que
+guarda cada arquivo em ArquivoArmazenado e o conteúdo em blocos de
+TAMANHO_BLOCO (BlocoArquivo); a gravação e a leitura vão bloco a bloco, sem o
+arquivo inteiro na memória, e a leitura aceita seek (o FileResponse mede o
+tamanho do arquivo assim).
+"""
+import io
+
+from django.core.files import File
+from django.core.files.storage import Storage
+from django.db import transaction
+from django.utils.deconstruct import deconstructible
+
+TAMANHO_BLOCO = 64 * 1024
+
+
+@deconstructible(path='consumo.armazenamento.ArmazenamentoBanco')
+class ArmazenamentoBanco(Storage):
+    """Storage com os arquivos no banco (ArquivoArmazenado/BlocoArquivo)"""
+
+    def _save(self, name, content):
+        from .models import ArquivoArmazenado, BlocoArquivo
+
+        with transaction.atomic():
+            arquivo = ArquivoArmazenado.objects.create(nome=name)
+            tamanho = 0
+            for ordem, bloco in enumerate(content.chunks(TAMANHO_BLOCO)):
+                BlocoArquivo.objects.create(arquivo=arquivo, ordem=ordem, dados=bloco)
+                tamanho += len(bloco)
+            arquivo.tamanho = tamanho
+            arquivo.save(update_fields=['tamanho'])
+        return name
+
+    def _open(self, name, mode='rb'):
+        from .models import ArquivoArmazenado
+
+        if 'b' not in mode or set(mode) - set('rb'):
+            raise ValueError(f'ArmazenamentoBanco só lê em modo binário (modo {mode!r})')
+        arquivo = ArquivoArmazenado.objects.filter(nome=name).values('id', 'tamanho').first()
+        if arquivo is None:
+            raise FileNotFoundError(f'Arquivo não encontrado no banco: {name}')
+        return File(LeitorBlocos(arquivo['id'], arquivo['tamanho']), name=name)
+
+    def exists(self, name):
+        from .models import ArquivoArmazenado
+
+        return ArquivoArmazenado.objects.filter(nome=name).exists()
+
+    def size(self, name):
+        from .models import ArquivoArmazenado
+
+        tamanho = ArquivoArmazenado.objects.filter(nome=name).values_list('tamanho', flat=True).first()
+        if tamanho is None:
+            raise FileNotFoundError(f'Arquivo não encontrado no banco: {name}')
+        return tamanho
+
+    def delete(self, name):
+        from .models import ArquivoArmazenado
+
+        ArquivoArmazenado.objects.filter(nome=name).delete()
+
+
+class LeitorBlocos(io.RawIOBase):
+    """Leitura de um ArquivoArmazenado buscando um bloco por vez"""
+
+    def __init__(self, arquivo_id, tamanho):
+        super().__init__()
+        self.arquivo_id = arquivo_id
+        self.tamanho = tamanho
+        self.posicao = 0
+        self._ordem = None
+        self._dados = b''
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.posicao
+
+    def seek(self, posicao, origem=io.SEEK_SET):
+        inicio = {io.SEEK_SET: 0, io.SEEK_CUR: self.posicao, io.SEEK_END: self.tamanho}[origem]
+        self.posicao = max(inicio + posicao, 0)
+        return self.posicao
+
+    def readinto(self, buffer):
+        if self.posicao >= self.tamanho:
+            return 0
+        ordem, deslocamento = divmod(self.posicao, TAMANHO_BLOCO)
+        dados = self._bloco(ordem)[deslocamento:deslocamento + len(buffer)]
+        buffer[:len(dados)] = dados
+        self.posicao += len(dados)
+        return len(dados)
+
+    def _bloco(self, ordem):
+        from .models import BlocoArquivo
+
+        if ordem != self._ordem:
+            # bytes(): o PostgreSQL devolve memoryview
+            self._dados = bytes(
+                BlocoArquivo.objects.values_list('dados', flat=True).get(arquivo_id=self.arquivo_id, ordem=ordem)
+            )
+            self._ordem = ordem
+        return self._dados
@@ -0,0 +1,142 @@
+"""
+Cache dos dados dos gráficos (dados_graficos) das páginas /graficos/ e
+/lotes/<id>/graficos/.
+
+A chave combina a visão, o lote e o período normalizado (datas de início e fim
+já resolvidas, então "30dias" muda de chave à meia-noite). Cada entrada guarda a
+versão dos dados com que foi calculada, um par (identidade, contador):
+- gráficos de um lote: identidade pelas datas de criação e alteração do Lote e
+  contador Lote.versao_dados, incrementado pela consolidação a cada leitura
+  gravada ou excluída no lote (e quando um hidrômetro do lote muda);
+- gráficos do condomínio: identidade pela quantidade de lotes e a última
+  alteração entre eles, contador pela soma das versões.
+Uma leitura no lote 5 muda a versão do lote 5 e a do condomínio, mas não a do
+lote 200.
+
+As versões ficam no banco, então valem para todos os workers; os dados ficam no
+cache do Django (settings.CACHES). Quando só o contador mudou (leituras novas),
+a entrada antiga continua sendo servida enquanto uma thread a recalcula
+(stale-while-revalidate). Sem entrada ou com os lotes alterados (cadastro, tipo),
+o cálculo é feito na hora. Com settings.GRAFICOS_REVALIDACAO_EM_SEGUNDO_PLANO
+= False o recálculo também é feito na hora, na própria requisição.
+
+aversao_condominio() e aobter_dados() são as versões para views assíncronas:
+leem as mesmas versões e as mesmas entradas (a API assíncrona e a página
+compartilham o cache), com o cálculo na hora feito pela função assíncrona.
+"""
+import logging
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connections
+from django.db.models import Count, Max, Sum
+
+from .models import Lote
+
+TIMEOUT = 24 * 60 * 60
+TIMEOUT_RECALCULO = 5 * 60
+
+logger = logging.getLogger(__name__)
+
+
+def versao_lote(lote):
+    return (f'{lote.criado_em.timestamp()}:{lote.atualizado_em.timestamp()}', lote.versao_dados)
+
+
+_RESUMO_LOTES = {'quantidade': Count('id'), 'soma': Sum('versao_dados'), 'atualizado_em': Max('atualizado_em')}
+
+
+def resumo_lotes():
+    """Quantidade de lotes, soma das versões e última alteração (uma consulta)"""
+    return Lote.objects.aggregate(**_RESUMO_LOTES)
+
+
+def versao_condominio(resumo=None):
+    resumo = resumo or resumo_lotes()
+    atualizado_em = resumo['atualizado_em'].timestamp() if resumo['atualizado_em'] else 0
+    return (f"{resumo['quantidade']}:{atualizado_em}", resumo['soma'] or 0)
+
+
+async def aversao_condominio():
+    return versao_condominio(await Lote.objects.aaggregate(**_RESUMO_LOTES))
+
+
+def chave(visao, lote_id, periodo, data_inicio, data_fim, *extras):
+    """Chave do cache com o período normalizado para datas (AAAAMMDD)"""
+    partes = [visao, lote_id or '-', periodo, f'{data_inicio:%Y%m%d}', f'{data_fim:%Y%m%d}', *extras]
+    return 'graficos:' + ':'.join(str(parte) for parte in partes)
+
+
+def obter_dados(chave, versao, calcular):
+    """dados_graficos da chave, calculados por calcular() quando necessário.
+
+    Versão em cache igual à atual: devolve o cache. Mesma identidade com contador
+    antigo: devolve o cache e agenda o recálculo em segundo plano. Caso contrário
+    calcula na hora.
+    """
+    entrada = cache.get(chave)
+    if _servir_cache(entrada, versao):
+        if entrada[0] != versao:
+            _revalidar(chave, versao, calcular)
+        return entrada[1]
+
+    dados = calcular()
+    cache.set(chave, (versao, dados), TIMEOUT)
+    return dados
+
+
+async def aobter_dados(chave, versao, acalcular, calcular):
+    """Versão assíncrona de obter_dados: o cálculo na hora é await acalcular().
+
+    O recálculo em segundo plano continua em uma thread, com calcular().
+    """
+    entrada = await cache.aget(chave)
+    if _servir_cache(entrada, versao):
+        if entrada[0] != versao:
+            await sync_to_async(_revalidar)(chave, versao, calcular)
+        return entrada[1]
+
+    dados = await acalcular()
+    await cache.aset(chave, (versao, dados), TIMEOUT)
+    return dados
+
+
+def _servir_cache(entrada, versao):
+    # Versão igual ou mesma identidade com contador antigo (recalculada depois)
+    return entrada is not None and entrada[0][0] == versao[0]
+
+
+def _revalidar(chave, versao, calcular):
+    # Um único recálculo por chave e versão de cada vez
+    trava = f'{chave}:recalculando:{versao[1]}'
+    if not cache.add(trava, True, TIMEOUT_RECALCULO):
+        return
+    if getattr(settings, 'GRAFICOS_REVALIDACAO_EM_SEGUNDO_PLANO', True):
+        _em_segundo_plano(_recalcular, chave, versao, calcular, trava)
+    else:
+        _recalcular(chave, versao, calcular, trava)
+
+
+def _recalcular(chave, versao, calcular, trava):
+    try:
+        cache.set(chave, (versao, calcular()), TIMEOUT)
+    except Exception:
+        logger.exception('Falha ao recalcular os dados dos gráficos (%s)', chave)
+    finally:
+        cache.delete(trava)
+
+
+def _em_segundo_plano(funcao, *args):
+    def executar():
+        # Mesmo ciclo de conexões de uma requisição: descarta as vencidas antes
+        # e fecha as da thread ao final
+        close_old_connections()
+        try:
+            funcao(*args)
+        finally:
+            connections.close_all()
+
+    # Não daemon: no desligamento do worker o processo espera o recálculo terminar
+    threading.Thread(target=executar, name='recalculo-graficos').start()
@@ -0,0 +1,48 @@
+"""
+GET condicional (ETag) das listas da API e das páginas de gráficos.
+
+O ETag sai da versão dos dados, um marcador barato consultado antes dos
+querysets e agregações caros: a mesma do cache dos gráficos (Lote.versao_dados,
+que muda a cada leitura gravada ou excluída e a cada alteração de hidrômetro,
+mais as alterações dos próprios lotes), do condomínio inteiro ou de um lote.
+
+O ETag combina a versão com a URL completa (filtros, página), o Accept e o dia
+atual, porque janelas como "últimos 30 dias" e o consumo do dia mudam à
+meia-noite. Com If-None-Match em dia a view responde 304 sem executar mais nada.
+
+Não há Last-Modified: nenhuma data acompanha a versão. O atualizado_em dos
+lotes não muda quando um hidrômetro é editado (só versao_dados, por .update()),
+e o maior atualizado_em pode até voltar no tempo quando um hidrômetro ou lote é
+excluído; um cliente só com If-Modified-Since receberia 304 com dados antigos.
+"""
+import hashlib
+
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from .cache_graficos import versao_condominio, versao_lote
+from .models import Lote
+
+
+def _etag(request, versao):
+    partes = [
+        request.get_full_path(),
+        request.META.get('HTTP_ACCEPT', ''),
+        timezone.localdate().isoformat(),
+        repr(versao),
+    ]
+    return hashlib.sha1('|'.join(partes).encode('utf-8')).hexdigest()
+
+
+def etag_condominio(request, *args, **kwargs):
+    return _etag(request, versao_condominio())
+
+
+def etag_lote(request, lote_id, *args, **kwargs):
+    lote = Lote.objects.filter(pk=lote_id).first()
+    return _etag(request, versao_lote(lote)) if lote is not None else None
+
+
+# Decoradores prontos para as views (e, com method_decorator, para os ViewSets)
+condicional_condominio = condition(etag_func=etag_condominio)
+condicional_lote = condition(etag_func=etag_lote)
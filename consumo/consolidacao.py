@@ -0,0 +1,436 @@
+"""
+Manutenção incremental da consolidação diária de consumo (ConsumoDiario).
+
+Cada gravação ou exclusão de Leitura marca o dia afetado do hidrômetro. O
+recálculo refaz, a partir das leituras, os dias entre o primeiro dia marcado e
+o dia da primeira leitura seguinte (cujo delta depende da leitura alterada).
+
+Fora de adiar_consolidacao() o recálculo é imediato; dentro dele as marcações
+são acumuladas e recalculadas uma única vez por hidrômetro ao final do bloco,
+o que torna inserções e exclusões em massa viáveis.
+
+O mesmo recálculo atualiza a coluna Leitura.consumo_m3/consumo_litros (delta em
+relação à leitura anterior) das leituras do intervalo, o que cobre a leitura
+seguinte a uma inserção, edição ou exclusão.
+
+Ao final de cada recálculo o estado dos hidrômetros afetados (HidrometroEstado:
+última leitura, primeira leitura e contagem do dia, consumo do mês) é refeito
+com uma consulta por lote de hidrômetros.
+
+A consolidação mensal (ConsumoMensal) é derivada da diária: cada recálculo de
+dias refaz, com uma soma agrupada, os meses que os contêm. Meses anteriores ao
+atual ficam marcados como fechados: só voltam a ser gravados se uma correção de
+leitura mudar os totais deles. O primeiro recálculo após a virada do mês fecha
+os meses que ainda estavam abertos (fechar_meses(), pelo índice parcial dos
+meses abertos).
+
+Cada recálculo trava (select_for_update) os hidrômetros afetados até o fim da
+transação, então recálculos concorrentes do mesmo hidrômetro são serializados.
+
+O recálculo também incrementa Lote.versao_dados dos lotes afetados, na mesma
+transação, o que invalida os dados de gráficos em cache desses lotes.
+"""
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, QuerySet, Subquery, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import ConsumoDiario, ConsumoMensal, Hidrometro, HidrometroEstado, Leitura, Lote
+
+_estado = threading.local()
+
+CAMPOS_ESTADO = [
+    'ultima_leitura', 'ultima_data_leitura', 'ultimo_periodo', 'dia',
+    'primeira_leitura_dia', 'leituras_dia', 'mes', 'litros_mes', 'atualizado_em',
+]
+
+
+def _dia_local(momento):
+    return timezone.localtime(momento).date()
+
+
+def _inicio_do_dia(dia):
+    """Meia-noite local do dia: janelas por intervalo de data_leitura usam o índice (__date não)"""
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def _proximo_mes(mes):
+    return (mes.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+@contextmanager
+def adiar_consolidacao():
+    """Acumula as marcações do bloco e recalcula a consolidação uma vez ao final"""
+    profundidade = getattr(_estado, 'profundidade', 0)
+    if profundidade == 0:
+        _estado.pendentes = defaultdict(set)
+    _estado.profundidade = profundidade + 1
+    try:
+        yield
+    finally:
+        _estado.profundidade -= 1
+        if _estado.profundidade == 0:
+            pendentes = _estado.pendentes
+            _estado.pendentes = None
+            recalcular_consumo_diario(pendentes)
+
+
+def marcar_alteracao(hidrometro_id, data_leitura):
+    """Registra que o dia da leitura (e o da leitura seguinte) precisa ser recalculado"""
+    dia = _dia_local(data_leitura)
+    if getattr(_estado, 'profundidade', 0):
+        _estado.pendentes[hidrometro_id].add(dia)
+    else:
+        recalcular_consumo_diario({hidrometro_id: {dia}})
+
+
+def antecipar_ultima_leitura(leitura):
+    """Dentro de adiar_consolidacao(), leva já ao estado a leitura mais recente gravada.
+
+    A validação de novas leituras compara com HidrometroEstado.ultima_leitura,
+    que de outro modo só seria refeito ao final do bloco.
+    """
+    if not getattr(_estado, 'profundidade', 0):
+        return
+    HidrometroEstado.objects.filter(
+        Q(ultima_data_leitura__lt=leitura.data_leitura) | Q(ultima_data_leitura__isnull=True),
+        hidrometro_id=leitura.hidrometro_id,
+    ).update(
+        ultima_leitura=leitura.leitura,
+        ultima_data_leitura=leitura.data_leitura,
+        ultimo_periodo=leitura.periodo,
+    )
+
+
+def recalcular_consumo_diario(pendentes):
+    """Recalcula a consolidação dos dias marcados ({hidrometro_id: {datas}})"""
+    if not pendentes:
+        return
+
+    with transaction.atomic():
+        # Trava os hidrômetros (em ordem de id, sem deadlock) até o fim da transação:
+        # dois recálculos do mesmo hidrômetro não se intercalam entre o delete e o
+        # bulk_create das consolidações, o que violaria (hidrometro, data/mes) únicos
+        lotes = dict(
+            Hidrometro.objects.select_for_update()
+            .filter(id__in=list(pendentes))
+            .order_by('id')
+            .values_list('id', 'lote_id')
+        )
+        for hidrometro_id, dias in pendentes.items():
+            if hidrometro_id not in lotes or not dias:
+                # Hidrômetro excluído: a consolidação foi removida em cascata
+                continue
+            _recalcular_intervalo(hidrometro_id, lotes[hidrometro_id], min(dias), max(dias))
+        fechar_meses()
+        atualizar_estados(Hidrometro.objects.filter(id__in=list(lotes)))
+        incrementar_versao_lotes(set(lotes.values()))
+
+
+def incrementar_versao_lotes(lote_ids):
+    """Marca os dados dos lotes como alterados (Lote.versao_dados + 1)"""
+    Lote.objects.filter(id__in=lote_ids).update(versao_dados=F('versao_dados') + 1)
+
+
+def _recalcular_intervalo(hidrometro_id, lote_id, dia_inicio, dia_fim):
+    leituras = Leitura.objects.filter(hidrometro_id=hidrometro_id)
+
+    # O delta da primeira leitura após o intervalo depende da última leitura dele
+    proxima = (
+        leituras.filter(data_leitura__gte=_inicio_do_dia(dia_fim + timedelta(days=1)))
+        .order_by('data_leitura')
+        .values_list('data_leitura', flat=True)
+        .first()
+    )
+    if proxima is not None:
+        dia_fim = _dia_local(proxima)
+
+    anterior = (
+        leituras.filter(data_leitura__lt=_inicio_do_dia(dia_inicio))
+        .order_by('-data_leitura')
+        .values_list('leitura', flat=True)
+        .first()
+    )
+
+    consolidado = {}
+    deltas = []
+    for leitura_id, data_leitura, valor, consumo_m3 in (
+        leituras.filter(
+            data_leitura__gte=_inicio_do_dia(dia_inicio),
+            data_leitura__lt=_inicio_do_dia(dia_fim + timedelta(days=1)),
+        )
+        .order_by('data_leitura')
+        .values_list('id', 'data_leitura', 'leitura', 'consumo_m3')
+    ):
+        dia = _dia_local(data_leitura)
+        litros, n_leituras = consolidado.get(dia, (Decimal('0'), 0))
+        if anterior is not None and valor > anterior:
+            litros += (valor - anterior) * 1000
+        consolidado[dia] = (litros, n_leituras + 1)
+
+        delta = valor - anterior if anterior is not None else Decimal('0')
+        if consumo_m3 != delta:
+            deltas.append(Leitura(id=leitura_id, consumo_m3=delta, consumo_litros=delta * 1000))
+        anterior = valor
+
+    Leitura.objects.bulk_update(deltas, ['consumo_m3', 'consumo_litros'])
+
+    ConsumoDiario.objects.filter(
+        hidrometro_id=hidrometro_id,
+        data__gte=dia_inicio,
+        data__lte=dia_fim,
+    ).delete()
+    ConsumoDiario.objects.bulk_create([
+        ConsumoDiario(
+            hidrometro_id=hidrometro_id,
+            lote_id=lote_id,
+            data=dia,
+            litros=litros,
+            n_leituras=n_leituras,
+        )
+        for dia, (litros, n_leituras) in consolidado.items()
+    ])
+
+    _recalcular_meses(hidrometro_id, dia_inicio.replace(day=1), dia_fim.replace(day=1))
+
+
+def atualizar_estados(hidrometros):
+    """Refaz HidrometroEstado dos hidrômetros informados (uma consulta + gravação em lote)"""
+    if not isinstance(hidrometros, QuerySet):
+        hidrometros = Hidrometro.objects.filter(pk__in=[getattr(h, 'pk', h) for h in hidrometros])
+    hoje = timezone.localdate()
+    mes = hoje.replace(day=1)
+    leituras = Leitura.objects.filter(hidrometro=OuterRef('pk'))
+    ultima = leituras.order_by('-data_leitura')
+    do_dia = leituras.filter(
+        data_leitura__gte=_inicio_do_dia(hoje),
+        data_leitura__lt=_inicio_do_dia(hoje + timedelta(days=1)),
+    )
+
+    linhas = hidrometros.order_by().annotate(
+        e_ultima_leitura=Subquery(ultima.values('leitura')[:1]),
+        e_ultima_data_leitura=Subquery(ultima.values('data_leitura')[:1]),
+        e_ultimo_periodo=Subquery(ultima.values('periodo')[:1]),
+        e_primeira_leitura_dia=Subquery(do_dia.order_by('data_leitura').values('leitura')[:1]),
+        e_leituras_dia=Subquery(
+            do_dia.order_by().values('hidrometro').annotate(n=Count('id')).values('n')[:1]
+        ),
+        e_litros_mes=Subquery(
+            ConsumoMensal.objects.filter(hidrometro=OuterRef('pk'), mes=mes).values('litros')[:1]
+        ),
+    ).values_list(
+        'id', 'e_ultima_leitura', 'e_ultima_data_leitura', 'e_ultimo_periodo',
+        'e_primeira_leitura_dia', 'e_leituras_dia', 'e_litros_mes',
+    )
+
+    estados = [
+        HidrometroEstado(
+            hidrometro_id=hidrometro_id,
+            ultima_leitura=ultima_leitura,
+            ultima_data_leitura=ultima_data_leitura,
+            ultimo_periodo=ultimo_periodo or '',
+            dia=hoje,
+            primeira_leitura_dia=primeira_leitura_dia,
+            leituras_dia=leituras_dia or 0,
+            mes=mes,
+            litros_mes=litros_mes or 0,
+        )
+        for (hidrometro_id, ultima_leitura, ultima_data_leitura, ultimo_periodo,
+             primeira_leitura_dia, leituras_dia, litros_mes) in linhas
+    ]
+    # Upsert em vez de delete + insert: chamadas simultâneas (fora da trava do
+    # recálculo, como o comando de reconstrução) não colidem na chave primária
+    HidrometroEstado.objects.bulk_create(
+        estados,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['hidrometro'],
+        update_fields=CAMPOS_ESTADO,
+    )
+    return len(estados)
+
+
+def _totais_mensais(consumos_diarios):
+    """Soma agrupada por (hidrômetro, lote, mês) de um queryset de ConsumoDiario"""
+    return (
+        consumos_diarios.order_by()
+        .annotate(mes=TruncMonth('data'))
+        .values('hidrometro_id', 'lote_id', 'mes')
+        .annotate(total_litros=Sum('litros'), total_leituras=Sum('n_leituras'))
+        .order_by('hidrometro_id', 'mes')
+    )
+
+
+def _consumo_mensal(linha, mes_atual):
+    return ConsumoMensal(
+        hidrometro_id=linha['hidrometro_id'],
+        lote_id=linha['lote_id'],
+        mes=linha['mes'],
+        litros=linha['total_litros'],
+        n_leituras=linha['total_leituras'],
+        fechado=linha['mes'] < mes_atual,
+    )
+
+
+def _valores_mensais(mensal):
+    return (mensal.lote_id, mensal.litros, mensal.n_leituras, mensal.fechado)
+
+
+def _recalcular_meses(hidrometro_id, mes_inicio, mes_fim):
+    mes_atual = timezone.localdate().replace(day=1)
+    diarios = ConsumoDiario.objects.filter(
+        hidrometro_id=hidrometro_id,
+        data__gte=mes_inicio,
+        data__lt=_proximo_mes(mes_fim),
+    )
+    meses = ConsumoMensal.objects.filter(
+        hidrometro_id=hidrometro_id,
+        mes__gte=mes_inicio,
+        mes__lte=mes_fim,
+    )
+    atuais = {mensal.mes: _valores_mensais(mensal) for mensal in meses}
+    novos = {linha['mes']: _consumo_mensal(linha, mes_atual) for linha in _totais_mensais(diarios)}
+
+    sem_dias = [mes for mes in atuais if mes not in novos]
+    if sem_dias:
+        meses.filter(mes__in=sem_dias).delete()
+    # Meses com os mesmos totais (ex.: mês fechado sem correção de consumo) ficam como estão
+    ConsumoMensal.objects.bulk_create(
+        [mensal for mes, mensal in novos.items() if atuais.get(mes) != _valores_mensais(mensal)],
+        update_conflicts=True,
+        unique_fields=['hidrometro', 'mes'],
+        update_fields=['lote', 'litros', 'n_leituras', 'fechado', 'atualizado_em'],
+    )
+
+
+def fechar_meses(mes_atual=None):
+    """Marca como fechados os meses anteriores ao atual ainda abertos (virada do mês)"""
+    mes_atual = mes_atual or timezone.localdate().replace(day=1)
+    return ConsumoMensal.objects.filter(fechado=False, mes__lt=mes_atual).update(fechado=True)
+
+
+def calcular_delta(leitura):
+    """Delta (m³) de uma leitura ainda não gravada em relação à leitura anterior do hidrômetro"""
+    anterior = (
+        Leitura.objects.filter(hidrometro_id=leitura.hidrometro_id, data_leitura__lt=leitura.data_leitura)
+        .exclude(pk=leitura.pk)
+        .order_by('-data_leitura')
+        .values_list('leitura', flat=True)
+        .first()
+    )
+    if anterior is None:
+        return Decimal('0')
+    return Decimal(str(leitura.leitura)) - anterior
+
+
+def reconstruir_deltas(hidrometros=None, somente_pendentes=False, batch_size=2000):
+    """Preenche Leitura.consumo_m3/consumo_litros (backfill) e retorna o número de leituras alteradas"""
+    leituras = Leitura.objects.all()
+    if hidrometros is not None:
+        leituras = leituras.filter(hidrometro__in=hidrometros)
+    if somente_pendentes:
+        pendentes = leituras.filter(consumo_m3__isnull=True).values('hidrometro_id')
+        leituras = leituras.filter(hidrometro_id__in=pendentes)
+
+    leituras = leituras.order_by('hidrometro_id', 'data_leitura').values_list(
+        'id', 'hidrometro_id', 'leitura', 'consumo_m3'
+    )
+
+    total = 0
+    with transaction.atomic():
+        alteradas = []
+        hidrometro_anterior, anterior = None, None
+        for leitura_id, hidrometro_id, valor, consumo_m3 in leituras.iterator(chunk_size=batch_size):
+            if hidrometro_id != hidrometro_anterior:
+                hidrometro_anterior, anterior = hidrometro_id, None
+            delta = valor - anterior if anterior is not None else Decimal('0')
+            if consumo_m3 != delta:
+                alteradas.append(Leitura(id=leitura_id, consumo_m3=delta, consumo_litros=delta * 1000))
+                if len(alteradas) >= batch_size:
+                    Leitura.objects.bulk_update(alteradas, ['consumo_m3', 'consumo_litros'])
+                    total += len(alteradas)
+                    alteradas = []
+            anterior = valor
+
+        Leitura.objects.bulk_update(alteradas, ['consumo_m3', 'consumo_litros'])
+        total += len(alteradas)
+
+    return total
+
+
+def reconstruir_consumo_diario(hidrometros=None, batch_size=2000):
+    """Reconstrói do zero as consolidações diária e mensal (backfill) e retorna o número de dias criados"""
+    leituras = Leitura.objects.all()
+    consolidacao = ConsumoDiario.objects.all()
+    mensal = ConsumoMensal.objects.all()
+    if hidrometros is not None:
+        leituras = leituras.filter(hidrometro__in=hidrometros)
+        consolidacao = consolidacao.filter(hidrometro__in=hidrometros)
+        mensal = mensal.filter(hidrometro__in=hidrometros)
+
+    leituras = leituras.order_by('hidrometro_id', 'data_leitura').values_list(
+        'hidrometro_id', 'hidrometro__lote_id', 'data_leitura', 'leitura'
+    )
+
+    total = 0
+    with transaction.atomic():
+        consolidacao.delete()
+
+        lote_id = None
+        linhas = []
+        atual = None  # (hidrometro_id, dia)
+        litros, n_leituras = Decimal('0'), 0
+        hidrometro_anterior, anterior = None, None
+
+        def _fechar_dia():
+            linhas.append(ConsumoDiario(
+                hidrometro_id=atual[0],
+                lote_id=lote_id,
+                data=atual[1],
+                litros=litros,
+                n_leituras=n_leituras,
+            ))
+
+        for hidrometro_id, lote_atual, data_leitura, valor in leituras.iterator(chunk_size=batch_size):
+            chave = (hidrometro_id, _dia_local(data_leitura))
+            if chave != atual:
+                if atual is not None:
+                    _fechar_dia()
+                    if len(linhas) >= batch_size:
+                        ConsumoDiario.objects.bulk_create(linhas)
+                        total += len(linhas)
+                        linhas = []
+                atual, lote_id = chave, lote_atual
+                litros, n_leituras = Decimal('0'), 0
+            if hidrometro_id != hidrometro_anterior:
+                hidrometro_anterior, anterior = hidrometro_id, None
+            if anterior is not None and valor > anterior:
+                litros += (valor - anterior) * 1000
+            n_leituras += 1
+            anterior = valor
+
+        if atual is not None:
+            _fechar_dia()
+        ConsumoDiario.objects.bulk_create(linhas)
+        total += len(linhas)
+
+        mensal.delete()
+        mes_atual = timezone.localdate().replace(day=1)
+        ConsumoMensal.objects.bulk_create(
+            (_consumo_mensal(linha, mes_atual) for linha in _totais_mensais(consolidacao)),
+            batch_size=batch_size,
+        )
+
+        atualizar_estados(hidrometros if hidrometros is not None else Hidrometro.objects.all())
+        lotes = Lote.objects.all()
+        if hidrometros is not None:
+            lotes = lotes.filter(hidrometros__in=hidrometros)
+        incrementar_versao_lotes(set(lotes.values_list('id', flat=True)))
+
+    return total
@@ -0,0 +1,79 @@
+"""
+Estatísticas de consumo de vários hidrômetros em uma única passagem.
+
+As leituras da janela são carregadas em séries compactas (SerieLeituras) com
+uma só consulta; para cada hidrômetro o consumo diário (dias sem consumo
+contam como zero) dá média, desvio padrão, mínimo, máximo, p50 e p95.
+"""
+from datetime import timedelta
+from math import floor
+from statistics import fmean, pstdev
+
+from django.utils import timezone
+
+from .series import SerieLeituras
+
+DIAS_MAXIMO = 366
+
+
+def _percentil(ordenados, fracao):
+    # Interpolação linear entre as posições vizinhas (mesmo critério do numpy.percentile)
+    posicao = (len(ordenados) - 1) * fracao
+    abaixo = floor(posicao)
+    acima = min(abaixo + 1, len(ordenados) - 1)
+    return ordenados[abaixo] + (ordenados[acima] - ordenados[abaixo]) * (posicao - abaixo)
+
+
+def _resumo_diario(consumo_por_dia, dias_janela):
+    valores = sorted(consumo_por_dia.get(dia, 0.0) for dia in dias_janela)
+    return {
+        'media': round(fmean(valores), 2),
+        'desvio_padrao': round(pstdev(valores), 2),
+        'minimo': round(valores[0], 2),
+        'maximo': round(valores[-1], 2),
+        'p50': round(_percentil(valores, 0.5), 2),
+        'p95': round(_percentil(valores, 0.95), 2),
+    }
+
+
+def _janela(dias, agora):
+    agora = agora or timezone.now()
+    return agora - timedelta(days=dias), agora
+
+
+def _resumir(hidrometros, series, dias, agora):
+    hoje = timezone.localtime(agora).date()
+    dias_janela = [hoje - timedelta(days=i) for i in range(dias)]
+
+    estatisticas = []
+    for hidrometro in hidrometros:
+        serie = series.get(hidrometro.id) or SerieLeituras(hidrometro.id)
+        consumo_total = float(serie.ultima - serie.primeira) if serie else 0.0
+        estatisticas.append({
+            'hidrometro_id': hidrometro.id,
+            'hidrometro': hidrometro.numero,
+            'periodo_dias': dias,
+            'total_leituras': len(serie),
+            'consumo_total_m3': consumo_total,
+            'consumo_medio_dia_m3': round(consumo_total / dias, 3),
+            'primeira_leitura': serie.primeira,
+            'ultima_leitura': serie.ultima,
+            'consumo_diario_litros': _resumo_diario(serie.por_dia(), dias_janela),
+        })
+    return estatisticas
+
+
+def estatisticas_hidrometros(hidrometros, dias, agora=None):
+    """Estatísticas dos últimos `dias` dias de cada hidrômetro, na ordem recebida"""
+    data_inicio, agora = _janela(dias, agora)
+    hidrometros = list(hidrometros)
+    series = SerieLeituras.carregar(hidrometros, data_inicio, agora)
+    return _resumir(hidrometros, series, dias, agora)
+
+
+async def aestatisticas_hidrometros(hidrometros, dias, agora=None):
+    """Versão assíncrona de estatisticas_hidrometros (hidrometros já carregados)"""
+    data_inicio, agora = _janela(dias, agora)
+    hidrometros = list(hidrometros)
+    series = await SerieLeituras.acarregar(hidrometros, data_inicio, agora)
+    return _resumir(hidrometros, series, dias, agora)
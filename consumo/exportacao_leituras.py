@@ -0,0 +1,110 @@
+"""
+Exportação das leituras brutas em CSV ou CSV.gz, em fluxo.
+
+As leituras são lidas com .iterator(chunk_size=...) (cursor no servidor no
+PostgreSQL, fetchmany no SQLite) só com as colunas exportadas, e cada bloco vira
+um pedaço do CSV (comprimido com zlib no formato gzip, para .csv.gz) entregue a
+um StreamingHttpResponse ou gravado em arquivo: a memória não cresce com o
+tamanho da exportação.
+
+Os filtros são os mesmos de GET /api/leituras/ (filtrar_leituras). O consumo de
+cada leitura é a coluna persistida Leitura.consumo_m3/consumo_litros, válida
+mesmo quando os filtros cortam a sequência de um hidrômetro. As colunas
+hidrometro, leitura, data_leitura, periodo, responsavel e observacoes são as da
+importação (importacao.py): o arquivo exportado pode ser importado de volta.
+"""
+import csv
+import io
+import zlib
+from itertools import islice
+
+from django.utils import timezone
+
+from .models import Leitura
+
+CHUNK_SIZE = 2000
+COLUNAS = [
+    'id', 'hidrometro', 'lote', 'data_leitura', 'periodo', 'leitura',
+    'consumo_m3', 'consumo_litros', 'responsavel', 'observacoes',
+]
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'csv.gz': 'application/gzip',
+}
+
+
+def filtrar_leituras(queryset, parametros):
+    """Filtros de GET /api/leituras/: hidrometro, data_inicio, data_fim e periodo"""
+    hidrometro_id = parametros.get('hidrometro', None)
+    data_inicio = parametros.get('data_inicio', None)
+    data_fim = parametros.get('data_fim', None)
+    periodo = parametros.get('periodo', None)
+
+    if hidrometro_id:
+        queryset = queryset.filter(hidrometro_id=hidrometro_id)
+    if data_inicio:
+        queryset = queryset.filter(data_leitura__gte=data_inicio)
+    if data_fim:
+        queryset = queryset.filter(data_leitura__lte=data_fim)
+    if periodo:
+        queryset = queryset.filter(periodo=periodo)
+    return queryset
+
+
+def leituras_exportadas(parametros):
+    """Linhas da exportação na ordem do índice (hidrômetro, data), sem instanciar modelos"""
+    return filtrar_leituras(Leitura.objects.all(), parametros).order_by('hidrometro_id', 'data_leitura').values_list(
+        'id', 'hidrometro__numero', 'hidrometro__lote__numero', 'data_leitura', 'periodo', 'leitura',
+        'consumo_m3', 'consumo_litros', 'responsavel', 'observacoes',
+    )
+
+
+def nome_arquivo(formato):
+    return f'leituras_{timezone.localtime():%Y%m%d_%H%M%S}.{formato}'
+
+
+def gerar_csv(linhas, chunk_size=CHUNK_SIZE):
+    """Texto do CSV (cabeçalho e um pedaço por bloco de linhas)"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(COLUNAS)
+    linhas = iter(linhas)
+    while True:
+        bloco = list(islice(linhas, chunk_size))
+        if not bloco:
+            break
+        for (id_, hidrometro, lote, data_leitura, periodo, leitura,
+             consumo_m3, consumo_litros, responsavel, observacoes) in bloco:
+            escritor.writerow([
+                id_, hidrometro, lote, timezone.localtime(data_leitura).isoformat(), periodo, leitura,
+                consumo_m3, consumo_litros, responsavel or '', observacoes or '',
+            ])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gerar_bytes(parametros, formato='csv', chunk_size=None):
+    """Pedaços (bytes) do arquivo exportado: CSV em UTF-8 ou, para csv.gz, gzip.
+
+    Os filtros são validados aqui, antes do primeiro pedaço (ValidationError ou
+    ValueError para datas e ids inválidos); a consulta só roda na iteração.
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f'Formato de exportação desconhecido: {formato}')
+    chunk_size = chunk_size or CHUNK_SIZE
+    linhas = leituras_exportadas(parametros).iterator(chunk_size=chunk_size)
+    pedacos = (texto.encode('utf-8') for texto in gerar_csv(linhas, chunk_size))
+    return pedacos if formato == 'csv' else _comprimir(pedacos)
+
+
+def _comprimir(pedacos):
+    # wbits=31: cabeçalho e rodapé gzip, para o arquivo abrir com gunzip
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for pedaco in pedacos:
+        comprimido = compressor.compress(pedaco)
+        if comprimido:
+            yield comprimido
+    yield compressor.flush()
@@ -0,0 +1,235 @@
+"""
+Fila de exportação dos relatórios em PDF e Excel, sem broker externo.
+
+Os relatórios do ano inteiro levam mais que o timeout do gunicorn para serem
+gerados dentro da requisição. Aqui o pedido vira uma linha em Exportacao
+(enfileirar) e o comando processar_exportacoes gera os arquivos em um pool de
+processos locais, reservando cada pedido com um UPDATE condicional
+(status pendente -> processando), que funciona igual no SQLite e no PostgreSQL.
+
+Os arquivos prontos são guardados no banco (armazenamento.ArmazenamentoBanco,
+compartilhado pelo serviço web e pelo processador da fila) pelo SHA-256 do
+conteúdo (exportacoes/ab/abcd….pdf): conteúdos iguais ocupam um arquivo só.
+Cada pedido tem uma chave com o relatório, os parâmetros, o dia e a versão dos
+dados (cache_graficos); um pedido com a mesma chave reaproveita a exportação já
+feita (ou em andamento) em vez de gerar outra; a restrição única parcial em
+chave (fora as com erro) vale também para pedidos iguais simultâneos. Uma
+leitura nova muda a versão e o próximo pedido gera um arquivo novo. Uma exportação concluída cujo arquivo
+sumiu volta para a fila (regenerar).
+
+O relatório das linhas rejeitadas de uma importação também é guardado aqui
+(guardar_relatorio_importacao), como exportação já concluída: o cliente o
+baixa pelo mesmo /download/.
+"""
+import hashlib
+import json
+import logging
+import multiprocessing
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import timedelta
+
+from django.core.files import File
+from django.db import IntegrityError, OperationalError, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import cache_graficos, relatorios, trabalhador_exportacao
+from .armazenamento import TAMANHO_BLOCO
+from .models import Exportacao
+
+INTERVALO = 2
+TEMPO_MAXIMO_PROCESSANDO = timedelta(minutes=15)
+MAX_TENTATIVAS = 3
+EXTENSOES = {'pdf': 'pdf', 'excel': 'xlsx', 'csv': 'csv'}
+
+logger = logging.getLogger(__name__)
+armazenamento = Exportacao._meta.get_field('arquivo').storage
+
+
+def parametros_relatorio(parametros):
+    """Só os parâmetros que mudam o relatório: o período e, se personalizado, as datas"""
+    periodo = parametros.get('periodo') or '30dias'
+    normalizados = {'periodo': periodo}
+    if periodo == 'personalizado':
+        normalizados['data_inicio'] = parametros.get('data_inicio') or ''
+        normalizados['data_fim'] = parametros.get('data_fim') or ''
+    return normalizados
+
+
+def chave_exportacao(relatorio, formato, parametros, lote=None):
+    versao = cache_graficos.versao_lote(lote) if lote else cache_graficos.versao_condominio()
+    conteudo = json.dumps(
+        [relatorio, formato, lote.pk if lote else None, parametros, timezone.localdate().isoformat(), versao],
+        sort_keys=True,
+    )
+    return hashlib.sha256(conteudo.encode()).hexdigest()
+
+
+def enfileirar(relatorio, formato, parametros, lote=None):
+    """Exportação para o pedido: a existente com a mesma chave ou uma nova pendente.
+
+    Retorna (exportacao, criada).
+    """
+    parametros = parametros_relatorio(parametros)
+    chave = chave_exportacao(relatorio, formato, parametros, lote)
+    ativas = Exportacao.objects.filter(chave=chave).exclude(status='erro')
+    existente = ativas.first()
+    if existente is not None:
+        return existente, False
+    try:
+        with transaction.atomic():
+            exportacao = Exportacao.objects.create(
+                relatorio=relatorio, formato=formato, lote=lote, parametros=parametros, chave=chave,
+            )
+    except IntegrityError:
+        # Pedido igual gravado entre a consulta e o create (exportacao_chave_ativa_unica)
+        return ativas.get(), False
+    return exportacao, True
+
+
+def reservar_proxima():
+    """Id da exportação pendente mais antiga, já marcada como processando (None se não há)"""
+    pendentes = Exportacao.objects.filter(status='pendente').order_by('criado_em').values_list('pk', flat=True)
+    for pk in pendentes[:10]:
+        reservada = Exportacao.objects.filter(pk=pk, status='pendente').update(
+            status='processando', iniciado_em=timezone.now(), tentativas=F('tentativas') + 1,
+        )
+        if reservada:
+            return pk
+    return None
+
+
+def recuperar_travadas():
+    """Devolve à fila as exportações paradas em processando (worker encerrado no meio)"""
+    limite = timezone.now() - TEMPO_MAXIMO_PROCESSANDO
+    travadas = Exportacao.objects.filter(status='processando', iniciado_em__lt=limite)
+    if not travadas.exists():
+        return
+    travadas.filter(tentativas__lt=MAX_TENTATIVAS).update(status='pendente')
+    travadas.update(status='erro', erro='Tempo máximo de processamento excedido', concluido_em=timezone.now())
+
+
+def regenerar(exportacao):
+    """Devolve à fila uma exportação concluída cujo arquivo sumiu do armazenamento.
+
+    Pedidos com a mesma chave passam a aguardar o novo arquivo em vez de
+    receber a exportação sem arquivo.
+    """
+    logger.warning(
+        'Arquivo da exportação %s não encontrado (%s); voltando para a fila', exportacao.pk, exportacao.arquivo.name,
+    )
+    Exportacao.objects.filter(pk=exportacao.pk, status='concluida').update(
+        status='pendente', arquivo='', sha256='', tamanho=None, tentativas=0,
+        iniciado_em=None, concluido_em=None,
+    )
+    exportacao.refresh_from_db()
+
+
+def armazenar(conteudo, formato):
+    """Grava o conteúdo (bytes ou arquivo) pelo seu SHA-256 (uma vez só) e retorna (nome, sha256)"""
+    arquivo = relatorios.como_arquivo(conteudo)
+    sha256 = hashlib.sha256()
+    for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO), b''):
+        sha256.update(bloco)
+    sha256 = sha256.hexdigest()
+    nome = f'exportacoes/{sha256[:2]}/{sha256}.{EXTENSOES[formato]}'
+    if not armazenamento.exists(nome):
+        arquivo.seek(0)
+        nome = armazenamento.save(nome, File(arquivo))
+    return nome, sha256
+
+
+def guardar_relatorio_importacao(arquivo):
+    """Guarda o relatório CSV (arquivo binário) das linhas rejeitadas de uma importação.
+
+    Retorna a Exportacao concluída, com chave única: não é reaproveitada por outros pedidos.
+    """
+    arquivo.seek(0)
+    nome, sha256 = armazenar(arquivo, 'csv')
+    agora = timezone.now()
+    return Exportacao.objects.create(
+        relatorio='importacao', formato='csv', chave=uuid.uuid4().hex, status='concluida',
+        arquivo=nome, sha256=sha256, tamanho=armazenamento.size(nome),
+        nome_arquivo=f'erros_importacao_{timezone.localtime(agora):%Y%m%d_%H%M%S}.csv', concluido_em=agora,
+    )
+
+
+def executar(pk):
+    """Gera o arquivo de uma exportação reservada e registra o resultado"""
+    exportacao = Exportacao.objects.select_related('lote').get(pk=pk)
+    try:
+        relatorio = relatorios.gerar(
+            exportacao.relatorio, exportacao.formato, exportacao.parametros, lote=exportacao.lote,
+        )
+        with relatorios.como_arquivo(relatorio.conteudo) as arquivo:
+            nome, sha256 = armazenar(arquivo, exportacao.formato)
+    except Exception as erro:
+        logger.exception('Falha ao gerar a exportação %s', pk)
+        Exportacao.objects.filter(pk=pk).update(status='erro', erro=str(erro), concluido_em=timezone.now())
+        return 'erro'
+
+    Exportacao.objects.filter(pk=pk).update(
+        status='concluida', arquivo=nome, sha256=sha256, tamanho=armazenamento.size(nome),
+        nome_arquivo=relatorio.nome_arquivo, erro='', concluido_em=timezone.now(),
+    )
+    return 'concluida'
+
+
+def processar(processos=2, uma_vez=False, intervalo=INTERVALO):
+    """Processa a fila com até `processos` exportações em paralelo.
+
+    Com processos=0 gera no próprio processo. Com uma_vez=True termina quando a
+    fila esvazia; senão consulta a fila a cada `intervalo` segundos.
+    Retorna o número de exportações processadas.
+    """
+    if processos == 0:
+        return _processar_no_processo(uma_vez, intervalo)
+
+    processadas = 0
+    # Processos novos (spawn), sem herdar as conexões com o banco deste processo
+    connections.close_all()
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(
+        max_workers=processos, mp_context=contexto, initializer=trabalhador_exportacao.iniciar,
+    ) as pool:
+        em_andamento = set()
+        while True:
+            try:
+                recuperar_travadas()
+                while len(em_andamento) < processos:
+                    pk = reservar_proxima()
+                    if pk is None:
+                        break
+                    em_andamento.add(pool.submit(trabalhador_exportacao.executar, pk))
+            except OperationalError:
+                # SQLite bloqueado pelas gravações dos workers: tenta de novo na próxima volta
+                logger.warning('Banco ocupado ao consultar a fila de exportação', exc_info=True)
+            if not em_andamento:
+                if uma_vez:
+                    return processadas
+                time.sleep(intervalo)
+                continue
+            prontas, em_andamento = wait(em_andamento, timeout=intervalo, return_when=FIRST_COMPLETED)
+            for pronta in prontas:
+                try:
+                    pronta.result()
+                except Exception:
+                    # Processo do pool encerrado: a exportação volta à fila por recuperar_travadas
+                    logger.exception('Worker de exportação encerrado')
+                processadas += 1
+
+
+def _processar_no_processo(uma_vez, intervalo):
+    processadas = 0
+    while True:
+        recuperar_travadas()
+        pk = reservar_proxima()
+        if pk is not None:
+            executar(pk)
+            processadas += 1
+        elif uma_vez:
+            return processadas
+        else:
+            time.sleep(intervalo)
@@ -0,0 +1,282 @@
+"""
+Dados dos gráficos de consumo do condomínio.
+
+periodo_graficos() interpreta o filtro ?periodo= da página (periodo_graficos_lote(),
+o da página do lote; os relatórios em PDF/Excel usam os mesmos) e
+montar_dados_graficos() monta os dados dos gráficos a partir dos resultados já
+consultados (consolidação do período e comparativo anual). Assim a página
+/graficos/ e a versão JSON assíncrona compartilham o mesmo código e diferem
+apenas na forma de consultar; calcular_dados_graficos() é a versão síncrona
+completa (consultas + montagem).
+
+A API de gráficos entrega os mesmos dados em formato colunar, um conjunto por
+gráfico (conjuntos_colunares()).
+"""
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+from .agregacao import calcular_consumo_consolidado, comparativo_anual
+from .models import Hidrometro
+
+NOMES_MESES = [
+    'Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun',
+    'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez'
+]
+
+
+# Conjuntos da API de gráficos: nome -> (caminho em dados_graficos, colunas)
+CONJUNTOS_CONDOMINIO = {
+    'por_dia': (('consumo_por_dia',), ('dia', 'label', 'consumo_litros')),
+    'por_mes': (('consumo_mes',), ('mes', 'mes_nome', 'consumo_litros')),
+    'comparativo_anual': (('comparativo_anual', 'meses'), ('mes_nome', 'consumo_litros', 'consumo_litros_anterior')),
+    'top_lotes': (('top_lotes',), ('lote', 'consumo_litros')),
+    'por_hidrometro': (('consumo_por_hidrometro',), ('hidrometro', 'lote', 'consumo_litros')),
+}
+CONJUNTOS_LOTE = {
+    'por_dia': (('consumo_por_dia',), ('dia', 'consumo_litros')),
+    'por_mes': (('consumo_mes',), ('mes', 'mes_nome', 'consumo_litros')),
+}
+
+
+def _ultimos_dias(hoje, dias):
+    return (hoje - timedelta(days=dias - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def periodo_graficos(parametros, agora):
+    """Janela do filtro (7dias, 15dias, 30dias, mes_atual, ano_atual ou personalizado; padrão 30dias).
+
+    Retorna {'data_inicio', 'data_fim', 'periodo_label', 'periodo_selecionado'}.
+    """
+    hoje = agora
+    periodo_selecionado = parametros.get('periodo', '30dias')
+
+    if periodo_selecionado in ('7dias', '15dias', '30dias'):
+        dias = int(periodo_selecionado[:-4])
+        data_inicio = _ultimos_dias(hoje, dias)
+        periodo_label = f"Últimos {dias} dias"
+    elif periodo_selecionado == 'mes_atual':
+        # Mês atual (do dia 1 até hoje)
+        data_inicio = hoje.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        periodo_label = f"Mês Atual ({hoje.strftime('%B/%Y')})"
+    elif periodo_selecionado == 'ano_atual':
+        # Ano atual (de 1º de janeiro até hoje)
+        data_inicio = timezone.datetime(hoje.year, 1, 1, 0, 0, 0, tzinfo=hoje.tzinfo)
+        periodo_label = f"Ano Atual ({hoje.year})"
+    elif periodo_selecionado == 'personalizado':
+        # Período personalizado (data_inicio e data_fim via GET)
+        data_inicio_str = parametros.get('data_inicio')
+        data_fim_str = parametros.get('data_fim')
+        data_inicio = _ultimos_dias(hoje, 30)
+        periodo_label = "Últimos 30 dias"
+
+        if data_inicio_str and data_fim_str:
+            try:
+                inicio = timezone.datetime.strptime(data_inicio_str, '%Y-%m-%d')
+                inicio = timezone.make_aware(inicio.replace(hour=0, minute=0, second=0, microsecond=0))
+                fim = timezone.datetime.strptime(data_fim_str, '%Y-%m-%d')
+                fim = timezone.make_aware(fim.replace(hour=23, minute=59, second=59, microsecond=999999))
+
+                # Limitar data_fim ao hoje se for futuro
+                if fim > hoje:
+                    fim = hoje
+
+                data_inicio = inicio
+                periodo_label = f"{inicio.strftime('%d/%m/%Y')} até {fim.strftime('%d/%m/%Y')}"
+                hoje = fim  # Usar data_fim personalizada
+            except (ValueError, TypeError):
+                # Se houver erro, usar padrão (últimos 30 dias)
+                periodo_label = "Últimos 30 dias (erro na data personalizada)"
+    else:
+        # Padrão: últimos 30 dias
+        data_inicio = _ultimos_dias(hoje, 30)
+        periodo_label = "Últimos 30 dias"
+
+    return {
+        'data_inicio': data_inicio,
+        'data_fim': hoje,
+        'periodo_label': periodo_label,
+        'periodo_selecionado': periodo_selecionado,
+    }
+
+
+def periodo_graficos_lote(parametros, hoje):
+    """(data_inicio, data_fim, periodo_label, periodo) do filtro da página de gráficos do lote (datas, sem hora)"""
+    periodo = parametros.get('periodo', '30dias')
+    data_inicio_str = parametros.get('data_inicio', '')
+    data_fim_str = parametros.get('data_fim', '')
+    
+    data_inicio = None
+    data_fim = hoje
+    periodo_label = ''
+    
+    # Definir período baseado no filtro
+    if periodo == '7dias':
+        data_inicio = hoje - timedelta(days=7)
+        periodo_label = 'Últimos 7 dias'
+    elif periodo == '15dias':
+        data_inicio = hoje - timedelta(days=15)
+        periodo_label = 'Últimos 15 dias'
+    elif periodo == '30dias':
+        data_inicio = hoje - timedelta(days=30)
+        periodo_label = 'Últimos 30 dias'
+    elif periodo == 'mes_atual':
+        data_inicio = hoje.replace(day=1)
+        periodo_label = f'{hoje.strftime("%B de %Y").capitalize()}'
+    elif periodo == 'ano_atual':
+        data_inicio = hoje.replace(month=1, day=1)
+        periodo_label = f'Ano de {hoje.year}'
+    elif periodo == 'personalizado' and data_inicio_str and data_fim_str:
+        try:
+            data_inicio = datetime.strptime(data_inicio_str, '%Y-%m-%d').date()
+            data_fim = datetime.strptime(data_fim_str, '%Y-%m-%d').date()
+            # Limitar data_fim ao hoje se for futuro
+            if data_fim > hoje:
+                data_fim = hoje
+            periodo_label = f'{data_inicio.strftime("%d/%m/%Y")} a {data_fim.strftime("%d/%m/%Y")}'
+        except (ValueError, TypeError):
+            data_inicio = hoje - timedelta(days=30)
+            data_fim = hoje
+            periodo_label = 'Últimos 30 dias'
+            periodo = '30dias'
+    else:
+        data_inicio = hoje - timedelta(days=30)
+        periodo_label = 'Últimos 30 dias'
+    
+    return data_inicio, data_fim, periodo_label, periodo
+
+
+def ordenar_lote(item):
+    """Chave de ordenação pelo número do lote do item (numéricos primeiro, depois ADM)"""
+    numero = item['lote']
+    # Lotes numéricos primeiro, ordenados por valor inteiro; depois lotes ADM/strings
+    try:
+        return (0, int(numero), numero)
+    except ValueError:
+        # Tentar extrair número após prefixo ADM-
+        if numero.upper().startswith('ADM-'):
+            try:
+                return (1, int(numero.split('-', 1)[1]), numero)
+            except ValueError:
+                return (1, float('inf'), numero)
+        return (1, float('inf'), numero)
+
+
+def montar_dados_graficos(periodo, ano_atual, hidrometros, resultado, comparativo):
+    """Dados dos gráficos a partir dos hidrômetros (com lote), do ResultadoConsumo do
+    período (calcular_consumo_consolidado) e do comparativo_anual de ano_atual"""
+    data_inicio, data_fim = periodo['data_inicio'], periodo['data_fim']
+    dados_graficos = {
+        'consumo_por_dia': [],
+        'consumo_mes': [],
+        'consumo_total_ano': 0.0,
+        'top_lotes': [],
+        'consumo_por_hidrometro': [],
+        'periodo_label': periodo['periodo_label'],
+        'periodo_selecionado': periodo['periodo_selecionado'],
+        'ano_atual': ano_atual,
+    }
+
+    # ================= CONSUMO POR DIA =================
+    consumo_diario = {}
+    datas_periodo = []
+    dia_cursor = data_inicio
+    while dia_cursor.date() <= data_fim.date():
+        consumo_diario[dia_cursor.date()] = 0.0
+        datas_periodo.append(dia_cursor.date())
+        dia_cursor += timedelta(days=1)
+
+    consumo_por_lote_ano = {}
+    consumo_por_hidrometro = []
+    for hidrometro in hidrometros:
+        consumo_hidrometro_litros = resultado.por_hidrometro.get(hidrometro.id, 0.0)
+        if consumo_hidrometro_litros > 0:
+            numero_lote = hidrometro.lote.numero
+            consumo_por_lote_ano.setdefault(numero_lote, 0.0)
+            consumo_por_lote_ano[numero_lote] += consumo_hidrometro_litros
+            consumo_por_hidrometro.append({
+                'hidrometro': hidrometro.numero,
+                'lote': numero_lote,
+                'consumo_litros': round(consumo_hidrometro_litros, 2),
+            })
+
+    for dia, consumo_litros in resultado.por_dia.items():
+        if dia in consumo_diario:
+            consumo_diario[dia] += consumo_litros
+
+    for dia in datas_periodo:
+        dados_graficos['consumo_por_dia'].append({
+            'dia': dia.day,
+            'label': dia.strftime('%d/%m'),
+            'consumo_litros': round(consumo_diario[dia], 2)
+        })
+
+    consumo_mes_ordenado = sorted(resultado.por_mes.items(), key=lambda x: (x[0][0], x[0][1]))
+    for (ano, mes), valor in consumo_mes_ordenado:
+        dados_graficos['consumo_mes'].append({
+            'mes': mes,
+            'mes_nome': f"{NOMES_MESES[mes - 1]}/{str(ano)[-2:]}",
+            'consumo_litros': round(valor, 2)
+        })
+
+    dados_graficos['consumo_total_ano'] = round(resultado.total, 2)
+
+    # Comparativo com o ano anterior a partir da consolidação mensal
+    dados_graficos['comparativo_anual'] = {
+        'ano': ano_atual,
+        'ano_anterior': ano_atual - 1,
+        'meses': [
+            {
+                'mes_nome': NOMES_MESES[indice],
+                'consumo_litros': round(comparativo['atual'][indice], 2),
+                'consumo_litros_anterior': round(comparativo['anterior'][indice], 2),
+            }
+            for indice in range(12)
+        ],
+        'total_ano': round(sum(comparativo['atual']), 2),
+        'total_ano_anterior': round(sum(comparativo['anterior']), 2),
+    }
+
+    top_lotes = sorted(consumo_por_lote_ano.items(), key=lambda x: x[1], reverse=True)[:10]
+    dados_graficos['top_lotes'] = [
+        {'lote': lote, 'consumo_litros': round(consumo, 2)} for lote, consumo in top_lotes
+    ]
+
+    dados_graficos['consumo_por_hidrometro'] = sorted(
+        consumo_por_hidrometro,
+        key=lambda x: (ordenar_lote(x), x['hidrometro'])
+    )
+    return dados_graficos
+
+
+def hidrometros_graficos():
+    """Hidrômetros considerados nos gráficos do condomínio (ativos de lotes residenciais)"""
+    return Hidrometro.objects.filter(
+        ativo=True,
+        lote__tipo='residencial'
+    ).select_related('lote')
+
+
+def calcular_dados_graficos(periodo, ano_atual):
+    """Consulta a consolidação do período e o comparativo de ano_atual e monta os dados"""
+    hidrometros = hidrometros_graficos()
+    resultado = calcular_consumo_consolidado(hidrometros, periodo['data_inicio'], periodo['data_fim'])
+    comparativo = comparativo_anual(hidrometros, ano_atual)
+    return montar_dados_graficos(periodo, ano_atual, hidrometros, resultado, comparativo)
+
+
+def colunas(linhas, campos):
+    """Lista de dicts em formato colunar: {campo: [valor de cada linha]}"""
+    return {campo: [linha[campo] for linha in linhas] for campo in campos}
+
+
+def conjuntos_colunares(dados, definicoes, nomes):
+    """Conjuntos pedidos de dados_graficos, cada um em formato colunar"""
+    conjuntos = {}
+    for nome in nomes:
+        caminho, campos = definicoes[nome]
+        linhas = dados
+        for chave in caminho:
+            linhas = linhas[chave]
+        conjuntos[nome] = colunas(linhas, campos)
+    return conjuntos
@@ -0,0 +1,261 @@
+"""
+Gravação de leituras em lote com validação em conjunto.
+
+Em vez de validar e inserir leitura por leitura (consulta da última leitura,
+INSERT e commit por linha), o lote é agrupado por hidrômetro:
+
+1. hidrômetros travados (select_for_update) e carregados com a última leitura
+   de cada um em uma consulta;
+2. validação de campos de cada item sem acesso ao banco;
+3. leituras já existentes com a mesma (hidrômetro, data, período) em uma consulta;
+4. ordem das leituras verificada em memória, na ordem do lote;
+5. inserção das válidas com um bulk_create, com a consolidação recalculada
+   uma vez por hidrômetro ao final.
+
+Tudo roda em uma transação, com os hidrômetros travados desde a verificação: um
+lote concorrente dos mesmos hidrômetros espera. Se mesmo assim uma leitura
+igual chega antes do bulk_create (POST de uma leitura, que não trava), as
+leituras são gravadas uma a uma e a repetida vira erro do item.
+
+Os erros continuam sendo reportados por item, no mesmo formato do serializer.
+
+importar_leituras aplica o mesmo caminho a arquivos CSV ou NDJSON (planilhas
+dos leituristas, identificando o hidrômetro pelo número) lidos linha a linha
+em blocos de tamanho fixo: a memória não cresce com o tamanho do arquivo e os
+erros vão sendo escritos em um relatório CSV.
+"""
+import csv
+import json
+import os
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.db.models import OuterRef, Subquery
+from rest_framework.validators import UniqueTogetherValidator
+
+from .consolidacao import adiar_consolidacao, marcar_alteracao
+from .models import Hidrometro, Leitura
+from .serializers import LeituraLoteSerializer
+
+BATCH_SIZE = 500
+MENSAGEM_UNICA = UniqueTogetherValidator.message.format(field_names='hidrometro, data_leitura, periodo')
+
+
+def _ids_hidrometros(itens):
+    ids = set()
+    for item in itens:
+        try:
+            ids.add(int(item.get('hidrometro')))
+        except (AttributeError, TypeError, ValueError):
+            pass
+    return ids
+
+
+def _carregar_hidrometros(ids):
+    """Hidrômetros do lote com valor e data da última leitura anotados (uma consulta)"""
+    ultima = Leitura.objects.filter(hidrometro=OuterRef('pk')).order_by('-data_leitura')
+    return {
+        hidrometro.id: hidrometro
+        for hidrometro in Hidrometro.objects.filter(id__in=ids).annotate(
+            valor_ultima_leitura=Subquery(ultima.values('leitura')[:1]),
+            data_ultima_leitura=Subquery(ultima.values('data_leitura')[:1]),
+        )
+    }
+
+
+def gravar_leituras_em_lote(itens):
+    """Valida e grava um lote de leituras; retorna (leituras criadas, erros por item)"""
+    ids = _ids_hidrometros(itens)
+    with transaction.atomic(), adiar_consolidacao():
+        # Trava os hidrômetros do lote (em ordem de id, como a consolidação) antes
+        # das verificações: outro lote dos mesmos hidrômetros espera este terminar
+        list(Hidrometro.objects.select_for_update().filter(id__in=ids).order_by('id').values_list('id', flat=True))
+        novas, erros = _validar_e_gravar(itens, _carregar_hidrometros(ids))
+        for leitura in novas:
+            marcar_alteracao(leitura.hidrometro_id, leitura.data_leitura)
+
+    return novas, [{'dados': itens[indice], 'erros': erros[indice]} for indice in sorted(erros)]
+
+
+def _existentes(validos):
+    """(hidrômetro, data, período) já gravados entre os dos itens válidos"""
+    if not validos:
+        return set()
+    return set(
+        Leitura.objects.filter(
+            hidrometro_id__in={dados['hidrometro'].id for dados in validos},
+            data_leitura__in={dados['data_leitura'] for dados in validos},
+        ).values_list('hidrometro_id', 'data_leitura', 'periodo')
+    )
+
+
+def _validar_e_gravar(itens, hidrometros):
+    contexto = {'hidrometros': hidrometros}
+
+    validos, erros = [], {}
+    for indice, item in enumerate(itens):
+        serializer = LeituraLoteSerializer(data=item, context=contexto)
+        if serializer.is_valid():
+            validos.append((indice, serializer.validated_data))
+        else:
+            erros[indice] = serializer.errors
+
+    existentes = _existentes([dados for _, dados in validos])
+
+    ultimas = {
+        hidrometro.id: (hidrometro.valor_ultima_leitura, hidrometro.data_ultima_leitura)
+        for hidrometro in hidrometros.values()
+    }
+
+    novas = []
+    for indice, dados in validos:
+        hidrometro = dados['hidrometro']
+        chave = (hidrometro.id, dados['data_leitura'], dados['periodo'])
+        if chave in existentes:
+            erros[indice] = {'non_field_errors': [MENSAGEM_UNICA]}
+            continue
+
+        valor_ultima, data_ultima = ultimas[hidrometro.id]
+        if valor_ultima is not None and dados['leitura'] < valor_ultima:
+            erros[indice] = {'non_field_errors': [
+                f"A leitura não pode ser menor que a última leitura registrada ({valor_ultima:.3f}m³)"
+            ]}
+            continue
+
+        leitura = Leitura(**dados)
+        if data_ultima is None or leitura.data_leitura > data_ultima:
+            # Posterior a todas as leituras conhecidas: o delta já é conhecido;
+            # nos demais casos a consolidação o preenche
+            leitura.consumo_m3 = leitura.leitura - valor_ultima if valor_ultima is not None else 0
+            leitura.consumo_litros = leitura.consumo_m3 * 1000
+            ultimas[hidrometro.id] = (leitura.leitura, leitura.data_leitura)
+        existentes.add(chave)
+        novas.append((indice, leitura))
+
+    try:
+        with transaction.atomic():
+            Leitura.objects.bulk_create([leitura for _, leitura in novas], batch_size=BATCH_SIZE)
+    except IntegrityError:
+        # Uma leitura igual foi gravada depois da verificação por quem não trava o
+        # hidrômetro (POST de uma leitura): grava uma a uma e reporta cada falha
+        return _gravar_uma_a_uma(novas, erros), erros
+    return [leitura for _, leitura in novas], erros
+
+
+def _gravar_uma_a_uma(novas, erros):
+    gravadas = []
+    for indice, leitura in novas:
+        try:
+            with transaction.atomic():
+                Leitura.objects.bulk_create([leitura])
+        except IntegrityError:
+            erros[indice] = {'non_field_errors': [MENSAGEM_UNICA]}
+        else:
+            gravadas.append(leitura)
+    # Os deltas calculados em sequência são refeitos pela consolidação dos dias marcados
+    return gravadas
+
+
+CAMPOS_IMPORTACAO = ['hidrometro', 'leitura', 'data_leitura', 'periodo', 'responsavel', 'observacoes']
+CAMPOS_RELATORIO = ['linha'] + CAMPOS_IMPORTACAO + ['erros']
+
+
+def _linhas_csv(arquivo):
+    """(número da linha, dados ou None, erro) de um CSV com cabeçalho (',' ou ';')"""
+    cabecalho = arquivo.readline()
+    delimitador = ';' if cabecalho.count(';') > cabecalho.count(',') else ','
+    campos = [campo.strip().lower() for campo in next(csv.reader([cabecalho], delimiter=delimitador), [])]
+    for numero, valores in enumerate(csv.reader(arquivo, delimiter=delimitador), start=2):
+        if not any(valor.strip() for valor in valores):
+            continue
+        dados = {campo: valor.strip() for campo, valor in zip(campos, valores) if campo}
+        # Planilhas em pt-BR exportam decimais com vírgula
+        leitura = dados.get('leitura', '')
+        if ',' in leitura and '.' not in leitura:
+            dados['leitura'] = leitura.replace(',', '.')
+        yield numero, dados, None
+
+
+def _linhas_ndjson(arquivo):
+    """(número da linha, dados ou None, erro) de um arquivo com um objeto JSON por linha"""
+    for numero, linha in enumerate(arquivo, start=1):
+        if not linha.strip():
+            continue
+        try:
+            dados = json.loads(linha)
+        except ValueError as erro:
+            yield numero, None, f'JSON inválido: {erro}'
+            continue
+        if not isinstance(dados, dict):
+            yield numero, None, 'Cada linha deve ser um objeto JSON'
+            continue
+        yield numero, dados, None
+
+
+LEITORES = {'csv': _linhas_csv, 'ndjson': _linhas_ndjson}
+
+
+def formato_pelo_nome(nome):
+    """Formato de importação pela extensão do arquivo (.csv, .ndjson ou .jsonl) ou None"""
+    extensao = os.path.splitext(nome)[1].lower()
+    return {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}.get(extensao)
+
+
+def _texto_erros(erros):
+    if isinstance(erros, dict):
+        return '; '.join(f'{campo}: {_texto_erros(mensagens)}' for campo, mensagens in erros.items())
+    if isinstance(erros, (list, tuple)):
+        return ' '.join(_texto_erros(mensagem) for mensagem in erros)
+    return str(erros)
+
+
+def importar_leituras(arquivo, formato='csv', relatorio=None, chunk_size=BATCH_SIZE):
+    """Importa leituras de um arquivo de texto CSV ou NDJSON, em blocos de chunk_size linhas.
+
+    A coluna `hidrometro` traz o número do hidrômetro. Cada linha rejeitada é
+    escrita em `relatorio` (arquivo de texto, CSV) com o número da linha e os
+    erros. Retorna {'linhas', 'criadas', 'erros'}.
+    """
+    if formato not in LEITORES:
+        raise ValueError(f'Formato de importação desconhecido: {formato}')
+
+    escritor = None
+    if relatorio is not None:
+        escritor = csv.DictWriter(relatorio, fieldnames=CAMPOS_RELATORIO, extrasaction='ignore')
+        escritor.writeheader()
+
+    resultado = {'linhas': 0, 'criadas': 0, 'erros': 0}
+    linhas = LEITORES[formato](arquivo)
+    while True:
+        bloco = list(islice(linhas, chunk_size))
+        if not bloco:
+            break
+        resultado['linhas'] += len(bloco)
+
+        numeros = {str(dados.get('hidrometro', '')).strip() for _, dados, _ in bloco if dados is not None}
+        ids = dict(Hidrometro.objects.filter(numero__in=numeros).values_list('numero', 'id'))
+
+        itens, origem, rejeitadas = [], {}, []
+        for numero, dados, erro in bloco:
+            if erro:
+                rejeitadas.append((numero, dados, erro))
+                continue
+            hidrometro = str(dados.get('hidrometro', '')).strip()
+            if hidrometro not in ids:
+                rejeitadas.append((numero, dados, {'hidrometro': [f'Hidrômetro {hidrometro!r} não encontrado']}))
+                continue
+            item = {campo: dados[campo] for campo in CAMPOS_IMPORTACAO if dados.get(campo) not in (None, '')}
+            item['hidrometro'] = ids[hidrometro]
+            itens.append(item)
+            origem[id(item)] = (numero, dados)
+
+        novas, erros = gravar_leituras_em_lote(itens)
+        resultado['criadas'] += len(novas)
+        rejeitadas.extend((*origem[id(erro['dados'])], erro['erros']) for erro in erros)
+
+        resultado['erros'] += len(rejeitadas)
+        if escritor is not None:
+            for numero, dados, erros_linha in sorted(rejeitadas, key=lambda rejeitada: rejeitada[0]):
+                escritor.writerow({**(dados or {}), 'linha': numero, 'erros': _texto_erros(erros_linha)})
+
+    return resultado
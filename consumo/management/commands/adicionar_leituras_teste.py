@@ -2,6 +2,7 @@ from django.core.management.base import BaseCommand
 from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal
+from consumo.consolidacao import adiar_consolidacao
 from consumo.models import Hidrometro, Leitura
 import random
 
@@ -9,6 +10,7 @@ import random
 class Command(BaseCommand):
     help = 'Adiciona 40 leituras de teste em 20 hidrômetros com consumo entre 7 mil e 22 mil litros'
 
+    @adiar_consolidacao()
     def handle(self, *args, **kwargs):
         self.stdout.write(self.style.SUCCESS('Iniciando criação de leituras de teste...'))
 
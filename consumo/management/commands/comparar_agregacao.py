@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+from datetime import timedelta
+import time
+
+from consumo.agregacao import BACKENDS, calcular_consumo
+from consumo.models import Hidrometro
+
+
+class Command(BaseCommand):
+    help = 'Compara o tempo dos backends de agregação de consumo (python x sql) no banco atual'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=30, help='Tamanho da janela em dias (padrão: 30)')
+        parser.add_argument('--repeticoes', type=int, default=5, help='Execuções por backend (padrão: 5)')
+        parser.add_argument(
+            '--backends',
+            nargs='+',
+            default=list(BACKENDS),
+            choices=list(BACKENDS),
+            help='Backends a comparar (padrão: todos)'
+        )
+
+    def handle(self, *args, **options):
+        fim = timezone.now()
+        inicio = fim - timedelta(days=options['dias'])
+        hidrometros = Hidrometro.objects.filter(ativo=True)
+
+        self.stdout.write(
+            f"Banco: {connection.vendor} | Hidrômetros ativos: {hidrometros.count()} | "
+            f"Janela: {options['dias']} dias | Repetições: {options['repeticoes']}"
+        )
+
+        totais = {}
+        for backend in options['backends']:
+            tempos = []
+            for _ in range(options['repeticoes']):
+                inicio_execucao = time.perf_counter()
+                resultado = calcular_consumo(hidrometros, inicio, fim, backend=backend)
+                tempos.append(time.perf_counter() - inicio_execucao)
+
+            totais[backend] = resultado.total
+            tempos.sort()
+            self.stdout.write(
+                f"  {backend:>8}: mediana {tempos[len(tempos) // 2] * 1000:8.1f} ms | "
+                f"melhor {tempos[0] * 1000:8.1f} ms | total {resultado.total:,.0f} L"
+            )
+
+        valores = list(totais.values())
+        if all(abs(valor - valores[0]) < 0.01 for valor in valores):
+            self.stdout.write(self.style.SUCCESS("✓ Todos os backends produziram o mesmo consumo total"))
+        else:
+            self.stdout.write(self.style.ERROR(f"✗ Totais divergentes entre backends: {totais}"))
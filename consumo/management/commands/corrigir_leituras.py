@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from datetime import datetime, timedelta
+from consumo.consolidacao import adiar_consolidacao
 from consumo.models import Hidrometro, Leitura
 import random
 
@@ -8,6 +9,7 @@ import random
 class Command(BaseCommand):
     help = 'Remove leituras futuras e popula com leituras de 01/01 até hoje'
 
+    @adiar_consolidacao()
     def handle(self, *args, **options):
         hoje = timezone.now()
         
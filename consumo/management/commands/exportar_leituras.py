@@ -0,0 +1,55 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from consumo.exportacao_leituras import CHUNK_SIZE, FORMATOS, gerar_bytes
+
+
+class Command(BaseCommand):
+    help = 'Exporta as leituras brutas (com o consumo de cada leitura) para um arquivo CSV ou CSV.gz, em blocos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do arquivo de saída (.csv ou .csv.gz)')
+        parser.add_argument(
+            '--formato',
+            choices=sorted(FORMATOS),
+            help='Formato do arquivo (padrão: pela extensão)',
+        )
+        parser.add_argument('--hidrometro', help='Id do hidrômetro')
+        parser.add_argument('--data-inicio', help='Leituras a partir desta data/hora (AAAA-MM-DD[THH:MM])')
+        parser.add_argument('--data-fim', help='Leituras até esta data/hora (AAAA-MM-DD[THH:MM])')
+        parser.add_argument('--periodo', choices=['manha', 'tarde'], help='Período da leitura')
+        parser.add_argument(
+            '--tamanho-bloco',
+            type=int,
+            default=CHUNK_SIZE,
+            help=f'Leituras lidas do banco por vez (padrão: {CHUNK_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        arquivo = options['arquivo']
+        formato = options['formato'] or ('csv.gz' if arquivo.endswith('.gz') else 'csv')
+        if options['tamanho_bloco'] < 1:
+            raise CommandError('--tamanho-bloco deve ser maior que zero')
+        parametros = {
+            'hidrometro': options['hidrometro'],
+            'data_inicio': options['data_inicio'],
+            'data_fim': options['data_fim'],
+            'periodo': options['periodo'],
+        }
+
+        try:
+            pedacos = gerar_bytes(parametros, formato, chunk_size=options['tamanho_bloco'])
+        except (ValidationError, ValueError) as erro:
+            raise CommandError(f'Filtro inválido: {erro}')
+
+        self.stdout.write(f'Exportando leituras para {arquivo} ({formato})...')
+        tamanho = 0
+        try:
+            with open(arquivo, 'wb') as saida:
+                for pedaco in pedacos:
+                    saida.write(pedaco)
+                    tamanho += len(pedaco)
+        except OSError as erro:
+            raise CommandError(str(erro))
+
+        self.stdout.write(self.style.SUCCESS(f'✅ {tamanho / 1024:,.0f} KB gravados em {arquivo}'))
@@ -0,0 +1,56 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from consumo.importacao import BATCH_SIZE, LEITORES, formato_pelo_nome, importar_leituras
+
+
+class Command(BaseCommand):
+    help = 'Importa leituras de um arquivo CSV ou NDJSON (coluna hidrometro com o número), em blocos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do arquivo CSV ou NDJSON')
+        parser.add_argument(
+            '--formato',
+            choices=sorted(LEITORES),
+            help='Formato do arquivo (padrão: pela extensão)',
+        )
+        parser.add_argument(
+            '--relatorio',
+            help='Arquivo CSV com as linhas rejeitadas (padrão: <arquivo>.erros.csv)',
+        )
+        parser.add_argument(
+            '--tamanho-bloco',
+            type=int,
+            default=BATCH_SIZE,
+            help=f'Linhas validadas e gravadas por vez (padrão: {BATCH_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        arquivo = options['arquivo']
+        formato = options['formato'] or formato_pelo_nome(arquivo)
+        if formato is None:
+            raise CommandError('Não foi possível deduzir o formato pela extensão; use --formato csv|ndjson')
+        if options['tamanho_bloco'] < 1:
+            raise CommandError('--tamanho-bloco deve ser maior que zero')
+        caminho_relatorio = options['relatorio'] or f'{arquivo}.erros.csv'
+
+        self.stdout.write(f'Importando {arquivo} ({formato})...')
+        try:
+            with open(arquivo, encoding='utf-8-sig', newline='') as entrada, \
+                    open(caminho_relatorio, 'w', encoding='utf-8', newline='') as relatorio:
+                resultado = importar_leituras(
+                    entrada, formato, relatorio=relatorio, chunk_size=options['tamanho_bloco']
+                )
+        except OSError as erro:
+            raise CommandError(str(erro))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {resultado['criadas']} de {resultado['linhas']} leituras importadas"
+        ))
+        if resultado['erros']:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️ {resultado['erros']} linhas rejeitadas; relatório em {caminho_relatorio}"
+            ))
+        else:
+            os.remove(caminho_relatorio)
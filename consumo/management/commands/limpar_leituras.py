@@ -1,4 +1,5 @@
 from django.core.management.base import BaseCommand
+from consumo.consolidacao import adiar_consolidacao
 from consumo.models import Leitura
 
 
@@ -12,6 +13,7 @@ class Command(BaseCommand):
             help='Confirma a deleção sem perguntar',
         )
 
+    @adiar_consolidacao()
     def handle(self, *args, **options):
         total = Leitura.objects.count()
         
@@ -4,6 +4,7 @@ Comando para limpar dados de consumo (leituras) do banco de dados
 """
 from django.core.management.base import BaseCommand
 from django.utils import timezone
+from consumo.consolidacao import adiar_consolidacao
 from consumo.models import Leitura
 from datetime import timedelta
 
@@ -35,6 +36,7 @@ class Command(BaseCommand):
             help='Confirma a operação sem pedir confirmação',
         )
 
+    @adiar_consolidacao()
     def handle(self, *args, **options):
         todas_leituras = Leitura.objects.all()
         total_leituras_antes = todas_leituras.count()
@@ -2,6 +2,7 @@ from django.core.management.base import BaseCommand
 from django.utils import timezone
 from datetime import datetime, timedelta
 from decimal import Decimal
+from consumo.consolidacao import adiar_consolidacao, reconstruir_consumo_diario, reconstruir_deltas
 from consumo.models import Hidrometro, Leitura
 import random
 
@@ -13,7 +14,8 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS('Iniciando população do sistema com 1 ano de dados...'))
         
         # Limpar leituras existentes
-        Leitura.objects.all().delete()
+        with adiar_consolidacao():
+            Leitura.objects.all().delete()
         self.stdout.write(self.style.WARNING('Leituras anteriores removidas'))
 
         # Pegar todos os hidrômetros
@@ -98,6 +100,11 @@ class Command(BaseCommand):
         if leituras_batch:
             Leitura.objects.bulk_create(leituras_batch)
         
+        # bulk_create não dispara sinais: reconstruir a consolidação diária e os deltas
+        total_consolidado = reconstruir_consumo_diario()
+        self.stdout.write(f'📈 Consolidação diária reconstruída ({total_consolidado:,} linhas)')
+        reconstruir_deltas()
+        
         self.stdout.write(self.style.SUCCESS(f'\n📊 Resumo Final:'))
         self.stdout.write(self.style.SUCCESS(f'   Hidrômetros: {len(hidrometros)}'))
         self.stdout.write(self.style.SUCCESS(f'   Período: {total_dias} dias'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from consumo.exportacoes import INTERVALO, processar
+
+
+class Command(BaseCommand):
+    help = 'Gera as exportações de relatórios (PDF/Excel) pendentes em um pool de processos locais'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processos',
+            type=int,
+            default=2,
+            help='Exportações geradas em paralelo (padrão: 2; 0 gera no próprio processo)',
+        )
+        parser.add_argument(
+            '--uma-vez',
+            action='store_true',
+            help='Termina quando a fila esvazia, em vez de continuar aguardando pedidos',
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=INTERVALO,
+            help=f'Segundos entre consultas à fila vazia (padrão: {INTERVALO})',
+        )
+
+    def handle(self, *args, **options):
+        if options['processos'] < 0:
+            raise CommandError('--processos não pode ser negativo')
+
+        self.stdout.write(f"Processando exportações com {options['processos']} processo(s)...")
+        total = processar(options['processos'], uma_vez=options['uma_vez'], intervalo=options['intervalo'])
+        self.stdout.write(self.style.SUCCESS(f'✅ {total} exportação(ões) processada(s)'))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from consumo.consolidacao import atualizar_estados, reconstruir_consumo_diario
+from consumo.models import ConsumoDiario, Hidrometro, HidrometroEstado
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói as consolidações de consumo (ConsumoDiario, ConsumoMensal) e o estado dos hidrômetros a partir das leituras'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hidrometro',
+            nargs='+',
+            help='Números dos hidrômetros a reconstruir (padrão: todos)',
+        )
+        parser.add_argument(
+            '--se-vazio',
+            action='store_true',
+            help='Só reconstrói se a consolidação ainda estiver vazia (uso em deploy)',
+        )
+
+    def handle(self, *args, **options):
+        if options['se_vazio'] and ConsumoDiario.objects.exists():
+            if not HidrometroEstado.objects.exists():
+                total = atualizar_estados(Hidrometro.objects.all())
+                self.stdout.write(self.style.SUCCESS(f'✅ Estado de {total} hidrômetro(s) gerado'))
+            self.stdout.write('Consolidação diária já populada; nada a fazer.')
+            return
+
+        hidrometros = None
+        if options['hidrometro']:
+            hidrometros = Hidrometro.objects.filter(numero__in=options['hidrometro'])
+            self.stdout.write(f'Reconstruindo {hidrometros.count()} hidrômetro(s)...')
+        else:
+            self.stdout.write('Reconstruindo a consolidação de todos os hidrômetros...')
+
+        total = reconstruir_consumo_diario(hidrometros)
+        self.stdout.write(self.style.SUCCESS(f'✅ {total} linhas de consumo diário geradas'))
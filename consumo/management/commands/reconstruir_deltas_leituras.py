@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from consumo.consolidacao import reconstruir_deltas
+from consumo.models import Hidrometro
+
+
+class Command(BaseCommand):
+    help = 'Preenche o consumo desde a leitura anterior (Leitura.consumo_m3/consumo_litros) a partir das leituras'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hidrometro',
+            nargs='+',
+            help='Números dos hidrômetros a recalcular (padrão: todos)',
+        )
+        parser.add_argument(
+            '--somente-pendentes',
+            action='store_true',
+            help='Só recalcula hidrômetros com leituras ainda sem consumo preenchido (uso em deploy)',
+        )
+
+    def handle(self, *args, **options):
+        hidrometros = None
+        if options['hidrometro']:
+            hidrometros = Hidrometro.objects.filter(numero__in=options['hidrometro'])
+            self.stdout.write(f'Recalculando {hidrometros.count()} hidrômetro(s)...')
+        else:
+            self.stdout.write('Recalculando o consumo das leituras de todos os hidrômetros...')
+
+        total = reconstruir_deltas(hidrometros, somente_pendentes=options['somente_pendentes'])
+        self.stdout.write(self.style.SUCCESS(f'✅ {total} leituras atualizadas'))
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.1 on 2026-10-17 17:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consumo', '0002_alter_leitura_leitura_alter_lote_tipo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsumoDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField(verbose_name='Data')),
+                ('litros', models.DecimalField(decimal_places=3, default=0, help_text='Soma dos deltas positivos das leituras do dia em relação à leitura anterior', max_digits=12, verbose_name='Consumo (L)')),
+                ('n_leituras', models.PositiveIntegerField(default=0, verbose_name='Número de Leituras')),
+                ('atualizado_em', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+                ('hidrometro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='consumos_diarios', to='consumo.hidrometro', verbose_name='Hidrômetro')),
+                ('lote', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='consumos_diarios', to='consumo.lote', verbose_name='Lote')),
+            ],
+            options={
+                'verbose_name': 'Consumo Diário',
+                'verbose_name_plural': 'Consumos Diários',
+                'ordering': ['-data'],
+                'indexes': [models.Index(fields=['data', 'lote'], name='consumo_diario_data_lote_idx')],
+                'unique_together': {('hidrometro', 'data')},
+            },
+        ),
+    ]
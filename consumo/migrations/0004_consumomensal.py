@@ -0,0 +1,34 @@
+# Generated by Django 5.0.1 on 2026-10-17 17:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consumo', '0003_consumodiario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsumoMensal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(help_text='Primeiro dia do mês de referência', verbose_name='Mês')),
+                ('litros', models.DecimalField(decimal_places=3, default=0, max_digits=14, verbose_name='Consumo (L)')),
+                ('n_leituras', models.PositiveIntegerField(default=0, verbose_name='Número de Leituras')),
+                ('fechado', models.BooleanField(default=False, help_text='Meses anteriores ao atual: valores congelados, só mudam com correção de leitura', verbose_name='Mês Fechado')),
+                ('atualizado_em', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+                ('hidrometro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='consumos_mensais', to='consumo.hidrometro', verbose_name='Hidrômetro')),
+                ('lote', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='consumos_mensais', to='consumo.lote', verbose_name='Lote')),
+            ],
+            options={
+                'verbose_name': 'Consumo Mensal',
+                'verbose_name_plural': 'Consumos Mensais',
+                'ordering': ['-mes'],
+                'indexes': [models.Index(fields=['mes', 'lote'], name='consumo_mensal_mes_lote_idx')],
+                'unique_together': {('hidrometro', 'mes')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-17 17:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consumo', '0004_consumomensal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leitura',
+            name='consumo_litros',
+            field=models.DecimalField(blank=True, decimal_places=3, editable=False, max_digits=11, null=True, verbose_name='Consumo desde a Leitura Anterior (L)'),
+        ),
+        migrations.AddField(
+            model_name='leitura',
+            name='consumo_m3',
+            field=models.DecimalField(blank=True, decimal_places=3, editable=False, help_text='Mantido automaticamente a cada gravação ou exclusão de leitura', max_digits=8, null=True, verbose_name='Consumo desde a Leitura Anterior (m³)'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.1 on 2026-10-17 17:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consumo', '0005_leitura_consumo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HidrometroEstado',
+            fields=[
+                ('hidrometro', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='estado', serialize=False, to='consumo.hidrometro', verbose_name='Hidrômetro')),
+                ('ultima_leitura', models.DecimalField(blank=True, decimal_places=3, max_digits=8, null=True, verbose_name='Última Leitura (m³)')),
+                ('ultima_data_leitura', models.DateTimeField(blank=True, null=True, verbose_name='Data da Última Leitura')),
+                ('ultimo_periodo', models.CharField(blank=True, default='', max_length=10, verbose_name='Período da Última Leitura')),
+                ('dia', models.DateField(blank=True, help_text='Dia (local) a que se referem a primeira leitura e a contagem do dia', null=True, verbose_name='Dia de Referência')),
+                ('primeira_leitura_dia', models.DecimalField(blank=True, decimal_places=3, max_digits=8, null=True, verbose_name='Primeira Leitura do Dia (m³)')),
+                ('leituras_dia', models.PositiveIntegerField(default=0, verbose_name='Leituras no Dia')),
+                ('mes', models.DateField(blank=True, null=True, verbose_name='Mês de Referência')),
+                ('litros_mes', models.DecimalField(decimal_places=3, default=0, max_digits=14, verbose_name='Consumo no Mês até Agora (L)')),
+                ('atualizado_em', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+            ],
+            options={
+                'verbose_name': 'Estado do Hidrômetro',
+                'verbose_name_plural': 'Estados dos Hidrômetros',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-17 17:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consumo', '0006_hidrometroestado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lote',
+            name='versao_dados',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Incrementada a cada alteração das leituras ou hidrômetros do lote (invalida caches)', verbose_name='Versão dos Dados'),
+        ),
+    ]
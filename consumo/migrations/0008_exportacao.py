@@ -0,0 +1,41 @@
+# Generated by Django 5.0.1 on 2026-10-17 18:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consumo', '0007_lote_versao_dados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Exportacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('relatorio', models.CharField(choices=[('condominio', 'Condomínio'), ('lote', 'Lote')], max_length=20, verbose_name='Relatório')),
+                ('formato', models.CharField(choices=[('pdf', 'PDF'), ('excel', 'Excel')], max_length=10, verbose_name='Formato')),
+                ('parametros', models.JSONField(blank=True, default=dict, help_text='Filtro de período do relatório (periodo, data_inicio, data_fim)', verbose_name='Parâmetros')),
+                ('chave', models.CharField(db_index=True, help_text='Hash do relatório, parâmetros, dia e versão dos dados: pedidos iguais reaproveitam o arquivo', max_length=64, verbose_name='Chave')),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('processando', 'Processando'), ('concluida', 'Concluída'), ('erro', 'Erro')], default='pendente', max_length=20, verbose_name='Status')),
+                ('tentativas', models.PositiveSmallIntegerField(default=0, verbose_name='Tentativas')),
+                ('arquivo', models.FileField(blank=True, help_text='Guardado pelo SHA-256 do conteúdo (exportacoes/ab/abcd….pdf)', upload_to='exportacoes/', verbose_name='Arquivo')),
+                ('sha256', models.CharField(blank=True, max_length=64, verbose_name='SHA-256')),
+                ('tamanho', models.PositiveIntegerField(blank=True, null=True, verbose_name='Tamanho (bytes)')),
+                ('nome_arquivo', models.CharField(blank=True, max_length=255, verbose_name='Nome do Arquivo')),
+                ('erro', models.TextField(blank=True, verbose_name='Erro')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True, verbose_name='Iniciado em')),
+                ('concluido_em', models.DateTimeField(blank=True, null=True, verbose_name='Concluído em')),
+                ('lote', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='exportacoes', to='consumo.lote', verbose_name='Lote')),
+            ],
+            options={
+                'verbose_name': 'Exportação',
+                'verbose_name_plural': 'Exportações',
+                'ordering': ['-criado_em'],
+                'indexes': [models.Index(fields=['status', 'criado_em'], name='exportacao_status_idx')],
+            },
+        ),
+    ]
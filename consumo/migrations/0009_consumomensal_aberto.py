@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-17 19:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consumo', '0008_exportacao'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='consumomensal',
+            index=models.Index(condition=models.Q(('fechado', False)), fields=['mes'], name='consumo_mensal_aberto_idx'),
+        ),
+    ]
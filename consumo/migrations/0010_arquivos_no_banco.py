@@ -0,0 +1,50 @@
+# Generated by Django 5.0.1 on 2026-10-17 19:06
+
+import consumo.armazenamento
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consumo', '0009_consumomensal_aberto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArquivoArmazenado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=255, unique=True, verbose_name='Nome')),
+                ('tamanho', models.PositiveBigIntegerField(default=0, verbose_name='Tamanho (bytes)')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+            ],
+            options={
+                'verbose_name': 'Arquivo Armazenado',
+                'verbose_name_plural': 'Arquivos Armazenados',
+            },
+        ),
+        migrations.AlterField(
+            model_name='exportacao',
+            name='arquivo',
+            field=models.FileField(blank=True, help_text='Guardado no banco pelo SHA-256 do conteúdo (exportacoes/ab/abcd….pdf)', storage=consumo.armazenamento.ArmazenamentoBanco(), upload_to='exportacoes/', verbose_name='Arquivo'),
+        ),
+        migrations.CreateModel(
+            name='BlocoArquivo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ordem', models.PositiveIntegerField(verbose_name='Ordem')),
+                ('dados', models.BinaryField(verbose_name='Dados')),
+                ('arquivo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blocos', to='consumo.arquivoarmazenado', verbose_name='Arquivo')),
+            ],
+            options={
+                'verbose_name': 'Bloco de Arquivo',
+                'verbose_name_plural': 'Blocos de Arquivo',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='blocoarquivo',
+            constraint=models.UniqueConstraint(fields=('arquivo', 'ordem'), name='bloco_arquivo_ordem_unica'),
+        ),
+    ]
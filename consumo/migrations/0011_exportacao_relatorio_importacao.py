@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-17 19:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consumo', '0010_arquivos_no_banco'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exportacao',
+            name='formato',
+            field=models.CharField(choices=[('pdf', 'PDF'), ('excel', 'Excel'), ('csv', 'CSV')], max_length=10, verbose_name='Formato'),
+        ),
+        migrations.AlterField(
+            model_name='exportacao',
+            name='relatorio',
+            field=models.CharField(choices=[('condominio', 'Condomínio'), ('lote', 'Lote'), ('importacao', 'Erros de Importação')], max_length=20, verbose_name='Relatório'),
+        ),
+    ]
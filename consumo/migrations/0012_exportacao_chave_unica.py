@@ -0,0 +1,31 @@
+# Generated by Django 5.0.1 on 2026-10-17 19:27
+
+from django.db import migrations, models
+
+
+def descartar_duplicadas(apps, schema_editor):
+    # Pedidos iguais criados juntos antes da restrição: fica o mais recente
+    Exportacao = apps.get_model('consumo', 'Exportacao')
+    ativas = Exportacao.objects.exclude(status='erro').order_by('chave', '-criado_em', '-pk')
+    vistas = set()
+    duplicadas = []
+    for pk, chave in ativas.values_list('pk', 'chave').iterator():
+        if chave in vistas:
+            duplicadas.append(pk)
+        vistas.add(chave)
+    Exportacao.objects.filter(pk__in=duplicadas).update(status='erro', erro='Pedido duplicado')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consumo', '0011_exportacao_relatorio_importacao'),
+    ]
+
+    operations = [
+        migrations.RunPython(descartar_duplicadas, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='exportacao',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'erro'), _negated=True), fields=('chave',), name='exportacao_chave_ativa_unica'),
+        ),
+    ]
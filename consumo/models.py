@@ -1,6 +1,8 @@
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from .armazenamento import ArmazenamentoBanco
+
 
 class Lote(models.Model):
     """Modelo para representar um lote residencial"""
@@ -39,6 +41,12 @@ class Lote(models.Model):
         auto_now=True,
         verbose_name='Atualizado em'
     )
+    versao_dados = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Versão dos Dados',
+        help_text='Incrementada a cada alteração das leituras ou hidrômetros do lote (invalida caches)'
+    )
 
     class Meta:
         verbose_name = 'Lote'
@@ -102,13 +110,17 @@ class Hidrometro(models.Model):
     def consumo_diario_atual(self):
         """Retorna o consumo do dia atual em m³"""
         from django.utils import timezone
-        hoje = timezone.now().date()
-        leituras_hoje = self.leituras.filter(data_leitura__date=hoje).order_by('data_leitura')
+        from .series import SerieLeituras
+        hoje = timezone.localdate()
+        try:
+            return self.estado.consumo_no_dia(hoje)
+        except HidrometroEstado.DoesNotExist:
+            pass
         
-        if leituras_hoje.count() >= 2:
-            primeira = leituras_hoje.first()
-            ultima = leituras_hoje.last()
-            return ultima.leitura - primeira.leitura
+        # Estado ainda não populado: calcula a partir das leituras do dia
+        serie = SerieLeituras.de_leituras(self.leituras.filter(data_leitura__date=hoje), self.id)
+        if len(serie) >= 2:
+            return serie.ultima - serie.primeira
         return 0
     
     def consumo_diario_atual_litros(self):
@@ -162,6 +174,23 @@ class Leitura(models.Model):
         null=True,
         verbose_name='Foto da Leitura'
     )
+    consumo_m3 = models.DecimalField(
+        max_digits=8,
+        decimal_places=3,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Consumo desde a Leitura Anterior (m³)',
+        help_text='Mantido automaticamente a cada gravação ou exclusão de leitura'
+    )
+    consumo_litros = models.DecimalField(
+        max_digits=11,
+        decimal_places=3,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Consumo desde a Leitura Anterior (L)'
+    )
     criado_em = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Criado em'
@@ -181,7 +210,9 @@ class Leitura(models.Model):
         return f"{self.hidrometro} - {self.data_leitura.strftime('%d/%m/%Y %H:%M')} - {self.leitura}m³"
 
     def consumo_desde_ultima_leitura(self):
-        """Calcula o consumo desde a última leitura em m³"""
+        """Consumo desde a última leitura em m³ (coluna persistida; consulta só se ainda não preenchida)"""
+        if self.consumo_m3 is not None:
+            return self.consumo_m3
         leitura_anterior = Leitura.objects.filter(
             hidrometro=self.hidrometro,
             data_leitura__lt=self.data_leitura
@@ -192,7 +223,366 @@ class Leitura(models.Model):
         return 0
     
     def consumo_desde_ultima_leitura_litros(self):
-        """Calcula o consumo desde a última leitura em litros"""
+        """Consumo desde a última leitura em litros"""
+        if self.consumo_litros is not None:
+            return float(self.consumo_litros)
         consumo_m3 = self.consumo_desde_ultima_leitura()
         return float(consumo_m3) * 1000
 
+
+
+class ConsumoDiario(models.Model):
+    """Consolidação diária do consumo de um hidrômetro, mantida a cada gravação de leitura"""
+    hidrometro = models.ForeignKey(
+        Hidrometro,
+        on_delete=models.CASCADE,
+        related_name='consumos_diarios',
+        verbose_name='Hidrômetro'
+    )
+    lote = models.ForeignKey(
+        Lote,
+        on_delete=models.CASCADE,
+        related_name='consumos_diarios',
+        verbose_name='Lote'
+    )
+    data = models.DateField(
+        verbose_name='Data'
+    )
+    litros = models.DecimalField(
+        max_digits=12,
+        decimal_places=3,
+        default=0,
+        verbose_name='Consumo (L)',
+        help_text='Soma dos deltas positivos das leituras do dia em relação à leitura anterior'
+    )
+    n_leituras = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Número de Leituras'
+    )
+    atualizado_em = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Atualizado em'
+    )
+
+    class Meta:
+        verbose_name = 'Consumo Diário'
+        verbose_name_plural = 'Consumos Diários'
+        ordering = ['-data']
+        unique_together = ['hidrometro', 'data']
+        indexes = [
+            models.Index(fields=['data', 'lote'], name='consumo_diario_data_lote_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.hidrometro} - {self.data.strftime('%d/%m/%Y')} - {self.litros}L"
+
+
+class ConsumoMensal(models.Model):
+    """Consolidação mensal do consumo de um hidrômetro, derivada da consolidação diária"""
+    hidrometro = models.ForeignKey(
+        Hidrometro,
+        on_delete=models.CASCADE,
+        related_name='consumos_mensais',
+        verbose_name='Hidrômetro'
+    )
+    lote = models.ForeignKey(
+        Lote,
+        on_delete=models.CASCADE,
+        related_name='consumos_mensais',
+        verbose_name='Lote'
+    )
+    mes = models.DateField(
+        verbose_name='Mês',
+        help_text='Primeiro dia do mês de referência'
+    )
+    litros = models.DecimalField(
+        max_digits=14,
+        decimal_places=3,
+        default=0,
+        verbose_name='Consumo (L)'
+    )
+    n_leituras = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Número de Leituras'
+    )
+    fechado = models.BooleanField(
+        default=False,
+        verbose_name='Mês Fechado',
+        help_text='Meses anteriores ao atual: valores congelados, só mudam com correção de leitura'
+    )
+    atualizado_em = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Atualizado em'
+    )
+
+    class Meta:
+        verbose_name = 'Consumo Mensal'
+        verbose_name_plural = 'Consumos Mensais'
+        ordering = ['-mes']
+        unique_together = ['hidrometro', 'mes']
+        indexes = [
+            models.Index(fields=['mes', 'lote'], name='consumo_mensal_mes_lote_idx'),
+            # Só os meses abertos (atual e, até a virada, o anterior): fechar_meses()
+            models.Index(fields=['mes'], condition=models.Q(fechado=False), name='consumo_mensal_aberto_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.hidrometro} - {self.mes.strftime('%m/%Y')} - {self.litros}L"
+
+
+class HidrometroEstado(models.Model):
+    """Estado atual de um hidrômetro (uma linha por hidrômetro), atualizado a cada gravação de leitura"""
+    hidrometro = models.OneToOneField(
+        Hidrometro,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='estado',
+        verbose_name='Hidrômetro'
+    )
+    ultima_leitura = models.DecimalField(
+        max_digits=8,
+        decimal_places=3,
+        null=True,
+        blank=True,
+        verbose_name='Última Leitura (m³)'
+    )
+    ultima_data_leitura = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Data da Última Leitura'
+    )
+    ultimo_periodo = models.CharField(
+        max_length=10,
+        blank=True,
+        default='',
+        verbose_name='Período da Última Leitura'
+    )
+    dia = models.DateField(
+        null=True,
+        blank=True,
+        verbose_name='Dia de Referência',
+        help_text='Dia (local) a que se referem a primeira leitura e a contagem do dia'
+    )
+    primeira_leitura_dia = models.DecimalField(
+        max_digits=8,
+        decimal_places=3,
+        null=True,
+        blank=True,
+        verbose_name='Primeira Leitura do Dia (m³)'
+    )
+    leituras_dia = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Leituras no Dia'
+    )
+    mes = models.DateField(
+        null=True,
+        blank=True,
+        verbose_name='Mês de Referência'
+    )
+    litros_mes = models.DecimalField(
+        max_digits=14,
+        decimal_places=3,
+        default=0,
+        verbose_name='Consumo no Mês até Agora (L)'
+    )
+    atualizado_em = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Atualizado em'
+    )
+
+    class Meta:
+        verbose_name = 'Estado do Hidrômetro'
+        verbose_name_plural = 'Estados dos Hidrômetros'
+
+    def __str__(self):
+        return f"{self.hidrometro_id} - {self.ultima_leitura}m³"
+
+    def leituras_no_dia(self, dia):
+        """Número de leituras no dia informado (zero se o estado se refere a outro dia)"""
+        return self.leituras_dia if self.dia == dia else 0
+
+    def consumo_no_dia(self, dia):
+        """Consumo (m³) entre a primeira e a última leitura do dia (exige duas leituras)"""
+        from django.utils import timezone
+        if self.leituras_no_dia(dia) < 2 or timezone.localtime(self.ultima_data_leitura).date() != dia:
+            return 0
+        return self.ultima_leitura - self.primeira_leitura_dia
+
+    def litros_no_mes(self, mes):
+        """Consumo (L) acumulado no mês informado (primeiro dia do mês)"""
+        return self.litros_mes if self.mes == mes else 0
+
+
+class Exportacao(models.Model):
+    """Pedido de exportação de relatório (PDF/Excel), gerado em segundo plano pela fila de exportação"""
+    # Relatórios gerados pela fila; 'importacao' é o relatório das linhas
+    # rejeitadas de uma importação, guardado já concluído
+    RELATORIOS_FILA = [
+        ('condominio', 'Condomínio'),
+        ('lote', 'Lote'),
+    ]
+    RELATORIO_CHOICES = RELATORIOS_FILA + [
+        ('importacao', 'Erros de Importação'),
+    ]
+    FORMATOS_FILA = [
+        ('pdf', 'PDF'),
+        ('excel', 'Excel'),
+    ]
+    FORMATO_CHOICES = FORMATOS_FILA + [
+        ('csv', 'CSV'),
+    ]
+    STATUS_CHOICES = [
+        ('pendente', 'Pendente'),
+        ('processando', 'Processando'),
+        ('concluida', 'Concluída'),
+        ('erro', 'Erro'),
+    ]
+
+    relatorio = models.CharField(
+        max_length=20,
+        choices=RELATORIO_CHOICES,
+        verbose_name='Relatório'
+    )
+    formato = models.CharField(
+        max_length=10,
+        choices=FORMATO_CHOICES,
+        verbose_name='Formato'
+    )
+    lote = models.ForeignKey(
+        Lote,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='exportacoes',
+        verbose_name='Lote'
+    )
+    parametros = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Parâmetros',
+        help_text='Filtro de período do relatório (periodo, data_inicio, data_fim)'
+    )
+    chave = models.CharField(
+        max_length=64,
+        db_index=True,
+        verbose_name='Chave',
+        help_text='Hash do relatório, parâmetros, dia e versão dos dados: pedidos iguais reaproveitam o arquivo'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pendente',
+        verbose_name='Status'
+    )
+    tentativas = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Tentativas'
+    )
+    arquivo = models.FileField(
+        upload_to='exportacoes/',
+        storage=ArmazenamentoBanco(),
+        blank=True,
+        verbose_name='Arquivo',
+        help_text='Guardado no banco pelo SHA-256 do conteúdo (exportacoes/ab/abcd….pdf)'
+    )
+    sha256 = models.CharField(
+        max_length=64,
+        blank=True,
+        verbose_name='SHA-256'
+    )
+    tamanho = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Tamanho (bytes)'
+    )
+    nome_arquivo = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name='Nome do Arquivo'
+    )
+    erro = models.TextField(
+        blank=True,
+        verbose_name='Erro'
+    )
+    criado_em = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Criado em'
+    )
+    iniciado_em = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Iniciado em'
+    )
+    concluido_em = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Concluído em'
+    )
+
+    class Meta:
+        verbose_name = 'Exportação'
+        verbose_name_plural = 'Exportações'
+        ordering = ['-criado_em']
+        indexes = [
+            models.Index(fields=['status', 'criado_em'], name='exportacao_status_idx'),
+        ]
+        constraints = [
+            # Um pedido ativo por chave: pedidos iguais simultâneos reaproveitam a mesma linha
+            models.UniqueConstraint(
+                fields=['chave'], condition=~models.Q(status='erro'), name='exportacao_chave_ativa_unica'
+            ),
+        ]
+
+    def __str__(self):
+        alvo = f"Lote {self.lote.numero}" if self.lote_id else self.get_relatorio_display()
+        return f"{alvo} - {self.get_formato_display()} - {self.get_status_display()}"
+
+
+class ArquivoArmazenado(models.Model):
+    """Arquivo guardado no banco (ArmazenamentoBanco), com o conteúdo em BlocoArquivo"""
+    nome = models.CharField(
+        max_length=255,
+        unique=True,
+        verbose_name='Nome'
+    )
+    tamanho = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Tamanho (bytes)'
+    )
+    criado_em = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Criado em'
+    )
+
+    class Meta:
+        verbose_name = 'Arquivo Armazenado'
+        verbose_name_plural = 'Arquivos Armazenados'
+
+    def __str__(self):
+        return self.nome
+
+
+class BlocoArquivo(models.Model):
+    """Bloco de um ArquivoArmazenado (armazenamento.TAMANHO_BLOCO bytes, menos o último)"""
+    arquivo = models.ForeignKey(
+        ArquivoArmazenado,
+        on_delete=models.CASCADE,
+        related_name='blocos',
+        verbose_name='Arquivo'
+    )
+    ordem = models.PositiveIntegerField(
+        verbose_name='Ordem'
+    )
+    dados = models.BinaryField(
+        verbose_name='Dados'
+    )
+
+    class Meta:
+        verbose_name = 'Bloco de Arquivo'
+        verbose_name_plural = 'Blocos de Arquivo'
+        constraints = [
+            models.UniqueConstraint(fields=['arquivo', 'ordem'], name='bloco_arquivo_ordem_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.arquivo} - bloco {self.ordem}"
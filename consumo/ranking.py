@@ -0,0 +1,106 @@
+"""
+Ranking de lotes por consumo em um período.
+
+O consumo de cada hidrômetro é a diferença entre a maior e a menor leitura da
+janela, obtida com uma única consulta agrupada (MAX/MIN por hidrômetro); os
+hidrômetros são somados por lote em Python (uma linha por hidrômetro). Usado
+pelas exportações do condomínio e por GET /api/lotes/ranking/.
+"""
+from django.db.models import Count, F, Max, Min
+
+from .agregacao import filtrar_periodo
+from .models import Leitura, Lote
+
+
+class RankingLotes:
+    """Lotes ordenados do maior para o menor consumo, com posição e percentil"""
+
+    def __init__(self, itens):
+        self.itens = itens
+        self._por_lote = {item['lote_id']: item for item in itens}
+
+    def __len__(self):
+        return len(self.itens)
+
+    def top(self, n=10):
+        """Os n lotes de maior consumo"""
+        return self.itens[:n]
+
+    def bottom(self, n=10):
+        """Os n lotes de menor consumo, do menor para o maior"""
+        return self.itens[::-1][:n]
+
+    def posicao(self, lote_id):
+        """Item do lote no ranking ou None se ele não tem leituras no período"""
+        return self._por_lote.get(lote_id)
+
+
+def _percentis(itens):
+    # Percentil por posição média sobre a lista já ordenada: empatados recebem o mesmo valor
+    total = len(itens)
+    inicio = 0
+    while inicio < total:
+        fim = inicio
+        while fim < total and itens[fim]['consumo_litros'] == itens[inicio]['consumo_litros']:
+            fim += 1
+        percentil = round(100 * ((total - fim) + 0.5 * (fim - inicio)) / total, 1)
+        for item in itens[inicio:fim]:
+            item['percentil'] = percentil
+        inicio = fim
+
+
+def ranking_lotes(data_inicio, data_fim, tipo='residencial', somente_com_consumo=False):
+    """Ranking de lotes ativos (do tipo pedido, ou todos se tipo=None) no período.
+
+    Considera apenas hidrômetros ativos com leituras na janela. Com
+    somente_com_consumo=True, lotes de consumo zero ficam de fora.
+    """
+    leituras = filtrar_periodo(
+        Leitura.objects.filter(hidrometro__ativo=True, hidrometro__lote__ativo=True),
+        data_inicio,
+        data_fim,
+    )
+    if tipo:
+        leituras = leituras.filter(hidrometro__lote__tipo=tipo)
+
+    linhas = (
+        leituras.order_by()
+        .values('hidrometro_id')
+        .annotate(
+            lote_id=F('hidrometro__lote_id'),
+            numero=F('hidrometro__lote__numero'),
+            tipo=F('hidrometro__lote__tipo'),
+            maior=Max('leitura'),
+            menor=Min('leitura'),
+            n=Count('id'),
+        )
+    )
+
+    tipos = dict(Lote.TIPO_CHOICES)
+    por_lote = {}
+    for linha in linhas:
+        item = por_lote.get(linha['lote_id'])
+        if item is None:
+            item = por_lote[linha['lote_id']] = {
+                'lote_id': linha['lote_id'],
+                'lote': linha['numero'],
+                'tipo': linha['tipo'],
+                'tipo_display': tipos.get(linha['tipo'], linha['tipo']),
+                'consumo_litros': 0.0,
+                'hidrometros': 0,
+                'leituras': 0,
+            }
+        item['consumo_litros'] += float(linha['maior'] - linha['menor']) * 1000
+        item['hidrometros'] += 1
+        item['leituras'] += linha['n']
+
+    itens = [
+        item for item in por_lote.values()
+        if item['consumo_litros'] > 0 or not somente_com_consumo
+    ]
+    itens.sort(key=lambda item: (-item['consumo_litros'], item['lote']))
+    for posicao, item in enumerate(itens, 1):
+        item['consumo_litros'] = round(item['consumo_litros'], 2)
+        item['posicao'] = posicao
+    _percentis(itens)
+    return RankingLotes(itens)
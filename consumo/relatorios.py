@@ -0,0 +1,879 @@
+"""
+Relatórios de gráficos em PDF e Excel (condomínio e lote).
+
+Cada gerador recebe os parâmetros do filtro de período (o QueryDict da
+requisição ou um dict) e devolve um Relatorio com o conteúdo do arquivo, sem
+depender da requisição: as views de exportação respondem com ele na hora e a
+fila de exportação (exportacoes.py) o executa nos workers.
+
+O Excel do lote, que inclui todas as leituras do período, é escrito em modo
+write_only do openpyxl, lendo as leituras em blocos do banco, e salvo em um
+SpooledTemporaryFile: o Relatorio traz o arquivo em vez dos bytes, e a resposta
+o envia em blocos.
+"""
+from collections import namedtuple
+from datetime import timedelta
+import io
+import os
+import tempfile
+
+from django.utils import timezone
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.drawing.image import Image as XLImage
+from openpyxl.styles import Font, Alignment, PatternFill
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Image
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.lib.enums import TA_CENTER
+
+from .agregacao import calcular_consumo_consolidado
+from .graficos import hidrometros_graficos, ordenar_lote, periodo_graficos, periodo_graficos_lote
+from . import renderizacao
+from .models import Lote, Leitura
+from .ranking import ranking_lotes
+from .tabelas_pdf import TabelaPaginada, estilo_tabela
+
+# conteudo: bytes, ou um arquivo temporário já posicionado no início (Excel do lote)
+Relatorio = namedtuple('Relatorio', ['conteudo', 'nome_arquivo', 'content_type'])
+
+# Acima deste tamanho o arquivo temporário do relatório passa da memória para o disco
+TAMANHO_MAXIMO_EM_MEMORIA = 8 * 1024 * 1024
+TAMANHO_BLOCO_LEITURAS = 2000
+
+CONTENT_TYPES = {
+    'pdf': 'application/pdf',
+    'excel': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+class SemHidrometrosAtivos(Exception):
+    """O lote não tem hidrômetros ativos para o relatório"""
+
+    def __init__(self, lote):
+        super().__init__('Nenhum hidrômetro ativo encontrado para este lote.')
+        self.lote = lote
+
+
+def como_arquivo(conteudo):
+    """Conteúdo de um Relatorio como arquivo binário (bytes viram BytesIO)"""
+    if isinstance(conteudo, bytes):
+        return io.BytesIO(conteudo)
+    return conteudo
+
+
+def _celula(ws, valor, **estilo):
+    """Célula com estilo para abas write_only"""
+    celula = WriteOnlyCell(ws, value=valor)
+    for atributo, valor_estilo in estilo.items():
+        setattr(celula, atributo, valor_estilo)
+    return celula
+
+
+def _cabecalho(ws, titulos, fonte):
+    return [_celula(ws, titulo, font=fonte) for titulo in titulos]
+
+
+# Estilo dos gráficos por formato: tamanho da figura e resolução
+ESTILO_PDF = {'tamanho': (10, 5), 'dpi': 150}
+ESTILO_EXCEL = {'tamanho': (12, 6), 'dpi': 100}
+
+
+def _renderizar_graficos(graficos):
+    """PNGs (nome -> bytes) dos gráficos do relatório, desenhados em paralelo.
+
+    Os gráficos None (sem dados) ficam de fora.
+    """
+    nomes = [nome for nome, grafico in graficos.items() if grafico is not None]
+    pngs = renderizacao.renderizar_varios([graficos[nome] for nome in nomes])
+    return dict(zip(nomes, pngs))
+
+
+def _grafico_diario(datas, consumo_por_dia, titulo, rotulo_x, estilo):
+    return renderizacao.Grafico(
+        'linha', [d.strftime('%d/%m') for d in datas], [consumo_por_dia.get(d, 0.0) for d in datas],
+        titulo, rotulo_x, 'Consumo (L)', '#3498db', **estilo,
+    )
+
+
+def _grafico_top_lotes(top_lotes, periodo_label, estilo):
+    if not top_lotes:
+        return None
+    return renderizacao.Grafico(
+        'barras_horizontais', [item['lote'] for item in top_lotes], [item['consumo_litros'] for item in top_lotes],
+        f'Top 10 Lotes - Consumo ({periodo_label})', 'Consumo (L)', 'Lote', '#e74c3c', alpha=0.7, **estilo,
+    )
+
+
+def _grafico_hidrometros(consumo_por_hidrometro, periodo_label):
+    if not consumo_por_hidrometro:
+        return None
+    return renderizacao.Grafico(
+        'barras',
+        [f"{item['hidrometro']} (Lote {item['lote']})" for item in consumo_por_hidrometro],
+        [item['consumo_litros'] for item in consumo_por_hidrometro],
+        f'Consumo por Hidrômetro ({periodo_label})', 'Hidrômetro', 'Consumo (L)', '#eab308',
+        alpha=0.85, tamanho=(14, 6), dpi=100, rotacao=60, fonte_rotulos=8,
+    )
+
+
+def _grafico_mensal(lote, meses_periodo, consumo_por_mes, nomes_meses, estilo):
+    return renderizacao.Grafico(
+        'barras',
+        [f'{nomes_meses[mes - 1]}/{str(ano)[-2:]}' for (ano, mes) in meses_periodo],
+        [consumo_por_mes.get((ano, mes), 0.0) for (ano, mes) in meses_periodo],
+        f'Consumo Mensal - Lote {lote.numero} (Litros)', 'Mês', 'Consumo (L)', '#27ae60', alpha=0.7, **estilo,
+    )
+
+
+def graficos_consumo_pdf(parametros):
+    """Relatório em PDF dos gráficos de consumo do condomínio"""
+    agora = timezone.localtime(timezone.now())
+    periodo = periodo_graficos(parametros, agora)
+    data_inicio, data_fim = periodo['data_inicio'], periodo['data_fim']
+    periodo_label = periodo['periodo_label']
+    hidrometros = hidrometros_graficos()
+    
+    # Calcular consumo diário baseado no período filtrado
+    consumo_diario = {}
+    datas_periodo = []
+    dia_cursor = data_inicio
+    while dia_cursor.date() <= data_fim.date():
+        consumo_diario[dia_cursor.date()] = 0.0
+        datas_periodo.append(dia_cursor.date())
+        dia_cursor += timedelta(days=1)
+
+    # Consumo do período pelas consolidações mensal e diária, como a página /graficos/
+    resultado = calcular_consumo_consolidado(hidrometros, data_inicio, data_fim)
+    consumo_total_periodo = resultado.total
+    
+    for dia, consumo_litros in resultado.por_dia.items():
+        if dia in consumo_diario:
+            consumo_diario[dia] += consumo_litros
+    
+    # Consumo por hidrômetro (individual) no período
+    consumo_por_hidrometro = []
+    for hidrometro in hidrometros:
+        consumo_hidrometro_litros = resultado.por_hidrometro.get(hidrometro.id, 0.0)
+        if consumo_hidrometro_litros > 0:
+            consumo_por_hidrometro.append({
+                'hidrometro': hidrometro.numero,
+                'lote': hidrometro.lote.numero,
+                'consumo_litros': round(consumo_hidrometro_litros, 2),
+            })
+    
+    # Top 10 lotes por consumo (baseado no período filtrado), em uma consulta agrupada
+    top_lotes = ranking_lotes(data_inicio, data_fim, somente_com_consumo=True).top(10)
+
+    # Ordenar hidrômetros por lote (numéricos primeiro, depois ADM)
+    consumo_por_hidrometro = sorted(
+        consumo_por_hidrometro,
+        key=lambda x: (ordenar_lote(x), x['hidrometro'])
+    )
+    
+    # Gráficos do relatório (em paralelo, ou do cache de PNGs)
+    pngs = _renderizar_graficos({
+        'diario': _grafico_diario(datas_periodo, consumo_diario, f'Consumo Diário - {periodo_label}', 'Data', ESTILO_PDF),
+        'top_lotes': _grafico_top_lotes(top_lotes, periodo_label, ESTILO_PDF),
+    })
+
+    # Criar PDF
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4),
+                          rightMargin=30, leftMargin=30,
+                          topMargin=30, bottomMargin=18)
+    
+    elements = []
+    styles = getSampleStyleSheet()
+    
+    # Estilo do título
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#2c3e50'),
+        spaceAfter=30,
+        alignment=TA_CENTER
+    )
+    
+    subtitle_style = ParagraphStyle(
+        'CustomSubtitle',
+        parent=styles['Normal'],
+        fontSize=14,
+        textColor=colors.HexColor('#7f8c8d'),
+        spaceAfter=20,
+        alignment=TA_CENTER
+    )
+    
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=16,
+        textColor=colors.HexColor('#2c3e50'),
+        spaceAfter=12,
+        spaceBefore=12
+    )
+    
+    # Título
+    elements.append(Paragraph(f"Relatório de Consumo de Água - {periodo_label}", title_style))
+    elements.append(Paragraph(f"Gerado em: {agora.strftime('%d/%m/%Y %H:%M')}", subtitle_style))
+    elements.append(Spacer(1, 0.3*inch))
+    
+    # Resumo Geral
+    elements.append(Paragraph("📊 Resumo Geral", heading_style))
+    
+    resumo_data = [
+        ['Indicador', 'Valor'],
+        ['Período', periodo_label],
+        ['Consumo Total', f'{consumo_total_periodo:,.0f} L'],
+        ['Hidrômetros Ativos', str(hidrometros.count())],
+        ['Lotes Ativos', str(Lote.objects.filter(ativo=True, tipo='residencial').count())],
+    ]
+    
+    resumo_table = Table(resumo_data, colWidths=[3*inch, 2*inch])
+    resumo_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498db')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 10),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
+    ]))
+    
+    elements.append(resumo_table)
+    elements.append(Spacer(1, 0.4*inch))
+    
+    # Gráfico de Consumo Diário
+    elements.append(Paragraph("📈 Consumo Diário", heading_style))
+    
+    # Adicionar imagem ao PDF
+    img = Image(io.BytesIO(pngs['diario']), width=7*inch, height=3.5*inch)
+    elements.append(img)
+    elements.append(PageBreak())
+    
+    # Top 10 Lotes
+    elements.append(Paragraph("🏆 Top 10 Lotes com Maior Consumo", heading_style))
+    
+    top_data = [['Posição', 'Lote', 'Tipo', 'Consumo (L)']]
+    for idx, item in enumerate(top_lotes, 1):
+        top_data.append([
+            str(idx),
+            item['lote'],
+            item['tipo_display'],
+            f"{item['consumo_litros']:,.2f}"
+        ])
+    
+    top_table = Table(top_data, colWidths=[1*inch, 1.5*inch, 1.5*inch, 2*inch])
+    top_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#e74c3c')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 11),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 9),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
+    ]))
+    
+    elements.append(top_table)
+    elements.append(Spacer(1, 0.3*inch))
+    
+    # Gráfico Top 10 Lotes
+    if top_lotes:
+        # Adicionar imagem ao PDF
+        img_top = Image(io.BytesIO(pngs['top_lotes']), width=7*inch, height=3.5*inch)
+        elements.append(img_top)
+    
+    elements.append(Spacer(1, 0.3*inch))
+    elements.append(PageBreak())
+    
+    # Tabela: Consumo por Hidrômetro (período)
+    elements.append(Paragraph("📈 Consumo por Hidrômetro (período)", heading_style))
+
+    # Uma Table por página (TabelaPaginada): o custo não cresce com o quadrado das linhas
+    hidrometro_data = [
+        [item['hidrometro'], item['lote'], f"{item['consumo_litros']:,.0f}"]
+        for item in consumo_por_hidrometro
+    ]
+    hidrometro_table = TabelaPaginada(
+        ['Hidrômetro', 'Lote', 'Consumo (L)'],
+        hidrometro_data,
+        [2*inch, 1.5*inch, 2*inch],
+        estilo_tabela('#2980b9'),
+    )
+
+    elements.append(hidrometro_table)
+    elements.append(Spacer(1, 0.3*inch))
+    
+    # Construir PDF
+    doc.build(elements)
+    
+    # Preparar resposta
+    buffer.seek(0)
+    return Relatorio(buffer.getvalue(), f'relatorio_consumo_condominio_{agora.strftime("%Y%m%d")}.pdf', CONTENT_TYPES['pdf'])
+
+
+def graficos_consumo_excel(parametros):
+    """Relatório em Excel (com gráficos) do consumo do condomínio"""
+    agora = timezone.localtime(timezone.now())
+    periodo = periodo_graficos(parametros, agora)
+    data_inicio, data_fim = periodo['data_inicio'], periodo['data_fim']
+    periodo_label = periodo['periodo_label']
+    hidrometros = hidrometros_graficos()
+    
+    # Calcular consumo diário baseado no período filtrado
+    consumo_diario = {}
+    datas_periodo = []
+    dia_cursor = data_inicio
+    while dia_cursor.date() <= data_fim.date():
+        consumo_diario[dia_cursor.date()] = 0.0
+        datas_periodo.append(dia_cursor.date())
+        dia_cursor += timedelta(days=1)
+    
+    # Consumo do período pelas consolidações mensal e diária, como a página /graficos/
+    resultado = calcular_consumo_consolidado(hidrometros, data_inicio, data_fim)
+    consumo_total_periodo = resultado.total
+    
+    for dia, consumo_litros in resultado.por_dia.items():
+        if dia in consumo_diario:
+            consumo_diario[dia] += consumo_litros
+    
+    # Consumo por hidrômetro (individual) no período
+    consumo_por_hidrometro = []
+    for hidrometro in hidrometros:
+        consumo_hidrometro_litros = resultado.por_hidrometro.get(hidrometro.id, 0.0)
+        consumo_por_hidrometro.append({
+            'hidrometro': hidrometro.numero,
+            'lote': hidrometro.lote.numero,
+            'consumo_litros': round(consumo_hidrometro_litros, 2),
+        })
+    
+    # Top 10 lotes por consumo (baseado no período filtrado), em uma consulta agrupada
+    top_lotes = ranking_lotes(data_inicio, data_fim, somente_com_consumo=True).top(10)
+    
+    # Ordenar hidrômetros por lote (numéricos primeiro, depois ADM)
+    consumo_por_hidrometro = sorted(
+        consumo_por_hidrometro,
+        key=lambda x: (ordenar_lote(x), x['hidrometro'])
+    )
+    
+    # Gráficos do relatório (em paralelo, ou do cache de PNGs)
+    pngs = _renderizar_graficos({
+        'diario': _grafico_diario(datas_periodo, consumo_diario, f'Consumo Diário - {periodo_label}', 'Data', ESTILO_EXCEL),
+        'top_lotes': _grafico_top_lotes(top_lotes, periodo_label, ESTILO_EXCEL),
+        'hidrometros': _grafico_hidrometros(consumo_por_hidrometro, periodo_label),
+    })
+
+    # Criar Excel
+    wb = Workbook()
+    
+    # Aba: Resumo
+    ws_resumo = wb.active
+    ws_resumo.title = "Resumo"
+    
+    # Título
+    ws_resumo['A1'] = f'Relatório de Consumo de Água - {periodo_label}'
+    ws_resumo['A1'].font = Font(size=16, bold=True, color='FFFFFF')
+    ws_resumo['A1'].fill = PatternFill(start_color='3498db', end_color='3498db', fill_type='solid')
+    ws_resumo['A1'].alignment = Alignment(horizontal='center')
+    ws_resumo.merge_cells('A1:C1')
+    
+    ws_resumo['A2'] = f'Gerado em: {agora.strftime("%d/%m/%Y %H:%M")}'
+    ws_resumo['A2'].alignment = Alignment(horizontal='center')
+    ws_resumo.merge_cells('A2:C2')
+    
+    # Dados resumo
+    ws_resumo['A4'] = 'Indicador'
+    ws_resumo['B4'] = 'Valor'
+    ws_resumo['A4'].font = Font(bold=True)
+    ws_resumo['B4'].font = Font(bold=True)
+    
+    resumo_dados = [
+        ['Período', periodo_label],
+        ['Consumo Total', f'{consumo_total_periodo:,.0f} L'],
+        ['Hidrômetros Ativos', hidrometros.count()],
+        ['Lotes Ativos', Lote.objects.filter(ativo=True, tipo='residencial').count()],
+    ]
+    
+    for idx, (indicador, valor) in enumerate(resumo_dados, start=5):
+        ws_resumo[f'A{idx}'] = indicador
+        ws_resumo[f'B{idx}'] = valor
+    
+    ws_resumo.column_dimensions['A'].width = 30
+    ws_resumo.column_dimensions['B'].width = 20
+    
+    # Aba: Consumo Diário (baseado no período filtrado)
+    ws_diario = wb.create_sheet("Consumo Diário")
+    
+    ws_diario['A1'] = 'Data'
+    ws_diario['B1'] = 'Consumo (L)'
+    ws_diario['A1'].font = Font(bold=True)
+    ws_diario['B1'].font = Font(bold=True)
+    
+    for idx, data in enumerate(datas_periodo, start=2):
+        ws_diario[f'A{idx}'] = data.strftime('%d/%m/%Y')
+        ws_diario[f'B{idx}'] = round(consumo_diario[data], 2)
+    
+    # Adicionar imagem ao Excel
+    img_diario = XLImage(io.BytesIO(pngs['diario']))
+    img_diario.width = 600
+    img_diario.height = 300
+    ws_diario.add_image(img_diario, "D2")
+    
+    ws_diario.column_dimensions['A'].width = 15
+    ws_diario.column_dimensions['B'].width = 15
+    
+    # Aba: Top 10 Lotes
+    ws_top = wb.create_sheet("Top 10 Lotes")
+    
+    ws_top['A1'] = 'Posição'
+    ws_top['B1'] = 'Lote'
+    ws_top['C1'] = 'Tipo'
+    ws_top['D1'] = 'Consumo (L)'
+    
+    for col in ['A1', 'B1', 'C1', 'D1']:
+        ws_top[col].font = Font(bold=True)
+    
+    for idx, item in enumerate(top_lotes, 1):
+        ws_top[f'A{idx + 1}'] = idx
+        ws_top[f'B{idx + 1}'] = item['lote']
+        ws_top[f'C{idx + 1}'] = item['tipo_display']
+        ws_top[f'D{idx + 1}'] = item['consumo_litros']
+    
+    if top_lotes:
+        # Adicionar imagem ao Excel
+        img_top_chart = XLImage(io.BytesIO(pngs['top_lotes']))
+        img_top_chart.width = 600
+        img_top_chart.height = 300
+        ws_top.add_image(img_top_chart, "F2")
+    
+    for col in ['A', 'B', 'C', 'D']:
+        ws_top.column_dimensions[col].width = 15
+
+    # Aba: Consumo por Hidrômetro
+    ws_hid = wb.create_sheet("Consumo por Hidrômetro")
+    ws_hid['A1'] = 'Hidrômetro'
+    ws_hid['B1'] = 'Lote'
+    ws_hid['C1'] = 'Consumo (L)'
+    for col in ['A1', 'B1', 'C1']:
+        ws_hid[col].font = Font(bold=True)
+
+    for idx, item in enumerate(consumo_por_hidrometro, start=2):
+        ws_hid[f'A{idx}'] = item['hidrometro']
+        ws_hid[f'B{idx}'] = item['lote']
+        ws_hid[f'C{idx}'] = item['consumo_litros']
+
+    for col in ['A', 'B', 'C']:
+        ws_hid.column_dimensions[col].width = 18
+
+    # Gráfico de barras por hidrômetro
+    if consumo_por_hidrometro:
+        img_h_chart = XLImage(io.BytesIO(pngs['hidrometros']))
+        img_h_chart.width = 700
+        img_h_chart.height = 320
+        ws_hid.add_image(img_h_chart, "E2")
+    
+    # Salvar e retornar
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    buffer.seek(0)
+    
+    return Relatorio(buffer.getvalue(), f'relatorio_consumo_condominio_{agora.strftime("%Y%m%d")}.xlsx', CONTENT_TYPES['excel'])
+
+
+def graficos_lote_pdf(lote, parametros):
+    """Relatório em PDF dos gráficos de consumo de um lote"""
+    agora = timezone.localtime(timezone.now())
+    data_inicio, data_fim, periodo_label, _periodo = periodo_graficos_lote(parametros, agora.date())
+    
+    hidrometros = lote.hidrometros.filter(ativo=True)
+    
+    if not hidrometros.exists():
+        raise SemHidrometrosAtivos(lote)
+    
+    # Calcular consumo no periodo
+    nomes_meses = [
+        'Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
+        'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro'
+    ]
+    resultado = calcular_consumo_consolidado(hidrometros, data_inicio, data_fim)
+    consumo_total_periodo = resultado.total
+    consumo_por_dia = dict(resultado.por_dia)
+    consumo_por_mes = dict(resultado.por_mes)
+
+    datas_periodo = []
+    dia_cursor = data_inicio
+    while dia_cursor <= data_fim:
+        datas_periodo.append(dia_cursor)
+        consumo_por_dia.setdefault(dia_cursor, 0.0)
+        dia_cursor += timedelta(days=1)
+
+    meses_periodo = []
+    mes_cursor = data_inicio.replace(day=1)
+    while mes_cursor <= data_fim:
+        meses_periodo.append((mes_cursor.year, mes_cursor.month))
+        if mes_cursor.month == 12:
+            mes_cursor = mes_cursor.replace(year=mes_cursor.year + 1, month=1)
+        else:
+            mes_cursor = mes_cursor.replace(month=mes_cursor.month + 1)
+    
+    
+    # Gráficos do relatório (em paralelo, ou do cache de PNGs)
+    pngs = _renderizar_graficos({
+        'mensal': _grafico_mensal(lote, meses_periodo, consumo_por_mes, nomes_meses, ESTILO_PDF),
+    })
+
+    # Criar PDF
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4),
+                          rightMargin=30, leftMargin=30,
+                          topMargin=30, bottomMargin=18)
+    
+    elements = []
+    styles = getSampleStyleSheet()
+    
+    # Estilo do título
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#2c3e50'),
+        spaceAfter=30,
+        alignment=TA_CENTER
+    )
+    
+    subtitle_style = ParagraphStyle(
+        'CustomSubtitle',
+        parent=styles['Normal'],
+        fontSize=14,
+        textColor=colors.HexColor('#7f8c8d'),
+        spaceAfter=20,
+        alignment=TA_CENTER
+    )
+    
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=16,
+        textColor=colors.HexColor('#2c3e50'),
+        spaceAfter=12,
+        spaceBefore=12
+    )
+    
+    # Título
+    elements.append(Paragraph(f"Relatório de Consumo - Lote {lote.numero} ({periodo_label})", title_style))
+    elements.append(Paragraph(
+        f"Tipo: {lote.get_tipo_display()} | Período: {data_inicio.strftime('%d/%m/%Y')} a {data_fim.strftime('%d/%m/%Y')} | Gerado em: {agora.strftime('%d/%m/%Y %H:%M')}",
+        subtitle_style
+    ))
+    elements.append(Spacer(1, 0.3*inch))
+    
+    # Resumo Geral
+    elements.append(Paragraph("📊 Resumo Geral", heading_style))
+    
+    resumo_data = [
+        ['Indicador', 'Valor'],
+        ['Lote', lote.numero],
+        ['Tipo', lote.get_tipo_display()],
+        ['Período', periodo_label],
+        ['Consumo Total no Período', f'{consumo_total_periodo:,.0f} L'],
+        ['Hidrometros Ativos', str(hidrometros.count())],
+    ]
+    
+    resumo_table = Table(resumo_data, colWidths=[3*inch, 2*inch])
+    resumo_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498db')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 10),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
+    ]))
+    
+    elements.append(resumo_table)
+    elements.append(Spacer(1, 0.4*inch))
+    
+    # Consumo Mensal
+    elements.append(Paragraph("📅 Consumo Mensal", heading_style))
+    
+    mensal_data = [['Mês', 'Consumo (L)']]
+    for (ano, mes) in meses_periodo:
+        mes_nome = f'{nomes_meses[mes - 1]}/{str(ano)[-2:]}'
+        mensal_data.append([mes_nome, f'{consumo_por_mes.get((ano, mes), 0.0):,.2f}'])
+    
+    mensal_table = Table(mensal_data, colWidths=[2*inch, 2*inch])
+    mensal_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#27ae60')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 11),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 9),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
+    ]))
+    
+    elements.append(mensal_table)
+    elements.append(Spacer(1, 0.3*inch))
+    
+    # Gráfico de Consumo Mensal
+    # Adicionar imagem ao PDF
+    img = Image(io.BytesIO(pngs['mensal']), width=7*inch, height=3.5*inch)
+    elements.append(img)
+    elements.append(Spacer(1, 0.3*inch))
+
+    leituras_periodo = Leitura.objects.filter(
+        hidrometro__lote=lote,
+        data_leitura__date__gte=data_inicio,
+        data_leitura__date__lte=data_fim
+    ).select_related('hidrometro').order_by('data_leitura')
+
+    elements.append(PageBreak())
+    elements.append(Paragraph("📋 Leituras no Período", heading_style))
+
+    leituras_data = []
+    for leitura in leituras_periodo:
+        consumo_litros = leitura.consumo_desde_ultima_leitura_litros()
+        responsavel = leitura.responsavel or 'N/A'
+        observacoes = leitura.observacoes or '—'
+        if len(observacoes) > 60:
+            observacoes = f"{observacoes[:57]}..."
+        leituras_data.append([
+            leitura.data_leitura.strftime('%d/%m/%Y %H:%M'),
+            leitura.hidrometro.numero,
+            f"{leitura.leitura}",
+            f"{consumo_litros:,.0f}",
+            responsavel,
+            observacoes,
+        ])
+
+    # Uma Table por página (TabelaPaginada): o custo não cresce com o quadrado das leituras
+    leituras_table = TabelaPaginada(
+        ['Data/Hora', 'Hidrômetro', 'Leitura (m³)', 'Consumo (L)', 'Responsável', 'Observações'],
+        leituras_data,
+        [1.4*inch, 1.1*inch, 1.1*inch, 1.1*inch, 1.2*inch, 2.1*inch],
+        estilo_tabela('#2c3e50', fonte_cabecalho=10, padding_cabecalho=8, fonte=8, grade=0.5),
+    )
+
+    elements.append(leituras_table)
+    elements.append(Spacer(1, 0.3*inch))
+
+    leituras_com_foto = [leitura for leitura in leituras_periodo if leitura.foto]
+    if leituras_com_foto:
+        elements.append(PageBreak())
+        elements.append(Paragraph("📷 Fotos das Leituras", heading_style))
+        for leitura in leituras_com_foto:
+            foto_path = getattr(leitura.foto, 'path', '')
+            if not foto_path or not os.path.exists(foto_path):
+                continue
+            legenda = (
+                f"Hidrômetro {leitura.hidrometro.numero} - "
+                f"{leitura.data_leitura.strftime('%d/%m/%Y %H:%M')}"
+            )
+            elements.append(Paragraph(legenda, styles['Normal']))
+            elements.append(Spacer(1, 0.1*inch))
+            elements.append(Image(foto_path, width=6.5*inch, height=3.8*inch))
+            elements.append(Spacer(1, 0.2*inch))
+    
+    
+    # Construir PDF
+    doc.build(elements)
+    
+    # Preparar resposta
+    buffer.seek(0)
+    nome = f'relatorio_lote_{lote.numero}_{data_inicio.strftime("%Y%m%d")}_{data_fim.strftime("%Y%m%d")}.pdf'
+    return Relatorio(buffer.getvalue(), nome, CONTENT_TYPES['pdf'])
+
+
+def graficos_lote_excel(lote, parametros):
+    """Relatório em Excel (com gráficos) do consumo de um lote"""
+    agora = timezone.localtime(timezone.now())
+    data_inicio, data_fim, periodo_label, _periodo = periodo_graficos_lote(parametros, agora.date())
+    
+    hidrometros = lote.hidrometros.filter(ativo=True)
+    
+    if not hidrometros.exists():
+        raise SemHidrometrosAtivos(lote)
+    
+    # Calcular consumo no periodo
+    nomes_meses = [
+        'Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
+        'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro'
+    ]
+    resultado = calcular_consumo_consolidado(hidrometros, data_inicio, data_fim)
+    consumo_total_periodo = resultado.total
+    consumo_por_dia = dict(resultado.por_dia)
+    consumo_por_mes = dict(resultado.por_mes)
+
+    datas_periodo = []
+    dia_cursor = data_inicio
+    while dia_cursor <= data_fim:
+        datas_periodo.append(dia_cursor)
+        consumo_por_dia.setdefault(dia_cursor, 0.0)
+        dia_cursor += timedelta(days=1)
+
+    meses_periodo = []
+    mes_cursor = data_inicio.replace(day=1)
+    while mes_cursor <= data_fim:
+        meses_periodo.append((mes_cursor.year, mes_cursor.month))
+        if mes_cursor.month == 12:
+            mes_cursor = mes_cursor.replace(year=mes_cursor.year + 1, month=1)
+        else:
+            mes_cursor = mes_cursor.replace(month=mes_cursor.month + 1)
+    
+    
+    # Gráficos do relatório (em paralelo, ou do cache de PNGs)
+    pngs = _renderizar_graficos({
+        'mensal': _grafico_mensal(lote, meses_periodo, consumo_por_mes, nomes_meses, ESTILO_EXCEL),
+        'diario': _grafico_diario(
+            datas_periodo, consumo_por_dia, f'Consumo Diário - Lote {lote.numero} ({periodo_label})', 'Dia',
+            ESTILO_EXCEL,
+        ),
+    })
+
+    # Criar Excel em modo write_only: cada linha vai direto para o arquivo da
+    # aba, sem manter as células em memória. Larguras das colunas e alturas das
+    # linhas precisam ser definidas antes de escrever as linhas.
+    wb = Workbook(write_only=True)
+    negrito = Font(bold=True)
+
+    # Aba: Resumo
+    ws_resumo = wb.create_sheet("Resumo")
+    ws_resumo.column_dimensions['A'].width = 30
+    ws_resumo.column_dimensions['B'].width = 20
+
+    # Título
+    ws_resumo.append([_celula(
+        ws_resumo, f'Relatório de Consumo - Lote {lote.numero} ({periodo_label})',
+        font=Font(size=16, bold=True, color='FFFFFF'),
+        fill=PatternFill(start_color='3498db', end_color='3498db', fill_type='solid'),
+        alignment=Alignment(horizontal='center'),
+    )])
+    ws_resumo.append([_celula(
+        ws_resumo,
+        f'Tipo: {lote.get_tipo_display()} | Período: {data_inicio.strftime("%d/%m/%Y")} '
+        f'a {data_fim.strftime("%d/%m/%Y")} | Gerado em: {agora.strftime("%d/%m/%Y %H:%M")}',
+        alignment=Alignment(horizontal='center'),
+    )])
+    ws_resumo.merged_cells.add('A1:C1')
+    ws_resumo.merged_cells.add('A2:C2')
+    ws_resumo.append([])
+
+    # Dados resumo
+    ws_resumo.append(_cabecalho(ws_resumo, ['Indicador', 'Valor'], negrito))
+    resumo_dados = [
+        ['Lote', lote.numero],
+        ['Tipo', lote.get_tipo_display()],
+        ['Período', periodo_label],
+        ['Consumo Total no Período', f'{consumo_total_periodo:,.0f} L'],
+        ['Hidrometros Ativos', hidrometros.count()],
+    ]
+    for linha in resumo_dados:
+        ws_resumo.append(linha)
+
+    # Aba: Consumo Mensal
+    ws_mensal = wb.create_sheet("Consumo Mensal")
+    ws_mensal.column_dimensions['A'].width = 15
+    ws_mensal.column_dimensions['B'].width = 15
+
+    ws_mensal.append(_cabecalho(ws_mensal, ['Mês', 'Consumo (L)'], negrito))
+    for (ano, mes) in meses_periodo:
+        ws_mensal.append([f'{nomes_meses[mes - 1]}/{str(ano)[-2:]}', round(consumo_por_mes.get((ano, mes), 0.0), 2)])
+
+    # Adicionar imagem ao Excel
+    img_mensal = XLImage(io.BytesIO(pngs['mensal']))
+    img_mensal.width = 600
+    img_mensal.height = 300
+    ws_mensal.add_image(img_mensal, "D2")
+
+    # Aba: Consumo Diário
+    ws_diario_lote = wb.create_sheet("Consumo Diário")
+    ws_diario_lote.column_dimensions['A'].width = 15
+    ws_diario_lote.column_dimensions['B'].width = 15
+
+    ws_diario_lote.append(_cabecalho(ws_diario_lote, ['Dia', 'Consumo (L)'], negrito))
+    for dia in datas_periodo:
+        ws_diario_lote.append([dia.strftime('%d/%m/%Y'), round(consumo_por_dia.get(dia, 0.0), 2)])
+
+    # Adicionar imagem ao Excel
+    img_diario_lote = XLImage(io.BytesIO(pngs['diario']))
+    img_diario_lote.width = 600
+    img_diario_lote.height = 300
+    ws_diario_lote.add_image(img_diario_lote, "D2")
+
+    leituras_periodo = Leitura.objects.filter(
+        hidrometro__lote=lote,
+        data_leitura__date__gte=data_inicio,
+        data_leitura__date__lte=data_fim
+    ).select_related('hidrometro').order_by('data_leitura')
+
+    ws_leituras = wb.create_sheet("Leituras")
+    for coluna, largura in zip('ABCDEFG', [18, 15, 14, 14, 18, 40, 22]):
+        ws_leituras.column_dimensions[coluna].width = largura
+
+    ws_leituras.append(_cabecalho(
+        ws_leituras, ['Data/Hora', 'Hidrômetro', 'Leitura (m³)', 'Consumo (L)', 'Responsável', 'Observações', 'Foto'],
+        negrito,
+    ))
+
+    # Leituras em blocos do banco, escritas uma linha por vez
+    for idx, leitura in enumerate(leituras_periodo.iterator(chunk_size=TAMANHO_BLOCO_LEITURAS), start=2):
+        if leitura.foto:
+            foto_path = getattr(leitura.foto, 'path', '')
+            if foto_path and os.path.exists(foto_path):
+                img = XLImage(foto_path)
+                img.width = 120
+                img.height = 90
+                ws_leituras.add_image(img, f'G{idx}')
+                ws_leituras.row_dimensions[idx].height = 70
+
+        ws_leituras.append([
+            leitura.data_leitura.strftime('%d/%m/%Y %H:%M'),
+            leitura.hidrometro.numero,
+            float(leitura.leitura),
+            round(leitura.consumo_desde_ultima_leitura_litros(), 2),
+            leitura.responsavel or 'N/A',
+            leitura.observacoes or '—',
+        ])
+
+    # Salvar em arquivo temporário (em memória até TAMANHO_MAXIMO_EM_MEMORIA, depois em disco)
+    arquivo = tempfile.SpooledTemporaryFile(max_size=TAMANHO_MAXIMO_EM_MEMORIA)
+    wb.save(arquivo)
+    arquivo.seek(0)
+
+    nome = f'relatorio_lote_{lote.numero}_{data_inicio.strftime("%Y%m%d")}_{data_fim.strftime("%Y%m%d")}.xlsx'
+    return Relatorio(arquivo, nome, CONTENT_TYPES['excel'])
+
+
+def gerar(relatorio, formato, parametros, lote=None):
+    """Gera o relatório ('condominio' ou 'lote') no formato ('pdf' ou 'excel')"""
+    if relatorio == 'condominio':
+        return GERADORES[relatorio, formato](parametros)
+    return GERADORES[relatorio, formato](lote, parametros)
+
+
+GERADORES = {
+    ('condominio', 'pdf'): graficos_consumo_pdf,
+    ('condominio', 'excel'): graficos_consumo_excel,
+    ('lote', 'pdf'): graficos_lote_pdf,
+    ('lote', 'excel'): graficos_lote_excel,
+}
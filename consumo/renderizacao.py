@@ -0,0 +1,152 @@
+"""
+Renderização em PNG dos gráficos dos relatórios em PDF e Excel.
+
+Cada gráfico é descrito por um Grafico (tipo, dados e estilo) e desenhado com a
+API orientada a objetos do matplotlib (Figure + FigureCanvasAgg), sem pyplot:
+nenhuma figura "atual" nem backend global, então threads diferentes podem
+renderizar ao mesmo tempo, cada uma na sua Figure.
+
+Os PNGs ficam em um cache LRU em memória (por processo), com a chave no
+SHA-256 do Grafico: o mesmo relatório baixado de novo, com os mesmos dados,
+não redesenha os gráficos. renderizar_varios() desenha em paralelo, em threads,
+os gráficos de um relatório que não estão no cache.
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# Antes de importar o matplotlib: diretório de cache gravável no servidor
+os.environ.setdefault('MPLCONFIGDIR', '/tmp/matplotlib')
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+TIPOS = ('linha', 'barras', 'barras_horizontais')
+CACHE_MAXIMO_BYTES = 32 * 1024 * 1024
+MAX_THREADS = 4
+
+Grafico = namedtuple(
+    'Grafico',
+    ['tipo', 'rotulos', 'valores', 'titulo', 'rotulo_x', 'rotulo_y', 'cor',
+     'alpha', 'tamanho', 'dpi', 'rotacao', 'fonte_rotulos'],
+    defaults=[1.0, (10, 5), 150, 45, None],
+)
+Grafico.__doc__ = """Tipo, dados e estilo de um gráfico (tudo o que muda o PNG)"""
+
+
+class CachePng:
+    """LRU de PNGs limitado pelo total de bytes, seguro entre threads"""
+
+    def __init__(self, maximo_bytes=CACHE_MAXIMO_BYTES):
+        self.maximo_bytes = maximo_bytes
+        self.bytes = 0
+        self._entradas = OrderedDict()
+        self._trava = threading.Lock()
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def obter(self, chave):
+        with self._trava:
+            png = self._entradas.get(chave)
+            if png is not None:
+                self._entradas.move_to_end(chave)
+            return png
+
+    def guardar(self, chave, png):
+        if len(png) > self.maximo_bytes:
+            return
+        with self._trava:
+            anterior = self._entradas.pop(chave, None)
+            if anterior is not None:
+                self.bytes -= len(anterior)
+            self._entradas[chave] = png
+            self.bytes += len(png)
+            while self.bytes > self.maximo_bytes:
+                _, removido = self._entradas.popitem(last=False)
+                self.bytes -= len(removido)
+
+    def limpar(self):
+        with self._trava:
+            self._entradas.clear()
+            self.bytes = 0
+
+
+cache = CachePng()
+
+
+def chave(grafico):
+    """SHA-256 dos dados e do estilo do gráfico"""
+    conteudo = json.dumps(list(grafico), default=str, separators=(',', ':'))
+    return hashlib.sha256(conteudo.encode()).hexdigest()
+
+
+def desenhar(grafico):
+    """PNG do gráfico, desenhado em uma Figure própria (sem cache)"""
+    if grafico.tipo not in TIPOS:
+        raise ValueError(f'Tipo de gráfico inválido: {grafico.tipo}')
+
+    figura = Figure(figsize=grafico.tamanho)
+    FigureCanvasAgg(figura)
+    eixos = figura.add_subplot()
+    rotulos, valores = list(grafico.rotulos), list(grafico.valores)
+
+    if grafico.tipo == 'linha':
+        eixos.plot(rotulos, valores, marker='o', color=grafico.cor, linewidth=2, markersize=4, alpha=grafico.alpha)
+    elif grafico.tipo == 'barras':
+        eixos.bar(range(len(rotulos)), valores, color=grafico.cor, alpha=grafico.alpha)
+        eixos.set_xticks(range(len(rotulos)), rotulos)
+    else:
+        # Primeiro item no topo
+        eixos.barh(rotulos[::-1], valores[::-1], color=grafico.cor, alpha=grafico.alpha)
+
+    eixos.set_title(grafico.titulo, fontsize=14, fontweight='bold')
+    eixos.set_xlabel(grafico.rotulo_x, fontsize=11)
+    eixos.set_ylabel(grafico.rotulo_y, fontsize=11)
+    if grafico.tipo == 'barras_horizontais':
+        eixos.grid(axis='x', alpha=0.3)
+    else:
+        eixos.tick_params(axis='x', labelrotation=grafico.rotacao)
+        if grafico.fonte_rotulos:
+            eixos.tick_params(axis='x', labelsize=grafico.fonte_rotulos)
+        for rotulo in eixos.get_xticklabels():
+            rotulo.set_horizontalalignment('right')
+        eixos.grid(axis='y', alpha=0.3)
+    figura.tight_layout()
+
+    buffer = io.BytesIO()
+    figura.savefig(buffer, format='png', dpi=grafico.dpi, bbox_inches='tight')
+    return buffer.getvalue()
+
+
+def renderizar(grafico):
+    """PNG do gráfico, do cache quando já desenhado com os mesmos dados e estilo"""
+    return renderizar_varios([grafico])[0]
+
+
+def renderizar_varios(graficos, max_threads=MAX_THREADS):
+    """PNGs dos gráficos, na mesma ordem; os que faltam no cache são desenhados em paralelo"""
+    chaves = [chave(grafico) for grafico in graficos]
+    pngs = {}
+    pendentes = {}
+    for chave_grafico, grafico in zip(chaves, graficos):
+        png = cache.obter(chave_grafico)
+        if png is not None:
+            pngs[chave_grafico] = png
+        else:
+            pendentes.setdefault(chave_grafico, grafico)
+
+    if len(pendentes) > 1 and max_threads > 1:
+        with ThreadPoolExecutor(max_workers=min(max_threads, len(pendentes))) as pool:
+            desenhados = list(pool.map(desenhar, pendentes.values()))
+    else:
+        desenhados = [desenhar(grafico) for grafico in pendentes.values()]
+
+    for chave_grafico, png in zip(pendentes, desenhados):
+        cache.guardar(chave_grafico, png)
+        pngs[chave_grafico] = png
+    return [pngs[chave_grafico] for chave_grafico in chaves]
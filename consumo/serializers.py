@@ -1,16 +1,34 @@
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Lote, Hidrometro, Leitura
+from rest_framework.reverse import reverse
+from .models import Lote, Hidrometro, Leitura, HidrometroEstado, Exportacao
 
 
 class LoteSerializer(serializers.ModelSerializer):
-    total_hidrometros = serializers.SerializerMethodField()
+    total_hidrometros = serializers.IntegerField(read_only=True)
+    ultima_data_leitura = serializers.DateTimeField(read_only=True)
+    consumo_mes_litros = serializers.FloatField(read_only=True)
     
     class Meta:
         model = Lote
         fields = '__all__'
     
-    def get_total_hidrometros(self, obj):
-        return obj.hidrometros.filter(ativo=True).count()
+    def to_representation(self, instance):
+        # LoteViewSet anota o resumo no queryset; instâncias sem anotação
+        # (criação/edição) calculam com uma consulta agregada
+        if not hasattr(instance, 'total_hidrometros'):
+            mes = timezone.localdate().replace(day=1)
+            resumo = instance.hidrometros.aggregate(
+                total_hidrometros=Count('id', filter=Q(ativo=True)),
+                ultima_data_leitura=Max('estado__ultima_data_leitura'),
+                consumo_mes_litros=Sum('estado__litros_mes', filter=Q(estado__mes=mes)),
+            )
+            for nome, valor in resumo.items():
+                setattr(instance, nome, valor)
+        if instance.consumo_mes_litros is None:
+            instance.consumo_mes_litros = 0
+        return super().to_representation(instance)
 
 
 class HidrometroSerializer(serializers.ModelSerializer):
@@ -22,11 +40,20 @@ class HidrometroSerializer(serializers.ModelSerializer):
         model = Hidrometro
         fields = '__all__'
     
+    def _consumo_do_dia(self, obj):
+        # Querysets das views trazem a primeira/última leitura do dia anotadas;
+        # instâncias sem anotação (criação/edição) usam o método do modelo
+        if not hasattr(obj, 'primeira_leitura_hoje'):
+            return obj.consumo_diario_atual()
+        if obj.primeira_leitura_hoje is None:
+            return 0
+        return obj.ultima_leitura_hoje - obj.primeira_leitura_hoje
+    
     def get_consumo_diario(self, obj):
-        return float(obj.consumo_diario_atual())
+        return float(self._consumo_do_dia(obj))
     
     def get_consumo_diario_litros(self, obj):
-        return float(obj.consumo_diario_atual_litros())
+        return float(self._consumo_do_dia(obj)) * 1000
 
 
 class LeituraSerializer(serializers.ModelSerializer):
@@ -39,11 +66,23 @@ class LeituraSerializer(serializers.ModelSerializer):
         model = Leitura
         fields = '__all__'
     
+    def _consumo_desde_ultima(self, obj):
+        # Coluna persistida; sem ela, a leitura anterior anotada pela view (janela)
+        # e, por último, a consulta do modelo
+        if obj.consumo_m3 is not None:
+            return obj.consumo_m3
+        leitura_anterior = getattr(obj, 'leitura_anterior', None)
+        if leitura_anterior is not None:
+            return obj.leitura - leitura_anterior
+        return obj.consumo_desde_ultima_leitura()
+    
     def get_consumo_desde_ultima(self, obj):
-        return float(obj.consumo_desde_ultima_leitura())
+        return float(self._consumo_desde_ultima(obj))
     
     def get_consumo_desde_ultima_litros(self, obj):
-        return float(obj.consumo_desde_ultima_leitura_litros())
+        if obj.consumo_litros is not None:
+            return float(obj.consumo_litros)
+        return float(self._consumo_desde_ultima(obj)) * 1000
 
 
 class LeituraCreateSerializer(serializers.ModelSerializer):
@@ -58,13 +97,101 @@ class LeituraCreateSerializer(serializers.ModelSerializer):
         hidrometro = data.get('hidrometro')
         leitura_atual = data.get('leitura')
         
-        ultima_leitura = Leitura.objects.filter(
+        # Última leitura lida do estado do hidrômetro (busca pela chave primária)
+        ultima_leitura = HidrometroEstado.objects.filter(
             hidrometro=hidrometro
-        ).order_by('-data_leitura').first()
+        ).values_list('ultima_leitura', flat=True).first()
+        if ultima_leitura is None:
+            ultima_leitura = Leitura.objects.filter(
+                hidrometro=hidrometro
+            ).order_by('-data_leitura').values_list('leitura', flat=True).first()
         
-        if ultima_leitura and leitura_atual < ultima_leitura.leitura:
+        if ultima_leitura is not None and leitura_atual < ultima_leitura:
             raise serializers.ValidationError(
-                f"A leitura não pode ser menor que a última leitura registrada ({ultima_leitura.leitura}m³)"
+                f"A leitura não pode ser menor que a última leitura registrada ({ultima_leitura}m³)"
             )
         
         return data
+
+
+class HidrometroCarregadoField(serializers.PrimaryKeyRelatedField):
+    """Resolve o hidrômetro pelo dicionário carregado uma única vez (context['hidrometros'])"""
+    
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return self.context['hidrometros'][int(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+class LeituraLoteSerializer(LeituraCreateSerializer):
+    """Validação por campo de uma leitura de lote, sem consultas.
+    
+    Unicidade e ordem das leituras são verificadas em conjunto por
+    importacao.gravar_leituras_em_lote.
+    """
+    hidrometro = HidrometroCarregadoField(queryset=Hidrometro.objects.all())
+    
+    class Meta(LeituraCreateSerializer.Meta):
+        validators = []
+    
+    def validate(self, data):
+        return data
+
+
+class ExportacaoSerializer(serializers.ModelSerializer):
+    url = serializers.HyperlinkedIdentityField(view_name='consumo:exportacao-detail')
+    url_download = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Exportacao
+        exclude = ['chave', 'arquivo']
+    
+    def get_url_download(self, obj):
+        if obj.status != 'concluida':
+            return None
+        return reverse('consumo:exportacao-download', args=[obj.pk], request=self.context.get('request'))
+
+
+class ExportacaoCreateSerializer(serializers.Serializer):
+    """Pedido de exportação: relatório, formato, lote (relatório de lote) e filtro de período"""
+    PERIODOS = ['7dias', '15dias', '30dias', 'mes_atual', 'ano_atual', 'personalizado']
+    
+    relatorio = serializers.ChoiceField(choices=Exportacao.RELATORIOS_FILA)
+    formato = serializers.ChoiceField(choices=Exportacao.FORMATOS_FILA)
+    lote = serializers.PrimaryKeyRelatedField(queryset=Lote.objects.all(), required=False, allow_null=True)
+    periodo = serializers.ChoiceField(choices=PERIODOS, default='30dias')
+    data_inicio = serializers.DateField(required=False)
+    data_fim = serializers.DateField(required=False)
+    
+    def validate(self, data):
+        if data['relatorio'] == 'lote':
+            lote = data.get('lote')
+            if lote is None:
+                raise serializers.ValidationError({'lote': 'Obrigatório no relatório de lote.'})
+            if not lote.hidrometros.filter(ativo=True).exists():
+                raise serializers.ValidationError({'lote': 'Nenhum hidrômetro ativo encontrado para este lote.'})
+        else:
+            data['lote'] = None
+        
+        if data['periodo'] == 'personalizado':
+            if not (data.get('data_inicio') and data.get('data_fim')):
+                raise serializers.ValidationError(
+                    {'periodo': 'data_inicio e data_fim são obrigatórios no período personalizado.'}
+                )
+            if data['data_inicio'] > data['data_fim']:
+                raise serializers.ValidationError({'data_fim': 'data_fim deve ser posterior a data_inicio.'})
+        return data
+    
+    def parametros(self):
+        """Filtro de período no formato dos parâmetros GET das páginas"""
+        dados = self.validated_data
+        parametros = {'periodo': dados['periodo']}
+        for campo in ['data_inicio', 'data_fim']:
+            if dados.get(campo):
+                parametros[campo] = dados[campo].isoformat()
+        return parametros
@@ -0,0 +1,127 @@
+"""
+Série compacta de leituras de um hidrômetro.
+
+SerieLeituras guarda instantes (epoch), dias locais (ordinal) e leituras (em
+litros inteiros) em buffers array, montados uma única vez por hidrômetro e
+janela a partir de uma consulta values_list, em vez de manter instâncias de
+Leitura. As operações (deltas, consumo, agrupamento por dia e recorte por
+intervalo) trabalham sobre esses buffers, sem novas consultas.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.utils import timezone
+
+from .agregacao import filtrar_periodo
+from .models import Leitura
+
+
+def _em_litros(leitura):
+    # Leituras têm 3 casas decimais: em litros o valor é inteiro e os deltas são exatos
+    return int(Decimal(leitura) * 1000)
+
+
+class SerieLeituras:
+    """Leituras de um hidrômetro em ordem cronológica, em buffers compactos"""
+
+    __slots__ = ('hidrometro_id', 'instantes', 'dias', 'litros')
+
+    def __init__(self, hidrometro_id=None):
+        self.hidrometro_id = hidrometro_id
+        self.instantes = array('d')
+        self.dias = array('l')
+        self.litros = array('q')
+
+    @classmethod
+    def de_leituras(cls, leituras, hidrometro_id=None):
+        """Monta a série a partir de um queryset de Leitura de um único hidrômetro"""
+        serie = cls(hidrometro_id)
+        for data_leitura, leitura in leituras.order_by('data_leitura').values_list('data_leitura', 'leitura'):
+            serie.adicionar(data_leitura, leitura)
+        return serie
+
+    @staticmethod
+    def _consulta(hidrometros, data_inicio, data_fim):
+        return filtrar_periodo(
+            Leitura.objects.filter(hidrometro__in=hidrometros),
+            data_inicio,
+            data_fim,
+        ).order_by('hidrometro_id', 'data_leitura').values_list('hidrometro_id', 'data_leitura', 'leitura')
+
+    @classmethod
+    def _acrescentar(cls, series, hidrometro_id, data_leitura, leitura):
+        serie = series.get(hidrometro_id)
+        if serie is None:
+            serie = series[hidrometro_id] = cls(hidrometro_id)
+        serie.adicionar(data_leitura, leitura)
+
+    @classmethod
+    def carregar(cls, hidrometros, data_inicio, data_fim):
+        """Séries de vários hidrômetros no período com uma única consulta: {hidrometro_id: serie}"""
+        series = {}
+        for linha in cls._consulta(hidrometros, data_inicio, data_fim).iterator(chunk_size=2000):
+            cls._acrescentar(series, *linha)
+        return series
+
+    @classmethod
+    async def acarregar(cls, hidrometros, data_inicio, data_fim):
+        """Versão assíncrona de carregar() (ORM assíncrono do Django)"""
+        series = {}
+        async for linha in cls._consulta(hidrometros, data_inicio, data_fim):
+            cls._acrescentar(series, *linha)
+        return series
+
+    def adicionar(self, data_leitura, leitura):
+        """Acrescenta uma leitura posterior às já existentes"""
+        self.instantes.append(data_leitura.timestamp())
+        self.dias.append(timezone.localtime(data_leitura).toordinal())
+        self.litros.append(_em_litros(leitura))
+
+    def __len__(self):
+        return len(self.litros)
+
+    @property
+    def primeira(self):
+        """Primeira leitura (m³) ou None se a série está vazia"""
+        return Decimal(self.litros[0]).scaleb(-3) if self.litros else None
+
+    @property
+    def ultima(self):
+        """Última leitura (m³) ou None se a série está vazia"""
+        return Decimal(self.litros[-1]).scaleb(-3) if self.litros else None
+
+    def deltas(self):
+        """Diferenças (L) entre leituras consecutivas, com sinal; len(serie) - 1 valores"""
+        litros = self.litros
+        return array('q', (litros[i] - litros[i - 1] for i in range(1, len(litros))))
+
+    def consumo_litros(self):
+        """Soma dos deltas positivos (deltas negativos, troca ou correção de hidrômetro, são ignorados)"""
+        return float(sum(delta for delta in self.deltas() if delta > 0))
+
+    def consumo_liquido_litros(self):
+        """Diferença entre a última e a primeira leitura (exige duas leituras)"""
+        if len(self) < 2:
+            return 0.0
+        return float(self.litros[-1] - self.litros[0])
+
+    def por_dia(self):
+        """Consumo (L) por dia local: cada delta positivo conta no dia da leitura mais recente"""
+        consumo = defaultdict(float)
+        for i, delta in enumerate(self.deltas(), start=1):
+            if delta > 0:
+                consumo[date.fromordinal(self.dias[i])] += delta
+        return consumo
+
+    def fatia(self, inicio, fim):
+        """Nova série com as leituras em [inicio, fim] (datetimes), por busca binária"""
+        i = bisect_left(self.instantes, inicio.timestamp())
+        j = bisect_right(self.instantes, fim.timestamp())
+        serie = SerieLeituras(self.hidrometro_id)
+        serie.instantes = self.instantes[i:j]
+        serie.dias = self.dias[i:j]
+        serie.litros = self.litros[i:j]
+        return serie
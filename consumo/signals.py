@@ -0,0 +1,71 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .consolidacao import antecipar_ultima_leitura, calcular_delta, incrementar_versao_lotes, marcar_alteracao
+from .models import Hidrometro, Leitura
+
+
+@receiver(pre_save, sender=Leitura)
+def guardar_leitura_anterior(sender, instance, raw=False, **kwargs):
+    """Guarda hidrômetro e data originais para recalcular também o dia antigo em edições"""
+    instance._consolidacao_anterior = None
+    if instance.pk and not raw:
+        instance._consolidacao_anterior = (
+            Leitura.objects.filter(pk=instance.pk)
+            .values_list('hidrometro_id', 'data_leitura')
+            .first()
+        )
+
+
+@receiver(pre_save, sender=Leitura)
+def preencher_consumo_da_leitura(sender, instance, raw=False, **kwargs):
+    """Grava na própria leitura o delta em relação à leitura anterior (a seguinte é ajustada na consolidação)"""
+    if raw:
+        return
+    instance.consumo_m3 = calcular_delta(instance)
+    instance.consumo_litros = instance.consumo_m3 * 1000
+
+
+@receiver(post_save, sender=Leitura)
+def consolidar_leitura_salva(sender, instance, raw=False, **kwargs):
+    """Atualiza a consolidação diária após criar ou editar uma leitura"""
+    if raw:
+        return
+    antecipar_ultima_leitura(instance)
+    marcar_alteracao(instance.hidrometro_id, instance.data_leitura)
+    anterior = getattr(instance, '_consolidacao_anterior', None)
+    if anterior and anterior != (instance.hidrometro_id, instance.data_leitura):
+        marcar_alteracao(*anterior)
+
+
+@receiver(post_delete, sender=Leitura)
+def consolidar_leitura_excluida(sender, instance, origin=None, **kwargs):
+    """Atualiza a consolidação diária após excluir uma leitura"""
+    # Exclusões em cascata (hidrômetro ou lote) já removem a consolidação
+    if isinstance(origin, QuerySet):
+        origin = origin.model
+    elif origin is not None:
+        origin = type(origin)
+    if origin is not None and origin is not Leitura:
+        return
+    marcar_alteracao(instance.hidrometro_id, instance.data_leitura)
+
+
+@receiver(pre_save, sender=Hidrometro)
+def guardar_lote_anterior(sender, instance, raw=False, **kwargs):
+    """Guarda o lote original para invalidar também os dados dele quando o hidrômetro muda de lote"""
+    instance._lote_anterior = None
+    if instance.pk and not raw:
+        instance._lote_anterior = (
+            Hidrometro.objects.filter(pk=instance.pk).values_list('lote_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Hidrometro)
+@receiver(post_delete, sender=Hidrometro)
+def invalidar_dados_do_lote(sender, instance, raw=False, **kwargs):
+    """Hidrômetro criado, editado (ex.: desativado) ou excluído muda os dados do lote"""
+    if raw:
+        return
+    incrementar_versao_lotes({instance.lote_id, getattr(instance, '_lote_anterior', None)} - {None})
@@ -0,0 +1,88 @@
+"""
+Tabelas longas dos relatórios em PDF (leituras do lote, consumo por hidrômetro).
+
+Uma Table única do reportlab com milhares de linhas é quebrada página a página:
+cada quebra cria uma Table com todas as linhas restantes e mede tudo de novo, e
+o tempo cresce com o quadrado do número de linhas. TabelaPaginada guarda as
+linhas e, a cada página, monta uma Table só com as que cabem no espaço
+disponível (calculado pela altura fixa das linhas, sem medir o conteúdo), com
+o cabeçalho repetido, as larguras das colunas já definidas e o mesmo TableStyle
+(estilo_tabela) em todas as páginas.
+
+As linhas precisam ter uma linha de texto cada (textos longos já truncados),
+como nas tabelas dos relatórios.
+"""
+from functools import lru_cache
+
+from reportlab.lib import colors
+from reportlab.platypus import Flowable, Table, TableStyle
+
+# Uma linha de texto com FONTSIZE até 9 e o padding padrão das células
+ALTURA_LINHA = 18
+
+
+@lru_cache(maxsize=None)
+def estilo_tabela(cor_cabecalho, fonte_cabecalho=11, padding_cabecalho=12, fonte=9, grade=1):
+    """TableStyle das tabelas dos relatórios: um objeto por combinação, compartilhado entre as tabelas"""
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(cor_cabecalho)),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), fonte_cabecalho),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), padding_cabecalho),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), grade, colors.black),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), fonte),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
+    ])
+
+
+class TabelaPaginada(Flowable):
+    """Tabela dividida em uma Table por página, com o cabeçalho em todas"""
+
+    def __init__(self, cabecalho, linhas, larguras, estilo, altura_linha=ALTURA_LINHA, inicio=0, altura_cabecalho=None):
+        super().__init__()
+        self.cabecalho = cabecalho
+        self.linhas = linhas
+        self.larguras = larguras
+        self.estilo = estilo
+        self.altura_linha = altura_linha
+        # As partes das páginas seguintes compartilham a lista de linhas a partir de `inicio`
+        self.inicio = inicio
+        if altura_cabecalho is None:
+            cabecalho_sozinho = Table([cabecalho], colWidths=larguras, style=estilo)
+            altura_cabecalho = cabecalho_sozinho.wrap(sum(larguras), 0)[1]
+        self.altura_cabecalho = altura_cabecalho
+
+    def _tabela(self, fim):
+        quantidade = fim - self.inicio
+        return Table(
+            [self.cabecalho, *self.linhas[self.inicio:fim]],
+            colWidths=self.larguras,
+            rowHeights=[self.altura_cabecalho] + [self.altura_linha] * quantidade,
+            style=self.estilo,
+        )
+
+    def wrap(self, availWidth, availHeight):
+        self.width = sum(self.larguras)
+        self.height = self.altura_cabecalho + (len(self.linhas) - self.inicio) * self.altura_linha
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        cabem = int((availHeight - self.altura_cabecalho) // self.altura_linha)
+        if cabem < 1:
+            # Nem o cabeçalho e uma linha: a tabela começa na próxima página
+            return []
+        fim = self.inicio + cabem
+        restante = TabelaPaginada(
+            self.cabecalho, self.linhas, self.larguras, self.estilo,
+            altura_linha=self.altura_linha, inicio=fim, altura_cabecalho=self.altura_cabecalho,
+        )
+        return [self._tabela(fim), restante]
+
+    def draw(self):
+        tabela = self._tabela(len(self.linhas))
+        tabela.wrapOn(self.canv, self.width, self.height)
+        tabela.drawOn(self.canv, 0, 0)
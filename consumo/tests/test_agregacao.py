@@ -0,0 +1,196 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from consumo.agregacao import calcular_consumo
+from consumo.models import Lote, Hidrometro, Leitura
+
+
+class CalcularConsumoTests(TestCase):
+    def setUp(self):
+        self.agora = timezone.localtime(timezone.now()).replace(hour=12, minute=0, second=0, microsecond=0)
+        self.inicio = self.agora - timedelta(days=5)
+        data_instalacao = self.agora.date()
+        self.lote1 = Lote.objects.create(numero='801', tipo='residencial')
+        self.lote2 = Lote.objects.create(numero='802', tipo='residencial')
+        self.h1 = Hidrometro.objects.create(numero='H801', lote=self.lote1, data_instalacao=data_instalacao)
+        self.h2 = Hidrometro.objects.create(numero='H802', lote=self.lote2, data_instalacao=data_instalacao)
+
+        # h1: +2 m³, -1 m³ (ignorado), +0.5 m³
+        self._add(self.h1, '100.000', dias_atras=4)
+        self._add(self.h1, '102.000', dias_atras=3)
+        self._add(self.h1, '101.000', dias_atras=2)
+        self._add(self.h1, '101.500', dias_atras=1)
+        # h2: +1 m³
+        self._add(self.h2, '10.000', dias_atras=4)
+        self._add(self.h2, '11.000', dias_atras=1)
+
+    def _add(self, hidrometro, valor, dias_atras):
+        return Leitura.objects.create(
+            hidrometro=hidrometro,
+            leitura=Decimal(valor),
+            data_leitura=self.agora - timedelta(days=dias_atras),
+            periodo='manha',
+        )
+
+    def test_uma_unica_consulta(self):
+        hidrometros = Hidrometro.objects.filter(ativo=True)
+        with self.assertNumQueries(1):
+            calcular_consumo(hidrometros, self.inicio, self.agora)
+
+    def test_acumuladores(self):
+        resultado = calcular_consumo(Hidrometro.objects.all(), self.inicio, self.agora)
+
+        self.assertAlmostEqual(resultado.total, 3500.0, places=2)
+        self.assertAlmostEqual(resultado.por_hidrometro[self.h1.id], 2500.0, places=2)
+        self.assertAlmostEqual(resultado.por_hidrometro[self.h2.id], 1000.0, places=2)
+        self.assertAlmostEqual(resultado.por_lote[self.lote1.id], 2500.0, places=2)
+        self.assertAlmostEqual(sum(resultado.por_dia.values()), resultado.total, places=2)
+        self.assertAlmostEqual(sum(resultado.por_mes.values()), resultado.total, places=2)
+
+        dia_h2 = (self.agora - timedelta(days=1)).date()
+        self.assertAlmostEqual(resultado.por_dia[dia_h2], 1500.0, places=2)
+
+    def test_consumo_liquido_e_contagem(self):
+        resultado = calcular_consumo(Hidrometro.objects.all(), self.inicio, self.agora)
+
+        self.assertEqual(resultado.total_leituras[self.h1.id], 4)
+        self.assertAlmostEqual(resultado.consumo_liquido_litros(self.h1.id), 1500.0, places=2)
+        self.assertEqual(resultado.consumo_liquido_litros(-1), 0.0)
+
+    def test_janela_por_data(self):
+        resultado = calcular_consumo(
+            [self.h1],
+            (self.agora - timedelta(days=2)).date(),
+            self.agora.date(),
+        )
+        self.assertEqual(resultado.total_leituras[self.h1.id], 2)
+        self.assertAlmostEqual(resultado.total, 500.0, places=2)
+
+
+class ExportacoesConsultasTests(TestCase):
+    """As exportações não devem crescer em consultas com o número de hidrômetros"""
+
+    def setUp(self):
+        agora = timezone.now()
+        self.lote = Lote.objects.create(numero='901', tipo='residencial')
+        for i in range(5):
+            h = Hidrometro.objects.create(numero=f'H90{i}', lote=self.lote, data_instalacao=agora.date())
+            Leitura.objects.create(hidrometro=h, leitura=Decimal('1.000'), data_leitura=agora - timedelta(days=1), periodo='manha')
+            Leitura.objects.create(hidrometro=h, leitura=Decimal('2.000'), data_leitura=agora, periodo='manha')
+
+    def test_exportar_excel_condominio(self):
+        url = reverse('consumo:exportar_graficos_consumo_excel')
+        # Consolidação (hidrômetro, mês, dia), hidrômetros, ranking e contagem de lotes
+        with self.assertNumQueries(6):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_exportar_excel_lote_sem_consulta_por_leitura(self):
+        url = reverse('consumo:exportar_graficos_lote_excel', args=[self.lote.id])
+        with CaptureQueriesContext(connection) as antes:
+            self.client.get(url)
+
+        for h in Hidrometro.objects.all():
+            Leitura.objects.create(hidrometro=h, leitura=Decimal('1.500'), data_leitura=timezone.now() - timedelta(hours=12), periodo='tarde')
+        with CaptureQueriesContext(connection) as depois:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(depois), len(antes))
+
+    def test_exportar_pdf_lote(self):
+        url = reverse('consumo:exportar_graficos_lote_pdf', args=[self.lote.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+
+
+class BackendSqlTests(CalcularConsumoTests):
+    """O backend 'sql' (funções de janela) deve produzir os mesmos acumuladores do 'python'"""
+
+    def test_paridade_com_backend_python(self):
+        for inicio, fim in [(self.inicio, self.agora), ((self.agora - timedelta(days=2)).date(), self.agora.date())]:
+            python = calcular_consumo(Hidrometro.objects.all(), inicio, fim, backend='python')
+            sql = calcular_consumo(Hidrometro.objects.all(), inicio, fim, backend='sql')
+
+            self.assertAlmostEqual(sql.total, python.total, places=2)
+            self.assertEqual(dict(sql.total_leituras), dict(python.total_leituras))
+            for campo in ['por_dia', 'por_mes', 'por_hidrometro', 'por_lote']:
+                esperado = getattr(python, campo)
+                obtido = getattr(sql, campo)
+                self.assertEqual(set(obtido), set(esperado), campo)
+                for chave, valor in esperado.items():
+                    self.assertAlmostEqual(obtido[chave], valor, places=2)
+            for hidrometro_id in python.total_leituras:
+                self.assertAlmostEqual(
+                    sql.consumo_liquido_litros(hidrometro_id),
+                    python.consumo_liquido_litros(hidrometro_id),
+                    places=2,
+                )
+
+    def test_uma_unica_consulta(self):
+        with self.assertNumQueries(1):
+            calcular_consumo(Hidrometro.objects.filter(ativo=True), self.inicio, self.agora, backend='sql')
+
+    def test_backend_desconhecido(self):
+        with self.assertRaises(ValueError):
+            calcular_consumo(Hidrometro.objects.all(), self.inicio, self.agora, backend='cobol')
+
+
+class BackendNumpyTests(CalcularConsumoTests):
+    """O backend 'numpy' (arrays vetorizados) deve produzir os mesmos acumuladores do 'python'"""
+
+    def _assert_paridade(self, inicio, fim):
+        python = calcular_consumo(Hidrometro.objects.all(), inicio, fim, backend='python')
+        numpy = calcular_consumo(Hidrometro.objects.all(), inicio, fim, backend='numpy')
+
+        self.assertAlmostEqual(numpy.total, python.total, places=6)
+        self.assertEqual(dict(numpy.total_leituras), dict(python.total_leituras))
+        self.assertEqual(numpy.primeira, python.primeira)
+        self.assertEqual(numpy.ultima, python.ultima)
+        for campo in ['por_dia', 'por_mes', 'por_hidrometro', 'por_lote']:
+            esperado = getattr(python, campo)
+            obtido = getattr(numpy, campo)
+            self.assertEqual(set(obtido), set(esperado), campo)
+            for chave, valor in esperado.items():
+                self.assertAlmostEqual(obtido[chave], valor, places=6)
+
+    def test_paridade_com_backend_python(self):
+        self._assert_paridade(self.inicio, self.agora)
+        self._assert_paridade((self.agora - timedelta(days=2)).date(), self.agora.date())
+        self._assert_paridade(self.agora + timedelta(days=1), self.agora + timedelta(days=2))
+
+    def test_uma_unica_consulta(self):
+        with self.assertNumQueries(1):
+            calcular_consumo(Hidrometro.objects.filter(ativo=True), self.inicio, self.agora, backend='numpy')
+
+    def test_exportacao_identica_ao_backend_python(self):
+        url = reverse('consumo:exportar_graficos_consumo_excel')
+        planilhas = {}
+        for backend in ['python', 'numpy']:
+            with self.settings(CONSUMO_AGREGACAO=backend):
+                response = self.client.get(url, {'periodo': '7dias'})
+            self.assertEqual(response.status_code, 200)
+            planilhas[backend] = self._valores_planilha(response.content)
+
+        self.assertEqual(planilhas['numpy'], planilhas['python'])
+
+    def _valores_planilha(self, conteudo):
+        from io import BytesIO
+        from openpyxl import load_workbook
+
+        wb = load_workbook(BytesIO(conteudo))
+        # Ignora o carimbo "Gerado em", que pode virar de minuto entre as duas exportações
+        return {
+            ws.title: [
+                [c for c in linha if not (isinstance(c, str) and c.startswith('Gerado em'))]
+                for linha in ws.iter_rows(values_only=True)
+            ]
+            for ws in wb.worksheets
+        }
@@ -1,3 +1,5 @@
+from datetime import timedelta
+
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
@@ -85,6 +87,146 @@ class ApiHidrometroFiltersTests(APITestCase):
         self.assertEqual(resp2.data['results'][0]['numero'], 'HB')
 
 
+class ApiHidrometroConsumoDiarioTests(APITestCase):
+    def setUp(self):
+        agora = timezone.localtime(timezone.now())
+        self.lote = Lote.objects.create(numero='701', tipo='residencial')
+        for i in range(5):
+            h = Hidrometro.objects.create(numero=f'H70{i}', lote=self.lote, data_instalacao=agora.date())
+            Leitura.objects.create(hidrometro=h, leitura=10, periodo='manha', data_leitura=agora - timedelta(minutes=2))
+            Leitura.objects.create(hidrometro=h, leitura=10 + i, periodo='tarde', data_leitura=agora - timedelta(minutes=1))
+
+    def test_listagem_com_numero_fixo_de_consultas(self):
+        url = reverse('consumo:hidrometro-list')
+
+        # ETag do GET condicional + contagem e página
+        with self.assertNumQueries(3):
+            resp = self.client.get(url)
+
+        consumos = {h['numero']: (h['consumo_diario'], h['consumo_diario_litros']) for h in resp.data['results']}
+        self.assertEqual(consumos['H704'], (4.0, 4000.0))
+        self.assertEqual(resp.data['results'][0]['lote_numero'], '701')
+
+        Hidrometro.objects.create(numero='H799', lote=self.lote, data_instalacao=timezone.localdate())
+        with self.assertNumQueries(3):
+            resp = self.client.get(url)
+        self.assertEqual(resp.data['results'][-1]['consumo_diario'], 0.0)
+
+    def test_hidrometros_do_lote(self):
+        url = reverse('consumo:lote-hidrometros', args=[self.lote.id])
+
+        with self.assertNumQueries(2):
+            resp = self.client.get(url)
+
+        self.assertEqual(len(resp.data), 5)
+        self.assertEqual(resp.data[1]['consumo_diario_litros'], 1000.0)
+
+
+class ApiLotesTests(APITestCase):
+    def setUp(self):
+        agora = timezone.now()
+        for numero, ativos, inativos in [('901', 3, 1), ('902', 1, 0), ('903', 0, 2)]:
+            lote = Lote.objects.create(numero=numero, tipo='residencial')
+            for i in range(ativos + inativos):
+                Hidrometro.objects.create(
+                    numero=f'H{numero}{i}', lote=lote, ativo=i < ativos, data_instalacao=agora.date()
+                )
+        h = Hidrometro.objects.get(numero='H9020')
+        Leitura.objects.create(hidrometro=h, leitura=10, periodo='manha', data_leitura=agora - timedelta(minutes=2))
+        self.ultima = Leitura.objects.create(hidrometro=h, leitura=11, periodo='tarde', data_leitura=agora - timedelta(minutes=1))
+
+    def test_listagem_com_numero_fixo_de_consultas(self):
+        url = reverse('consumo:lote-list')
+
+        with self.assertNumQueries(2):
+            resp = self.client.get(url, {'ordering': '-total_hidrometros'})
+
+        self.assertEqual([(l['numero'], l['total_hidrometros']) for l in resp.data['results']], [
+            ('901', 3), ('902', 1), ('903', 0),
+        ])
+        lote_902 = resp.data['results'][1]
+        self.assertIsNotNone(lote_902['ultima_data_leitura'])
+        self.assertEqual(lote_902['consumo_mes_litros'], float(
+            Hidrometro.objects.get(numero='H9020').estado.litros_mes
+        ))
+        self.assertIsNone(resp.data['results'][0]['ultima_data_leitura'])
+
+    def test_filtro_min_hidrometros(self):
+        url = reverse('consumo:lote-list')
+
+        resp = self.client.get(url, {'min_hidrometros': 1})
+        self.assertEqual([l['numero'] for l in resp.data['results']], ['901', '902'])
+
+        self.assertEqual(self.client.get(url, {'min_hidrometros': 'um'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_criacao_retorna_resumo(self):
+        resp = self.client.post(reverse('consumo:lote-list'), {'numero': '904', 'tipo': 'residencial'}, format='json')
+
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((resp.data['total_hidrometros'], resp.data['consumo_mes_litros']), (0, 0.0))
+
+
+class ApiLeiturasListaTests(APITestCase):
+    def setUp(self):
+        agora = timezone.now()
+        self.lote = Lote.objects.create(numero='801', tipo='residencial')
+        for i in range(3):
+            h = Hidrometro.objects.create(numero=f'H80{i}', lote=self.lote, data_instalacao=agora.date())
+            for dia, valor in enumerate([10, 12, 15]):
+                Leitura.objects.create(
+                    hidrometro=h,
+                    leitura=valor + i,
+                    periodo='manha',
+                    data_leitura=agora - timedelta(days=3 - dia),
+                )
+
+    def _consumos(self, resp):
+        return [(l['hidrometro_numero'], l['lote_numero'], l['consumo_desde_ultima_litros']) for l in resp.data['results']]
+
+    def test_listagem_com_numero_fixo_de_consultas(self):
+        url = reverse('consumo:leitura-list')
+
+        # ETag do GET condicional + contagem e página
+        with self.assertNumQueries(3) as consultas:
+            resp = self.client.get(url)
+
+        # Delta da coluna consumo_m3: sem função de janela sobre a tabela
+        self.assertFalse(any('LAG(' in consulta['sql'] for consulta in consultas.captured_queries))
+        self.assertEqual(resp.data['count'], 9)
+        self.assertIn(('H802', '801', 3000.0), self._consumos(resp))
+
+    def test_leitura_anterior_sem_coluna_preenchida(self):
+        # Dados antigos: só a primeira leitura de cada hidrômetro tem o delta gravado
+        Leitura.objects.exclude(consumo_m3=0).update(consumo_m3=None, consumo_litros=None)
+        url = reverse('consumo:leitura-list')
+        h = Hidrometro.objects.get(numero='H801')
+
+        # ETag do GET condicional + contagem, página e as anteriores das linhas sem o delta
+        with self.assertNumQueries(4):
+            resp = self.client.get(url, {'ordering': 'data_leitura', 'hidrometro': h.id})
+
+        self.assertEqual([c for _, _, c in self._consumos(resp)], [0.0, 2000.0, 3000.0])
+
+        # Filtro por data ou período corta a sequência: a anterior vem da tabela inteira
+        inicio = Leitura.objects.order_by('data_leitura').values_list('data_leitura', flat=True)[3]
+        with self.assertNumQueries(4):
+            resp = self.client.get(url, {'ordering': 'data_leitura', 'data_inicio': inicio.isoformat()})
+        self.assertEqual(sorted(c for _, _, c in self._consumos(resp)), [2000.0] * 3 + [3000.0] * 3)
+
+    def test_leituras_periodo_com_numero_fixo_de_consultas(self):
+        h = Hidrometro.objects.get(numero='H800')
+        hoje = timezone.localdate()
+        url = reverse('consumo:hidrometro-leituras-periodo', args=[h.id])
+
+        with self.assertNumQueries(2):
+            resp = self.client.get(url, {
+                'data_inicio': (hoje - timedelta(days=7)).isoformat(),
+                'data_fim': (hoje + timedelta(days=1)).isoformat(),
+            })
+
+        self.assertEqual([l['consumo_desde_ultima_litros'] for l in resp.data], [0.0, 2000.0, 3000.0])
+
+
 class ApiLeiturasPeriodoTests(APITestCase):
     def setUp(self):
         self.agora = timezone.now()
@@ -0,0 +1,116 @@
+import json
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from consumo import views
+from consumo.graficos import calcular_dados_graficos, periodo_graficos
+from consumo.models import Lote, Hidrometro, Leitura
+
+
+class ApiAssincronaTests(TestCase):
+    """As versões async respondem o mesmo JSON das ações síncronas equivalentes"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.agora = timezone.localtime(timezone.now()).replace(hour=12, minute=0, second=0, microsecond=0)
+        self.lote = Lote.objects.create(numero='1901', tipo='residencial')
+        self.h1 = Hidrometro.objects.create(numero='H1901', lote=self.lote, data_instalacao=self.agora.date())
+        self.h2 = Hidrometro.objects.create(numero='H1902', lote=self.lote, data_instalacao=self.agora.date())
+        Hidrometro.objects.create(numero='H1903', lote=self.lote, data_instalacao=self.agora.date())
+        for dias_atras, valor in [(4, '10.000'), (3, '10.400'), (1, '11.000'), (0, '11.250')]:
+            Leitura.objects.create(
+                hidrometro=self.h1, leitura=Decimal(valor), periodo='manha',
+                data_leitura=self.agora - timedelta(days=dias_atras),
+            )
+        Leitura.objects.create(
+            hidrometro=self.h2, leitura=Decimal('5.000'), periodo='tarde',
+            data_leitura=self.agora - timedelta(days=2),
+        )
+        self.inicio = (self.agora - timedelta(days=10)).date().isoformat()
+        self.fim = (self.agora + timedelta(days=1)).date().isoformat()
+
+    async def _comparar(self, url_sincrona, url_assincrona, status_esperado=200):
+        esperado = await self.async_client.get(url_sincrona, HTTP_ACCEPT='application/json')
+        resp = await self.async_client.get(url_assincrona)
+        self.assertEqual((esperado.status_code, resp.status_code), (status_esperado, status_esperado))
+        self.assertEqual(json.loads(resp.content), json.loads(esperado.content))
+        return json.loads(resp.content)
+
+    async def test_ultimas_leituras(self):
+        dados = await self._comparar(
+            reverse('consumo:leitura-ultimas-leituras'), reverse('consumo:async-ultimas-leituras')
+        )
+        self.assertEqual(sorted(item['hidrometro'] for item in dados), ['H1901', 'H1902'])
+
+    async def test_leituras_periodo(self):
+        consulta = f'?data_inicio={self.inicio}&data_fim={self.fim}'
+        dados = await self._comparar(
+            reverse('consumo:hidrometro-leituras-periodo', args=[self.h1.id]) + consulta,
+            reverse('consumo:async-leituras-periodo', args=[self.h1.id]) + consulta,
+        )
+        self.assertEqual(len(dados), 4)
+
+        await self._comparar(
+            reverse('consumo:hidrometro-leituras-periodo', args=[self.h1.id]),
+            reverse('consumo:async-leituras-periodo', args=[self.h1.id]),
+            status_esperado=400,
+        )
+
+    async def test_estatisticas(self):
+        for consulta, status_esperado in [('?dias=7', 200), ('?dias=0', 400), ('', 200)]:
+            with self.subTest(consulta=consulta):
+                await self._comparar(
+                    reverse('consumo:hidrometro-estatisticas', args=[self.h1.id]) + consulta,
+                    reverse('consumo:async-estatisticas', args=[self.h1.id]) + consulta,
+                    status_esperado,
+                )
+
+    async def test_consumo_total(self):
+        consulta = f'?data_inicio={self.inicio}&data_fim={self.fim}'
+        dados = await self._comparar(
+            reverse('consumo:lote-consumo-total', args=[self.lote.id]) + consulta,
+            reverse('consumo:async-consumo-total', args=[self.lote.id]) + consulta,
+        )
+        self.assertAlmostEqual(dados['consumo_total_m3'], 1.25)
+
+        await self._comparar(
+            reverse('consumo:lote-consumo-total', args=[self.lote.id]) + '?data_inicio=ontem&data_fim=hoje',
+            reverse('consumo:async-consumo-total', args=[self.lote.id]) + '?data_inicio=ontem&data_fim=hoje',
+            status_esperado=400,
+        )
+
+    async def test_nao_encontrado(self):
+        for nome in ['async-leituras-periodo', 'async-estatisticas', 'async-consumo-total']:
+            with self.subTest(nome=nome):
+                resp = await self.async_client.get(reverse(f'consumo:{nome}', args=[999999]))
+                self.assertEqual(resp.status_code, 404)
+
+    async def test_dados_graficos(self):
+        periodo = periodo_graficos({'periodo': '7dias'}, timezone.localtime(timezone.now()))
+        esperado = await sync_to_async(calcular_dados_graficos)(periodo, periodo['data_fim'].year)
+        resp = await self.async_client.get(reverse('consumo:async-dados-graficos'), {'periodo': '7dias'})
+
+        self.assertEqual(resp.status_code, 200)
+        dados = json.loads(resp.content)
+        self.assertEqual(dados, json.loads(json.dumps(esperado)))
+        self.assertEqual(dados['consumo_por_hidrometro'][0]['consumo_litros'], 1250.0)
+
+    async def test_dados_graficos_pelo_cache_da_pagina(self):
+        _periodo, esperado = await sync_to_async(views._dados_graficos_condominio)({'periodo': '7dias'})
+
+        with mock.patch('consumo.views.acalcular_consumo_consolidado') as calcular:
+            resp = await self.async_client.get(reverse('consumo:async-dados-graficos'), {'periodo': '7dias'})
+        calcular.assert_not_called()
+        self.assertEqual(json.loads(resp.content), json.loads(json.dumps(esperado)))
+
+    async def test_somente_get(self):
+        resp = await self.async_client.post(reverse('consumo:async-ultimas-leituras'))
+        self.assertEqual(resp.status_code, 405)
@@ -0,0 +1,103 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from consumo.models import Lote, Hidrometro, Leitura
+
+
+class ApiGraficosTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        # Recálculo do cache na própria requisição, sem threads que sobrevivem ao teste
+        em_linha = mock.patch(
+            'consumo.cache_graficos._em_segundo_plano', side_effect=lambda funcao, *args: funcao(*args)
+        )
+        em_linha.start()
+        self.addCleanup(em_linha.stop)
+        self.agora = timezone.localtime(timezone.now()).replace(hour=12, minute=0, second=0, microsecond=0)
+        self.lote = Lote.objects.create(numero='2101', tipo='residencial')
+        self.h1 = Hidrometro.objects.create(numero='H2101', lote=self.lote, data_instalacao=self.agora.date())
+        self.h2 = Hidrometro.objects.create(numero='H2102', lote=self.lote, data_instalacao=self.agora.date())
+        for hidrometro, valores in [(self.h1, ['10.000', '10.500', '11.000']), (self.h2, ['5.000', '5.250', '5.250'])]:
+            for dias_atras, valor in zip([3, 2, 1], valores):
+                Leitura.objects.create(
+                    hidrometro=hidrometro, leitura=Decimal(valor), periodo='manha',
+                    data_leitura=self.agora - timedelta(days=dias_atras),
+                )
+
+    def test_condominio_em_formato_colunar(self):
+        resp = self.client.get(reverse('consumo:graficos-consumo'), {'periodo': '7dias'})
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data['periodo'], {'selecionado': '7dias', 'label': 'Últimos 7 dias'})
+        self.assertEqual(resp.data['resumo']['consumo_total_litros'], 1250.0)
+        self.assertEqual(
+            set(resp.data['conjuntos']), {'por_dia', 'por_mes', 'comparativo_anual', 'top_lotes', 'por_hidrometro'}
+        )
+
+        por_hidrometro = resp.data['conjuntos']['por_hidrometro']
+        self.assertEqual(por_hidrometro['hidrometro'], ['H2101', 'H2102'])
+        self.assertEqual(por_hidrometro['lote'], ['2101', '2101'])
+        self.assertEqual(por_hidrometro['consumo_litros'], [1000.0, 250.0])
+
+        por_dia = resp.data['conjuntos']['por_dia']
+        self.assertEqual(len(por_dia['dia']), 7)
+        self.assertEqual(len(por_dia['consumo_litros']), 7)
+
+    def test_filtro_de_conjunto(self):
+        resp = self.client.get(reverse('consumo:graficos-consumo'), {'conjunto': 'top_lotes,por_mes'})
+
+        self.assertEqual(list(resp.data['conjuntos']), ['top_lotes', 'por_mes'])
+        self.assertEqual(resp.data['conjuntos']['top_lotes'], {'lote': ['2101'], 'consumo_litros': [1250.0]})
+
+    def test_conjunto_invalido(self):
+        resp = self.client.get(reverse('consumo:graficos-consumo'), {'conjunto': 'por_dia,pizza'})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('pizza', resp.data['error'])
+
+        resp = self.client.get(reverse('consumo:graficos-lote', args=[self.lote.id]), {'conjunto': 'top_lotes'})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_lote(self):
+        resp = self.client.get(
+            reverse('consumo:graficos-lote', args=[self.lote.id]), {'periodo': '7dias', 'conjunto': 'por_dia'}
+        )
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data['resumo'], {'lote': '2101', 'tipo': 'Residencial', 'consumo_total_litros': 1250.0})
+        self.assertEqual(sum(resp.data['conjuntos']['por_dia']['consumo_litros']), 1250.0)
+
+    def test_lote_inexistente(self):
+        resp = self.client.get(reverse('consumo:graficos-lote', args=[999999]))
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cabecalhos_de_cache(self):
+        url = reverse('consumo:graficos-lote', args=[self.lote.id])
+        resp = self.client.get(url)
+
+        self.assertIn('max-age=300', resp['Cache-Control'])
+        self.assertIn('private', resp['Cache-Control'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=resp['ETag']).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Leitura.objects.create(
+            hidrometro=self.h1, leitura=Decimal('12.000'), periodo='tarde', data_leitura=self.agora,
+        )
+        nova = self.client.get(url, HTTP_IF_NONE_MATCH=resp['ETag'])
+        self.assertEqual(nova.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(nova['ETag'], resp['ETag'])
+
+    def test_paginas_nao_agregam(self):
+        for url in [reverse('consumo:graficos_consumo'), reverse('consumo:graficos_lote', args=[self.lote.id])]:
+            with self.subTest(url=url):
+                resp = self.client.get(url, {'periodo': '7dias'})
+                self.assertEqual(resp.status_code, status.HTTP_200_OK)
+                self.assertNotIn('dados_graficos', resp.context)
+                self.assertIn('periodo=7dias', resp.context['url_dados'])
+                self.assertContains(resp, 'data-conjunto="por_dia"')
@@ -0,0 +1,52 @@
+import io
+import os
+
+from django.core.files import File
+from django.test import TestCase
+
+from consumo.armazenamento import TAMANHO_BLOCO, ArmazenamentoBanco
+from consumo.models import ArquivoArmazenado, BlocoArquivo
+
+
+class ArmazenamentoBancoTests(TestCase):
+    def setUp(self):
+        self.armazenamento = ArmazenamentoBanco()
+        self.conteudo = os.urandom(2 * TAMANHO_BLOCO + 100)
+        self.nome = self.armazenamento.save('exportacoes/ab/arquivo.pdf', File(io.BytesIO(self.conteudo)))
+
+    def test_gravado_em_blocos(self):
+        self.assertEqual(self.nome, 'exportacoes/ab/arquivo.pdf')
+        self.assertTrue(self.armazenamento.exists(self.nome))
+        self.assertEqual(self.armazenamento.size(self.nome), len(self.conteudo))
+        self.assertEqual(
+            [len(dados) for dados in BlocoArquivo.objects.order_by('ordem').values_list('dados', flat=True)],
+            [TAMANHO_BLOCO, TAMANHO_BLOCO, 100],
+        )
+        # Mesmo nome de novo: outro arquivo, com o nome livre seguinte
+        outro = self.armazenamento.save(self.nome, File(io.BytesIO(b'outro')))
+        self.assertNotEqual(outro, self.nome)
+        self.assertEqual(ArquivoArmazenado.objects.count(), 2)
+
+    def test_leitura_um_bloco_por_consulta(self):
+        with self.armazenamento.open(self.nome) as arquivo:
+            with self.assertNumQueries(3):
+                blocos = list(iter(lambda: arquivo.read(TAMANHO_BLOCO), b''))
+        self.assertEqual([len(bloco) for bloco in blocos], [TAMANHO_BLOCO, TAMANHO_BLOCO, 100])
+        self.assertEqual(b''.join(blocos), self.conteudo)
+
+    def test_seek(self):
+        with self.armazenamento.open(self.nome) as arquivo:
+            self.assertEqual(arquivo.seek(0, io.SEEK_END), len(self.conteudo))
+            arquivo.seek(TAMANHO_BLOCO - 10)
+            self.assertEqual(arquivo.read(20), self.conteudo[TAMANHO_BLOCO - 10:TAMANHO_BLOCO])
+            self.assertEqual(arquivo.tell(), TAMANHO_BLOCO)
+            arquivo.seek(-50, io.SEEK_END)
+            self.assertEqual(arquivo.read(), self.conteudo[-50:])
+
+    def test_arquivo_inexistente(self):
+        self.armazenamento.delete(self.nome)
+        self.assertFalse(BlocoArquivo.objects.exists())
+        with self.assertRaises(FileNotFoundError):
+            self.armazenamento.open(self.nome)
+        with self.assertRaises(FileNotFoundError):
+            self.armazenamento.size(self.nome)
@@ -0,0 +1,132 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from consumo import cache_graficos
+from consumo.models import Lote, Hidrometro, Leitura
+
+
+class CacheGraficosTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.agora = timezone.localtime(timezone.now()).replace(hour=12, minute=0, second=0, microsecond=0)
+        self.lote5 = Lote.objects.create(numero='5', tipo='residencial')
+        self.lote200 = Lote.objects.create(numero='200', tipo='residencial')
+        self.h5 = Hidrometro.objects.create(numero='H5', lote=self.lote5, data_instalacao=self.agora.date())
+        self.h200 = Hidrometro.objects.create(numero='H200', lote=self.lote200, data_instalacao=self.agora.date())
+        for hidrometro in (self.h5, self.h200):
+            self._leitura(hidrometro, '10.000', 3)
+            self._leitura(hidrometro, '11.000', 2)
+
+    def _leitura(self, hidrometro, valor, dias_atras):
+        return Leitura.objects.create(
+            hidrometro=hidrometro, leitura=Decimal(valor), periodo='manha',
+            data_leitura=self.agora - timedelta(days=dias_atras),
+        )
+
+    def _versao(self, lote):
+        return Lote.objects.get(pk=lote.pk).versao_dados
+
+    def _total_lote(self, lote):
+        resp = self.client.get(reverse('consumo:graficos-lote', args=[lote.id]))
+        return resp.json()['resumo']['consumo_total_litros']
+
+    def test_leitura_incrementa_so_a_versao_do_lote(self):
+        versoes = self._versao(self.lote5), self._versao(self.lote200)
+        condominio = cache_graficos.versao_condominio()
+
+        self._leitura(self.h5, '12.000', 1)
+
+        self.assertEqual(self._versao(self.lote5), versoes[0] + 1)
+        self.assertEqual(self._versao(self.lote200), versoes[1])
+        self.assertNotEqual(cache_graficos.versao_condominio(), condominio)
+
+        self.h200.leituras.latest('data_leitura').delete()
+        self.assertEqual(self._versao(self.lote200), versoes[1] + 1)
+
+    def test_hidrometro_alterado_incrementa_versao(self):
+        versao = self._versao(self.lote5)
+        self.h5.ativo = False
+        self.h5.save()
+        self.assertEqual(self._versao(self.lote5), versao + 1)
+
+        # Mudança de lote invalida o lote antigo e o novo
+        versao200 = self._versao(self.lote200)
+        self.h5.lote = self.lote200
+        self.h5.save()
+        self.assertEqual((self._versao(self.lote5), self._versao(self.lote200)), (versao + 2, versao200 + 1))
+
+    def test_pagina_do_lote_usa_o_cache(self):
+        self.assertEqual(self._total_lote(self.lote5), 1000.0)
+
+        with mock.patch('consumo.views.calcular_consumo_consolidado') as calcular:
+            self.assertEqual(self._total_lote(self.lote5), 1000.0)
+        calcular.assert_not_called()
+
+    def test_leitura_em_outro_lote_nao_invalida(self):
+        self._total_lote(self.lote5)
+        self._leitura(self.h200, '15.000', 1)
+
+        with mock.patch('consumo.cache_graficos._em_segundo_plano') as segundo_plano:
+            self._total_lote(self.lote5)
+        segundo_plano.assert_not_called()
+
+    def test_versao_antiga_servida_enquanto_recalcula(self):
+        self.assertEqual(self._total_lote(self.lote5), 1000.0)
+        self._leitura(self.h5, '12.500', 1)
+
+        with mock.patch('consumo.cache_graficos._em_segundo_plano') as segundo_plano:
+            self.assertEqual(self._total_lote(self.lote5), 1000.0)
+            # Um único recálculo agendado mesmo com várias requisições
+            self.assertEqual(self._total_lote(self.lote5), 1000.0)
+        self.assertEqual(segundo_plano.call_count, 1)
+
+        funcao, *args = segundo_plano.call_args.args
+        funcao(*args)
+        self.assertEqual(self._total_lote(self.lote5), 2500.0)
+
+    def test_lote_alterado_recalcula_na_hora(self):
+        self._total_lote(self.lote5)
+        self._leitura(self.h5, '12.500', 1)
+        self.lote5.refresh_from_db()
+        self.lote5.endereco = 'Rua A, 5'
+        self.lote5.save()
+
+        with mock.patch('consumo.cache_graficos._em_segundo_plano') as segundo_plano:
+            self.assertEqual(self._total_lote(self.lote5), 2500.0)
+        segundo_plano.assert_not_called()
+
+    def test_graficos_do_condominio(self):
+        def total():
+            return self.client.get(reverse('consumo:graficos-consumo')).json()['resumo']['consumo_total_litros']
+
+        self.assertEqual(total(), 2000.0)
+
+        self._leitura(self.h200, '11.500', 1)
+        with mock.patch('consumo.cache_graficos._em_segundo_plano', side_effect=lambda funcao, *args: funcao(*args)):
+            self.assertEqual(total(), 2000.0)
+        self.assertEqual(total(), 2500.0)
+
+    @override_settings(GRAFICOS_REVALIDACAO_EM_SEGUNDO_PLANO=False)
+    def test_revalidacao_na_propria_requisicao(self):
+        self.assertEqual(self._total_lote(self.lote5), 1000.0)
+        self._leitura(self.h5, '12.500', 1)
+
+        with mock.patch('consumo.cache_graficos._em_segundo_plano') as segundo_plano:
+            # A resposta ainda é a versão em cache; o cache já sai recalculado
+            self.assertEqual(self._total_lote(self.lote5), 1000.0)
+            self.assertEqual(self._total_lote(self.lote5), 2500.0)
+        segundo_plano.assert_not_called()
+
+    def test_chave_normaliza_periodo(self):
+        inicio = self.agora - timedelta(days=29)
+        self.assertEqual(
+            cache_graficos.chave('condominio', None, '30dias', inicio, self.agora),
+            cache_graficos.chave('condominio', None, '30dias', inicio.replace(hour=0), self.agora.date()),
+        )
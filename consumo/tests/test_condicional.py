@@ -0,0 +1,106 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+
+from consumo.models import Lote, Hidrometro, Leitura
+
+
+class GetCondicionalTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        # Recálculo do cache na própria requisição, sem threads que sobrevivem ao teste
+        em_linha = mock.patch(
+            'consumo.cache_graficos._em_segundo_plano', side_effect=lambda funcao, *args: funcao(*args)
+        )
+        em_linha.start()
+        self.addCleanup(em_linha.stop)
+        self.agora = timezone.localtime(timezone.now()).replace(hour=12, minute=0, second=0, microsecond=0)
+        self.lote = Lote.objects.create(numero='2001', tipo='residencial')
+        self.outro_lote = Lote.objects.create(numero='2002', tipo='residencial')
+        self.h = Hidrometro.objects.create(numero='H2001', lote=self.lote, data_instalacao=self.agora.date())
+        self.outro = Hidrometro.objects.create(numero='H2002', lote=self.outro_lote, data_instalacao=self.agora.date())
+        self._leitura(self.h, '10.000', 2)
+        self._leitura(self.outro, '20.000', 2)
+
+    def _leitura(self, hidrometro, valor, dias_atras):
+        return Leitura.objects.create(
+            hidrometro=hidrometro, leitura=Decimal(valor), periodo='manha',
+            data_leitura=self.agora - timedelta(days=dias_atras),
+        )
+
+    def _revalidar(self, url, resposta):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=resposta['ETag'])
+
+    def test_listas_da_api_respondem_304_sem_consultar_a_lista(self):
+        for url in [reverse('consumo:leitura-list'), reverse('consumo:hidrometro-list')]:
+            with self.subTest(url=url):
+                resp = self.client.get(url)
+                self.assertEqual(resp.status_code, 200)
+                self.assertNotIn('Last-Modified', resp)
+
+                # Só a versão dos dados (resumo dos lotes)
+                with self.assertNumQueries(1):
+                    self.assertEqual(self._revalidar(url, resp).status_code, 304)
+
+    def test_nova_leitura_muda_o_etag(self):
+        url = reverse('consumo:leitura-list')
+        resp = self.client.get(url)
+
+        self._leitura(self.h, '11.000', 1)
+
+        nova = self._revalidar(url, resp)
+        self.assertEqual(nova.status_code, 200)
+        self.assertNotEqual(nova['ETag'], resp['ETag'])
+        self.assertEqual(nova.data['count'], 3)
+
+    def test_filtros_e_formato_entram_no_etag(self):
+        url = reverse('consumo:leitura-list')
+        resp = self.client.get(url)
+
+        self.assertNotEqual(self.client.get(url, {'hidrometro': self.h.id})['ETag'], resp['ETag'])
+        self.assertNotEqual(self.client.get(url, HTTP_ACCEPT='text/html')['ETag'], resp['ETag'])
+
+    def test_if_modified_since_nao_responde_304(self):
+        url = reverse('consumo:hidrometro-list')
+        resp = self.client.get(url)
+        depois = http_date((timezone.now() + timedelta(days=1)).timestamp())
+
+        # Editar o hidrômetro só muda versao_dados: sem data confiável, If-Modified-Since sozinho não dá 304
+        self.h.numero = 'H2001-A'
+        self.h.save()
+        nova = self.client.get(url, HTTP_IF_MODIFIED_SINCE=depois)
+        self.assertEqual(nova.status_code, 200)
+        self.assertIn('H2001-A', [item['numero'] for item in nova.data['results']])
+        self.assertNotEqual(nova['ETag'], resp['ETag'])
+
+    def test_pagina_do_lote_so_muda_com_leituras_do_lote(self):
+        url = reverse('consumo:graficos_lote', args=[self.lote.id])
+        resp = self.client.get(url)
+
+        self._leitura(self.outro, '21.000', 1)
+        self.assertEqual(self._revalidar(url, resp).status_code, 304)
+
+        self._leitura(self.h, '11.000', 1)
+        self.assertEqual(self._revalidar(url, resp).status_code, 200)
+
+    def test_pagina_do_condominio(self):
+        url = reverse('consumo:graficos_consumo')
+        resp = self.client.get(url, {'periodo': '7dias'})
+
+        self.assertEqual(
+            self.client.get(url, {'periodo': '7dias'}, HTTP_IF_NONE_MATCH=resp['ETag']).status_code, 304
+        )
+        self.assertEqual(
+            self.client.get(url, {'periodo': '15dias'}, HTTP_IF_NONE_MATCH=resp['ETag']).status_code, 200
+        )
+
+    def test_lote_inexistente(self):
+        resp = self.client.get(reverse('consumo:graficos_lote', args=[999999]), HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(resp.status_code, 404)
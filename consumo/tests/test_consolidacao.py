@@ -0,0 +1,421 @@
+import threading
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from consumo.agregacao import calcular_consumo_consolidado, comparativo_anual, consumo_por_ano
+from consumo.consolidacao import (
+    adiar_consolidacao, recalcular_consumo_diario, reconstruir_consumo_diario, reconstruir_deltas,
+)
+from consumo.models import Lote, Hidrometro, Leitura, ConsumoDiario, ConsumoMensal
+from consumo.serializers import LeituraSerializer
+
+
+class ConsolidacaoBase:
+    def setUp(self):
+        self.agora = timezone.localtime(timezone.now()).replace(hour=9, minute=0, second=0, microsecond=0)
+        self.lote = Lote.objects.create(numero='1001', tipo='residencial')
+        self.h = Hidrometro.objects.create(numero='H1001', lote=self.lote, data_instalacao=self.agora.date())
+
+    def _add(self, valor, dias_atras, hora=9, periodo='manha'):
+        return Leitura.objects.create(
+            hidrometro=self.h,
+            leitura=Decimal(valor),
+            data_leitura=(self.agora - timedelta(days=dias_atras)).replace(hour=hora),
+            periodo=periodo,
+        )
+
+    def _dia(self, dias_atras):
+        return (self.agora - timedelta(days=dias_atras)).date()
+
+    def _consolidado(self):
+        return {
+            c.data: (float(c.litros), c.n_leituras)
+            for c in ConsumoDiario.objects.filter(hidrometro=self.h)
+        }
+
+
+class ConsolidacaoIncrementalTests(ConsolidacaoBase, TestCase):
+    def test_criacao_atualiza_dia_e_conta_leituras(self):
+        self._add('100.000', dias_atras=2)
+        self._add('101.000', dias_atras=1, hora=8)
+        self._add('101.500', dias_atras=1, hora=16, periodo='tarde')
+
+        self.assertEqual(self._consolidado(), {
+            self._dia(2): (0.0, 1),
+            self._dia(1): (1500.0, 2),
+        })
+
+    def test_edicao_recalcula_dia_seguinte(self):
+        primeira = self._add('100.000', dias_atras=3)
+        self._add('102.000', dias_atras=1)
+
+        primeira.leitura = Decimal('101.000')
+        primeira.save()
+
+        self.assertEqual(self._consolidado()[self._dia(1)], (1000.0, 1))
+
+    def test_edicao_muda_o_dia(self):
+        self._add('100.000', dias_atras=5)
+        movida = self._add('103.000', dias_atras=3)
+        self._add('104.000', dias_atras=1)
+
+        movida.data_leitura = movida.data_leitura + timedelta(days=1)
+        movida.save()
+
+        consolidado = self._consolidado()
+        self.assertNotIn(self._dia(3), consolidado)
+        self.assertEqual(consolidado[self._dia(2)], (3000.0, 1))
+        self.assertEqual(consolidado[self._dia(1)], (1000.0, 1))
+
+    def test_exclusao_recalcula(self):
+        self._add('100.000', dias_atras=3)
+        meio = self._add('102.000', dias_atras=2)
+        self._add('103.000', dias_atras=1)
+
+        meio.delete()
+
+        consolidado = self._consolidado()
+        self.assertNotIn(self._dia(2), consolidado)
+        self.assertEqual(consolidado[self._dia(1)], (3000.0, 1))
+
+    def test_adiar_consolidacao_recalcula_ao_final(self):
+        with adiar_consolidacao():
+            self._add('100.000', dias_atras=2)
+            self._add('102.000', dias_atras=1)
+            self.assertFalse(ConsumoDiario.objects.exists())
+
+        self.assertEqual(self._consolidado()[self._dia(1)], (2000.0, 1))
+
+    def test_exclusao_de_hidrometro_remove_consolidacao(self):
+        self._add('100.000', dias_atras=2)
+        self._add('102.000', dias_atras=1)
+
+        self.h.delete()
+
+        self.assertFalse(ConsumoDiario.objects.exists())
+
+    def test_reconstrucao_igual_ao_incremental(self):
+        self._add('100.000', dias_atras=4)
+        self._add('99.000', dias_atras=3)
+        self._add('101.250', dias_atras=2, hora=8)
+        self._add('101.750', dias_atras=2, hora=16, periodo='tarde')
+        incremental = self._consolidado()
+
+        ConsumoDiario.objects.all().delete()
+        reconstruir_consumo_diario()
+
+        self.assertEqual(self._consolidado(), incremental)
+
+    def test_comando_reconstruir(self):
+        self._add('100.000', dias_atras=2)
+        self._add('102.000', dias_atras=1)
+        ConsumoDiario.objects.all().delete()
+
+        call_command('reconstruir_consumo_diario', stdout=open('/dev/null', 'w'))
+
+        self.assertEqual(self._consolidado()[self._dia(1)], (2000.0, 1))
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class RecalculoConcorrenteTests(ConsolidacaoBase, TransactionTestCase):
+    """No PostgreSQL, recálculos simultâneos do mesmo hidrômetro esperam a trava em vez de violar os únicos"""
+
+    def test_recalculos_simultaneos(self):
+        for dias_atras, valor in [(3, '10.000'), (2, '10.400'), (1, '11.000')]:
+            self._add(valor, dias_atras)
+        dias = {self._dia(3), self._dia(1)}
+        barreira = threading.Barrier(4)
+        erros = []
+
+        def recalcular():
+            try:
+                barreira.wait()
+                for _ in range(10):
+                    recalcular_consumo_diario({self.h.id: dias})
+            except Exception as erro:
+                erros.append(erro)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=recalcular) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(erros, [])
+        self.assertEqual(self._consolidado(), {
+            self._dia(3): (0.0, 1), self._dia(2): (400.0, 1), self._dia(1): (600.0, 1),
+        })
+
+
+class DeltaLeituraTests(ConsolidacaoBase, TestCase):
+    def _deltas(self):
+        return [
+            (float(l.consumo_m3), float(l.consumo_litros))
+            for l in Leitura.objects.filter(hidrometro=self.h).order_by('data_leitura')
+        ]
+
+    def test_insercao_grava_delta(self):
+        self._add('100.000', dias_atras=3)
+        leitura = self._add('101.250', dias_atras=2)
+
+        self.assertEqual(leitura.consumo_m3, Decimal('1.250'))
+        self.assertEqual(self._deltas(), [(0.0, 0.0), (1.25, 1250.0)])
+
+    def test_insercao_no_meio_ajusta_a_seguinte(self):
+        self._add('100.000', dias_atras=3)
+        self._add('103.000', dias_atras=1)
+        self._add('101.000', dias_atras=2)
+
+        self.assertEqual(self._deltas(), [(0.0, 0.0), (1.0, 1000.0), (2.0, 2000.0)])
+
+    def test_edicao_e_exclusao_ajustam_a_seguinte(self):
+        self._add('100.000', dias_atras=3)
+        meio = self._add('101.000', dias_atras=2)
+        self._add('103.000', dias_atras=1)
+
+        meio.leitura = Decimal('102.500')
+        meio.save()
+        self.assertEqual(self._deltas()[2], (0.5, 500.0))
+
+        meio.delete()
+        self.assertEqual(self._deltas(), [(0.0, 0.0), (3.0, 3000.0)])
+
+    def test_backfill(self):
+        self._add('100.000', dias_atras=3)
+        self._add('99.000', dias_atras=2)
+        self._add('101.000', dias_atras=1)
+        esperado = self._deltas()
+        Leitura.objects.update(consumo_m3=None, consumo_litros=None)
+
+        self.assertEqual(reconstruir_deltas(batch_size=2), 3)
+        self.assertEqual(self._deltas(), esperado)
+        self.assertEqual(reconstruir_deltas(somente_pendentes=True), 0)
+
+    def test_comando_backfill(self):
+        self._add('100.000', dias_atras=2)
+        self._add('102.000', dias_atras=1)
+        Leitura.objects.update(consumo_m3=None, consumo_litros=None)
+
+        call_command('reconstruir_deltas_leituras', '--somente-pendentes', stdout=open('/dev/null', 'w'))
+
+        self.assertEqual(self._deltas(), [(0.0, 0.0), (2.0, 2000.0)])
+
+    def test_serializer_sem_consulta_por_linha(self):
+        for dias in range(5, 0, -1):
+            self._add(f'{100 + dias}.000', dias_atras=dias)
+        leituras = list(Leitura.objects.select_related('hidrometro__lote'))
+
+        with self.assertNumQueries(0):
+            dados = LeituraSerializer(leituras, many=True).data
+        self.assertEqual(len(dados), 5)
+
+
+class ConsumoMensalTests(TestCase):
+    def setUp(self):
+        self.lote = Lote.objects.create(numero='1101', tipo='residencial')
+        self.h = Hidrometro.objects.create(numero='H1101', lote=self.lote, data_instalacao=date(2024, 1, 1))
+        for valor, dia in [
+            ('100.000', date(2024, 12, 31)),
+            ('101.000', date(2025, 1, 15)),
+            ('103.000', date(2025, 1, 31)),
+            ('104.000', date(2025, 2, 1)),
+            ('106.500', date(2025, 3, 10)),
+        ]:
+            self._add(valor, dia)
+
+    def _add(self, valor, dia):
+        return Leitura.objects.create(
+            hidrometro=self.h,
+            leitura=Decimal(valor),
+            data_leitura=timezone.make_aware(datetime(dia.year, dia.month, dia.day, 9)),
+            periodo='manha',
+        )
+
+    def _mensal(self):
+        return {
+            c.mes: (float(c.litros), c.n_leituras, c.fechado)
+            for c in ConsumoMensal.objects.filter(hidrometro=self.h)
+        }
+
+    def test_meses_derivados_da_consolidacao_diaria(self):
+        self.assertEqual(self._mensal(), {
+            date(2024, 12, 1): (0.0, 1, True),
+            date(2025, 1, 1): (3000.0, 2, True),
+            date(2025, 2, 1): (1000.0, 1, True),
+            date(2025, 3, 1): (2500.0, 1, True),
+        })
+
+    def test_correcao_em_mes_fechado_recalcula_o_mes(self):
+        leitura = Leitura.objects.get(hidrometro=self.h, data_leitura__date=date(2025, 1, 31))
+        leitura.leitura = Decimal('102.000')
+        leitura.save()
+
+        mensal = self._mensal()
+        self.assertEqual(mensal[date(2025, 1, 1)][0], 2000.0)
+        self.assertEqual(mensal[date(2025, 2, 1)][0], 2000.0)
+
+    def test_mes_corrente_fica_aberto(self):
+        hoje = timezone.localdate()
+        self._add('110.000', hoje)
+        self.assertFalse(self._mensal()[hoje.replace(day=1)][2])
+
+    def test_virada_do_mes_fecha_os_meses_abertos(self):
+        # Mês calculado enquanto era o atual
+        ConsumoMensal.objects.filter(hidrometro=self.h, mes=date(2025, 3, 1)).update(fechado=False)
+
+        self._add('110.000', timezone.localdate())
+
+        self.assertTrue(self._mensal()[date(2025, 3, 1)][2])
+        self.assertFalse(ConsumoMensal.objects.filter(fechado=False, mes__lt=timezone.localdate().replace(day=1)))
+
+    def test_mes_fechado_sem_mudanca_nos_totais_nao_e_regravado(self):
+        janeiro = ConsumoMensal.objects.get(hidrometro=self.h, mes=date(2025, 1, 1))
+        leitura = Leitura.objects.get(hidrometro=self.h, data_leitura__date=date(2025, 1, 15))
+        leitura.observacoes = 'Conferida'
+
+        with CaptureQueriesContext(connection) as consultas:
+            leitura.save()
+        gravacoes = [
+            c['sql'] for c in consultas.captured_queries
+            if 'consumo_consumomensal' in c['sql'] and not c['sql'].startswith('SELECT')
+        ]
+        # Só o UPDATE de fechar_meses(), que não encontra meses abertos
+        self.assertEqual(len(gravacoes), 1)
+        self.assertEqual(ConsumoMensal.objects.get(pk=janeiro.pk).atualizado_em, janeiro.atualizado_em)
+
+    def test_reconstrucao_inclui_meses(self):
+        incremental = self._mensal()
+        ConsumoMensal.objects.all().delete()
+
+        reconstruir_consumo_diario()
+
+        self.assertEqual(self._mensal(), incremental)
+
+    def test_janela_combina_meses_inteiros_e_bordas(self):
+        hidrometros = Hidrometro.objects.all()
+        for inicio, fim in [
+            (date(2025, 1, 1), date(2025, 3, 31)),
+            (date(2025, 1, 16), date(2025, 3, 10)),
+            (date(2025, 1, 10), date(2025, 1, 31)),
+            (date(2024, 12, 31), date(2025, 2, 1)),
+        ]:
+            resultado = calcular_consumo_consolidado(hidrometros, inicio, fim)
+            diarios = ConsumoDiario.objects.filter(hidrometro=self.h, data__gte=inicio, data__lte=fim)
+
+            self.assertAlmostEqual(resultado.total, float(sum(d.litros for d in diarios)), places=2)
+            self.assertEqual(resultado.total_leituras[self.h.id], sum(d.n_leituras for d in diarios))
+            self.assertAlmostEqual(sum(resultado.por_mes.values()), resultado.total, places=2)
+            self.assertAlmostEqual(sum(resultado.por_dia.values()), resultado.total, places=2)
+
+    def test_ano_e_comparativo_anual(self):
+        Leitura.objects.create(
+            hidrometro=self.h,
+            leitura=Decimal('100.500'),
+            data_leitura=timezone.make_aware(datetime(2024, 12, 31, 18)),
+            periodo='tarde',
+        )
+        hidrometros = Hidrometro.objects.all()
+
+        with self.assertNumQueries(1):
+            totais = consumo_por_ano(hidrometros, [2024, 2025])
+        self.assertEqual(totais, {2024: 500.0, 2025: 6000.0})
+
+        comparativo = comparativo_anual(hidrometros, 2025)
+        self.assertEqual(comparativo['atual'][:3], [2500.0, 1000.0, 2500.0])
+        self.assertEqual(comparativo['anterior'][11], 500.0)
+
+
+class ConsolidacaoApiTests(ConsolidacaoBase, APITestCase):
+    def test_leitura_em_lote_consolida(self):
+        url = reverse('consumo:leitura-leitura-em-lote')
+        payload = {'leituras': [
+            {
+                'hidrometro': self.h.id,
+                'leitura': valor,
+                'data_leitura': (self.agora - timedelta(days=dias)).isoformat(),
+                'periodo': 'manha',
+            }
+            for valor, dias in [('10.000', 3), ('11.000', 2), ('13.000', 1)]
+        ]}
+
+        resp = self.client.post(url, payload, format='json')
+
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self._consolidado(), {
+            self._dia(3): (0.0, 1),
+            self._dia(2): (1000.0, 1),
+            self._dia(1): (2000.0, 1),
+        })
+
+    def test_consumo_total_usa_consolidacao(self):
+        self._add('100.000', dias_atras=3)
+        self._add('102.000', dias_atras=2)
+        self._add('102.500', dias_atras=1)
+
+        url = reverse('consumo:lote-consumo-total', args=[self.lote.id])
+        resp = self.client.get(url, {
+            'data_inicio': self._dia(2).isoformat(),
+            'data_fim': self._dia(1).isoformat(),
+        })
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertAlmostEqual(resp.data['consumo_total_m3'], 2.5, places=3)
+
+    def test_consumo_total_em_lote(self):
+        self._add('100.000', dias_atras=3)
+        self._add('102.000', dias_atras=2)
+        outro = Lote.objects.create(numero='1002', tipo='residencial')
+        vazio = Lote.objects.create(numero='1003', tipo='residencial')
+        h2 = Hidrometro.objects.create(numero='H1002', lote=outro, data_instalacao=self.agora.date())
+        for valor, dias in [('10.000', 3), ('10.500', 2)]:
+            Leitura.objects.create(hidrometro=h2, leitura=Decimal(valor), data_leitura=self.agora - timedelta(days=dias), periodo='manha')
+
+        url = reverse('consumo:lote-consumo-total-em-lote')
+        parametros = {'data_inicio': self._dia(3).isoformat(), 'data_fim': self._dia(1).isoformat()}
+        # lotes + totais agrupados, independente do número de lotes
+        with self.assertNumQueries(2):
+            resp = self.client.get(url, parametros)
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        totais = {linha['lote']: linha['consumo_total_m3'] for linha in resp.data['lotes']}
+        self.assertEqual(totais, {'1001': 2.0, '1002': 0.5, '1003': 0.0})
+
+        resp = self.client.get(url, {**parametros, 'lotes': f'{outro.id},{vazio.id}'})
+        self.assertEqual([linha['lote'] for linha in resp.data['lotes']], ['1002', '1003'])
+
+    def test_consumo_total_em_lote_csv(self):
+        self._add('100.000', dias_atras=3)
+        self._add('101.250', dias_atras=2)
+
+        resp = self.client.get(reverse('consumo:lote-consumo-total-em-lote'), {
+            'data_inicio': self._dia(3).isoformat(),
+            'data_fim': self._dia(1).isoformat(),
+            'formato': 'csv',
+        })
+
+        self.assertEqual(resp['Content-Type'], 'text/csv; charset=utf-8')
+        linhas = resp.content.decode().splitlines()
+        self.assertEqual(linhas[0], 'lote_id,lote,periodo,consumo_total_m3')
+        self.assertTrue(linhas[1].endswith(',1001,' + f'{self._dia(3).isoformat()} a {self._dia(1).isoformat()},1.250'))
+
+    def test_consumo_total_em_lote_parametros_invalidos(self):
+        url = reverse('consumo:lote-consumo-total-em-lote')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_400_BAD_REQUEST)
+        resp = self.client.get(url, {'data_inicio': '2026-01-01', 'data_fim': '2026-01-31', 'lotes': '1,a'})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_consumo_total_data_invalida(self):
+        url = reverse('consumo:lote-consumo-total', args=[self.lote.id])
+        resp = self.client.get(url, {'data_inicio': 'ontem', 'data_fim': '2026-01-01'})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,129 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from consumo.consolidacao import atualizar_estados
+from consumo.models import Lote, Hidrometro, Leitura, HidrometroEstado
+
+
+class EstadoBase:
+    def setUp(self):
+        self.agora = timezone.localtime(timezone.now())
+        self.hoje = self.agora.date()
+        self.lote = Lote.objects.create(numero='1501', tipo='residencial')
+        self.h = Hidrometro.objects.create(numero='H1501', lote=self.lote, data_instalacao=self.hoje)
+
+    def _add(self, valor, minutos_atras, periodo='manha', hidrometro=None):
+        return Leitura.objects.create(
+            hidrometro=hidrometro or self.h,
+            leitura=Decimal(valor),
+            data_leitura=self.agora - timedelta(minutes=minutos_atras),
+            periodo=periodo,
+        )
+
+    def _estado(self):
+        return HidrometroEstado.objects.get(hidrometro=self.h)
+
+
+class HidrometroEstadoTests(EstadoBase, TestCase):
+    def test_estado_acompanha_as_gravacoes(self):
+        self._add('100.000', minutos_atras=2)
+        ultima = self._add('100.750', minutos_atras=1, periodo='tarde')
+
+        estado = self._estado()
+        self.assertEqual(estado.ultima_leitura, Decimal('100.750'))
+        self.assertEqual(estado.ultimo_periodo, 'tarde')
+        self.assertEqual(estado.leituras_no_dia(self.hoje), 2)
+        self.assertEqual(estado.consumo_no_dia(self.hoje), Decimal('0.750'))
+        self.assertEqual(estado.litros_no_mes(self.hoje.replace(day=1)), Decimal('750.000'))
+
+        ultima.delete()
+        estado = self._estado()
+        self.assertEqual(estado.ultima_leitura, Decimal('100.000'))
+        self.assertEqual(estado.leituras_no_dia(self.hoje), 1)
+        self.assertEqual(estado.consumo_no_dia(self.hoje), 0)
+
+    def test_atualizar_estados_sem_apagar_as_linhas(self):
+        self._add('100.000', minutos_atras=2)
+        novo = Hidrometro.objects.create(numero='H1502', lote=self.lote, data_instalacao=self.hoje)
+        HidrometroEstado.objects.filter(hidrometro=novo).delete()
+        HidrometroEstado.objects.filter(hidrometro=self.h).update(ultima_leitura=Decimal('1.000'))
+
+        # Upsert: uma gravação concorrente do mesmo estado não viola a chave primária
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(atualizar_estados([self.h, novo]), 2)
+        self.assertFalse([c['sql'] for c in consultas.captured_queries if c['sql'].startswith('DELETE')])
+        self.assertEqual(self._estado().ultima_leitura, Decimal('100.000'))
+        self.assertIsNone(HidrometroEstado.objects.get(hidrometro=novo).ultima_leitura)
+
+    def test_estado_de_outro_dia_nao_conta_hoje(self):
+        self._add('100.000', minutos_atras=2)
+        HidrometroEstado.objects.filter(hidrometro=self.h).update(dia=self.hoje - timedelta(days=1))
+
+        self.assertEqual(self._estado().leituras_no_dia(self.hoje), 0)
+
+    def test_consumo_diario_atual_sem_consultar_leituras(self):
+        self._add('100.000', minutos_atras=2)
+        self._add('101.500', minutos_atras=1, periodo='tarde')
+        hidrometro = Hidrometro.objects.select_related('estado').get(pk=self.h.pk)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(hidrometro.consumo_diario_atual(), Decimal('1.500'))
+
+    def test_reconstrucao_e_comando(self):
+        self._add('100.000', minutos_atras=2)
+        esperado = self._estado().ultima_leitura
+        HidrometroEstado.objects.all().delete()
+
+        call_command('reconstruir_consumo_diario', '--se-vazio', stdout=open('/dev/null', 'w'))
+
+        self.assertEqual(self._estado().ultima_leitura, esperado)
+
+    def test_listar_hidrometros_le_o_estado(self):
+        self._add('100.000', minutos_atras=2)
+        self._add('101.000', minutos_atras=1, periodo='tarde')
+
+        response = self.client.get(reverse('consumo:listar_hidrometros'))
+
+        hidrometro = response.context['hidrometros'][0]
+        self.assertEqual(hidrometro.leituras_hoje, 2)
+        self.assertEqual(hidrometro.ultima_leitura, self._estado().ultima_data_leitura)
+
+
+class HidrometroEstadoApiTests(EstadoBase, APITestCase):
+    def test_ultimas_leituras_em_uma_consulta(self):
+        for i in range(3):
+            h = Hidrometro.objects.create(numero=f'H16{i}', lote=self.lote, data_instalacao=self.hoje)
+            self._add('10.000', minutos_atras=5, hidrometro=h)
+
+        with self.assertNumQueries(1):
+            resp = self.client.get(reverse('consumo:leitura-ultimas-leituras'))
+
+        self.assertEqual(len(resp.data), 3)
+        self.assertEqual(resp.data[0]['leitura'], 10.0)
+
+    def test_leitura_em_lote_valida_contra_o_estado(self):
+        self._add('10.000', minutos_atras=60)
+        leituras = [
+            {
+                'hidrometro': self.h.id,
+                'leitura': valor,
+                'data_leitura': (self.agora - timedelta(minutes=minutos)).isoformat(),
+                'periodo': periodo,
+            }
+            for valor, minutos, periodo in [('12.000', 30, 'manha'), ('11.000', 10, 'tarde')]
+        ]
+
+        resp = self.client.post(reverse('consumo:leitura-leitura-em-lote'), {'leituras': leituras}, format='json')
+
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((resp.data['criadas'], resp.data['erros']), (1, 1))
+        self.assertEqual(self._estado().ultima_leitura, Decimal('12.000'))
@@ -0,0 +1,94 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from consumo.estatisticas import estatisticas_hidrometros
+from consumo.models import Lote, Hidrometro, Leitura
+
+
+class EstatisticasBase:
+    def setUp(self):
+        self.agora = timezone.localtime(timezone.now()).replace(hour=12, minute=0, second=0, microsecond=0)
+        self.lote = Lote.objects.create(numero='1401', tipo='residencial')
+        self.h1 = Hidrometro.objects.create(numero='H1401', lote=self.lote, data_instalacao=self.agora.date())
+        self.h2 = Hidrometro.objects.create(numero='H1402', lote=self.lote, data_instalacao=self.agora.date())
+        self.inativo = Hidrometro.objects.create(
+            numero='H1403', lote=self.lote, ativo=False, data_instalacao=self.agora.date()
+        )
+
+        # h1 em 4 dias: 0 (primeira leitura), 1000 L, 0, 3000 L
+        for valor, dias in [('100.000', 3), ('101.000', 2), ('101.000', 1), ('104.000', 0)]:
+            self._add(self.h1, valor, dias)
+        self._add(self.h2, '10.000', 1)
+
+    def _add(self, hidrometro, valor, dias_atras):
+        return Leitura.objects.create(
+            hidrometro=hidrometro,
+            leitura=Decimal(valor),
+            data_leitura=self.agora - timedelta(days=dias_atras, minutes=-1),
+            periodo='manha',
+        )
+
+
+class EstatisticasHidrometrosTests(EstatisticasBase, TestCase):
+    def test_uma_consulta_para_varios_hidrometros(self):
+        hidrometros = list(Hidrometro.objects.filter(ativo=True).order_by('numero'))
+
+        with self.assertNumQueries(1):
+            estatisticas = estatisticas_hidrometros(hidrometros, 4, agora=self.agora + timedelta(minutes=5))
+
+        self.assertEqual([e['hidrometro'] for e in estatisticas], ['H1401', 'H1402'])
+
+    def test_resumo_diario(self):
+        h1, h2 = estatisticas_hidrometros([self.h1, self.h2], 4, agora=self.agora + timedelta(minutes=5))
+
+        self.assertEqual(h1['total_leituras'], 4)
+        self.assertEqual(h1['consumo_total_m3'], 4.0)
+        self.assertEqual(h1['consumo_medio_dia_m3'], 1.0)
+        self.assertEqual(h1['consumo_diario_litros'], {
+            'media': 1000.0,
+            'desvio_padrao': 1224.74,
+            'minimo': 0.0,
+            'maximo': 3000.0,
+            'p50': 500.0,
+            'p95': 2700.0,
+        })
+        self.assertEqual(h2['consumo_diario_litros']['maximo'], 0.0)
+        self.assertEqual(h2['primeira_leitura'], Decimal('10.000'))
+
+
+class EstatisticasApiTests(EstatisticasBase, APITestCase):
+    def test_estatisticas_em_lote(self):
+        url = reverse('consumo:hidrometro-estatisticas-em-lote')
+
+        with self.assertNumQueries(2):
+            resp = self.client.get(url, {'dias': 7})
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual({e['hidrometro'] for e in resp.data['hidrometros']}, {'H1401', 'H1402'})
+
+        resp = self.client.get(url, {'ids': f'{self.h2.id},{self.inativo.id}', 'ativo': 'false'})
+        self.assertEqual([e['hidrometro'] for e in resp.data['hidrometros']], ['H1403'])
+
+    def test_estatisticas_individual_reusa_o_lote(self):
+        resp = self.client.get(reverse('consumo:hidrometro-estatisticas', args=[self.h1.id]), {'dias': 7})
+
+        self.assertEqual(resp.data['total_leituras'], 4)
+        self.assertIn('p95', resp.data['consumo_diario_litros'])
+
+        resp = self.client.get(reverse('consumo:hidrometro-estatisticas', args=[self.inativo.id]))
+        self.assertIn('Sem leituras', resp.data['message'])
+
+    def test_dias_limitado(self):
+        url = reverse('consumo:hidrometro-estatisticas', args=[self.h1.id])
+        for dias in ['0', '367', 'trinta']:
+            self.assertEqual(self.client.get(url, {'dias': dias}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            self.client.get(reverse('consumo:hidrometro-estatisticas-em-lote'), {'dias': '9999'}).status_code,
+            status.HTTP_400_BAD_REQUEST,
+        )
@@ -0,0 +1,164 @@
+import csv
+import gzip
+import io
+import os
+import tempfile
+import tracemalloc
+import warnings
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from consumo import exportacao_leituras
+from consumo.models import Lote, Hidrometro, Leitura
+
+
+class ExportacaoLeiturasTests(TestCase):
+    def setUp(self):
+        self.agora = timezone.localtime(timezone.now()).replace(hour=12, minute=0, second=0, microsecond=0)
+        self.lote = Lote.objects.create(numero='2501', tipo='residencial')
+        self.h1 = Hidrometro.objects.create(numero='H2501', lote=self.lote, data_instalacao=self.agora.date())
+        self.h2 = Hidrometro.objects.create(numero='H2502', lote=self.lote, data_instalacao=self.agora.date())
+        for hidrometro, valores in [(self.h1, ['10.000', '10.400', '11.000']), (self.h2, ['5.000', '5.250'])]:
+            for dias_atras, valor in zip(range(len(valores), 0, -1), valores):
+                Leitura.objects.create(
+                    hidrometro=hidrometro, leitura=Decimal(valor), periodo='manha',
+                    data_leitura=self.agora - timedelta(days=dias_atras),
+                )
+        Leitura.objects.create(
+            hidrometro=self.h1, leitura=Decimal('11.100'), periodo='tarde',
+            data_leitura=self.agora - timedelta(hours=2), responsavel='Ana', observacoes='portão, fundos',
+        )
+        self.url = reverse('consumo:leitura-exportar')
+
+    def _linhas(self, resposta):
+        conteudo = b''.join(resposta.streaming_content)
+        if resposta['Content-Type'] == 'application/gzip':
+            conteudo = gzip.decompress(conteudo)
+        return list(csv.DictReader(io.StringIO(conteudo.decode('utf-8'))))
+
+    def test_csv_com_o_consumo_de_cada_leitura(self):
+        with self.assertNumQueries(1):
+            resp = self.client.get(self.url)
+            linhas = self._linhas(resp)
+
+        self.assertEqual(resp['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment; filename="leituras_', resp['Content-Disposition'])
+        self.assertEqual(list(linhas[0]), exportacao_leituras.COLUNAS)
+        self.assertEqual(
+            [(linha['hidrometro'], linha['leitura'], linha['consumo_litros']) for linha in linhas],
+            [('H2501', '10.000', '0.000'), ('H2501', '10.400', '400.000'), ('H2501', '11.000', '600.000'),
+             ('H2501', '11.100', '100.000'), ('H2502', '5.000', '0.000'), ('H2502', '5.250', '250.000')],
+        )
+        self.assertEqual((linhas[3]['responsavel'], linhas[3]['observacoes']), ('Ana', 'portão, fundos'))
+        self.assertEqual(linhas[0]['lote'], '2501')
+
+    def test_mesmos_filtros_da_lista(self):
+        def ids(**filtros):
+            lista = self.client.get(reverse('consumo:leitura-list'), {**filtros, 'page_size': 100}).data['results']
+            exportadas = self._linhas(self.client.get(self.url, filtros))
+            self.assertEqual(sorted(int(linha['id']) for linha in exportadas), sorted(item['id'] for item in lista))
+            return exportadas
+
+        # O delta exportado não depende de a sequência do hidrômetro ter sido cortada pelo filtro
+        self.assertEqual([linha['consumo_m3'] for linha in ids(periodo='tarde')], ['0.100'])
+        self.assertEqual(len(ids(hidrometro=self.h2.id)), 2)
+        inicio = (self.agora - timedelta(days=2, hours=1)).isoformat()
+        self.assertEqual(len(ids(data_inicio=inicio, data_fim=self.agora.isoformat())), 5)
+
+    def test_csv_gz(self):
+        resp = self.client.get(self.url, {'formato': 'csv.gz', 'hidrometro': self.h1.id})
+        self.assertEqual(resp['Content-Type'], 'application/gzip')
+        self.assertIn('.csv.gz"', resp['Content-Disposition'])
+        self.assertEqual(len(self._linhas(resp)), 4)
+
+    def test_parametros_invalidos(self):
+        for parametros in [{'formato': 'xlsx'}, {'hidrometro': 'abc'}, {'data_inicio': 'ontem'}]:
+            with self.subTest(parametros=parametros):
+                self.assertEqual(self.client.get(self.url, parametros).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def _criar_leituras(self, quantidade):
+        Leitura.objects.all().delete()
+        inicio = self.agora - timedelta(days=30)
+        Leitura.objects.bulk_create([
+            Leitura(hidrometro=self.h1, leitura=Decimal(i), periodo='manha',
+                    data_leitura=inicio + timedelta(minutes=i), consumo_m3=Decimal('1.000'),
+                    consumo_litros=Decimal('1000.000'), observacoes='x' * 100)
+            for i in range(quantidade)
+        ])
+
+    def test_memoria_nao_cresce_com_as_leituras(self):
+        def pico(quantidade):
+            self._criar_leituras(quantidade)
+            tracemalloc.start()
+            try:
+                tamanho = sum(len(pedaco) for pedaco in exportacao_leituras.gerar_bytes({}, chunk_size=100))
+                return tamanho, tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        pico(10)
+        (tamanho_pequeno, pequeno), (tamanho_grande, grande) = pico(200), pico(4000)
+
+        self.assertGreater(tamanho_grande - tamanho_pequeno, 500 * 1024)
+        self.assertLess(grande - pequeno, 256 * 1024)
+
+    def test_asgi_em_fluxo(self):
+        async def baixar(parametros):
+            resp = await self.async_client.get(self.url, parametros)
+            self.assertTrue(resp.is_async)
+            # Como o ASGIHandler envia: aiter(resposta), um pedaço por vez
+            tamanhos = []
+            async for pedaco in resp:
+                tamanhos.append(len(pedaco))
+            return tamanhos
+
+        self.assertEqual(
+            sum(async_to_sync(baixar)({})), len(b''.join(self.client.get(self.url).streaming_content))
+        )
+
+        def picos(quantidade):
+            self._criar_leituras(quantidade)
+            resultado = {}
+            for formato in exportacao_leituras.FORMATOS:
+                tracemalloc.start()
+                try:
+                    tamanhos = async_to_sync(baixar)({'formato': formato})
+                    resultado[formato] = tamanhos, tracemalloc.get_traced_memory()[1]
+                finally:
+                    tracemalloc.stop()
+            return resultado
+
+        with warnings.catch_warnings(), mock.patch('consumo.exportacao_leituras.CHUNK_SIZE', 100):
+            # Aviso do Django quando junta um iterador síncrono inteiro para enviar sob ASGI
+            warnings.filterwarnings('error', message='StreamingHttpResponse must consume')
+            picos(10)
+            pequenos, grandes = picos(200), picos(4000)
+
+        for formato in exportacao_leituras.FORMATOS:
+            with self.subTest(formato=formato):
+                (_, pequeno), (tamanhos, grande) = pequenos[formato], grandes[formato]
+                self.assertGreater(len(tamanhos), 2)
+                self.assertLess(grande - pequeno, 256 * 1024)
+
+    def test_comando(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, 'leituras.csv.gz')
+            saida = StringIO()
+            call_command('exportar_leituras', caminho, '--periodo', 'manha', stdout=saida)
+
+            self.assertIn('gravados em', saida.getvalue())
+            with gzip.open(caminho, 'rt', encoding='utf-8') as arquivo:
+                self.assertEqual(len(list(csv.DictReader(arquivo))), 5)
+
+            with self.assertRaises(CommandError):
+                call_command('exportar_leituras', caminho, '--data-inicio', 'ontem', stdout=StringIO())
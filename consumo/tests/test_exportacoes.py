@@ -0,0 +1,203 @@
+import hashlib
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.db.models import QuerySet
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from consumo import exportacoes
+from consumo.models import Lote, Hidrometro, Leitura, Exportacao, ArquivoArmazenado
+
+
+class FilaExportacaoTests(APITestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(self.pasta.cleanup)
+        configuracao = self.settings(MEDIA_ROOT=self.pasta.name)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+        self.agora = timezone.localtime(timezone.now()).replace(hour=12, minute=0, second=0, microsecond=0)
+        self.lote = Lote.objects.create(numero='2201', tipo='residencial')
+        self.h = Hidrometro.objects.create(numero='H2201', lote=self.lote, data_instalacao=self.agora.date())
+        for dias_atras, valor in [(3, '10.000'), (2, '10.400'), (1, '11.000')]:
+            self._leitura(valor, dias_atras)
+        self.url = reverse('consumo:exportacao-list')
+
+    def _leitura(self, valor, dias_atras):
+        return Leitura.objects.create(
+            hidrometro=self.h, leitura=Decimal(valor), periodo='manha',
+            data_leitura=self.agora - timedelta(days=dias_atras),
+        )
+
+    def _pedir(self, **dados):
+        return self.client.post(self.url, {'relatorio': 'condominio', 'formato': 'pdf', **dados}, format='json')
+
+    def test_enfileirar_processar_e_baixar(self):
+        resp = self._pedir(periodo='7dias')
+        self.assertEqual(resp.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(resp.data['status'], 'pendente')
+        self.assertIsNone(resp.data['url_download'])
+        self.assertEqual(resp['Location'], resp.data['url'])
+
+        download = reverse('consumo:exportacao-download', args=[resp.data['id']])
+        self.assertEqual(self.client.get(download).status_code, status.HTTP_409_CONFLICT)
+
+        self.assertEqual(exportacoes.processar(0, uma_vez=True), 1)
+
+        situacao = self.client.get(resp['Location'])
+        self.assertEqual(situacao.data['status'], 'concluida')
+        self.assertTrue(situacao.data['url_download'].endswith(download))
+
+        arquivo = self.client.get(download)
+        self.assertEqual(arquivo.status_code, status.HTTP_200_OK)
+        self.assertEqual(arquivo['Content-Type'], 'application/pdf')
+        self.assertIn('relatorio_consumo_condominio_', arquivo['Content-Disposition'])
+        conteudo = b''.join(arquivo.streaming_content)
+        self.assertTrue(conteudo.startswith(b'%PDF'))
+
+        # Guardado pelo hash do conteúdo
+        sha256 = hashlib.sha256(conteudo).hexdigest()
+        self.assertEqual(situacao.data['sha256'], sha256)
+        self.assertEqual(Exportacao.objects.get().arquivo.name, f'exportacoes/{sha256[:2]}/{sha256}.pdf')
+
+    def test_download_em_fluxo_sob_asgi(self):
+        resp = self._pedir(periodo='7dias')
+        exportacoes.processar(0, uma_vez=True)
+        download = reverse('consumo:exportacao-download', args=[resp.data['id']])
+
+        async def baixar():
+            arquivo = await self.async_client.get(download)
+            self.assertTrue(arquivo.is_async)
+            return [pedaco async for pedaco in arquivo]
+
+        conteudo = b''.join(async_to_sync(baixar)())
+        self.assertEqual(hashlib.sha256(conteudo).hexdigest(), Exportacao.objects.get().sha256)
+
+    def test_pedido_igual_reaproveita_a_exportacao(self):
+        primeira = self._pedir(periodo='ano_atual')
+        self.assertEqual(self._pedir(periodo='ano_atual').data['id'], primeira.data['id'])
+
+        exportacoes.processar(0, uma_vez=True)
+        pronta = self._pedir(periodo='ano_atual')
+        self.assertEqual(pronta.status_code, status.HTTP_200_OK)
+        self.assertEqual(pronta.data['id'], primeira.data['id'])
+
+        # Outro período, outro formato ou dados novos geram outra exportação
+        self.assertNotEqual(self._pedir(periodo='7dias').data['id'], primeira.data['id'])
+        self.assertNotEqual(self._pedir(periodo='ano_atual', formato='excel').data['id'], primeira.data['id'])
+        self._leitura('11.500', 0)
+        self.assertNotEqual(self._pedir(periodo='ano_atual').data['id'], primeira.data['id'])
+
+    def test_pedidos_iguais_simultaneos_reaproveitam_a_exportacao(self):
+        primeira, criada = exportacoes.enfileirar('condominio', 'pdf', {'periodo': '7dias'})
+        self.assertTrue(criada)
+
+        # O segundo pedido consulta antes de o primeiro ser gravado
+        with mock.patch.object(QuerySet, 'first', return_value=None):
+            segunda, criada = exportacoes.enfileirar('condominio', 'pdf', {'periodo': '7dias'})
+        self.assertEqual((segunda, criada), (primeira, False))
+        self.assertEqual(Exportacao.objects.count(), 1)
+
+    def test_conteudo_igual_ocupa_um_arquivo(self):
+        nome, sha256 = exportacoes.armazenar(b'relatorio', 'excel')
+        self.assertEqual(exportacoes.armazenar(b'relatorio', 'excel'), (nome, sha256))
+        self.assertTrue(nome.endswith(f'{sha256}.xlsx'))
+        self.assertEqual(list(ArquivoArmazenado.objects.values_list('nome', 'tamanho')), [(nome, 9)])
+        # No banco, compartilhado com o serviço web; nada no disco local
+        self.assertEqual(os.listdir(self.pasta.name), [])
+
+    def test_arquivo_sumido_volta_para_a_fila(self):
+        primeira = self._pedir()
+        exportacoes.processar(0, uma_vez=True)
+        exportacao = Exportacao.objects.get()
+        ArquivoArmazenado.objects.all().delete()
+
+        download = reverse('consumo:exportacao-download', args=[exportacao.pk])
+        with self.assertLogs('consumo.exportacoes', 'WARNING'):
+            resp = self.client.get(download)
+        self.assertEqual(resp.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(resp.data['status'], 'pendente')
+        self.assertEqual(resp['Retry-After'], str(exportacoes.INTERVALO))
+
+        # O mesmo pedido aguarda a exportação na fila, que gera o arquivo de novo
+        novo_pedido = self._pedir()
+        self.assertEqual(novo_pedido.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(novo_pedido.data['id'], primeira.data['id'])
+        exportacoes.processar(0, uma_vez=True)
+        arquivo = self.client.get(download)
+        self.assertEqual(arquivo.status_code, status.HTTP_200_OK)
+        exportacao.refresh_from_db()
+        self.assertEqual(exportacao.status, 'concluida')
+        self.assertEqual(hashlib.sha256(b''.join(arquivo.streaming_content)).hexdigest(), exportacao.sha256)
+
+    def test_relatorio_de_lote(self):
+        resp = self._pedir(relatorio='lote', formato='excel', lote=self.lote.id, periodo='personalizado',
+                           data_inicio=(self.agora - timedelta(days=5)).date().isoformat(),
+                           data_fim=self.agora.date().isoformat())
+        self.assertEqual(resp.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(set(resp.data['parametros']), {'periodo', 'data_inicio', 'data_fim'})
+
+        exportacoes.processar(0, uma_vez=True)
+        exportacao = Exportacao.objects.get()
+        self.assertEqual(exportacao.status, 'concluida')
+        self.assertTrue(exportacao.nome_arquivo.startswith('relatorio_lote_2201_'))
+
+    def test_pedidos_invalidos(self):
+        sem_hidrometros = Lote.objects.create(numero='2202', tipo='residencial')
+        for dados in [
+            {'relatorio': 'lote'},
+            {'relatorio': 'lote', 'lote': sem_hidrometros.id},
+            {'formato': 'csv'},
+            {'relatorio': 'importacao', 'formato': 'csv'},
+            {'periodo': 'personalizado'},
+            {'periodo': 'personalizado', 'data_inicio': '2025-02-01', 'data_fim': '2025-01-01'},
+        ]:
+            with self.subTest(dados=dados):
+                self.assertEqual(self._pedir(**dados).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Exportacao.objects.exists())
+
+    def test_falha_registra_erro_e_permite_novo_pedido(self):
+        primeira = self._pedir()
+        with mock.patch('consumo.relatorios.gerar', side_effect=RuntimeError('sem memória')), \
+                self.assertLogs('consumo.exportacoes', 'ERROR'):
+            exportacoes.processar(0, uma_vez=True)
+
+        situacao = self.client.get(primeira['Location']).data
+        self.assertEqual((situacao['status'], situacao['erro']), ('erro', 'sem memória'))
+        self.assertNotEqual(self._pedir().data['id'], primeira.data['id'])
+
+    def test_reserva_unica(self):
+        self._pedir()
+        pk = exportacoes.reservar_proxima()
+        self.assertIsNotNone(pk)
+        self.assertIsNone(exportacoes.reservar_proxima())
+        self.assertEqual(Exportacao.objects.get(pk=pk).tentativas, 1)
+
+    def test_exportacao_travada_volta_para_a_fila(self):
+        self._pedir()
+        self._pedir(formato='excel')
+        Exportacao.objects.update(status='processando', iniciado_em=timezone.now() - timedelta(hours=1))
+        Exportacao.objects.filter(formato='excel').update(tentativas=exportacoes.MAX_TENTATIVAS)
+
+        exportacoes.recuperar_travadas()
+
+        self.assertEqual(
+            dict(Exportacao.objects.values_list('formato', 'status')), {'pdf': 'pendente', 'excel': 'erro'}
+        )
+
+    def test_comando(self):
+        self._pedir()
+        saida = StringIO()
+        call_command('processar_exportacoes', '--processos', '0', '--uma-vez', stdout=saida)
+        self.assertIn('1 exportação(ões) processada(s)', saida.getvalue())
+        self.assertEqual(Exportacao.objects.get().status, 'concluida')
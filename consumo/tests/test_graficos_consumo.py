@@ -45,45 +45,62 @@ class GraficosConsumoViewTests(TestCase):
         )
 
     def test_view_returns_top_lotes_and_totals(self):
-        url = reverse('consumo:graficos_consumo')
-        response = self.client.get(url)
-
+        response = self.client.get(reverse('consumo:graficos_consumo'))
         self.assertEqual(response.status_code, 200)
-        self.assertIn('dados_graficos', response.context)
+        self.assertIn('url_dados', response.context)
 
-        dados = response.context['dados_graficos']
+        response = self.client.get(reverse('consumo:graficos-consumo'))
+        self.assertEqual(response.status_code, 200)
+        dados = response.json()
+        conjuntos = dados['conjuntos']
 
         # Top lotes: lote1 deve vir antes de lote2
-        top = dados.get('top_lotes', [])
-        self.assertGreaterEqual(len(top), 2)
-        self.assertEqual(top[0]['lote'], str(self.lote1.numero))
-        self.assertTrue(top[0]['consumo_litros'] > top[1]['consumo_litros'])
+        top = conjuntos['top_lotes']
+        self.assertGreaterEqual(len(top['lote']), 2)
+        self.assertEqual(top['lote'][0], str(self.lote1.numero))
+        self.assertTrue(top['consumo_litros'][0] > top['consumo_litros'][1])
 
         # Consumo total do ano deve ser consistente e não-zero
-        self.assertGreater(dados['consumo_total_ano'], 0)
-        soma_top = sum(item['consumo_litros'] for item in top)
-        self.assertGreaterEqual(dados['consumo_total_ano'], soma_top)
+        total = dados['resumo']['consumo_total_litros']
+        self.assertGreater(total, 0)
+        self.assertGreaterEqual(total, sum(top['consumo_litros']))
 
         # Consumo diário do dia 5 deve existir (>= 0)
-        dia5 = [d for d in dados['consumo_por_dia'] if d['dia'] == 5][0]
-        self.assertGreaterEqual(dia5['consumo_litros'], 0)
+        por_dia = conjuntos['por_dia']
+        self.assertGreaterEqual(por_dia['consumo_litros'][por_dia['dia'].index(5)], 0)
 
         # Consumo mensal do mês atual deve existir (>= 0)
-        mes_atual = [m for m in dados['consumo_mes'] if m['mes'] == self.mes][0]
-        self.assertGreaterEqual(mes_atual['consumo_litros'], 0)
+        por_mes = conjuntos['por_mes']
+        self.assertGreaterEqual(por_mes['consumo_litros'][por_mes['mes'].index(self.mes)], 0)
+
+    def test_comparativo_anual(self):
+        response = self.client.get(
+            reverse('consumo:graficos-consumo'), {'periodo': 'ano_atual', 'conjunto': 'comparativo_anual'}
+        )
+
+        dados = response.json()
+        self.assertEqual(list(dados['conjuntos']), ['comparativo_anual'])
+        meses = dados['conjuntos']['comparativo_anual']
+        resumo = dados['resumo']
+        self.assertEqual(resumo['ano'], self.ano)
+        self.assertEqual(len(meses['mes_nome']), 12)
+        self.assertAlmostEqual(meses['consumo_litros'][self.mes - 1], 21500.0, places=2)
+        self.assertAlmostEqual(resumo['total_ano'], 21500.0, places=2)
+        self.assertEqual(resumo['total_ano_anterior'], 0)
 
 
 class GraficosConsumoSemDadosTests(TestCase):
     def test_view_sem_hidrometros_retorna_zeros(self):
-        url = reverse('consumo:graficos_consumo')
+        url = reverse('consumo:graficos-consumo')
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, 200)
-        dados = response.context['dados_graficos']
+        dados = response.json()
 
-        self.assertEqual(dados['consumo_total_ano'], 0)
-        self.assertEqual(len(dados['top_lotes']), 0)
+        self.assertEqual(dados['resumo']['consumo_total_litros'], 0)
+        self.assertEqual(len(dados['conjuntos']['top_lotes']['lote']), 0)
 
         # Deve trazer consumo por dia preenchido com zeros do mês atual
-        self.assertTrue(len(dados['consumo_por_dia']) > 0)
-        self.assertTrue(all(item['consumo_litros'] == 0 for item in dados['consumo_por_dia']))
+        por_dia = dados['conjuntos']['por_dia']['consumo_litros']
+        self.assertTrue(len(por_dia) > 0)
+        self.assertTrue(all(consumo == 0 for consumo in por_dia))
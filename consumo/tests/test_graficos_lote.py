@@ -48,16 +48,14 @@ class GraficosLoteComConsumoTests(TestCase):
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, 200)
-        dados_json = response.context['dados_graficos']
-        
-        # Os dados estão em formato JSON, vamos fazer parse
-        import json
-        dados = json.loads(dados_json)
-
-        # Verificar que os dados possuem as chaves esperadas
-        self.assertIn('consumo_por_dia', dados)
-        self.assertIn('consumo_mes', dados)
-        self.assertIn('consumo_total_periodo', dados)
 
         # Flag sem_dados não deve estar presente
         self.assertFalse(response.context.get('sem_dados', False))
+
+        # Os dados vêm da API de gráficos do lote
+        dados = self.client.get(response.context['url_dados']).json()
+
+        # Verificar que os dados possuem as chaves esperadas
+        self.assertEqual(set(dados['conjuntos']), {'por_dia', 'por_mes'})
+        self.assertEqual(dados['resumo']['lote'], '303')
+        self.assertGreater(dados['resumo']['consumo_total_litros'], 0)
@@ -47,9 +47,9 @@ class HtmlViewsSmokeTests(TestCase):
     def test_graficos_consumo_route(self):
         resp = self.client.get(reverse('consumo:graficos_consumo'))
         self.assertEqual(resp.status_code, 200)
-        self.assertIn('dados_graficos', resp.context)
+        self.assertIn('url_dados', resp.context)
 
     def test_graficos_lote_route(self):
         resp = self.client.get(reverse('consumo:graficos_lote', args=[self.lote.id]))
         self.assertEqual(resp.status_code, 200)
-        self.assertIn('dados_graficos', resp.context)
+        self.assertIn('url_dados', resp.context)
@@ -0,0 +1,226 @@
+import csv
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from consumo import importacao
+from consumo.importacao import gravar_leituras_em_lote, importar_leituras
+from consumo.models import Lote, Hidrometro, Leitura, ConsumoDiario, Exportacao, ArquivoArmazenado
+
+
+class GravarLeiturasEmLoteTests(TestCase):
+    def setUp(self):
+        self.agora = timezone.localtime(timezone.now()).replace(hour=12, minute=0, second=0, microsecond=0)
+        self.lote = Lote.objects.create(numero='1601', tipo='residencial')
+        self.h = Hidrometro.objects.create(numero='H1601', lote=self.lote, data_instalacao=self.agora.date())
+
+    def _item(self, valor, dias_atras, periodo='manha', hidrometro=None):
+        return {
+            'hidrometro': (hidrometro or self.h).id,
+            'leitura': valor,
+            'data_leitura': (self.agora - timedelta(days=dias_atras)).isoformat(),
+            'periodo': periodo,
+        }
+
+    def test_consultas_nao_crescem_com_o_lote(self):
+        def consultas(hidrometro, n):
+            itens = [self._item(f'{10 + i}.000', n - i, hidrometro=hidrometro) for i in range(n)]
+            with CaptureQueriesContext(connection) as capturadas:
+                novas, erros = gravar_leituras_em_lote(itens)
+            self.assertEqual((len(novas), erros), (n, []))
+            return len(capturadas)
+
+        outro = Hidrometro.objects.create(numero='H1602', lote=self.lote, data_instalacao=self.agora.date())
+        self.assertEqual(consultas(self.h, 5), consultas(outro, 30))
+
+    def test_erros_por_item_na_ordem_do_lote(self):
+        Leitura.objects.create(
+            hidrometro=self.h, leitura=Decimal('10.000'), periodo='manha',
+            data_leitura=self.agora - timedelta(days=5),
+        )
+        itens = [
+            self._item('12.000', 3),
+            self._item('11.000', 2),                 # menor que a anterior do próprio lote
+            {**self._item('1.000', 1), 'hidrometro': 999999},
+            self._item('13.000', 3),                 # mesma (hidrômetro, data, período) do primeiro
+            self._item('13.000', 5),                 # já existe no banco
+            self._item('14.000', 1, periodo='noite'),
+            self._item('15.000', 1),
+        ]
+
+        novas, erros = gravar_leituras_em_lote(itens)
+
+        self.assertEqual([leitura.leitura for leitura in novas], [Decimal('12.000'), Decimal('15.000')])
+        self.assertEqual([erro['dados'] for erro in erros], itens[1:6])
+        self.assertIn('12.000', str(erros[0]['erros']['non_field_errors'][0]))
+        self.assertIn('hidrometro', erros[1]['erros'])
+        self.assertIn('non_field_errors', erros[2]['erros'])
+        self.assertIn('non_field_errors', erros[3]['erros'])
+        self.assertIn('periodo', erros[4]['erros'])
+
+    def test_leitura_igual_gravada_durante_o_lote(self):
+        itens = [self._item('10.000', 3), self._item('11.000', 2), self._item('12.000', 1)]
+        existentes = importacao._existentes
+
+        def concorrente(validos):
+            verificadas = existentes(validos)
+            # Outra requisição grava a segunda leitura logo depois da verificação de duplicidade
+            Leitura.objects.create(
+                hidrometro=self.h, leitura=Decimal('11.000'), periodo='manha',
+                data_leitura=self.agora - timedelta(days=2),
+            )
+            return verificadas
+
+        with mock.patch('consumo.importacao._existentes', side_effect=concorrente):
+            novas, erros = gravar_leituras_em_lote(itens)
+
+        self.assertEqual([leitura.leitura for leitura in novas], [Decimal('10.000'), Decimal('12.000')])
+        self.assertEqual([erro['dados'] for erro in erros], [itens[1]])
+        self.assertIn('non_field_errors', erros[0]['erros'])
+        self.assertEqual(Leitura.objects.count(), 3)
+        self.assertEqual(
+            list(Leitura.objects.order_by('data_leitura').values_list('consumo_litros', flat=True)),
+            [Decimal('0'), Decimal('1000'), Decimal('1000')],
+        )
+
+    def test_deltas_e_consolidacao(self):
+        Leitura.objects.create(
+            hidrometro=self.h, leitura=Decimal('10.000'), periodo='manha',
+            data_leitura=self.agora - timedelta(days=1),
+        )
+
+        # Leitura anterior às existentes (delta pela consolidação) e duas posteriores
+        gravar_leituras_em_lote([self._item('10.000', 3), self._item('11.500', 0.25, 'manha'), self._item('12.000', 0, 'tarde')])
+
+        deltas = list(Leitura.objects.order_by('data_leitura', 'periodo').values_list('consumo_litros', flat=True))
+        self.assertEqual(deltas, [Decimal('0'), Decimal('0'), Decimal('1500'), Decimal('500')])
+        self.assertEqual(
+            ConsumoDiario.objects.get(hidrometro=self.h, data=self.agora.date()).litros, Decimal('2000')
+        )
+        self.assertEqual(self.h.estado.ultima_leitura, Decimal('12.000'))
+
+
+class ImportarLeiturasTests(TestCase):
+    def setUp(self):
+        self.lote = Lote.objects.create(numero='1701', tipo='residencial')
+        hoje = timezone.localdate()
+        self.h1 = Hidrometro.objects.create(numero='H1701', lote=self.lote, data_instalacao=hoje)
+        self.h2 = Hidrometro.objects.create(numero='H1702', lote=self.lote, data_instalacao=hoje)
+        self.csv = (
+            'hidrometro;leitura;data_leitura;periodo;responsavel\n'
+            'H1701;10,500;2025-03-01 08:00;manha;Ana\n'
+            'H1702;20.000;2025-03-01 08:05;manha;Ana\n'
+            'H9999;1,000;2025-03-01 08:10;manha;Ana\n'
+            '\n'
+            'H1701;9,000;2025-03-01 17:00;tarde;Ana\n'
+            'H1701;11,000;2025-03-02 08:00;noite;Ana\n'
+            'H1701;12,250;2025-03-02 08:00;manha;\n'
+        )
+
+    def test_csv_em_blocos_com_relatorio(self):
+        relatorio = io.StringIO()
+
+        resultado = importar_leituras(io.StringIO(self.csv), 'csv', relatorio=relatorio, chunk_size=2)
+
+        self.assertEqual(resultado, {'linhas': 6, 'criadas': 3, 'erros': 3})
+        self.assertEqual(
+            list(self.h1.leituras.order_by('data_leitura').values_list('leitura', flat=True)),
+            [Decimal('10.500'), Decimal('12.250')],
+        )
+        linhas = list(csv.DictReader(io.StringIO(relatorio.getvalue())))
+        self.assertEqual([linha['linha'] for linha in linhas], ['4', '6', '7'])
+        self.assertIn('H9999', linhas[0]['erros'])
+        self.assertIn('10.500', linhas[1]['erros'])
+        self.assertTrue(linhas[2]['erros'].startswith('periodo:'))
+
+    def test_ndjson(self):
+        conteudo = '\n'.join([
+            json.dumps({'hidrometro': 'H1702', 'leitura': '5.000', 'data_leitura': '2025-03-01T08:00:00', 'periodo': 'manha'}),
+            '{quebrado',
+            '[1, 2]',
+            json.dumps({'hidrometro': 'H1702', 'leitura': 6, 'data_leitura': '2025-03-01T17:00:00', 'periodo': 'tarde'}),
+        ])
+
+        resultado = importar_leituras(io.StringIO(conteudo), 'ndjson')
+
+        self.assertEqual(resultado, {'linhas': 4, 'criadas': 2, 'erros': 2})
+        self.assertEqual(self.h2.estado.ultima_leitura, Decimal('6.000'))
+
+    def test_comando(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, 'leituras.csv')
+            with open(caminho, 'w', encoding='utf-8') as arquivo:
+                arquivo.write(self.csv)
+
+            call_command('importar_leituras', caminho, '--tamanho-bloco', '3', stdout=io.StringIO())
+
+            self.assertEqual(Leitura.objects.count(), 3)
+            with open(f'{caminho}.erros.csv', encoding='utf-8') as relatorio:
+                self.assertEqual(len(list(csv.DictReader(relatorio))), 3)
+
+
+class ImportarLeiturasApiTests(APITestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(self.pasta.cleanup)
+        lote = Lote.objects.create(numero='1801', tipo='residencial')
+        Hidrometro.objects.create(numero='H1801', lote=lote, data_instalacao=timezone.localdate())
+        self.url = reverse('consumo:leitura-importar')
+
+    def _enviar(self, nome, conteudo, **dados):
+        arquivo = SimpleUploadedFile(nome, conteudo.encode('utf-8'))
+        return self.client.post(self.url, {'arquivo': arquivo, **dados}, format='multipart')
+
+    def test_upload_com_link_para_o_relatorio(self):
+        conteudo = (
+            'hidrometro,leitura,data_leitura,periodo\n'
+            'H1801,1.000,2025-03-01 08:00,manha\n'
+            'H1801,0.500,2025-03-01 17:00,tarde\n'
+        )
+        # Arquivo maior que o limite em memória: o upload vai para arquivo temporário
+        with self.settings(MEDIA_ROOT=self.pasta.name, FILE_UPLOAD_MAX_MEMORY_SIZE=10):
+            resp = self._enviar('leituras.csv', conteudo)
+
+            self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+            self.assertEqual((resp.data['criadas'], resp.data['erros']), (1, 1))
+            # Nada gravado no MEDIA_ROOT, que não é servido em produção
+            self.assertEqual(os.listdir(self.pasta.name), [])
+
+        # Relatório guardado como exportação concluída, baixado em blocos
+        self.assertTrue(resp.data['url_relatorio'].endswith(
+            reverse('consumo:exportacao-download', args=[Exportacao.objects.get(relatorio='importacao').pk])
+        ))
+        download = self.client.get(resp.data['url_relatorio'])
+        self.assertEqual(download.status_code, status.HTTP_200_OK)
+        self.assertEqual(download['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('erros_importacao_', download['Content-Disposition'])
+        rejeitadas = list(csv.DictReader(io.StringIO(b''.join(download.streaming_content).decode('utf-8'))))
+        self.assertEqual([linha['leitura'] for linha in rejeitadas], ['0.500'])
+
+        # Sem o arquivo, não volta para a fila: não há como gerar de novo
+        ArquivoArmazenado.objects.all().delete()
+        self.assertEqual(self.client.get(resp.data['url_relatorio']).status_code, status.HTTP_410_GONE)
+        self.assertEqual(Exportacao.objects.get().status, 'concluida')
+
+    def test_formato_e_arquivo_obrigatorios(self):
+        self.assertEqual(self.client.post(self.url, {}, format='multipart').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self._enviar('leituras.txt', 'x').status_code, status.HTTP_400_BAD_REQUEST)
+
+        resp = self._enviar('leituras.txt', '{"hidrometro": "H1801", "leitura": 1, '
+                            '"data_leitura": "2025-03-01T08:00:00", "periodo": "manha"}', formato='ndjson')
+        self.assertEqual((resp.status_code, resp.data['url_relatorio']), (status.HTTP_201_CREATED, None))
+        self.assertFalse(Exportacao.objects.exists())
@@ -0,0 +1,107 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from consumo.models import Lote, Hidrometro, Leitura
+from consumo.ranking import ranking_lotes
+
+
+class RankingBase:
+    def setUp(self):
+        self.agora = timezone.localtime(timezone.now()).replace(hour=12, minute=0, second=0, microsecond=0)
+        self.hoje = self.agora.date()
+        # (lote, [(hidrômetro, primeira, última)])
+        consumos = {
+            '01': [('H01A', '10.000', '13.000'), ('H01B', '5.000', '6.000')],  # 4 m³
+            '02': [('H02', '20.000', '22.000')],                                # 2 m³
+            '03': [('H03', '30.000', '31.000')],                                # 1 m³
+            '04': [('H04', '40.000', '40.000')],                                # 0 m³
+        }
+        self.lotes = {}
+        for numero, hidrometros in consumos.items():
+            lote = self.lotes[numero] = Lote.objects.create(numero=numero, tipo='residencial')
+            for numero_h, primeira, ultima in hidrometros:
+                h = Hidrometro.objects.create(numero=numero_h, lote=lote, data_instalacao=self.hoje)
+                self._add(h, primeira, dias_atras=3)
+                self._add(h, ultima, dias_atras=1)
+
+        # Fora do ranking: hidrômetro inativo, lote de administração e leitura fora da janela
+        inativo = Hidrometro.objects.create(numero='H03X', lote=self.lotes['03'], ativo=False, data_instalacao=self.hoje)
+        self._add(inativo, '1.000', dias_atras=3)
+        self._add(inativo, '90.000', dias_atras=1)
+        adm = Lote.objects.create(numero='ADM-1', tipo='administracao')
+        h_adm = Hidrometro.objects.create(numero='HADM', lote=adm, data_instalacao=self.hoje)
+        self._add(h_adm, '1.000', dias_atras=3)
+        self._add(h_adm, '50.000', dias_atras=1)
+        self._add(Hidrometro.objects.get(numero='H04'), '99.000', dias_atras=40)
+
+    def _add(self, hidrometro, valor, dias_atras):
+        return Leitura.objects.create(
+            hidrometro=hidrometro,
+            leitura=Decimal(valor),
+            data_leitura=self.agora - timedelta(days=dias_atras),
+            periodo='manha',
+        )
+
+
+class RankingLotesTests(RankingBase, TestCase):
+    def test_uma_consulta_agrupada(self):
+        with self.assertNumQueries(1):
+            ranking = ranking_lotes(self.hoje - timedelta(days=7), self.hoje)
+
+        self.assertEqual([item['lote'] for item in ranking.itens], ['01', '02', '03', '04'])
+        self.assertEqual([item['consumo_litros'] for item in ranking.itens], [4000.0, 2000.0, 1000.0, 0.0])
+        self.assertEqual(ranking.itens[0]['hidrometros'], 2)
+
+    def test_top_bottom_e_percentil(self):
+        ranking = ranking_lotes(self.hoje - timedelta(days=7), self.hoje)
+
+        self.assertEqual([item['lote'] for item in ranking.top(2)], ['01', '02'])
+        self.assertEqual([item['lote'] for item in ranking.bottom(2)], ['04', '03'])
+        self.assertEqual([item['percentil'] for item in ranking.itens], [87.5, 62.5, 37.5, 12.5])
+        self.assertEqual(ranking.posicao(self.lotes['02'].id)['posicao'], 2)
+
+    def test_somente_com_consumo_e_todos_os_tipos(self):
+        ranking = ranking_lotes(self.hoje - timedelta(days=7), self.hoje, somente_com_consumo=True)
+        self.assertNotIn('04', [item['lote'] for item in ranking.itens])
+
+        todos = ranking_lotes(self.hoje - timedelta(days=7), self.hoje, tipo=None)
+        self.assertEqual(todos.top(1)[0]['lote'], 'ADM-1')
+
+    def test_exportacoes_usam_o_ranking(self):
+        from io import BytesIO
+        from openpyxl import load_workbook
+
+        response = self.client.get(reverse('consumo:exportar_graficos_consumo_excel'), {'periodo': '7dias'})
+
+        ws = load_workbook(BytesIO(response.content))['Top 10 Lotes']
+        linhas = list(ws.iter_rows(min_row=2, max_col=4, values_only=True))
+        self.assertEqual([linha[1] for linha in linhas], ['01', '02', '03'])
+        self.assertEqual(linhas[0][3], 4000.0)
+
+
+class RankingApiTests(RankingBase, APITestCase):
+    def test_ranking_endpoint(self):
+        resp = self.client.get(reverse('consumo:lote-ranking'), {
+            'data_inicio': (self.hoje - timedelta(days=7)).isoformat(),
+            'data_fim': self.hoje.isoformat(),
+            'n': 1,
+            'lote': self.lotes['03'].id,
+        })
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data['total_lotes'], 4)
+        self.assertEqual(resp.data['top'][0]['lote'], '01')
+        self.assertEqual(resp.data['bottom'][0]['lote'], '04')
+        self.assertEqual(resp.data['lote']['posicao'], 3)
+
+    def test_ranking_parametros_invalidos(self):
+        url = reverse('consumo:lote-ranking')
+        self.assertEqual(self.client.get(url, {'data_inicio': 'ontem'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url, {'n': 0}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url, {'n': 'dez'}).status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,136 @@
+import tracemalloc
+import warnings
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.http import FileResponse
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from consumo import relatorios
+from consumo.graficos import calcular_dados_graficos, periodo_graficos
+from consumo.models import Lote, Hidrometro, Leitura
+
+
+class ExcelLoteTests(TestCase):
+    def setUp(self):
+        self.agora = timezone.localtime(timezone.now()).replace(hour=12, minute=0, second=0, microsecond=0)
+        self.lote = Lote.objects.create(numero='2401', tipo='residencial')
+        self.h = Hidrometro.objects.create(numero='H2401', lote=self.lote, data_instalacao=self.agora.date())
+
+    def _leituras(self, quantidade, dias=5):
+        inicio = self.agora - timedelta(days=dias)
+        passo = timedelta(days=dias) / (quantidade + 1)
+        Leitura.objects.bulk_create([
+            Leitura(hidrometro=self.h, leitura=Decimal(i), periodo='manha', data_leitura=inicio + passo * (i + 1),
+                    consumo_m3=Decimal('1.000'), consumo_litros=Decimal('1000.00'), responsavel='Ana')
+            for i in range(quantidade)
+        ])
+
+    def test_resposta_em_blocos_com_as_abas(self):
+        self._leituras(3)
+        resp = self.client.get(
+            reverse('consumo:exportar_graficos_lote_excel', args=[self.lote.id]), {'periodo': '7dias'}
+        )
+
+        self.assertIsInstance(resp, FileResponse)
+        self.assertIn('relatorio_lote_2401_', resp['Content-Disposition'])
+        conteudo = b''.join(resp.streaming_content)
+        self.assertEqual(int(resp['Content-Length']), len(conteudo))
+
+        wb = load_workbook(BytesIO(conteudo))
+        self.assertEqual(wb.sheetnames, ['Resumo', 'Consumo Mensal', 'Consumo Diário', 'Leituras'])
+        self.assertIn('A1:C1', wb['Resumo'].merged_cells)
+        self.assertTrue(wb['Resumo']['A4'].font.bold)
+
+        leituras = list(wb['Leituras'].iter_rows(values_only=True))
+        self.assertEqual(leituras[0][:4], ('Data/Hora', 'Hidrômetro', 'Leitura (m³)', 'Consumo (L)'))
+        self.assertEqual([linha[1:5] for linha in leituras[1:]], [('H2401', float(i), 1000.0, 'Ana') for i in range(3)])
+        self.assertEqual(wb['Leituras'].column_dimensions['F'].width, 40)
+        self.assertEqual(len(wb['Consumo Diário']._images), 1)
+
+    def test_pico_de_memoria_nao_cresce_com_as_leituras(self):
+        def pico(quantidade):
+            Leitura.objects.all().delete()
+            self._leituras(quantidade)
+            tracemalloc.start()
+            try:
+                relatorio = relatorios.graficos_lote_excel(self.lote, {'periodo': '7dias'})
+                maximo = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+            relatorio.conteudo.close()
+            return maximo
+
+        with mock.patch('consumo.relatorios.TAMANHO_BLOCO_LEITURAS', 100):
+            pico(10)
+            pequeno, grande = pico(200), pico(2000)
+
+        # Com a planilha inteira em memória, 1800 leituras a mais somavam ~6 MB
+        self.assertLess(grande - pequeno, 1024 * 1024)
+
+    def test_asgi_em_blocos(self):
+        self._leituras(3000)
+        url = reverse('consumo:exportar_graficos_lote_excel', args=[self.lote.id])
+
+        async def baixar():
+            resp = await self.async_client.get(url, {'periodo': '7dias'})
+            self.assertTrue(resp.is_async)
+            # Como o ASGIHandler envia: aiter(resposta), um bloco por vez
+            return resp, [pedaco async for pedaco in resp]
+
+        with warnings.catch_warnings():
+            # Aviso do Django quando junta um iterador síncrono inteiro para enviar sob ASGI
+            warnings.filterwarnings('error', message='StreamingHttpResponse must consume')
+            resp, pedacos = async_to_sync(baixar)()
+
+        conteudo = b''.join(pedacos)
+        self.assertGreater(len(pedacos), 1)
+        self.assertLessEqual(max(map(len, pedacos)), 64 * 1024)
+        self.assertEqual(int(resp['Content-Length']), len(conteudo))
+        self.assertIn('relatorio_lote_2401_', resp['Content-Disposition'])
+        self.assertEqual(load_workbook(BytesIO(conteudo), read_only=True).sheetnames[-1], 'Leituras')
+
+    def test_periodo_igual_ao_da_pagina(self):
+        hoje = timezone.localdate()
+        parametros = {
+            'periodo': 'personalizado',
+            'data_inicio': (hoje - timedelta(days=3)).isoformat(),
+            'data_fim': (hoje + timedelta(days=10)).isoformat(),
+        }
+        pagina = self.client.get(reverse('consumo:graficos_lote', args=[self.lote.id]), parametros)
+
+        def periodo_do_resumo(relatorio):
+            linhas = load_workbook(relatorios.como_arquivo(relatorio.conteudo), read_only=True)['Resumo']
+            return {linha[0]: linha[1] for linha in linhas.iter_rows(values_only=True) if len(linha) > 1}['Período']
+
+        # Data final no futuro limitada a hoje, na página e no relatório
+        rotulo = f"{(hoje - timedelta(days=3)):%d/%m/%Y} a {hoje:%d/%m/%Y}"
+        self.assertEqual(pagina.context['periodo_label'], rotulo)
+        self.assertEqual(periodo_do_resumo(relatorios.graficos_lote_excel(self.lote, parametros)), rotulo)
+
+        pagina = self.client.get(reverse('consumo:graficos_consumo'), {'periodo': 'mes_atual'})
+        self.assertEqual(
+            periodo_do_resumo(relatorios.graficos_consumo_excel({'periodo': 'mes_atual'})),
+            pagina.context['periodo']['periodo_label'],
+        )
+
+    def test_total_do_condominio_igual_ao_da_pagina(self):
+        # Leitura antes da janela: o consumo até a primeira leitura do período entra no total
+        for dias_atras, valor in [(40, '10.000'), (3, '11.000'), (1, '11.500')]:
+            Leitura.objects.create(
+                hidrometro=self.h, leitura=Decimal(valor), periodo='manha',
+                data_leitura=self.agora - timedelta(days=dias_atras),
+            )
+        periodo = periodo_graficos({'periodo': '7dias'}, timezone.localtime(timezone.now()))
+        total = calcular_dados_graficos(periodo, self.agora.year)['consumo_total_ano']
+
+        wb = load_workbook(BytesIO(relatorios.graficos_consumo_excel({'periodo': '7dias'}).conteudo), read_only=True)
+        resumo = {linha[0]: linha[1] for linha in wb['Resumo'].iter_rows(values_only=True) if len(linha) > 1}
+        self.assertEqual(total, 1500.0)
+        self.assertEqual(resumo['Consumo Total'], f'{total:,.0f} L')
@@ -0,0 +1,109 @@
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from consumo import relatorios, renderizacao
+from consumo.models import Lote, Hidrometro, Leitura
+from consumo.renderizacao import CachePng, Grafico
+
+
+def _grafico(tipo='linha', valores=(1.0, 3.0, 2.0), **estilo):
+    return Grafico(tipo, ['01/01', '02/01', '03/01'], list(valores), 'Consumo', 'Data', 'Consumo (L)',
+                   '#3498db', tamanho=(4, 2), dpi=50, **estilo)
+
+
+class RenderizacaoTests(SimpleTestCase):
+    def setUp(self):
+        renderizacao.cache.limpar()
+        self.addCleanup(renderizacao.cache.limpar)
+
+    def test_tipos(self):
+        for tipo in renderizacao.TIPOS:
+            with self.subTest(tipo=tipo):
+                self.assertTrue(renderizacao.desenhar(_grafico(tipo)).startswith(b'\x89PNG'))
+        with self.assertRaises(ValueError):
+            renderizacao.desenhar(_grafico('pizza'))
+
+    def test_mesmos_dados_e_estilo_vem_do_cache(self):
+        png = renderizacao.renderizar(_grafico())
+
+        with mock.patch('consumo.renderizacao.desenhar', wraps=renderizacao.desenhar) as desenhar:
+            self.assertEqual(renderizacao.renderizar(_grafico()), png)
+            desenhar.assert_not_called()
+
+            # Dados ou estilo diferentes mudam a chave
+            renderizacao.renderizar(_grafico(valores=(1.0, 3.0, 2.5)))
+            renderizacao.renderizar(_grafico(alpha=0.5))
+        self.assertEqual(desenhar.call_count, 2)
+
+    def test_renderizar_varios_mantem_a_ordem(self):
+        graficos = [_grafico(), _grafico('barras'), _grafico(), _grafico('barras_horizontais')]
+        with mock.patch('consumo.renderizacao.desenhar', wraps=renderizacao.desenhar) as desenhar:
+            pngs = renderizacao.renderizar_varios(graficos)
+
+        # Gráfico repetido desenhado uma vez só
+        self.assertEqual(desenhar.call_count, 3)
+        self.assertEqual(pngs, [renderizacao.desenhar(grafico) for grafico in graficos])
+
+    def test_threads_simultaneas(self):
+        graficos = [_grafico(valores=(float(i), 2.0, 1.0)) for i in range(6)]
+        esperados = [renderizacao.desenhar(grafico) for grafico in graficos]
+        resultados = {}
+        barreira = threading.Barrier(3)
+
+        def renderizar(indice):
+            barreira.wait()
+            resultados[indice] = renderizacao.renderizar_varios(graficos, max_threads=3)
+
+        threads = [threading.Thread(target=renderizar, args=(i,)) for i in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(list(resultados.values()), [esperados] * 3)
+
+    def test_cache_lru_limitado_por_bytes(self):
+        cache = CachePng(maximo_bytes=10)
+        cache.guardar('a', b'1234')
+        cache.guardar('b', b'1234')
+        cache.obter('a')
+        cache.guardar('c', b'1234')
+
+        self.assertIsNone(cache.obter('b'))
+        self.assertEqual((cache.obter('a'), cache.obter('c')), (b'1234', b'1234'))
+        self.assertEqual((len(cache), cache.bytes), (2, 8))
+
+        # Maior que o cache inteiro: não é guardado
+        cache.guardar('d', b'x' * 11)
+        self.assertIsNone(cache.obter('d'))
+
+
+class RelatoriosGraficosTests(TestCase):
+    def setUp(self):
+        renderizacao.cache.limpar()
+        self.addCleanup(renderizacao.cache.limpar)
+        agora = timezone.localtime(timezone.now()).replace(hour=12, minute=0, second=0, microsecond=0)
+        self.lote = Lote.objects.create(numero='2301', tipo='residencial')
+        hidrometro = Hidrometro.objects.create(numero='H2301', lote=self.lote, data_instalacao=agora.date())
+        for dias_atras, valor in [(3, '10.000'), (2, '10.400'), (1, '11.000')]:
+            Leitura.objects.create(hidrometro=hidrometro, leitura=Decimal(valor), periodo='manha',
+                                   data_leitura=agora - timedelta(days=dias_atras))
+
+    def test_graficos_do_relatorio_desenhados_uma_vez(self):
+        parametros = {'periodo': '7dias'}
+        with mock.patch('consumo.renderizacao.desenhar', wraps=renderizacao.desenhar) as desenhar:
+            primeiro = relatorios.gerar('condominio', 'excel', parametros)
+            # Diário, top 10 e por hidrômetro
+            self.assertEqual(desenhar.call_count, 3)
+
+            segundo = relatorios.gerar('condominio', 'excel', parametros)
+            self.assertEqual(desenhar.call_count, 3)
+            relatorios.gerar('lote', 'pdf', parametros, lote=self.lote)
+            self.assertEqual(desenhar.call_count, 4)
+
+        self.assertEqual(primeiro.nome_arquivo, segundo.nome_arquivo)
@@ -0,0 +1,102 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from consumo.agregacao import calcular_consumo
+from consumo.models import Lote, Hidrometro, Leitura
+from consumo.series import SerieLeituras
+
+
+class SerieLeiturasTests(TestCase):
+    def setUp(self):
+        self.agora = timezone.localtime(timezone.now()).replace(hour=12, minute=0, second=0, microsecond=0)
+        self.lote = Lote.objects.create(numero='1201', tipo='residencial')
+        self.h1 = Hidrometro.objects.create(numero='H1201', lote=self.lote, data_instalacao=self.agora.date())
+        self.h2 = Hidrometro.objects.create(numero='H1202', lote=self.lote, data_instalacao=self.agora.date())
+
+        # h1: +2 m³, -1 m³ (ignorado), +0.5 m³
+        for valor, dias in [('100.000', 4), ('102.000', 3), ('101.000', 2), ('101.500', 1)]:
+            self._add(self.h1, valor, dias)
+        self._add(self.h2, '10.000', 4)
+        self._add(self.h2, '11.000', 1)
+
+    def _add(self, hidrometro, valor, dias_atras):
+        return Leitura.objects.create(
+            hidrometro=hidrometro,
+            leitura=Decimal(valor),
+            data_leitura=self.agora - timedelta(days=dias_atras),
+            periodo='manha',
+        )
+
+    def _dia(self, dias_atras):
+        return (self.agora - timedelta(days=dias_atras)).date()
+
+    def test_carregar_em_uma_consulta(self):
+        with self.assertNumQueries(1):
+            series = SerieLeituras.carregar(Hidrometro.objects.all(), self.agora - timedelta(days=5), self.agora)
+
+        self.assertEqual(set(series), {self.h1.id, self.h2.id})
+        self.assertEqual(len(series[self.h1.id]), 4)
+
+    def test_deltas_e_consumo(self):
+        serie = SerieLeituras.de_leituras(self.h1.leituras.all(), self.h1.id)
+
+        self.assertEqual(list(serie.deltas()), [2000, -1000, 500])
+        self.assertEqual(serie.consumo_litros(), 2500.0)
+        self.assertEqual(serie.consumo_liquido_litros(), 1500.0)
+        self.assertEqual(serie.primeira, Decimal('100.000'))
+        self.assertEqual(serie.ultima, Decimal('101.500'))
+
+    def test_por_dia(self):
+        serie = SerieLeituras.de_leituras(self.h1.leituras.all())
+
+        self.assertEqual(dict(serie.por_dia()), {self._dia(3): 2000.0, self._dia(1): 500.0})
+
+    def test_fatia(self):
+        serie = SerieLeituras.de_leituras(self.h1.leituras.all())
+
+        fatia = serie.fatia(self.agora - timedelta(days=3), self.agora - timedelta(days=2))
+
+        self.assertEqual(list(fatia.litros), [102000, 101000])
+        self.assertEqual(len(serie.fatia(self.agora, self.agora + timedelta(days=1))), 0)
+
+    def test_serie_vazia(self):
+        serie = SerieLeituras()
+
+        self.assertFalse(serie)
+        self.assertIsNone(serie.primeira)
+        self.assertEqual(serie.consumo_litros(), 0.0)
+        self.assertEqual(serie.consumo_liquido_litros(), 0.0)
+
+    def test_coerente_com_motor_de_agregacao(self):
+        inicio = self.agora - timedelta(days=5)
+        series = SerieLeituras.carregar(Hidrometro.objects.all(), inicio, self.agora)
+        resultado = calcular_consumo(Hidrometro.objects.all(), inicio, self.agora, backend='python')
+
+        for hidrometro_id, serie in series.items():
+            self.assertAlmostEqual(serie.consumo_litros(), resultado.por_hidrometro[hidrometro_id], places=2)
+            self.assertAlmostEqual(
+                serie.consumo_liquido_litros(), resultado.consumo_liquido_litros(hidrometro_id), places=2
+            )
+
+
+class EstatisticasSerieTests(APITestCase):
+    def test_estatisticas_em_uma_consulta_de_leituras(self):
+        agora = timezone.now()
+        lote = Lote.objects.create(numero='1301', tipo='residencial')
+        h = Hidrometro.objects.create(numero='H1301', lote=lote, data_instalacao=agora.date())
+        for valor, horas in [('10.000', 30), ('10.400', 20), ('11.000', 2)]:
+            Leitura.objects.create(hidrometro=h, leitura=Decimal(valor), data_leitura=agora - timedelta(hours=horas), periodo='manha')
+
+        url = reverse('consumo:hidrometro-estatisticas', args=[h.id])
+        # get_object + série de leituras
+        with self.assertNumQueries(2):
+            resp = self.client.get(url, {'dias': 5})
+
+        self.assertEqual(resp.data['total_leituras'], 3)
+        self.assertAlmostEqual(resp.data['consumo_total_m3'], 1.0, places=3)
+        self.assertEqual(resp.data['primeira_leitura'], Decimal('10.000'))
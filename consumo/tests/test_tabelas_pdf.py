@@ -0,0 +1,54 @@
+import io
+
+from django.test import SimpleTestCase
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table
+
+from consumo.tabelas_pdf import ALTURA_LINHA, TabelaPaginada, estilo_tabela
+
+CABECALHO = ['Hidrômetro', 'Lote', 'Consumo (L)']
+LARGURAS = [2*inch, 1.5*inch, 2*inch]
+
+
+def _linhas(quantidade):
+    return [[f'H{i}', str(i % 320), f'{i:,.0f}'] for i in range(quantidade)]
+
+
+class TabelaPaginadaTests(SimpleTestCase):
+    def test_estilo_compartilhado(self):
+        self.assertIs(estilo_tabela('#2980b9'), estilo_tabela('#2980b9'))
+        self.assertIsNot(estilo_tabela('#2980b9'), estilo_tabela('#2980b9', fonte=8))
+
+    def test_uma_tabela_por_pagina_com_o_cabecalho(self):
+        linhas = _linhas(100)
+        estilo = estilo_tabela('#2980b9')
+        tabela = TabelaPaginada(CABECALHO, linhas, LARGURAS, estilo)
+        self.assertEqual(tabela.wrap(800, 500)[1], tabela.altura_cabecalho + 100 * ALTURA_LINHA)
+
+        paginas = []
+        while tabela.wrap(800, 500)[1] > 500:
+            pagina, tabela = tabela.split(800, 500)
+            paginas.append(pagina)
+        paginas.append(tabela._tabela(len(linhas)))
+
+        cabem = int((500 - tabela.altura_cabecalho) // ALTURA_LINHA)
+        self.assertEqual([len(pagina._cellvalues) - 1 for pagina in paginas[:-1]], [cabem] * (len(paginas) - 1))
+        for pagina in paginas:
+            self.assertIsInstance(pagina, Table)
+            self.assertEqual(pagina._cellvalues[0], CABECALHO)
+            self.assertEqual(pagina._argW, LARGURAS)
+        self.assertEqual([linha for pagina in paginas for linha in pagina._cellvalues[1:]], linhas)
+
+    def test_sem_espaco_comeca_na_proxima_pagina(self):
+        tabela = TabelaPaginada(CABECALHO, _linhas(10), LARGURAS, estilo_tabela('#2980b9'))
+        self.assertEqual(tabela.split(800, tabela.altura_cabecalho + ALTURA_LINHA - 1), [])
+
+    def test_documento(self):
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=landscape(A4), topMargin=30, bottomMargin=18)
+        doc.build([TabelaPaginada(CABECALHO, _linhas(1000), LARGURAS, estilo_tabela('#2980b9'))])
+
+        # Cabeçalho e 28 linhas por página
+        self.assertEqual(doc.page, 36)
+        self.assertTrue(buffer.getvalue().startswith(b'%PDF'))
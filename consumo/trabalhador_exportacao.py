@@ -0,0 +1,16 @@
+"""
+Ponto de entrada dos processos do pool de exportação.
+
+Os processos são criados com spawn e importam este módulo antes do
+django.setup(); por isso ele não importa nada que dependa dos models.
+"""
+
+
+def iniciar():
+    import django
+    django.setup()
+
+
+def executar(pk):
+    from .exportacoes import executar
+    return executar(pk)
@@ -6,6 +6,8 @@ router = DefaultRouter()
 router.register(r'lotes', views.LoteViewSet, basename='lote')
 router.register(r'hidrometros', views.HidrometroViewSet, basename='hidrometro')
 router.register(r'leituras', views.LeituraViewSet, basename='leitura')
+router.register(r'graficos', views.GraficosViewSet, basename='graficos')
+router.register(r'exportacoes', views.ExportacaoViewSet, basename='exportacao')
 
 app_name = 'consumo'
 
@@ -13,6 +15,13 @@ urlpatterns = [
     # API endpoints
     path('api/', include(router.urls)),
     
+    # API assíncrona (ASGI)
+    path('api/async/leituras/ultimas_leituras/', views.ultimas_leituras_async, name='async-ultimas-leituras'),
+    path('api/async/hidrometros/<int:pk>/leituras_periodo/', views.leituras_periodo_async, name='async-leituras-periodo'),
+    path('api/async/hidrometros/<int:pk>/estatisticas/', views.estatisticas_async, name='async-estatisticas'),
+    path('api/async/lotes/<int:pk>/consumo_total/', views.consumo_total_async, name='async-consumo-total'),
+    path('api/async/graficos/', views.dados_graficos_async, name='async-dados-graficos'),
+    
     # Views HTML
     path('', views.dashboard, name='dashboard'),
     path('hidrometros/', views.listar_hidrometros, name='listar_hidrometros'),
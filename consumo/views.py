@@ -1,86 +1,321 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, get_object_or_404
+from django.urls import reverse
 from django.utils import timezone
-from django.db.models import Sum, Avg, Max, Min, Count, Q
-from django.http import HttpResponse
-from rest_framework import viewsets, filters, status
+from django.utils.dateparse import parse_date
+from django.db.models import Sum, Max, Count, Q, Case, When, F, Value, OuterRef, Subquery, Window
+from django.db.models.functions import Lag
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import require_GET
+from rest_framework import viewsets, filters, mixins, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
-from datetime import timedelta, datetime
+from rest_framework.utils.encoders import JSONEncoder
+from datetime import timedelta
+import asyncio
+import csv
 import json
 import io
-import os
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill
-from openpyxl.chart import BarChart, PieChart, LineChart, Reference
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
-
-from .models import Lote, Hidrometro, Leitura
+import tempfile
+
+from .agregacao import (
+    acalcular_consumo_consolidado, acomparativo_anual, aconsumo_total_lotes,
+    calcular_consumo_consolidado, consumo_total_lotes,
+)
+from .exportacao_leituras import filtrar_leituras
+from .estatisticas import DIAS_MAXIMO, aestatisticas_hidrometros, estatisticas_hidrometros
+from . import cache_graficos, exportacao_leituras, exportacoes, relatorios
+from .condicional import condicional_condominio, condicional_lote
+from .graficos import (
+    CONJUNTOS_CONDOMINIO, CONJUNTOS_LOTE, calcular_dados_graficos, conjuntos_colunares,
+    hidrometros_graficos, montar_dados_graficos, periodo_graficos, periodo_graficos_lote,
+)
+from .importacao import LEITORES, formato_pelo_nome, gravar_leituras_em_lote, importar_leituras
+from .ranking import ranking_lotes
+from .models import Lote, Hidrometro, Leitura, HidrometroEstado, Exportacao
 from .serializers import (
     LoteSerializer, 
     HidrometroSerializer, 
     LeituraSerializer,
-    LeituraCreateSerializer
+    LeituraCreateSerializer,
+    ExportacaoSerializer,
+    ExportacaoCreateSerializer,
 )
 
 
+def _parametro_data(parametros, nome, padrao):
+    """Data AAAA-MM-DD de um parâmetro opcional; ValueError se informada em outro formato"""
+    valor = parametros.get(nome)
+    if not valor:
+        return padrao
+    data = parse_date(valor)
+    if data is None:
+        raise ValueError(f'{nome} inválida: {valor}')
+    return data
+
+
+def _periodo_obrigatorio(parametros):
+    """(data_inicio, data_fim) obrigatórios no formato AAAA-MM-DD; ValueError com a mensagem de erro"""
+    data_inicio = parametros.get('data_inicio')
+    data_fim = parametros.get('data_fim')
+    if not data_inicio or not data_fim:
+        raise ValueError('Parâmetros data_inicio e data_fim são obrigatórios')
+    try:
+        inicio = parse_date(data_inicio)
+        fim = parse_date(data_fim)
+    except ValueError:
+        inicio = fim = None
+    if not inicio or not fim:
+        raise ValueError('Datas devem estar no formato AAAA-MM-DD')
+    return inicio, fim
+
+
+def _parametro_dias(parametros):
+    """Janela em dias (1 a DIAS_MAXIMO, padrão 30); ValueError com a mensagem de erro"""
+    try:
+        dias = int(parametros.get('dias', 30))
+    except ValueError:
+        dias = 0
+    if not 1 <= dias <= DIAS_MAXIMO:
+        raise ValueError(f'dias deve ser um inteiro entre 1 e {DIAS_MAXIMO}')
+    return dias
+
+
+def _hidrometros_com_estado():
+    """Hidrômetros ativos já lidos, com lote e estado denormalizado"""
+    return (
+        Hidrometro.objects.filter(ativo=True, estado__ultima_data_leitura__isnull=False)
+        .select_related('lote', 'estado')
+    )
+
+
+def _ultima_leitura(hidrometro):
+    estado = hidrometro.estado
+    return {
+        'hidrometro': hidrometro.numero,
+        'lote': hidrometro.lote.numero,
+        'leitura': float(estado.ultima_leitura),
+        'data_leitura': estado.ultima_data_leitura,
+        'periodo': estado.ultimo_periodo
+    }
+
+
+def _com_leituras_do_dia(hidrometros):
+    """Anota a primeira e a última leitura do dia (local) de cada hidrômetro com subconsultas"""
+    do_dia = Leitura.objects.filter(hidrometro=OuterRef('pk'), data_leitura__date=timezone.localdate())
+    return hidrometros.select_related('lote').annotate(
+        primeira_leitura_hoje=Subquery(do_dia.order_by('data_leitura').values('leitura')[:1]),
+        ultima_leitura_hoje=Subquery(do_dia.order_by('-data_leitura').values('leitura')[:1]),
+    )
+
+
+def _com_leitura_anterior(leituras):
+    """Anota a leitura anterior do mesmo hidrômetro (função de janela) e traz hidrômetro e lote no JOIN.
+
+    A janela enxerga só as linhas filtradas: use quando os filtros não cortam a
+    sequência de um hidrômetro no meio (período manhã/tarde, busca por responsável).
+    """
+    return leituras.select_related('hidrometro__lote').annotate(
+        leitura_anterior=Window(
+            Lag('leitura'),
+            partition_by=[F('hidrometro_id')],
+            order_by=F('data_leitura').asc(),
+        )
+    )
+
+
+def _anotar_leitura_anterior(leituras):
+    """Anota em cada leitura (já carregada) o valor da anterior do mesmo hidrômetro, em uma consulta"""
+    if not leituras:
+        return
+    anterior = Leitura.objects.filter(
+        hidrometro=OuterRef('hidrometro'), data_leitura__lt=OuterRef('data_leitura'),
+    ).order_by('-data_leitura')
+    anteriores = dict(
+        Leitura.objects.filter(id__in=[leitura.id for leitura in leituras])
+        .annotate(anterior=Subquery(anterior.values('leitura')[:1]))
+        .values_list('id', 'anterior')
+    )
+    for leitura in leituras:
+        # Primeira leitura do hidrômetro: consumo zero
+        valor = anteriores.get(leitura.id)
+        leitura.leitura_anterior = valor if valor is not None else leitura.leitura
+
+
+def _em_fluxo(request, response):
+    """Resposta em fluxo que, sob ASGI, continua em fluxo.
+
+    Com um iterador síncrono, o ASGIHandler do Django junta o corpo inteiro com
+    sync_to_async(list) antes de enviar o primeiro byte. Sob ASGI o iterador vira
+    assíncrono, com cada pedaço lido em sync_to_async (na mesma thread da view,
+    a do cursor do banco); sob WSGI a resposta fica como está.
+    """
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        response.streaming_content = _pedacos_async(response.streaming_content)
+    return response
+
+
+async def _pedacos_async(pedacos):
+    pedacos = iter(pedacos)
+    proximo = sync_to_async(next, thread_sensitive=True)
+    while (pedaco := await proximo(pedacos, None)) is not None:
+        yield pedaco
+
+
+def _resposta_arquivo(request, arquivo, nome_arquivo, content_type):
+    """Arquivo para download, lido em blocos de 64 KB e fechado ao fim da resposta"""
+    response = FileResponse(arquivo, as_attachment=True, filename=nome_arquivo, content_type=content_type)
+    response.block_size = exportacoes.TAMANHO_BLOCO
+    return _em_fluxo(request, response)
+
+
 class LoteViewSet(viewsets.ModelViewSet):
     """API endpoint para gerenciar lotes"""
     queryset = Lote.objects.all()
     serializer_class = LoteSerializer
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['numero', 'endereco']
-    ordering_fields = ['numero', 'tipo', 'criado_em']
+    ordering_fields = ['numero', 'tipo', 'criado_em', 'total_hidrometros', 'ultima_data_leitura', 'consumo_mes_litros']
     ordering = ['numero']
     
+    def get_queryset(self):
+        # Contagem de hidrômetros ativos e resumo do estado dos hidrômetros em uma
+        # única consulta agrupada (ordenáveis e filtráveis sem consultas por lote)
+        mes = timezone.localdate().replace(day=1)
+        queryset = Lote.objects.annotate(
+            total_hidrometros=Count('hidrometros', filter=Q(hidrometros__ativo=True)),
+            ultima_data_leitura=Max('hidrometros__estado__ultima_data_leitura'),
+            consumo_mes_litros=Sum('hidrometros__estado__litros_mes', filter=Q(hidrometros__estado__mes=mes)),
+        )
+        min_hidrometros = self.request.query_params.get('min_hidrometros')
+        
+        if min_hidrometros:
+            try:
+                queryset = queryset.filter(total_hidrometros__gte=int(min_hidrometros))
+            except ValueError:
+                raise ValidationError({'error': f'min_hidrometros inválido: {min_hidrometros}'})
+        
+        return queryset
+    
     @action(detail=True, methods=['get'])
     def hidrometros(self, request, pk=None):
         """Retorna todos os hidrômetros de um lote"""
         lote = self.get_object()
-        hidrometros = lote.hidrometros.filter(ativo=True)
+        hidrometros = _com_leituras_do_dia(lote.hidrometros.filter(ativo=True))
         serializer = HidrometroSerializer(hidrometros, many=True)
         return Response(serializer.data)
     
+    def _periodo_obrigatorio(self, request):
+        """(data_inicio, data_fim, None) ou (None, None, Response de erro)"""
+        try:
+            inicio, fim = _periodo_obrigatorio(request.query_params)
+        except ValueError as erro:
+            return None, None, Response({'error': str(erro)}, status=status.HTTP_400_BAD_REQUEST)
+        return inicio, fim, None
+    
     @action(detail=True, methods=['get'])
     def consumo_total(self, request, pk=None):
         """Retorna o consumo total de um lote em um período"""
         lote = self.get_object()
-        data_inicio = request.query_params.get('data_inicio')
-        data_fim = request.query_params.get('data_fim')
+        inicio, fim, erro = self._periodo_obrigatorio(request)
+        if erro:
+            return erro
         
-        if not data_inicio or not data_fim:
+        # Soma da consolidação diária dos hidrômetros ativos do lote
+        litros = consumo_total_lotes([lote.id], inicio, fim).get(lote.id, 0.0)
+        
+        return Response({
+            'lote': lote.numero,
+            'periodo': f'{inicio.isoformat()} a {fim.isoformat()}',
+            'consumo_total_m3': litros / 1000
+        })
+    
+    @action(detail=False, methods=['get'], url_path='consumo_total', url_name='consumo-total-em-lote')
+    def consumo_total_em_lote(self, request):
+        """Consumo total de vários lotes (?lotes=1,2,3; padrão: todos) no período, em JSON ou CSV (?formato=csv)"""
+        inicio, fim, erro = self._periodo_obrigatorio(request)
+        if erro:
+            return erro
+        
+        lotes = Lote.objects.order_by('numero')
+        lote_ids = None
+        if request.query_params.get('lotes'):
+            try:
+                lote_ids = [int(lote_id) for lote_id in request.query_params['lotes'].split(',')]
+            except ValueError:
+                return Response(
+                    {'error': 'lotes deve ser uma lista de ids separados por vírgula'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            lotes = lotes.filter(id__in=lote_ids)
+        
+        totais = consumo_total_lotes(lote_ids, inicio, fim)
+        periodo = f'{inicio.isoformat()} a {fim.isoformat()}'
+        linhas = [
+            {
+                'lote_id': lote_id,
+                'lote': numero,
+                'consumo_total_m3': totais.get(lote_id, 0.0) / 1000,
+            }
+            for lote_id, numero in lotes.values_list('id', 'numero')
+        ]
+        
+        if request.query_params.get('formato') == 'csv':
+            response = HttpResponse(content_type='text/csv; charset=utf-8')
+            response['Content-Disposition'] = (
+                f'attachment; filename="consumo_lotes_{inicio:%Y%m%d}_{fim:%Y%m%d}.csv"'
+            )
+            writer = csv.writer(response)
+            writer.writerow(['lote_id', 'lote', 'periodo', 'consumo_total_m3'])
+            for linha in linhas:
+                writer.writerow([linha['lote_id'], linha['lote'], periodo, f"{linha['consumo_total_m3']:.3f}"])
+            return response
+        
+        return Response({'periodo': periodo, 'lotes': linhas})
+    
+    @action(detail=False, methods=['get'])
+    def ranking(self, request):
+        """Ranking de lotes por consumo no período (top-N, bottom-N e percentil)"""
+        hoje = timezone.localdate()
+        try:
+            inicio = _parametro_data(request.query_params, 'data_inicio', hoje - timedelta(days=30))
+            fim = _parametro_data(request.query_params, 'data_fim', hoje)
+            n = int(request.query_params.get('n', 10))
+        except ValueError:
             return Response(
-                {'error': 'Parâmetros data_inicio e data_fim são obrigatórios'},
+                {'error': 'Datas devem estar no formato AAAA-MM-DD e n deve ser inteiro'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not 1 <= n <= 100:
+            return Response(
+                {'error': 'n deve estar entre 1 e 100'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        leituras = Leitura.objects.filter(
-            hidrometro__lote=lote,
-            data_leitura__range=[data_inicio, data_fim]
-        )
-        
-        consumo_total = 0
-        for hidrometro in lote.hidrometros.filter(ativo=True):
-            leituras_h = leituras.filter(hidrometro=hidrometro).order_by('data_leitura')
-            if leituras_h.exists():
-                primeira = leituras_h.first()
-                ultima = leituras_h.last()
-                consumo_total += float(ultima.leitura - primeira.leitura)
+        tipo = request.query_params.get('tipo', 'residencial')
+        ranking = ranking_lotes(inicio, fim, tipo=None if tipo == 'todos' else tipo)
         
-        return Response({
-            'lote': lote.numero,
-            'periodo': f'{data_inicio} a {data_fim}',
-            'consumo_total_m3': consumo_total
-        })
+        dados = {
+            'periodo': f'{inicio.isoformat()} a {fim.isoformat()}',
+            'total_lotes': len(ranking),
+            'top': ranking.top(n),
+            'bottom': ranking.bottom(n),
+        }
+        lote_id = request.query_params.get('lote')
+        if lote_id and lote_id.isdigit():
+            dados['lote'] = ranking.posicao(int(lote_id))
+        return Response(dados)
 
 
 class HidrometroViewSet(viewsets.ModelViewSet):
     """API endpoint para gerenciar hidrômetros"""
-    queryset = Hidrometro.objects.all()
+    queryset = Hidrometro.objects.select_related('lote')
     serializer_class = HidrometroSerializer
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['numero', 'lote__numero', 'localizacao']
@@ -88,7 +323,7 @@ class HidrometroViewSet(viewsets.ModelViewSet):
     ordering = ['numero']
     
     def get_queryset(self):
-        queryset = Hidrometro.objects.all()
+        queryset = _com_leituras_do_dia(Hidrometro.objects.all())
         lote_id = self.request.query_params.get('lote', None)
         ativo = self.request.query_params.get('ativo', None)
         
@@ -99,6 +334,11 @@ class HidrometroViewSet(viewsets.ModelViewSet):
         
         return queryset
     
+    @method_decorator(condicional_condominio)
+    def list(self, request, *args, **kwargs):
+        # 304 pela versão dos dados antes de montar a lista
+        return super().list(request, *args, **kwargs)
+    
     @action(detail=True, methods=['get'])
     def leituras_periodo(self, request, pk=None):
         """Retorna leituras de um hidrômetro em um período"""
@@ -112,38 +352,56 @@ class HidrometroViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        leituras = hidrometro.leituras.filter(
+        leituras = _com_leitura_anterior(hidrometro.leituras.filter(
             data_leitura__range=[data_inicio, data_fim]
-        ).order_by('data_leitura')
+        )).order_by('data_leitura')
         
         serializer = LeituraSerializer(leituras, many=True)
         return Response(serializer.data)
     
+    def _parametro_dias(self, request):
+        """Janela em dias (1 a DIAS_MAXIMO, padrão 30) ou Response de erro"""
+        try:
+            return _parametro_dias(request.query_params), None
+        except ValueError as erro:
+            return None, Response({'error': str(erro)}, status=status.HTTP_400_BAD_REQUEST)
+    
     @action(detail=True, methods=['get'])
     def estatisticas(self, request, pk=None):
         """Retorna estatísticas de consumo de um hidrômetro"""
         hidrometro = self.get_object()
-        dias = int(request.query_params.get('dias', 30))
+        dias, erro = self._parametro_dias(request)
+        if erro:
+            return erro
         
-        data_inicio = timezone.now() - timedelta(days=dias)
-        leituras = hidrometro.leituras.filter(data_leitura__gte=data_inicio).order_by('data_leitura')
-        
-        if not leituras.exists():
+        estatisticas = estatisticas_hidrometros([hidrometro], dias)[0]
+        if not estatisticas['total_leituras']:
             return Response({'message': 'Sem leituras no período especificado'})
+        return Response(estatisticas)
+    
+    @action(detail=False, methods=['get'], url_path='estatisticas', url_name='estatisticas-em-lote')
+    def estatisticas_em_lote(self, request):
+        """Estatísticas de vários hidrômetros (padrão: ativos; ?ids=1,2, ?lote= e ?search= filtram)"""
+        dias, erro = self._parametro_dias(request)
+        if erro:
+            return erro
         
-        primeira_leitura = leituras.first()
-        ultima_leitura = leituras.last()
-        consumo_total = float(ultima_leitura.leitura - primeira_leitura.leitura)
-        consumo_medio_dia = consumo_total / dias if dias > 0 else 0
+        hidrometros = self.filter_queryset(self.get_queryset())
+        if 'ativo' not in request.query_params:
+            hidrometros = hidrometros.filter(ativo=True)
+        if request.query_params.get('ids'):
+            try:
+                ids = [int(hidrometro_id) for hidrometro_id in request.query_params['ids'].split(',')]
+            except ValueError:
+                return Response(
+                    {'error': 'ids deve ser uma lista de ids separados por vírgula'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            hidrometros = hidrometros.filter(id__in=ids)
         
         return Response({
-            'hidrometro': hidrometro.numero,
             'periodo_dias': dias,
-            'total_leituras': leituras.count(),
-            'consumo_total_m3': consumo_total,
-            'consumo_medio_dia_m3': round(consumo_medio_dia, 3),
-            'primeira_leitura': primeira_leitura.leitura,
-            'ultima_leitura': ultima_leitura.leitura
+            'hidrometros': estatisticas_hidrometros(hidrometros, dias),
         })
 
 
@@ -161,40 +419,48 @@ class LeituraViewSet(viewsets.ModelViewSet):
         return LeituraSerializer
     
     def get_queryset(self):
-        queryset = Leitura.objects.all()
-        hidrometro_id = self.request.query_params.get('hidrometro', None)
-        data_inicio = self.request.query_params.get('data_inicio', None)
-        data_fim = self.request.query_params.get('data_fim', None)
-        periodo = self.request.query_params.get('periodo', None)
+        return filtrar_leituras(Leitura.objects.select_related('hidrometro__lote'), self.request.query_params)
+    
+    def paginate_queryset(self, queryset):
+        # A coluna consumo_m3 já traz o delta; só as leituras da página sem ela
+        # buscam a anterior (uma consulta), sem janela sobre a tabela inteira
+        pagina = super().paginate_queryset(queryset)
+        if pagina is not None:
+            _anotar_leitura_anterior([leitura for leitura in pagina if leitura.consumo_m3 is None])
+        return pagina
+    
+    @method_decorator(condicional_condominio)
+    def list(self, request, *args, **kwargs):
+        # 304 pela versão dos dados antes de montar a lista
+        return super().list(request, *args, **kwargs)
+    
+    @action(detail=False, methods=['get'])
+    def exportar(self, request):
+        """Leituras filtradas em CSV (?formato=csv) ou CSV comprimido (?formato=csv.gz), em fluxo"""
+        formato = request.query_params.get('formato', 'csv')
+        if formato not in exportacao_leituras.FORMATOS:
+            return Response(
+                {'error': 'Formato inválido: use formato=csv ou formato=csv.gz'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        if hidrometro_id:
-            queryset = queryset.filter(hidrometro_id=hidrometro_id)
-        if data_inicio:
-            queryset = queryset.filter(data_leitura__gte=data_inicio)
-        if data_fim:
-            queryset = queryset.filter(data_leitura__lte=data_fim)
-        if periodo:
-            queryset = queryset.filter(periodo=periodo)
+        try:
+            pedacos = exportacao_leituras.gerar_bytes(request.query_params, formato)
+        except (DjangoValidationError, ValueError):
+            return Response(
+                {'error': 'Filtro inválido: hidrometro deve ser um id e data_inicio/data_fim datas (AAAA-MM-DD)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        return queryset
+        response = StreamingHttpResponse(pedacos, content_type=exportacao_leituras.FORMATOS[formato])
+        response['Content-Disposition'] = f'attachment; filename="{exportacao_leituras.nome_arquivo(formato)}"'
+        return _em_fluxo(request, response)
     
     @action(detail=False, methods=['get'])
     def ultimas_leituras(self, request):
         """Retorna as últimas leituras de todos os hidrômetros ativos"""
-        hidrometros = Hidrometro.objects.filter(ativo=True)
-        resultado = []
-        
-        for hidrometro in hidrometros:
-            ultima_leitura = hidrometro.leituras.order_by('-data_leitura').first()
-            if ultima_leitura:
-                resultado.append({
-                    'hidrometro': hidrometro.numero,
-                    'lote': hidrometro.lote.numero,
-                    'leitura': float(ultima_leitura.leitura),
-                    'data_leitura': ultima_leitura.data_leitura,
-                    'periodo': ultima_leitura.periodo
-                })
-        
+        # Última leitura de cada hidrômetro lida do estado denormalizado (uma consulta)
+        resultado = [_ultima_leitura(hidrometro) for hidrometro in _hidrometros_com_estado()]
         return Response(resultado)
     
     @action(detail=False, methods=['post'])
@@ -208,19 +474,9 @@ class LeituraViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        criadas = []
-        erros = []
-        
-        for leitura_data in leituras_data:
-            serializer = LeituraCreateSerializer(data=leitura_data)
-            if serializer.is_valid():
-                serializer.save()
-                criadas.append(serializer.data)
-            else:
-                erros.append({
-                    'dados': leitura_data,
-                    'erros': serializer.errors
-                })
+        # Validação em conjunto e um bulk_create; consolidação uma vez por hidrômetro
+        novas, erros = gravar_leituras_em_lote(leituras_data)
+        criadas = [LeituraCreateSerializer(leitura).data for leitura in novas]
         
         return Response({
             'criadas': len(criadas),
@@ -228,6 +484,300 @@ class LeituraViewSet(viewsets.ModelViewSet):
             'leituras_criadas': criadas,
             'leituras_com_erro': erros
         }, status=status.HTTP_201_CREATED if criadas else status.HTTP_400_BAD_REQUEST)
+    
+    @action(detail=False, methods=['post'], parser_classes=[MultiPartParser])
+    def importar(self, request):
+        """Importa leituras de uma planilha CSV ou NDJSON enviada no campo `arquivo`"""
+        arquivo = request.FILES.get('arquivo')
+        if arquivo is None:
+            return Response(
+                {'error': 'Envie o arquivo CSV ou NDJSON no campo "arquivo"'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        formato = request.data.get('formato') or formato_pelo_nome(arquivo.name)
+        if formato not in LEITORES:
+            return Response(
+                {'error': 'Formato não reconhecido: use formato=csv ou formato=ndjson'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Arquivo lido em blocos; linhas rejeitadas vão para um relatório CSV em
+        # arquivo temporário, guardado como exportação e baixado por /download/
+        with tempfile.TemporaryFile() as bruto:
+            relatorio = io.TextIOWrapper(bruto, encoding='utf-8', newline='')
+            try:
+                resultado = importar_leituras(
+                    io.TextIOWrapper(arquivo.file, encoding='utf-8-sig', newline=''),
+                    formato,
+                    relatorio=relatorio,
+                )
+            except UnicodeDecodeError:
+                return Response(
+                    {'error': 'O arquivo deve estar em UTF-8 (blocos anteriores ao erro já foram gravados)'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            finally:
+                # Grava o que falta no arquivo temporário sem fechá-lo
+                relatorio.detach()
+            resultado['url_relatorio'] = None
+            if resultado['erros']:
+                exportacao = exportacoes.guardar_relatorio_importacao(bruto)
+                resultado['url_relatorio'] = request.build_absolute_uri(
+                    reverse('consumo:exportacao-download', args=[exportacao.pk])
+                )
+        
+        return Response(
+            resultado,
+            status=status.HTTP_201_CREATED if resultado['criadas'] else status.HTTP_400_BAD_REQUEST
+        )
+
+
+class ExportacaoViewSet(mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """Fila de exportação dos relatórios em PDF/Excel.
+    
+    POST enfileira (202) ou reaproveita a exportação igual já pedida (200 se pronta);
+    GET /api/exportacoes/{id}/ acompanha o status e /download/ entrega o arquivo.
+    """
+    queryset = Exportacao.objects.select_related('lote')
+    serializer_class = ExportacaoSerializer
+    
+    def create(self, request, *args, **kwargs):
+        pedido = ExportacaoCreateSerializer(data=request.data)
+        pedido.is_valid(raise_exception=True)
+        exportacao, _criada = exportacoes.enfileirar(
+            pedido.validated_data['relatorio'],
+            pedido.validated_data['formato'],
+            pedido.parametros(),
+            lote=pedido.validated_data['lote'],
+        )
+        
+        dados = self.get_serializer(exportacao).data
+        if exportacao.status == 'concluida':
+            return Response(dados, status=status.HTTP_200_OK)
+        resposta = Response(dados, status=status.HTTP_202_ACCEPTED, headers={'Location': dados['url']})
+        resposta['Retry-After'] = str(exportacoes.INTERVALO)
+        return resposta
+    
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Arquivo da exportação concluída (409 enquanto não fica pronta ou se o arquivo sumiu e voltou para a fila;
+        410 se sumiu o relatório de uma importação, que não é gerado de novo)"""
+        exportacao = self.get_object()
+        if exportacao.status == 'concluida':
+            try:
+                arquivo = exportacao.arquivo.open('rb')
+            except FileNotFoundError:
+                if exportacao.relatorio == 'importacao':
+                    # Relatório de uma importação: não há como gerar de novo
+                    return Response(
+                        {'error': 'Relatório de erros da importação não está mais disponível'},
+                        status=status.HTTP_410_GONE,
+                    )
+                exportacoes.regenerar(exportacao)
+            else:
+                return _resposta_arquivo(
+                    request, arquivo, exportacao.nome_arquivo, relatorios.CONTENT_TYPES[exportacao.formato],
+                )
+        resposta = Response(
+            {'error': f'Exportação {exportacao.get_status_display().lower()}', 'status': exportacao.status},
+            status=status.HTTP_409_CONFLICT,
+        )
+        if exportacao.status in ('pendente', 'processando'):
+            resposta['Retry-After'] = str(exportacoes.INTERVALO)
+        return resposta
+
+
+class GraficosViewSet(viewsets.ViewSet):
+    """Dados dos gráficos em formato colunar ({coluna: [valores]}), um conjunto por gráfico.
+
+    ?conjunto=por_dia,por_mes limita aos conjuntos pedidos; o filtro de período
+    é o mesmo das páginas (?periodo=, data_inicio, data_fim).
+    """
+    MAX_AGE = 5 * 60
+    
+    def _nomes_conjuntos(self, request, definicoes):
+        pedidos = request.query_params.get('conjunto')
+        if not pedidos:
+            return list(definicoes)
+        nomes = pedidos.split(',')
+        invalidos = [nome for nome in nomes if nome not in definicoes]
+        if invalidos:
+            raise ValidationError({
+                'error': f"conjunto inválido: {', '.join(invalidos)} (opções: {', '.join(definicoes)})"
+            })
+        return nomes
+    
+    def _resposta(self, dados):
+        resposta = Response(dados)
+        # Leituras chegam duas vezes ao dia: cache curto no navegador, depois revalida pelo ETag
+        patch_cache_control(resposta, private=True, max_age=self.MAX_AGE)
+        return resposta
+    
+    @action(detail=False, methods=['get'])
+    @method_decorator(condicional_condominio)
+    def consumo(self, request):
+        """Gráficos do condomínio: por_dia, por_mes, comparativo_anual, top_lotes e por_hidrometro"""
+        nomes = self._nomes_conjuntos(request, CONJUNTOS_CONDOMINIO)
+        _periodo, dados = _dados_graficos_condominio(request.query_params)
+        comparativo = dados['comparativo_anual']
+        return self._resposta({
+            'periodo': {'selecionado': dados['periodo_selecionado'], 'label': dados['periodo_label']},
+            'resumo': {
+                'consumo_total_litros': dados['consumo_total_ano'],
+                'ano': comparativo['ano'],
+                'ano_anterior': comparativo['ano_anterior'],
+                'total_ano': comparativo['total_ano'],
+                'total_ano_anterior': comparativo['total_ano_anterior'],
+            },
+            'conjuntos': conjuntos_colunares(dados, CONJUNTOS_CONDOMINIO, nomes),
+        })
+    
+    @action(detail=False, methods=['get'], url_path=r'lotes/(?P<lote_id>[0-9]+)', url_name='lote')
+    @method_decorator(condicional_lote)
+    def lote(self, request, lote_id=None):
+        """Gráficos de um lote: por_dia e por_mes"""
+        lote = get_object_or_404(Lote, id=lote_id)
+        nomes = self._nomes_conjuntos(request, CONJUNTOS_LOTE)
+        dados = _dados_graficos_lote(lote, request.query_params)
+        return self._resposta({
+            'periodo': {'selecionado': dados['periodo_selecionado'], 'label': dados['periodo_label']},
+            'resumo': {
+                'lote': dados['lote'],
+                'tipo': dados['tipo'],
+                'consumo_total_litros': dados['consumo_total_periodo'],
+            },
+            'conjuntos': conjuntos_colunares(dados, CONJUNTOS_LOTE, nomes),
+        })
+
+
+# API assíncrona (ASGI)
+# Versões async das ações de leitura mais consultadas pelos tablets: usam o ORM
+# assíncrono e disparam as consultas independentes juntas com asyncio.gather.
+# Respondem o mesmo JSON das ações equivalentes dos ViewSets.
+
+def _resposta_json(dados, status=200):
+    # Mesmo encoder do JSONRenderer do DRF (datas ISO 8601, Decimal como número)
+    return JsonResponse(
+        dados, status=status, safe=False, encoder=JSONEncoder, json_dumps_params={'ensure_ascii': False}
+    )
+
+
+def _nao_encontrado():
+    return _resposta_json({'detail': str(NotFound.default_detail)}, status=404)
+
+
+async def _alistar(consulta):
+    return [objeto async for objeto in consulta]
+
+
+async def _aobter(modelo, pk):
+    try:
+        return await modelo.objects.aget(pk=pk)
+    except modelo.DoesNotExist:
+        return None
+
+
+async def _aerro_parametro(modelo, pk, erro):
+    """404 se o objeto não existe (como get_object nos ViewSets); senão 400 com o erro"""
+    if not await modelo.objects.filter(pk=pk).aexists():
+        return _nao_encontrado()
+    return _resposta_json({'error': str(erro)}, status=400)
+
+
+@require_GET
+async def ultimas_leituras_async(request):
+    """Versão assíncrona de LeituraViewSet.ultimas_leituras"""
+    resultado = [_ultima_leitura(hidrometro) async for hidrometro in _hidrometros_com_estado()]
+    return _resposta_json(resultado)
+
+
+@require_GET
+async def leituras_periodo_async(request, pk):
+    """Versão assíncrona de HidrometroViewSet.leituras_periodo"""
+    data_inicio = request.GET.get('data_inicio')
+    data_fim = request.GET.get('data_fim')
+    if not data_inicio or not data_fim:
+        return await _aerro_parametro(Hidrometro, pk, 'Parâmetros data_inicio e data_fim são obrigatórios')
+    
+    leituras = _com_leitura_anterior(Leitura.objects.filter(
+        hidrometro_id=pk, data_leitura__range=[data_inicio, data_fim]
+    )).order_by('data_leitura')
+    hidrometro, leituras = await asyncio.gather(
+        _aobter(Hidrometro, pk), _alistar(leituras)
+    )
+    if hidrometro is None:
+        return _nao_encontrado()
+    
+    dados = await sync_to_async(lambda: LeituraSerializer(leituras, many=True).data)()
+    return _resposta_json(dados)
+
+
+@require_GET
+async def estatisticas_async(request, pk):
+    """Versão assíncrona de HidrometroViewSet.estatisticas"""
+    hidrometro = await _aobter(Hidrometro, pk)
+    if hidrometro is None:
+        return _nao_encontrado()
+    try:
+        dias = _parametro_dias(request.GET)
+    except ValueError as erro:
+        return _resposta_json({'error': str(erro)}, status=400)
+    
+    estatisticas = (await aestatisticas_hidrometros([hidrometro], dias))[0]
+    if not estatisticas['total_leituras']:
+        return _resposta_json({'message': 'Sem leituras no período especificado'})
+    return _resposta_json(estatisticas)
+
+
+@require_GET
+async def consumo_total_async(request, pk):
+    """Versão assíncrona de LoteViewSet.consumo_total"""
+    try:
+        inicio, fim = _periodo_obrigatorio(request.GET)
+    except ValueError as erro:
+        return await _aerro_parametro(Lote, pk, erro)
+    
+    lote, totais = await asyncio.gather(
+        _aobter(Lote, pk), aconsumo_total_lotes([pk], inicio, fim)
+    )
+    if lote is None:
+        return _nao_encontrado()
+    
+    return _resposta_json({
+        'lote': lote.numero,
+        'periodo': f'{inicio.isoformat()} a {fim.isoformat()}',
+        'consumo_total_m3': totais.get(lote.id, 0.0) / 1000
+    })
+
+
+@require_GET
+async def dados_graficos_async(request):
+    """Dados dos gráficos de consumo do condomínio (mesmo ?periodo= da página /graficos/) em JSON"""
+    agora = timezone.localtime(timezone.now())
+    periodo = periodo_graficos(request.GET, agora)
+    
+    
+    async def calcular():
+        hidrometros_qs = hidrometros_graficos()
+        # Hidrômetros, consolidação do período e comparativo anual são independentes
+        hidrometros, resultado, comparativo = await asyncio.gather(
+            _alistar(hidrometros_qs),
+            acalcular_consumo_consolidado(hidrometros_qs, periodo['data_inicio'], periodo['data_fim']),
+            acomparativo_anual(hidrometros_qs, agora.year),
+        )
+        return montar_dados_graficos(periodo, agora.year, hidrometros, resultado, comparativo)
+    
+    # Mesma chave e versão da página /graficos/ (_dados_graficos_condominio)
+    dados_graficos = await cache_graficos.aobter_dados(
+        cache_graficos.chave(
+            'condominio', None, periodo['periodo_selecionado'],
+            periodo['data_inicio'], periodo['data_fim'], agora.year,
+        ),
+        await cache_graficos.aversao_condominio(),
+        calcular,
+        lambda: calcular_dados_graficos(periodo, agora.year),
+    )
+    return _resposta_json(dados_graficos)
 
 
 # Views HTML para interface web
@@ -236,8 +786,10 @@ def dashboard(request):
     total_lotes = Lote.objects.filter(ativo=True).count()
     total_hidrometros = Hidrometro.objects.filter(ativo=True).count()
     
-    hoje = timezone.now().date()
-    leituras_hoje = Leitura.objects.filter(data_leitura__date=hoje).count()
+    hoje = timezone.localdate()
+    leituras_hoje = HidrometroEstado.objects.filter(dia=hoje).aggregate(
+        total=Sum('leituras_dia')
+    )['total'] or 0
     
     context = {
         'total_lotes': total_lotes,
@@ -258,8 +810,12 @@ def listar_hidrometros(request):
         Hidrometro.objects.filter(ativo=True)
         .select_related('lote')
         .annotate(
-            leituras_hoje=Count('leituras', filter=Q(leituras__data_leitura__date=hoje)),
-            ultima_leitura=Max('leituras__data_leitura'),
+            # Lidos do estado denormalizado, sem varrer as leituras
+            leituras_hoje=Case(
+                When(estado__dia=hoje, then=F('estado__leituras_dia')),
+                default=Value(0),
+            ),
+            ultima_leitura=F('estado__ultima_data_leitura'),
         )
         .order_by('numero')
     )
@@ -322,107 +878,23 @@ def registrar_leitura(request):
     return render(request, 'consumo/registrar_leitura.html', context)
 
 
-def detalhes_hidrometro(request, hidrometro_id):
-    """Página com detalhes e histórico de leituras do hidrômetro com filtros e gráficos"""
-    from datetime import timedelta
-    from django.db.models import Sum
+def _consumo_dia_mes_lista(resultado):
+    """Monta as séries 'consumo por dia' (dd/mm) e 'consumo por mês' usadas nos gráficos"""
     from collections import defaultdict
     import calendar
     
-    hidrometro = get_object_or_404(Hidrometro, id=hidrometro_id)
-    
-    # Obter filtros de período
-    periodo = request.GET.get('periodo', '30dias')
-    data_inicio_str = request.GET.get('data_inicio', '')
-    data_fim_str = request.GET.get('data_fim', '')
-    
-    hoje = timezone.now().date()
-    data_inicio = None
-    data_fim = hoje
-    periodo_label = ''
-    
-    # Definir período baseado no filtro
-    if periodo == '7dias':
-        data_inicio = hoje - timedelta(days=7)
-        periodo_label = 'Últimos 7 dias'
-    elif periodo == '15dias':
-        data_inicio = hoje - timedelta(days=15)
-        periodo_label = 'Últimos 15 dias'
-    elif periodo == '30dias':
-        data_inicio = hoje - timedelta(days=30)
-        periodo_label = 'Últimos 30 dias'
-    elif periodo == 'mes_atual':
-        data_inicio = hoje.replace(day=1)
-        periodo_label = f'{hoje.strftime("%B de %Y").capitalize()}'
-    elif periodo == 'ano_atual':
-        data_inicio = hoje.replace(month=1, day=1)
-        periodo_label = f'Ano de {hoje.year}'
-    elif periodo == 'personalizado' and data_inicio_str and data_fim_str:
-        try:
-            from datetime import datetime
-            data_inicio = datetime.strptime(data_inicio_str, '%Y-%m-%d').date()
-            data_fim = datetime.strptime(data_fim_str, '%Y-%m-%d').date()
-            periodo_label = f'{data_inicio.strftime("%d/%m/%Y")} a {data_fim.strftime("%d/%m/%Y")}'
-        except:
-            data_inicio = hoje - timedelta(days=30)
-            data_fim = hoje
-            periodo_label = 'Últimos 30 dias'
-            periodo = '30dias'
-    else:
-        data_inicio = hoje - timedelta(days=30)
-        periodo_label = 'Últimos 30 dias'
-    
-    # Obter leituras filtradas
-    leituras = hidrometro.leituras.filter(
-        data_leitura__date__gte=data_inicio,
-        data_leitura__date__lte=data_fim
-    ).order_by('-data_leitura')
-    
-    # Obter todas as leituras para o histórico completo (limitado)
-    leituras_historico = hidrometro.leituras.all().order_by('-data_leitura')[:50]
-    
-    # Calcular consumo total no período
-    consumo_total_periodo = 0
-    leituras_ordenadas = hidrometro.leituras.filter(
-        data_leitura__date__gte=data_inicio,
-        data_leitura__date__lte=data_fim
-    ).order_by('data_leitura')
-    
-    for i, leitura_atual in enumerate(leituras_ordenadas):
-        if i > 0:
-            leitura_anterior = list(leituras_ordenadas)[i-1]
-            diferenca = float(leitura_atual.leitura) - float(leitura_anterior.leitura)
-            if diferenca > 0:
-                consumo_litros = diferenca * 1000
-                consumo_total_periodo += consumo_litros
-    
-    # Preparar dados para gráficos
-    # Gráfico 1: Consumo por Dia
     consumo_por_dia = defaultdict(float)
-    for i, leitura_atual in enumerate(leituras_ordenadas):
-        if i > 0:
-            leitura_anterior = list(leituras_ordenadas)[i-1]
-            diferenca = float(leitura_atual.leitura) - float(leitura_anterior.leitura)
-            if diferenca > 0:
-                consumo_litros = diferenca * 1000
-                dia_str = leitura_atual.data_leitura.strftime('%d/%m')
-                consumo_por_dia[dia_str] += consumo_litros
+    for dia, consumo_litros in resultado.por_dia.items():
+        consumo_por_dia[dia.strftime('%d/%m')] += consumo_litros
     
     consumo_dia_lista = [
         {'dia': dia, 'consumo_litros': consumo}
         for dia, consumo in sorted(consumo_por_dia.items())
     ]
     
-    # Gráfico 2: Consumo por Mês
     consumo_por_mes = defaultdict(float)
-    for i, leitura_atual in enumerate(leituras_ordenadas):
-        if i > 0:
-            leitura_anterior = list(leituras_ordenadas)[i-1]
-            diferenca = float(leitura_atual.leitura) - float(leitura_anterior.leitura)
-            if diferenca > 0:
-                consumo_litros = diferenca * 1000
-                mes_numero = leitura_atual.data_leitura.month
-                consumo_por_mes[mes_numero] += consumo_litros
+    for (_ano, mes), consumo_litros in resultado.por_mes.items():
+        consumo_por_mes[mes] += consumo_litros
     
     consumo_mes_lista = []
     for mes in sorted(consumo_por_mes.keys()):
@@ -433,6 +905,26 @@ def detalhes_hidrometro(request, hidrometro_id):
             'consumo_litros': consumo_por_mes[mes]
         })
     
+    return consumo_dia_lista, consumo_mes_lista
+
+
+def detalhes_hidrometro(request, hidrometro_id):
+    """Página com detalhes e histórico de leituras do hidrômetro com filtros e gráficos"""
+    hidrometro = get_object_or_404(Hidrometro, id=hidrometro_id)
+    
+    # Obter filtros de período (os mesmos da página do lote)
+    data_inicio, data_fim, periodo_label, periodo = periodo_graficos_lote(request.GET, timezone.localdate())
+    
+    # Obter todas as leituras para o histórico completo (limitado)
+    leituras_historico = hidrometro.leituras.all().order_by('-data_leitura')[:50]
+    
+    # Consumo do período a partir da consolidação diária
+    resultado = calcular_consumo_consolidado([hidrometro], data_inicio, data_fim)
+    consumo_total_periodo = resultado.total
+    
+    # Preparar dados para gráficos (consumo por dia e por mês)
+    consumo_dia_lista, consumo_mes_lista = _consumo_dia_mes_lista(resultado)
+    
     # Dados dos gráficos (sem período do dia - removido do template)
     dados_graficos = {
         'consumo_dia': consumo_dia_lista,
@@ -443,7 +935,6 @@ def detalhes_hidrometro(request, hidrometro_id):
     }
     
     # Serializar dados para JSON
-    import json
     dados_graficos_json = json.dumps(dados_graficos, ensure_ascii=False)
     
     context = {
@@ -455,207 +946,32 @@ def detalhes_hidrometro(request, hidrometro_id):
     return render(request, 'consumo/detalhes_hidrometro.html', context)
 
 
-def graficos_consumo(request):
-    """Página com gráficos de consumo do condomínio com filtro de período."""
-
+def _dados_graficos_condominio(parametros):
+    """(periodo, dados_graficos) do condomínio para o filtro ?periodo=, em cache até a próxima leitura"""
     agora = timezone.localtime(timezone.now())
-    hoje = agora
-    ano_atual = hoje.year
-    
-    # Obter o período selecionado (padrão: últimos 30 dias)
-    periodo_selecionado = request.GET.get('periodo', '30dias')
-    
-    # Definir data de início baseada no período selecionado
-    if periodo_selecionado == '7dias':
-        dias_filtrados = 7
-        data_inicio_dias = (hoje - timedelta(days=dias_filtrados - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
-        data_inicio_ano = data_inicio_dias
-        periodo_label = "Últimos 7 dias"
-    elif periodo_selecionado == '15dias':
-        dias_filtrados = 15
-        data_inicio_dias = (hoje - timedelta(days=dias_filtrados - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
-        data_inicio_ano = data_inicio_dias
-        periodo_label = "Últimos 15 dias"
-    elif periodo_selecionado == '30dias':
-        dias_filtrados = 30
-        data_inicio_dias = (hoje - timedelta(days=dias_filtrados - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
-        data_inicio_ano = data_inicio_dias
-        periodo_label = "Últimos 30 dias"
-    elif periodo_selecionado == 'mes_atual':
-        # Mês atual (do dia 1 até hoje)
-        data_inicio_dias = hoje.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        data_inicio_ano = data_inicio_dias
-        dias_filtrados = (hoje - data_inicio_dias).days + 1
-        periodo_label = f"Mês Atual ({hoje.strftime('%B/%Y')})"
-    elif periodo_selecionado == 'ano_atual':
-        # Ano atual (de 1º de janeiro até hoje)
-        data_inicio_ano = timezone.datetime(ano_atual, 1, 1, 0, 0, 0, tzinfo=hoje.tzinfo)
-        data_inicio_dias = data_inicio_ano
-        dias_filtrados = (hoje - data_inicio_ano).days + 1
-        periodo_label = f"Ano Atual ({ano_atual})"
-    elif periodo_selecionado == 'personalizado':
-        # Período personalizado (data_inicio e data_fim via GET)
-        data_inicio_str = request.GET.get('data_inicio')
-        data_fim_str = request.GET.get('data_fim')
-        
-        if data_inicio_str and data_fim_str:
-            try:
-                data_inicio_dias = timezone.datetime.strptime(data_inicio_str, '%Y-%m-%d')
-                data_inicio_dias = timezone.make_aware(data_inicio_dias.replace(hour=0, minute=0, second=0, microsecond=0))
-                data_fim_personalizada = timezone.datetime.strptime(data_fim_str, '%Y-%m-%d')
-                data_fim_personalizada = timezone.make_aware(data_fim_personalizada.replace(hour=23, minute=59, second=59, microsecond=999999))
-                
-                # Limitar data_fim ao hoje se for futuro
-                if data_fim_personalizada > hoje:
-                    data_fim_personalizada = hoje
-                
-                data_inicio_ano = data_inicio_dias
-                dias_filtrados = (data_fim_personalizada - data_inicio_dias).days + 1
-                periodo_label = f"{data_inicio_dias.strftime('%d/%m/%Y')} até {data_fim_personalizada.strftime('%d/%m/%Y')}"
-                hoje = data_fim_personalizada  # Usar data_fim personalizada
-            except (ValueError, TypeError):
-                # Se houver erro, usar padrão (últimos 30 dias)
-                dias_filtrados = 30
-                data_inicio_dias = (hoje - timedelta(days=dias_filtrados - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
-                data_inicio_ano = data_inicio_dias
-                periodo_label = "Últimos 30 dias (erro na data personalizada)"
-        else:
-            # Sem datas fornecidas, usar padrão
-            dias_filtrados = 30
-            data_inicio_dias = (hoje - timedelta(days=dias_filtrados - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
-            data_inicio_ano = data_inicio_dias
-            periodo_label = "Últimos 30 dias"
-    else:
-        # Padrão: últimos 30 dias
-        dias_filtrados = 30
-        data_inicio_dias = (hoje - timedelta(days=dias_filtrados - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
-        data_inicio_ano = data_inicio_dias
-        periodo_label = "Últimos 30 dias"
-    
-    data_fim = hoje
-
-    dados_graficos = {
-        'consumo_por_dia': [],
-        'consumo_mes': [],
-        'consumo_total_ano': 0.0,
-        'top_lotes': [],
-        'consumo_por_hidrometro': [],
-        'periodo_label': periodo_label,
-        'periodo_selecionado': periodo_selecionado,
-        'ano_atual': ano_atual,
-    }
-
-    hidrometros_qs = Hidrometro.objects.filter(
-        ativo=True,
-        lote__tipo='residencial'
-    ).select_related('lote')
-
-    # ================= CONSUMO POR DIA (ÚLTIMOS 30 DIAS) =================
-    consumo_diario = {}
-    datas_periodo = []
-    dia_cursor = data_inicio_dias
-    while dia_cursor.date() <= data_fim.date():
-        consumo_diario[dia_cursor.date()] = 0.0
-        datas_periodo.append(dia_cursor.date())
-        dia_cursor += timedelta(days=1)
-
-    consumo_mensal = {}
-    consumo_total_ano = 0.0
-    consumo_por_lote_ano = {}
-    consumo_por_hidrometro = []
-
-    for hidrometro in hidrometros_qs:
-        # Buscar leituras do período filtrado para calcular o consumo total
-        leituras_ano = hidrometro.leituras.filter(
-            data_leitura__gte=data_inicio_dias,
-            data_leitura__lte=data_fim
-        ).order_by('data_leitura')
-
-        consumo_hidrometro_litros = 0.0
-        if not leituras_ano.exists():
-            continue
-
-        # Calcular consumo do ano (para total e top lotes)
-        for i in range(1, len(leituras_ano)):
-            leitura_atual = leituras_ano[i]
-            leitura_anterior = leituras_ano[i - 1]
-
-            consumo_m3 = float(leitura_atual.leitura - leitura_anterior.leitura)
-            if consumo_m3 < 0:
-                continue
-
-            consumo_litros = consumo_m3 * 1000
-            consumo_total_ano += consumo_litros
-            consumo_hidrometro_litros += consumo_litros
-
-            # Consumo por lote (ano)
-            numero_lote = leitura_atual.hidrometro.lote.numero
-            consumo_por_lote_ano.setdefault(numero_lote, 0.0)
-            consumo_por_lote_ano[numero_lote] += consumo_litros
-
-            # Consumo por mês (ano)
-            mes_key = (leitura_atual.data_leitura.year, leitura_atual.data_leitura.month)
-            consumo_mensal.setdefault(mes_key, 0.0)
-            consumo_mensal[mes_key] += consumo_litros
-
-            # Consumo diário (apenas últimos 30 dias)
-            dia = leitura_atual.data_leitura.date()
-            if dia in consumo_diario:
-                consumo_diario[dia] += consumo_litros
-
-        if consumo_hidrometro_litros > 0:
-            consumo_por_hidrometro.append({
-                'hidrometro': hidrometro.numero,
-                'lote': hidrometro.lote.numero,
-                'consumo_litros': round(consumo_hidrometro_litros, 2),
-            })
-
-    # Preparar dados dos gráficos
-    for dia in datas_periodo:
-        dados_graficos['consumo_por_dia'].append({
-            'dia': dia.day,
-            'label': dia.strftime('%d/%m'),
-            'consumo_litros': round(consumo_diario[dia], 2)
-        })
+    periodo = periodo_graficos(parametros, agora)
+    dados_graficos = cache_graficos.obter_dados(
+        cache_graficos.chave(
+            'condominio', None, periodo['periodo_selecionado'],
+            periodo['data_inicio'], periodo['data_fim'], agora.year,
+        ),
+        cache_graficos.versao_condominio(),
+        lambda: calcular_dados_graficos(periodo, agora.year),
+    )
+    return periodo, dados_graficos
 
-    nomes_meses = [
-        'Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun',
-        'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez'
-    ]
 
-    consumo_mes_ordenado = sorted(consumo_mensal.items(), key=lambda x: (x[0][0], x[0][1]))
-    for (ano, mes), valor in consumo_mes_ordenado:
-        dados_graficos['consumo_mes'].append({
-            'mes': mes,
-            'mes_nome': f"{nomes_meses[mes - 1]}/{str(ano)[-2:]}",
-            'consumo_litros': round(valor, 2)
-        })
-
-    dados_graficos['consumo_total_ano'] = round(consumo_total_ano, 2)
+@condicional_condominio
+def graficos_consumo(request):
+    """Página com gráficos de consumo do condomínio com filtro de período.
 
-    top_lotes = sorted(consumo_por_lote_ano.items(), key=lambda x: x[1], reverse=True)[:10]
-    dados_graficos['top_lotes'] = [
-        {'lote': lote, 'consumo_litros': round(consumo, 2)} for lote, consumo in top_lotes
-    ]
+    A página não agrega nada: cada gráfico busca o seu conjunto em
+    /api/graficos/consumo/ quando fica visível.
+    """
 
-    def _ordenar_lote(item):
-        numero = item['lote']
-        # Lotes numéricos primeiro, ordenados por valor inteiro; depois lotes ADM/strings
-        try:
-            return (0, int(numero), numero)
-        except ValueError:
-            # Tentar extrair número após prefixo ADM-
-            if numero.upper().startswith('ADM-'):
-                try:
-                    return (1, int(numero.split('-', 1)[1]), numero)
-                except ValueError:
-                    return (1, float('inf'), numero)
-            return (1, float('inf'), numero)
-
-    dados_graficos['consumo_por_hidrometro'] = sorted(
-        consumo_por_hidrometro,
-        key=lambda x: (_ordenar_lote(x), x['hidrometro'])
-    )
+    agora = timezone.localtime(timezone.now())
+    periodo = periodo_graficos(request.GET, agora)
+    hidrometros_qs = hidrometros_graficos()
 
     lotes_disponiveis = Lote.objects.filter(
         ativo=True,
@@ -663,7 +979,9 @@ def graficos_consumo(request):
     ).order_by('numero')
 
     context = {
-        'dados_graficos': dados_graficos,
+        'periodo': periodo,
+        'ano_atual': agora.year,
+        'url_dados': f"{reverse('consumo:graficos-consumo')}?{request.GET.urlencode()}",
         'hidrometros': hidrometros_qs,
         'lotes': lotes_disponiveis,
     }
@@ -671,1502 +989,94 @@ def graficos_consumo(request):
     return render(request, 'consumo/graficos_consumo.html', context)
 
 
-def graficos_lote(request, lote_id):
-    """Página com gráficos de consumo específicos de um lote com filtros de período"""
-    from collections import defaultdict
-    import calendar
-    
-    lote = get_object_or_404(Lote, id=lote_id)
-    
-    # Obter filtros de período
-    periodo = request.GET.get('periodo', '30dias')
-    data_inicio_str = request.GET.get('data_inicio', '')
-    data_fim_str = request.GET.get('data_fim', '')
-    
-    hoje = timezone.now().date()
-    data_inicio = None
-    data_fim = hoje
-    periodo_label = ''
-    
-    # Definir período baseado no filtro
-    if periodo == '7dias':
-        data_inicio = hoje - timedelta(days=7)
-        periodo_label = 'Últimos 7 dias'
-    elif periodo == '15dias':
-        data_inicio = hoje - timedelta(days=15)
-        periodo_label = 'Últimos 15 dias'
-    elif periodo == '30dias':
-        data_inicio = hoje - timedelta(days=30)
-        periodo_label = 'Últimos 30 dias'
-    elif periodo == 'mes_atual':
-        data_inicio = hoje.replace(day=1)
-        periodo_label = f'{hoje.strftime("%B de %Y").capitalize()}'
-    elif periodo == 'ano_atual':
-        data_inicio = hoje.replace(month=1, day=1)
-        periodo_label = f'Ano de {hoje.year}'
-    elif periodo == 'personalizado' and data_inicio_str and data_fim_str:
-        try:
-            from datetime import datetime
-            data_inicio = datetime.strptime(data_inicio_str, '%Y-%m-%d').date()
-            data_fim = datetime.strptime(data_fim_str, '%Y-%m-%d').date()
-            periodo_label = f'{data_inicio.strftime("%d/%m/%Y")} a {data_fim.strftime("%d/%m/%Y")}'
-        except:
-            data_inicio = hoje - timedelta(days=30)
-            data_fim = hoje
-            periodo_label = 'Últimos 30 dias'
-            periodo = '30dias'
-    else:
-        data_inicio = hoje - timedelta(days=30)
-        periodo_label = 'Últimos 30 dias'
-    
-    # Obter todos os hidrômetros do lote
+def _calcular_dados_graficos_lote(lote, data_inicio, data_fim, periodo_label, periodo):
+    # Consumo de todos os hidrômetros do lote a partir da consolidação diária
     hidrometros = lote.hidrometros.filter(ativo=True)
+    resultado = calcular_consumo_consolidado(hidrometros, data_inicio, data_fim)
     
-    if not hidrometros.exists():
-        dados_graficos = {
-            'lote': lote.numero,
-            'tipo': lote.get_tipo_display(),
-            'consumo_por_dia': [],
-            'consumo_mes': [],
-            'consumo_periodo': [],
-            'consumo_total_periodo': 0,
-            'periodo_label': periodo_label,
-            'periodo_selecionado': periodo,
-        }
-        
-        import json
-        dados_graficos_json = json.dumps(dados_graficos, ensure_ascii=False)
-        
-        context = {
-            'lote': lote,
-            'dados_graficos': dados_graficos_json,
-            'sem_dados': True,
-        }
-        return render(request, 'consumo/graficos_lote.html', context)
-    
-    # Calcular consumo total no período para todos os hidrômetros do lote
-    consumo_total_periodo = 0
-    
-    for hidrometro in hidrometros:
-        leituras_ordenadas = hidrometro.leituras.filter(
-            data_leitura__date__gte=data_inicio,
-            data_leitura__date__lte=data_fim
-        ).order_by('data_leitura')
-        
-        for i, leitura_atual in enumerate(leituras_ordenadas):
-            if i > 0:
-                leitura_anterior = list(leituras_ordenadas)[i-1]
-                diferenca = float(leitura_atual.leitura) - float(leitura_anterior.leitura)
-                if diferenca > 0:
-                    consumo_litros = diferenca * 1000
-                    consumo_total_periodo += consumo_litros
-    
-    # Preparar dados para gráficos
-    # Gráfico 1: Consumo por Dia
-    consumo_por_dia = defaultdict(float)
-    
-    for hidrometro in hidrometros:
-        leituras_ordenadas = hidrometro.leituras.filter(
-            data_leitura__date__gte=data_inicio,
-            data_leitura__date__lte=data_fim
-        ).order_by('data_leitura')
-        
-        for i, leitura_atual in enumerate(leituras_ordenadas):
-            if i > 0:
-                leitura_anterior = list(leituras_ordenadas)[i-1]
-                diferenca = float(leitura_atual.leitura) - float(leitura_anterior.leitura)
-                if diferenca > 0:
-                    consumo_litros = diferenca * 1000
-                    dia_str = leitura_atual.data_leitura.strftime('%d/%m')
-                    consumo_por_dia[dia_str] += consumo_litros
-    
-    consumo_dia_lista = [
-        {'dia': dia, 'consumo_litros': consumo}
-        for dia, consumo in sorted(consumo_por_dia.items())
-    ]
-    
-    # Gráfico 2: Consumo por Mês
-    consumo_por_mes = defaultdict(float)
-    
-    for hidrometro in hidrometros:
-        leituras_ordenadas = hidrometro.leituras.filter(
-            data_leitura__date__gte=data_inicio,
-            data_leitura__date__lte=data_fim
-        ).order_by('data_leitura')
-        
-        for i, leitura_atual in enumerate(leituras_ordenadas):
-            if i > 0:
-                leitura_anterior = list(leituras_ordenadas)[i-1]
-                diferenca = float(leitura_atual.leitura) - float(leitura_anterior.leitura)
-                if diferenca > 0:
-                    consumo_litros = diferenca * 1000
-                    mes_numero = leitura_atual.data_leitura.month
-                    consumo_por_mes[mes_numero] += consumo_litros
-    
-    consumo_mes_lista = []
-    for mes in sorted(consumo_por_mes.keys()):
-        mes_nome = calendar.month_name[mes].capitalize() if mes <= 12 else f'Mês {mes}'
-        consumo_mes_lista.append({
-            'mes': mes,
-            'mes_nome': mes_nome,
-            'consumo_litros': consumo_por_mes[mes]
-        })
+    # Preparar dados para gráficos (consumo por dia e por mês)
+    consumo_dia_lista, consumo_mes_lista = _consumo_dia_mes_lista(resultado)
     
     # Dados dos gráficos (sem período do dia - removido do template)
-    dados_graficos = {
+    return {
         'lote': lote.numero,
         'tipo': lote.get_tipo_display(),
         'consumo_por_dia': consumo_dia_lista,
         'consumo_mes': consumo_mes_lista,
-        'consumo_total_periodo': consumo_total_periodo,
+        'consumo_total_periodo': resultado.total,
         'periodo_label': periodo_label,
         'periodo_selecionado': periodo,
     }
+
+
+def _dados_graficos_lote(lote, parametros):
+    """dados_graficos do lote para o filtro ?periodo=, em cache até a próxima leitura do lote"""
+    data_inicio, data_fim, periodo_label, periodo = periodo_graficos_lote(parametros, timezone.localdate())
+    return cache_graficos.obter_dados(
+        cache_graficos.chave('lote', lote.id, periodo, data_inicio, data_fim),
+        cache_graficos.versao_lote(lote),
+        lambda: _calcular_dados_graficos_lote(lote, data_inicio, data_fim, periodo_label, periodo),
+    )
+
+
+@condicional_lote
+def graficos_lote(request, lote_id):
+    """Página com gráficos de consumo específicos de um lote com filtros de período.
+
+    Os gráficos buscam os dados em /api/graficos/lotes/<id>/ quando ficam visíveis.
+    """
+    lote = get_object_or_404(Lote, id=lote_id)
     
-    # Serializar dados para JSON
-    import json
-    dados_graficos_json = json.dumps(dados_graficos, ensure_ascii=False)
+    # Obter filtros de período
+    _data_inicio, _data_fim, periodo_label, periodo = periodo_graficos_lote(request.GET, timezone.localdate())
+    
+    # Obter todos os hidrômetros do lote
+    hidrometros = lote.hidrometros.filter(ativo=True)
     
     context = {
         'lote': lote,
-        'dados_graficos': dados_graficos_json,
+        'periodo_label': periodo_label,
+        'periodo_selecionado': periodo,
+        'url_dados': f"{reverse('consumo:graficos-lote', args=[lote.id])}?{request.GET.urlencode()}",
         'hidrometros': hidrometros,
+        'sem_dados': not hidrometros.exists(),
     }
     
     return render(request, 'consumo/graficos_lote.html', context)
 
 
+def _resposta_relatorio(request, relatorio):
+    if not isinstance(relatorio.conteudo, bytes):
+        # Arquivo temporário: enviado em blocos e fechado ao fim da resposta
+        return _resposta_arquivo(request, relatorio.conteudo, relatorio.nome_arquivo, relatorio.content_type)
+    response = HttpResponse(relatorio.conteudo, content_type=relatorio.content_type)
+    response['Content-Disposition'] = f'attachment; filename="{relatorio.nome_arquivo}"'
+    return response
+
+
 def exportar_graficos_consumo_pdf(request):
     """Exporta os gráficos de consumo do condomínio em PDF"""
-    import os
-    os.environ.setdefault('MPLCONFIGDIR', '/tmp/matplotlib')
-    import matplotlib
-    matplotlib.use('Agg')
-    import matplotlib.pyplot as plt
-    
-    from django.template.loader import render_to_string
-    
-    # Obter dados dos gráficos (mesma lógica da view graficos_consumo)
-    agora = timezone.localtime(timezone.now())
-    hoje = agora
-    ano_atual = hoje.year
-    
-    # Obter o período selecionado (padrão: últimos 30 dias)
-    periodo_selecionado = request.GET.get('periodo', '30dias')
-    
-    # Definir data de início baseada no período selecionado
-    if periodo_selecionado == '7dias':
-        dias_filtrados = 7
-        data_inicio_dias = (hoje - timedelta(days=dias_filtrados - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
-        data_inicio_ano = data_inicio_dias
-        periodo_label = "Últimos 7 dias"
-    elif periodo_selecionado == '15dias':
-        dias_filtrados = 15
-        data_inicio_dias = (hoje - timedelta(days=dias_filtrados - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
-        data_inicio_ano = data_inicio_dias
-        periodo_label = "Últimos 15 dias"
-    elif periodo_selecionado == '30dias':
-        dias_filtrados = 30
-        data_inicio_dias = (hoje - timedelta(days=dias_filtrados - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
-        data_inicio_ano = data_inicio_dias
-        periodo_label = "Últimos 30 dias"
-    elif periodo_selecionado == 'mes_atual':
-        # Mês atual (do dia 1 até hoje)
-        data_inicio_dias = hoje.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        data_inicio_ano = data_inicio_dias
-        dias_filtrados = (hoje - data_inicio_dias).days + 1
-        periodo_label = f"Mês Atual ({hoje.strftime('%B/%Y')})"
-    elif periodo_selecionado == 'ano_atual':
-        # Ano atual (de 1º de janeiro até hoje)
-        data_inicio_ano = timezone.datetime(ano_atual, 1, 1, 0, 0, 0, tzinfo=hoje.tzinfo)
-        data_inicio_dias = data_inicio_ano
-        dias_filtrados = (hoje - data_inicio_ano).days + 1
-        periodo_label = f"Ano Atual ({ano_atual})"
-    elif periodo_selecionado == 'personalizado':
-        # Período personalizado (data_inicio e data_fim via GET)
-        data_inicio_str = request.GET.get('data_inicio')
-        data_fim_str = request.GET.get('data_fim')
-        
-        if data_inicio_str and data_fim_str:
-            try:
-                data_inicio_dias = timezone.datetime.strptime(data_inicio_str, '%Y-%m-%d')
-                data_inicio_dias = timezone.make_aware(data_inicio_dias.replace(hour=0, minute=0, second=0, microsecond=0))
-                data_fim_personalizada = timezone.datetime.strptime(data_fim_str, '%Y-%m-%d')
-                data_fim_personalizada = timezone.make_aware(data_fim_personalizada.replace(hour=23, minute=59, second=59, microsecond=999999))
-                
-                # Limitar data_fim ao hoje se for futuro
-                if data_fim_personalizada > hoje:
-                    data_fim_personalizada = hoje
-                
-                data_inicio_ano = data_inicio_dias
-                dias_filtrados = (data_fim_personalizada - data_inicio_dias).days + 1
-                periodo_label = f"{data_inicio_dias.strftime('%d/%m/%Y')} até {data_fim_personalizada.strftime('%d/%m/%Y')}"
-                hoje = data_fim_personalizada  # Usar data_fim personalizada
-            except (ValueError, TypeError):
-                # Se houver erro, usar padrão (últimos 30 dias)
-                dias_filtrados = 30
-                data_inicio_dias = (hoje - timedelta(days=dias_filtrados - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
-                data_inicio_ano = data_inicio_dias
-                periodo_label = "Últimos 30 dias (erro na data personalizada)"
-        else:
-            # Sem datas fornecidas, usar padrão
-            dias_filtrados = 30
-            data_inicio_dias = (hoje - timedelta(days=dias_filtrados - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
-            data_inicio_ano = data_inicio_dias
-            periodo_label = "Últimos 30 dias"
-    else:
-        # Padrão: últimos 30 dias
-        dias_filtrados = 30
-        data_inicio_dias = (hoje - timedelta(days=dias_filtrados - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
-        data_inicio_ano = data_inicio_dias
-        periodo_label = "Últimos 30 dias"
-    
-    data_fim = hoje
-    
-    # Buscar todos os hidrômetros ativos
-    hidrometros = Hidrometro.objects.filter(
-        ativo=True,
-        lote__tipo='residencial'
-    ).select_related('lote')
-    
-    # Calcular consumo diário baseado no período filtrado
-    consumo_diario = {}
-    datas_periodo = []
-    dia_cursor = data_inicio_dias
-    while dia_cursor.date() <= data_fim.date():
-        consumo_diario[dia_cursor.date()] = 0.0
-        datas_periodo.append(dia_cursor.date())
-        dia_cursor += timedelta(days=1)
-
-    # Consumo por hidrômetro (individual) no período
-    consumo_por_hidrometro = []
-    consumo_total_periodo = 0.0
-    
-    for hidrometro in hidrometros:
-        leituras = hidrometro.leituras.filter(
-            data_leitura__gte=data_inicio_dias,
-            data_leitura__lte=data_fim
-        ).order_by('data_leitura')
-        
-        consumo_hidrometro_litros = 0.0
-        if leituras.exists():
-            for i in range(1, len(leituras)):
-                leitura_atual = leituras[i]
-                leitura_anterior = leituras[i - 1]
-                
-                consumo_m3 = float(leitura_atual.leitura - leitura_anterior.leitura)
-                if consumo_m3 < 0:
-                    continue
-                    
-                consumo_litros = consumo_m3 * 1000
-                consumo_hidrometro_litros += consumo_litros
-                consumo_total_periodo += consumo_litros
-                
-                # Consumo diário
-                dia = leitura_atual.data_leitura.date()
-                if dia in consumo_diario:
-                    consumo_diario[dia] += consumo_litros
-
-        if consumo_hidrometro_litros > 0:
-            consumo_por_hidrometro.append({
-                'hidrometro': hidrometro.numero,
-                'lote': hidrometro.lote.numero,
-                'consumo_litros': round(consumo_hidrometro_litros, 2),
-            })
-    
-    # Top 10 lotes por consumo (baseado no período filtrado)
-    lotes_consumo = []
-    for lote in Lote.objects.filter(ativo=True, tipo='residencial'):
-        consumo_lote = 0.0
-        hidrometros_lote = lote.hidrometros.filter(ativo=True)
-        
-        for hidrometro in hidrometros_lote:
-            leituras_periodo = hidrometro.leituras.filter(
-                data_leitura__gte=data_inicio_dias,
-                data_leitura__lte=data_fim
-            ).order_by('data_leitura')
-            
-            if leituras_periodo.count() >= 2:
-                primeira = leituras_periodo.first()
-                ultima = leituras_periodo.last()
-                consumo_m3 = float(ultima.leitura - primeira.leitura)
-                consumo_litros = consumo_m3 * 1000
-                consumo_lote += consumo_litros
-        
-        if consumo_lote > 0:
-            lotes_consumo.append({
-                'lote': lote,
-                'consumo': consumo_lote
-            })
-    
-    lotes_consumo.sort(key=lambda x: x['consumo'], reverse=True)
-    top_lotes = lotes_consumo[:10]
-
-    # Ordenar hidrômetros por lote (numéricos primeiro, depois ADM)
-    def _ordenar_lote(item):
-        numero = item['lote']
-        try:
-            return (0, int(numero), numero)
-        except ValueError:
-            if numero.upper().startswith('ADM-'):
-                try:
-                    return (1, int(numero.split('-', 1)[1]), numero)
-                except ValueError:
-                    return (1, float('inf'), numero)
-            return (1, float('inf'), numero)
-
-    consumo_por_hidrometro = sorted(
-        consumo_por_hidrometro,
-        key=lambda x: (_ordenar_lote(x), x['hidrometro'])
-    )
-    
-    # Criar PDF
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4),
-                          rightMargin=30, leftMargin=30,
-                          topMargin=30, bottomMargin=18)
-    
-    elements = []
-    styles = getSampleStyleSheet()
-    
-    # Estilo do título
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#2c3e50'),
-        spaceAfter=30,
-        alignment=TA_CENTER
-    )
-    
-    subtitle_style = ParagraphStyle(
-        'CustomSubtitle',
-        parent=styles['Normal'],
-        fontSize=14,
-        textColor=colors.HexColor('#7f8c8d'),
-        spaceAfter=20,
-        alignment=TA_CENTER
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=16,
-        textColor=colors.HexColor('#2c3e50'),
-        spaceAfter=12,
-        spaceBefore=12
-    )
-    
-    # Título
-    elements.append(Paragraph(f"Relatório de Consumo de Água - {periodo_label}", title_style))
-    elements.append(Paragraph(f"Gerado em: {agora.strftime('%d/%m/%Y %H:%M')}", subtitle_style))
-    elements.append(Spacer(1, 0.3*inch))
-    
-    # Resumo Geral
-    elements.append(Paragraph("📊 Resumo Geral", heading_style))
-    
-    resumo_data = [
-        ['Indicador', 'Valor'],
-        ['Período', periodo_label],
-        ['Consumo Total', f'{consumo_total_periodo:,.0f} L'],
-        ['Hidrômetros Ativos', str(hidrometros.count())],
-        ['Lotes Ativos', str(Lote.objects.filter(ativo=True, tipo='residencial').count())],
-    ]
-    
-    resumo_table = Table(resumo_data, colWidths=[3*inch, 2*inch])
-    resumo_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498db')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
-    ]))
-    
-    elements.append(resumo_table)
-    elements.append(Spacer(1, 0.4*inch))
-    
-    # Gráfico de Consumo Diário
-    elements.append(Paragraph("📈 Consumo Diário", heading_style))
-    
-    plt.figure(figsize=(10, 5))
-    datas_labels = [d.strftime('%d/%m') for d in datas_periodo]
-    valores_diarios = [consumo_diario[d] for d in datas_periodo]
-    plt.plot(datas_labels, valores_diarios, marker='o', color='#3498db', linewidth=2, markersize=4)
-    plt.title(f'Consumo Diário - {periodo_label}', fontsize=14, fontweight='bold')
-    plt.xlabel('Data', fontsize=11)
-    plt.ylabel('Consumo (L)', fontsize=11)
-    plt.xticks(rotation=45, ha='right')
-    plt.grid(axis='y', alpha=0.3)
-    plt.tight_layout()
-    
-    # Salvar gráfico em buffer
-    img_buffer = io.BytesIO()
-    plt.savefig(img_buffer, format='png', dpi=150, bbox_inches='tight')
-    img_buffer.seek(0)
-    plt.close()
-    
-    # Adicionar imagem ao PDF
-    img = Image(img_buffer, width=7*inch, height=3.5*inch)
-    elements.append(img)
-    elements.append(PageBreak())
-    
-    # Top 10 Lotes
-    elements.append(Paragraph("🏆 Top 10 Lotes com Maior Consumo", heading_style))
-    
-    top_data = [['Posição', 'Lote', 'Tipo', 'Consumo (L)']]
-    for idx, item in enumerate(top_lotes, 1):
-        lote = item['lote']
-        consumo = item['consumo']
-        top_data.append([
-            str(idx),
-            lote.numero,
-            lote.get_tipo_display(),
-            f'{consumo:,.2f}'
-        ])
-    
-    top_table = Table(top_data, colWidths=[1*inch, 1.5*inch, 1.5*inch, 2*inch])
-    top_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#e74c3c')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 9),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
-    ]))
-    
-    elements.append(top_table)
-    elements.append(Spacer(1, 0.3*inch))
-    
-    # Gráfico Top 10 Lotes
-    if top_lotes:
-        plt.figure(figsize=(10, 5))
-        lotes_labels = [item['lote'].numero for item in top_lotes]
-        lotes_valores = [item['consumo'] for item in top_lotes]
-        plt.barh(lotes_labels[::-1], lotes_valores[::-1], color='#e74c3c', alpha=0.7)
-        plt.title(f'Top 10 Lotes - Consumo ({periodo_label})', fontsize=14, fontweight='bold')
-        plt.xlabel('Consumo (L)', fontsize=11)
-        plt.ylabel('Lote', fontsize=11)
-        plt.grid(axis='x', alpha=0.3)
-        plt.tight_layout()
-        
-        # Salvar gráfico em buffer
-        img_buffer_top = io.BytesIO()
-        plt.savefig(img_buffer_top, format='png', dpi=150, bbox_inches='tight')
-        img_buffer_top.seek(0)
-        plt.close()
-        
-        # Adicionar imagem ao PDF
-        img_top = Image(img_buffer_top, width=7*inch, height=3.5*inch)
-        elements.append(img_top)
-    
-    elements.append(Spacer(1, 0.3*inch))
-    elements.append(PageBreak())
-    
-    # Tabela: Consumo por Hidrômetro (período)
-    elements.append(Paragraph("📈 Consumo por Hidrômetro (período)", heading_style))
-
-    hidrometro_data = [['Hidrômetro', 'Lote', 'Consumo (L)']]
-    for item in consumo_por_hidrometro:
-        hidrometro_data.append([
-            item['hidrometro'],
-            item['lote'],
-            f"{item['consumo_litros']:,.0f}"
-        ])
-
-    hidrometro_table = Table(hidrometro_data, colWidths=[2*inch, 1.5*inch, 2*inch])
-    hidrometro_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2980b9')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 9),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
-    ]))
-
-    elements.append(hidrometro_table)
-    elements.append(Spacer(1, 0.3*inch))
-    
-    # Construir PDF
-    doc.build(elements)
-    
-    # Preparar resposta
-    buffer.seek(0)
-    response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="relatorio_consumo_condominio_{agora.strftime("%Y%m%d")}.pdf"'
-    
-    return response
+    return _resposta_relatorio(request, relatorios.graficos_consumo_pdf(request.GET))
 
 
 def exportar_graficos_consumo_excel(request):
     """Exporta os gráficos de consumo do condomínio em Excel com gráficos"""
-    import os
-    os.environ.setdefault('MPLCONFIGDIR', '/tmp/matplotlib')
-    import matplotlib
-    matplotlib.use('Agg')
-    import matplotlib.pyplot as plt
-    
-    # Obter dados dos gráficos (mesma lógica da view graficos_consumo)
-    agora = timezone.localtime(timezone.now())
-    hoje = agora
-    ano_atual = hoje.year
-    
-    # Obter o período selecionado (padrão: últimos 30 dias)
-    periodo_selecionado = request.GET.get('periodo', '30dias')
-    
-    # Definir data de início baseada no período selecionado
-    if periodo_selecionado == '7dias':
-        dias_filtrados = 7
-        data_inicio_dias = (hoje - timedelta(days=dias_filtrados - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
-        data_inicio_ano = data_inicio_dias
-        periodo_label = "Últimos 7 dias"
-    elif periodo_selecionado == '15dias':
-        dias_filtrados = 15
-        data_inicio_dias = (hoje - timedelta(days=dias_filtrados - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
-        data_inicio_ano = data_inicio_dias
-        periodo_label = "Últimos 15 dias"
-    elif periodo_selecionado == '30dias':
-        dias_filtrados = 30
-        data_inicio_dias = (hoje - timedelta(days=dias_filtrados - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
-        data_inicio_ano = data_inicio_dias
-        periodo_label = "Últimos 30 dias"
-    elif periodo_selecionado == 'mes_atual':
-        # Mês atual (do dia 1 até hoje)
-        data_inicio_dias = hoje.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        data_inicio_ano = data_inicio_dias
-        dias_filtrados = (hoje - data_inicio_dias).days + 1
-        periodo_label = f"Mês Atual ({hoje.strftime('%B/%Y')})"
-    elif periodo_selecionado == 'ano_atual':
-        # Ano atual (de 1º de janeiro até hoje)
-        data_inicio_ano = timezone.datetime(ano_atual, 1, 1, 0, 0, 0, tzinfo=hoje.tzinfo)
-        data_inicio_dias = data_inicio_ano
-        dias_filtrados = (hoje - data_inicio_ano).days + 1
-        periodo_label = f"Ano Atual ({ano_atual})"
-    elif periodo_selecionado == 'personalizado':
-        # Período personalizado (data_inicio e data_fim via GET)
-        data_inicio_str = request.GET.get('data_inicio')
-        data_fim_str = request.GET.get('data_fim')
-        
-        if data_inicio_str and data_fim_str:
-            try:
-                data_inicio_dias = timezone.datetime.strptime(data_inicio_str, '%Y-%m-%d')
-                data_inicio_dias = timezone.make_aware(data_inicio_dias.replace(hour=0, minute=0, second=0, microsecond=0))
-                data_fim_personalizada = timezone.datetime.strptime(data_fim_str, '%Y-%m-%d')
-                data_fim_personalizada = timezone.make_aware(data_fim_personalizada.replace(hour=23, minute=59, second=59, microsecond=999999))
-                
-                # Limitar data_fim ao hoje se for futuro
-                if data_fim_personalizada > hoje:
-                    data_fim_personalizada = hoje
-                
-                data_inicio_ano = data_inicio_dias
-                dias_filtrados = (data_fim_personalizada - data_inicio_dias).days + 1
-                periodo_label = f"{data_inicio_dias.strftime('%d/%m/%Y')} até {data_fim_personalizada.strftime('%d/%m/%Y')}"
-                hoje = data_fim_personalizada  # Usar data_fim personalizada
-            except (ValueError, TypeError):
-                # Se houver erro, usar padrão (últimos 30 dias)
-                dias_filtrados = 30
-                data_inicio_dias = (hoje - timedelta(days=dias_filtrados - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
-                data_inicio_ano = data_inicio_dias
-                periodo_label = "Últimos 30 dias (erro na data personalizada)"
-        else:
-            # Sem datas fornecidas, usar padrão
-            dias_filtrados = 30
-            data_inicio_dias = (hoje - timedelta(days=dias_filtrados - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
-            data_inicio_ano = data_inicio_dias
-            periodo_label = "Últimos 30 dias"
-    else:
-        # Padrão: últimos 30 dias
-        dias_filtrados = 30
-        data_inicio_dias = (hoje - timedelta(days=dias_filtrados - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
-        data_inicio_ano = data_inicio_dias
-        periodo_label = "Últimos 30 dias"
-    
-    data_fim = hoje
-    
-    # Buscar todos os hidrômetros ativos
-    hidrometros = Hidrometro.objects.filter(
-        ativo=True,
-        lote__tipo='residencial'
-    ).select_related('lote')
-    
-    # Calcular consumo diário baseado no período filtrado
-    consumo_diario = {}
-    datas_periodo = []
-    dia_cursor = data_inicio_dias
-    while dia_cursor.date() <= data_fim.date():
-        consumo_diario[dia_cursor.date()] = 0.0
-        datas_periodo.append(dia_cursor.date())
-        dia_cursor += timedelta(days=1)
-    
-    # Consumo por hidrômetro (individual) no período
-    consumo_por_hidrometro = []
-    consumo_total_periodo = 0.0
-    
-    for hidrometro in hidrometros:
-        leituras = hidrometro.leituras.filter(
-            data_leitura__gte=data_inicio_dias,
-            data_leitura__lte=data_fim
-        ).order_by('data_leitura')
-        
-        consumo_hidrometro_litros = 0.0
-        if leituras.exists():
-            for i in range(1, len(leituras)):
-                leitura_atual = leituras[i]
-                leitura_anterior = leituras[i - 1]
-                
-                consumo_m3 = float(leitura_atual.leitura - leitura_anterior.leitura)
-                if consumo_m3 < 0:
-                    continue
-                    
-                consumo_litros = consumo_m3 * 1000
-                consumo_hidrometro_litros += consumo_litros
-                consumo_total_periodo += consumo_litros
-                
-                # Consumo diário
-                dia = leitura_atual.data_leitura.date()
-                if dia in consumo_diario:
-                    consumo_diario[dia] += consumo_litros
-
-        consumo_por_hidrometro.append({
-            'hidrometro': hidrometro.numero,
-            'lote': hidrometro.lote.numero,
-            'consumo_litros': round(consumo_hidrometro_litros, 2),
-        })
-    
-    # Top 10 lotes por consumo (baseado no período filtrado)
-    lotes_consumo = []
-    for lote in Lote.objects.filter(ativo=True, tipo='residencial'):
-        consumo_lote = 0.0
-        hidrometros_lote = lote.hidrometros.filter(ativo=True)
-        
-        for hidrometro in hidrometros_lote:
-            leituras_periodo = hidrometro.leituras.filter(
-                data_leitura__gte=data_inicio_dias,
-                data_leitura__lte=data_fim
-            ).order_by('data_leitura')
-            
-            if leituras_periodo.count() >= 2:
-                primeira = leituras_periodo.first()
-                ultima = leituras_periodo.last()
-                consumo_m3 = float(ultima.leitura - primeira.leitura)
-                consumo_litros = consumo_m3 * 1000
-                consumo_lote += consumo_litros
-        
-        if consumo_lote > 0:
-            lotes_consumo.append({
-                'lote': lote,
-                'consumo': consumo_lote
-            })
-    
-    lotes_consumo.sort(key=lambda x: x['consumo'], reverse=True)
-    top_lotes = lotes_consumo[:10]
-    
-    # Ordenar hidrômetros por lote (numéricos primeiro, depois ADM)
-    def _ordenar_lote(item):
-        numero = item['lote']
-        try:
-            return (0, int(numero), numero)
-        except ValueError:
-            if numero.upper().startswith('ADM-'):
-                try:
-                    return (1, int(numero.split('-', 1)[1]), numero)
-                except ValueError:
-                    return (1, float('inf'), numero)
-            return (1, float('inf'), numero)
-
-    consumo_por_hidrometro = sorted(
-        consumo_por_hidrometro,
-        key=lambda x: (_ordenar_lote(x), x['hidrometro'])
-    )
-    
-    # Criar Excel
-    wb = Workbook()
-    
-    # Aba: Resumo
-    ws_resumo = wb.active
-    ws_resumo.title = "Resumo"
-    
-    # Título
-    ws_resumo['A1'] = f'Relatório de Consumo de Água - {periodo_label}'
-    ws_resumo['A1'].font = Font(size=16, bold=True, color='FFFFFF')
-    ws_resumo['A1'].fill = PatternFill(start_color='3498db', end_color='3498db', fill_type='solid')
-    ws_resumo['A1'].alignment = Alignment(horizontal='center')
-    ws_resumo.merge_cells('A1:C1')
-    
-    ws_resumo['A2'] = f'Gerado em: {agora.strftime("%d/%m/%Y %H:%M")}'
-    ws_resumo['A2'].alignment = Alignment(horizontal='center')
-    ws_resumo.merge_cells('A2:C2')
-    
-    # Dados resumo
-    ws_resumo['A4'] = 'Indicador'
-    ws_resumo['B4'] = 'Valor'
-    ws_resumo['A4'].font = Font(bold=True)
-    ws_resumo['B4'].font = Font(bold=True)
-    
-    resumo_dados = [
-        ['Período', periodo_label],
-        ['Consumo Total', f'{consumo_total_periodo:,.0f} L'],
-        ['Hidrômetros Ativos', hidrometros.count()],
-        ['Lotes Ativos', Lote.objects.filter(ativo=True, tipo='residencial').count()],
-    ]
-    
-    for idx, (indicador, valor) in enumerate(resumo_dados, start=5):
-        ws_resumo[f'A{idx}'] = indicador
-        ws_resumo[f'B{idx}'] = valor
-    
-    ws_resumo.column_dimensions['A'].width = 30
-    ws_resumo.column_dimensions['B'].width = 20
-    
-    # Aba: Consumo Diário (baseado no período filtrado)
-    ws_diario = wb.create_sheet("Consumo Diário")
-    
-    ws_diario['A1'] = 'Data'
-    ws_diario['B1'] = 'Consumo (L)'
-    ws_diario['A1'].font = Font(bold=True)
-    ws_diario['B1'].font = Font(bold=True)
-    
-    for idx, data in enumerate(datas_periodo, start=2):
-        ws_diario[f'A{idx}'] = data.strftime('%d/%m/%Y')
-        ws_diario[f'B{idx}'] = round(consumo_diario[data], 2)
-    
-    # Gerar gráfico com matplotlib (igual ao PDF)
-    plt.figure(figsize=(12, 6))
-    datas_labels = [d.strftime('%d/%m') for d in datas_periodo]
-    valores_diarios = [consumo_diario[d] for d in datas_periodo]
-    plt.plot(datas_labels, valores_diarios, marker='o', color='#3498db', linewidth=2, markersize=4)
-    plt.title(f'Consumo Diário - {periodo_label}', fontsize=14, fontweight='bold')
-    plt.xlabel('Data', fontsize=11)
-    plt.ylabel('Consumo (L)', fontsize=11)
-    plt.xticks(rotation=45, ha='right')
-    plt.grid(axis='y', alpha=0.3)
-    plt.tight_layout()
-    
-    # Salvar gráfico em buffer
-    img_buffer_diario = io.BytesIO()
-    plt.savefig(img_buffer_diario, format='png', dpi=100, bbox_inches='tight')
-    img_buffer_diario.seek(0)
-    plt.close()
-    
-    # Adicionar imagem ao Excel
-    from openpyxl.drawing.image import Image as XLImage
-    img_diario = XLImage(img_buffer_diario)
-    img_diario.width = 600
-    img_diario.height = 300
-    ws_diario.add_image(img_diario, "D2")
-    
-    ws_diario.column_dimensions['A'].width = 15
-    ws_diario.column_dimensions['B'].width = 15
-    
-    # Aba: Top 10 Lotes
-    ws_top = wb.create_sheet("Top 10 Lotes")
-    
-    ws_top['A1'] = 'Posição'
-    ws_top['B1'] = 'Lote'
-    ws_top['C1'] = 'Tipo'
-    ws_top['D1'] = 'Consumo (L)'
-    
-    for col in ['A1', 'B1', 'C1', 'D1']:
-        ws_top[col].font = Font(bold=True)
-    
-    for idx, item in enumerate(top_lotes, 1):
-        lote = item['lote']
-        consumo = item['consumo']
-        ws_top[f'A{idx + 1}'] = idx
-        ws_top[f'B{idx + 1}'] = lote.numero
-        ws_top[f'C{idx + 1}'] = lote.get_tipo_display()
-        ws_top[f'D{idx + 1}'] = round(consumo, 2)
-    
-    # Gerar gráfico com matplotlib (igual ao PDF)
-    if top_lotes:
-        plt.figure(figsize=(12, 6))
-        lotes_labels = [item['lote'].numero for item in top_lotes]
-        lotes_valores = [item['consumo'] for item in top_lotes]
-        plt.barh(lotes_labels[::-1], lotes_valores[::-1], color='#e74c3c', alpha=0.7)
-        plt.title(f'Top 10 Lotes - Consumo ({periodo_label})', fontsize=14, fontweight='bold')
-        plt.xlabel('Consumo (L)', fontsize=11)
-        plt.ylabel('Lote', fontsize=11)
-        plt.grid(axis='x', alpha=0.3)
-        plt.tight_layout()
-        
-        # Salvar gráfico em buffer
-        img_buffer_top = io.BytesIO()
-        plt.savefig(img_buffer_top, format='png', dpi=100, bbox_inches='tight')
-        img_buffer_top.seek(0)
-        plt.close()
-        
-        # Adicionar imagem ao Excel
-        from openpyxl.drawing.image import Image as XLImage
-        img_top_chart = XLImage(img_buffer_top)
-        img_top_chart.width = 600
-        img_top_chart.height = 300
-        ws_top.add_image(img_top_chart, "F2")
-    
-    for col in ['A', 'B', 'C', 'D']:
-        ws_top.column_dimensions[col].width = 15
-
-    # Aba: Consumo por Hidrômetro
-    ws_hid = wb.create_sheet("Consumo por Hidrômetro")
-    ws_hid['A1'] = 'Hidrômetro'
-    ws_hid['B1'] = 'Lote'
-    ws_hid['C1'] = 'Consumo (L)'
-    for col in ['A1', 'B1', 'C1']:
-        ws_hid[col].font = Font(bold=True)
-
-    for idx, item in enumerate(consumo_por_hidrometro, start=2):
-        ws_hid[f'A{idx}'] = item['hidrometro']
-        ws_hid[f'B{idx}'] = item['lote']
-        ws_hid[f'C{idx}'] = item['consumo_litros']
-
-    for col in ['A', 'B', 'C']:
-        ws_hid.column_dimensions[col].width = 18
-
-    # Gráfico de barras por hidrômetro
-    if consumo_por_hidrometro:
-        plt.figure(figsize=(14, 6))
-        labels_h = [f"{item['hidrometro']} (Lote {item['lote']})" for item in consumo_por_hidrometro]
-        valores_h = [item['consumo_litros'] for item in consumo_por_hidrometro]
-        plt.bar(range(len(labels_h)), valores_h, color='#eab308', alpha=0.85)
-        plt.title(f'Consumo por Hidrômetro ({periodo_label})', fontsize=14, fontweight='bold')
-        plt.xlabel('Hidrômetro', fontsize=11)
-        plt.ylabel('Consumo (L)', fontsize=11)
-        plt.xticks(range(len(labels_h)), labels_h, rotation=60, ha='right', fontsize=8)
-        plt.grid(axis='y', alpha=0.3)
-        plt.tight_layout()
-
-        img_buffer_h = io.BytesIO()
-        plt.savefig(img_buffer_h, format='png', dpi=100, bbox_inches='tight')
-        img_buffer_h.seek(0)
-        plt.close()
-
-        from openpyxl.drawing.image import Image as XLImage
-        img_h_chart = XLImage(img_buffer_h)
-        img_h_chart.width = 700
-        img_h_chart.height = 320
-        ws_hid.add_image(img_h_chart, "E2")
-    
-    # Salvar e retornar
-    buffer = io.BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-    
-    response = HttpResponse(
-        buffer.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename="relatorio_consumo_condominio_{agora.strftime("%Y%m%d")}.xlsx"'
-    
-    return response
+    return _resposta_relatorio(request, relatorios.graficos_consumo_excel(request.GET))
+
+
+def _exportar_lote(request, lote_id, gerar):
+    lote = get_object_or_404(Lote, id=lote_id)
+    try:
+        return _resposta_relatorio(request, gerar(lote, request.GET))
+    except relatorios.SemHidrometrosAtivos as erro:
+        return HttpResponse(str(erro), status=404)
 
 
 def exportar_graficos_lote_pdf(request, lote_id):
     """Exporta os gráficos de consumo de um lote específico em PDF"""
-    import os
-    os.environ.setdefault('MPLCONFIGDIR', '/tmp/matplotlib')
-    import matplotlib
-    matplotlib.use('Agg')
-    import matplotlib.pyplot as plt
-    
-    lote = get_object_or_404(Lote, id=lote_id)
-    
-    # Obter dados do lote (mesma lógica da view graficos_lote)
-    agora = timezone.localtime(timezone.now())
-    hoje = agora.date()
-    periodo = request.GET.get('periodo', '30dias')
-    data_inicio_str = request.GET.get('data_inicio', '')
-    data_fim_str = request.GET.get('data_fim', '')
-    data_fim = hoje
-    periodo_label = ''
-
-    if periodo == '7dias':
-        data_inicio = hoje - timedelta(days=7)
-        periodo_label = 'Últimos 7 dias'
-    elif periodo == '15dias':
-        data_inicio = hoje - timedelta(days=15)
-        periodo_label = 'Últimos 15 dias'
-    elif periodo == '30dias':
-        data_inicio = hoje - timedelta(days=30)
-        periodo_label = 'Últimos 30 dias'
-    elif periodo == 'mes_atual':
-        data_inicio = hoje.replace(day=1)
-        periodo_label = f'{hoje.strftime("%B de %Y").capitalize()}'
-    elif periodo == 'ano_atual':
-        data_inicio = hoje.replace(month=1, day=1)
-        periodo_label = f'Ano de {hoje.year}'
-    elif periodo == 'personalizado' and data_inicio_str and data_fim_str:
-        try:
-            data_inicio = datetime.strptime(data_inicio_str, '%Y-%m-%d').date()
-            data_fim = datetime.strptime(data_fim_str, '%Y-%m-%d').date()
-            if data_fim > hoje:
-                data_fim = hoje
-            periodo_label = f'{data_inicio.strftime("%d/%m/%Y")} a {data_fim.strftime("%d/%m/%Y")}'
-        except (ValueError, TypeError):
-            data_inicio = hoje - timedelta(days=30)
-            data_fim = hoje
-            periodo_label = 'Últimos 30 dias'
-            periodo = '30dias'
-    else:
-        data_inicio = hoje - timedelta(days=30)
-        periodo_label = 'Últimos 30 dias'
-    
-    hidrometros = lote.hidrometros.filter(ativo=True)
-    
-    if not hidrometros.exists():
-        return HttpResponse("Nenhum hidrômetro ativo encontrado para este lote.", status=404)
-    
-    # Calcular consumo no periodo
-    nomes_meses = [
-        'Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
-        'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro'
-    ]
-    consumo_total_periodo = 0.0
-    consumo_por_dia = {}
-    consumo_por_mes = {}
-
-    for hidrometro in hidrometros:
-        leituras = hidrometro.leituras.filter(
-            data_leitura__date__gte=data_inicio,
-            data_leitura__date__lte=data_fim
-        ).order_by('data_leitura')
-
-        for i in range(1, len(leituras)):
-            leitura_atual = leituras[i]
-            leitura_anterior = leituras[i - 1]
-            diferenca = float(leitura_atual.leitura - leitura_anterior.leitura)
-            if diferenca <= 0:
-                continue
-
-            consumo_litros = diferenca * 1000
-            consumo_total_periodo += consumo_litros
-
-            dia = leitura_atual.data_leitura.date()
-            consumo_por_dia[dia] = consumo_por_dia.get(dia, 0.0) + consumo_litros
-
-            mes_key = (leitura_atual.data_leitura.year, leitura_atual.data_leitura.month)
-            consumo_por_mes[mes_key] = consumo_por_mes.get(mes_key, 0.0) + consumo_litros
-
-    datas_periodo = []
-    dia_cursor = data_inicio
-    while dia_cursor <= data_fim:
-        datas_periodo.append(dia_cursor)
-        consumo_por_dia.setdefault(dia_cursor, 0.0)
-        dia_cursor += timedelta(days=1)
-
-    meses_periodo = []
-    mes_cursor = data_inicio.replace(day=1)
-    while mes_cursor <= data_fim:
-        meses_periodo.append((mes_cursor.year, mes_cursor.month))
-        if mes_cursor.month == 12:
-            mes_cursor = mes_cursor.replace(year=mes_cursor.year + 1, month=1)
-        else:
-            mes_cursor = mes_cursor.replace(month=mes_cursor.month + 1)
-    
-    
-    # Criar PDF
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4),
-                          rightMargin=30, leftMargin=30,
-                          topMargin=30, bottomMargin=18)
-    
-    elements = []
-    styles = getSampleStyleSheet()
-    
-    # Estilo do título
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#2c3e50'),
-        spaceAfter=30,
-        alignment=TA_CENTER
-    )
-    
-    subtitle_style = ParagraphStyle(
-        'CustomSubtitle',
-        parent=styles['Normal'],
-        fontSize=14,
-        textColor=colors.HexColor('#7f8c8d'),
-        spaceAfter=20,
-        alignment=TA_CENTER
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=16,
-        textColor=colors.HexColor('#2c3e50'),
-        spaceAfter=12,
-        spaceBefore=12
-    )
-    
-    # Título
-    elements.append(Paragraph(f"Relatório de Consumo - Lote {lote.numero} ({periodo_label})", title_style))
-    elements.append(Paragraph(
-        f"Tipo: {lote.get_tipo_display()} | Período: {data_inicio.strftime('%d/%m/%Y')} a {data_fim.strftime('%d/%m/%Y')} | Gerado em: {agora.strftime('%d/%m/%Y %H:%M')}",
-        subtitle_style
-    ))
-    elements.append(Spacer(1, 0.3*inch))
-    
-    # Resumo Geral
-    elements.append(Paragraph("📊 Resumo Geral", heading_style))
-    
-    resumo_data = [
-        ['Indicador', 'Valor'],
-        ['Lote', lote.numero],
-        ['Tipo', lote.get_tipo_display()],
-        ['Período', periodo_label],
-        ['Consumo Total no Período', f'{consumo_total_periodo:,.0f} L'],
-        ['Hidrometros Ativos', str(hidrometros.count())],
-    ]
-    
-    resumo_table = Table(resumo_data, colWidths=[3*inch, 2*inch])
-    resumo_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498db')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
-    ]))
-    
-    elements.append(resumo_table)
-    elements.append(Spacer(1, 0.4*inch))
-    
-    # Consumo Mensal
-    elements.append(Paragraph("📅 Consumo Mensal", heading_style))
-    
-    mensal_data = [['Mês', 'Consumo (L)']]
-    for (ano, mes) in meses_periodo:
-        mes_nome = f'{nomes_meses[mes - 1]}/{str(ano)[-2:]}'
-        mensal_data.append([mes_nome, f'{consumo_por_mes.get((ano, mes), 0.0):,.2f}'])
-    
-    mensal_table = Table(mensal_data, colWidths=[2*inch, 2*inch])
-    mensal_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#27ae60')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 9),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
-    ]))
-    
-    elements.append(mensal_table)
-    elements.append(Spacer(1, 0.3*inch))
-    
-    # Gráfico de Consumo Mensal
-    plt.figure(figsize=(10, 5))
-    meses_labels = [f'{nomes_meses[mes - 1]}/{str(ano)[-2:]}' for (ano, mes) in meses_periodo]
-    valores_mensais = [consumo_por_mes.get((ano, mes), 0.0) for (ano, mes) in meses_periodo]
-    plt.bar(meses_labels, valores_mensais, color='#27ae60', alpha=0.7)
-    plt.title(f'Consumo Mensal - Lote {lote.numero} (Litros)', fontsize=14, fontweight='bold')
-    plt.xlabel('Mês', fontsize=11)
-    plt.ylabel('Consumo (L)', fontsize=11)
-    plt.xticks(rotation=45, ha='right')
-    plt.grid(axis='y', alpha=0.3)
-    plt.tight_layout()
-    
-    # Salvar gráfico em buffer
-    img_buffer = io.BytesIO()
-    plt.savefig(img_buffer, format='png', dpi=150, bbox_inches='tight')
-    img_buffer.seek(0)
-    plt.close()
-    
-    # Adicionar imagem ao PDF
-    img = Image(img_buffer, width=7*inch, height=3.5*inch)
-    elements.append(img)
-    elements.append(Spacer(1, 0.3*inch))
-
-    leituras_periodo = Leitura.objects.filter(
-        hidrometro__lote=lote,
-        data_leitura__date__gte=data_inicio,
-        data_leitura__date__lte=data_fim
-    ).select_related('hidrometro').order_by('data_leitura')
-
-    elements.append(PageBreak())
-    elements.append(Paragraph("📋 Leituras no Período", heading_style))
-
-    leituras_data = [[
-        'Data/Hora',
-        'Hidrômetro',
-        'Leitura (m³)',
-        'Consumo (L)',
-        'Responsável',
-        'Observações'
-    ]]
-
-    for leitura in leituras_periodo:
-        consumo_litros = leitura.consumo_desde_ultima_leitura_litros()
-        responsavel = leitura.responsavel or 'N/A'
-        observacoes = leitura.observacoes or '—'
-        if len(observacoes) > 60:
-            observacoes = f"{observacoes[:57]}..."
-        leituras_data.append([
-            leitura.data_leitura.strftime('%d/%m/%Y %H:%M'),
-            leitura.hidrometro.numero,
-            f"{leitura.leitura}",
-            f"{consumo_litros:,.0f}",
-            responsavel,
-            observacoes,
-        ])
-
-    leituras_table = Table(
-        leituras_data,
-        colWidths=[1.4*inch, 1.1*inch, 1.1*inch, 1.1*inch, 1.2*inch, 2.1*inch]
-    )
-    leituras_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c3e50')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 8),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
-    ]))
-
-    elements.append(leituras_table)
-    elements.append(Spacer(1, 0.3*inch))
-
-    leituras_com_foto = [leitura for leitura in leituras_periodo if leitura.foto]
-    if leituras_com_foto:
-        elements.append(PageBreak())
-        elements.append(Paragraph("📷 Fotos das Leituras", heading_style))
-        for leitura in leituras_com_foto:
-            foto_path = getattr(leitura.foto, 'path', '')
-            if not foto_path or not os.path.exists(foto_path):
-                continue
-            legenda = (
-                f"Hidrômetro {leitura.hidrometro.numero} - "
-                f"{leitura.data_leitura.strftime('%d/%m/%Y %H:%M')}"
-            )
-            elements.append(Paragraph(legenda, styles['Normal']))
-            elements.append(Spacer(1, 0.1*inch))
-            elements.append(Image(foto_path, width=6.5*inch, height=3.8*inch))
-            elements.append(Spacer(1, 0.2*inch))
-    
-    
-    # Construir PDF
-    doc.build(elements)
-    
-    # Preparar resposta
-    buffer.seek(0)
-    response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-    response['Content-Disposition'] = (
-        f'attachment; filename="relatorio_lote_{lote.numero}_{data_inicio.strftime("%Y%m%d")}_'
-        f'{data_fim.strftime("%Y%m%d")}.pdf"'
-    )
-    
-    return response
+    return _exportar_lote(request, lote_id, relatorios.graficos_lote_pdf)
 
 
 def exportar_graficos_lote_excel(request, lote_id):
     """Exporta os gráficos de consumo de um lote específico em Excel com gráficos"""
-    import os
-    os.environ.setdefault('MPLCONFIGDIR', '/tmp/matplotlib')
-    import matplotlib
-    matplotlib.use('Agg')
-    import matplotlib.pyplot as plt
-    
-    lote = get_object_or_404(Lote, id=lote_id)
-    
-    # Obter dados do lote (mesma lógica da view graficos_lote)
-    agora = timezone.localtime(timezone.now())
-    hoje = agora.date()
-    periodo = request.GET.get('periodo', '30dias')
-    data_inicio_str = request.GET.get('data_inicio', '')
-    data_fim_str = request.GET.get('data_fim', '')
-    data_fim = hoje
-    periodo_label = ''
-
-    if periodo == '7dias':
-        data_inicio = hoje - timedelta(days=7)
-        periodo_label = 'Últimos 7 dias'
-    elif periodo == '15dias':
-        data_inicio = hoje - timedelta(days=15)
-        periodo_label = 'Últimos 15 dias'
-    elif periodo == '30dias':
-        data_inicio = hoje - timedelta(days=30)
-        periodo_label = 'Últimos 30 dias'
-    elif periodo == 'mes_atual':
-        data_inicio = hoje.replace(day=1)
-        periodo_label = f'{hoje.strftime("%B de %Y").capitalize()}'
-    elif periodo == 'ano_atual':
-        data_inicio = hoje.replace(month=1, day=1)
-        periodo_label = f'Ano de {hoje.year}'
-    elif periodo == 'personalizado' and data_inicio_str and data_fim_str:
-        try:
-            data_inicio = datetime.strptime(data_inicio_str, '%Y-%m-%d').date()
-            data_fim = datetime.strptime(data_fim_str, '%Y-%m-%d').date()
-            if data_fim > hoje:
-                data_fim = hoje
-            periodo_label = f'{data_inicio.strftime("%d/%m/%Y")} a {data_fim.strftime("%d/%m/%Y")}'
-        except (ValueError, TypeError):
-            data_inicio = hoje - timedelta(days=30)
-            data_fim = hoje
-            periodo_label = 'Últimos 30 dias'
-            periodo = '30dias'
-    else:
-        data_inicio = hoje - timedelta(days=30)
-        periodo_label = 'Últimos 30 dias'
-    
-    hidrometros = lote.hidrometros.filter(ativo=True)
-    
-    if not hidrometros.exists():
-        return HttpResponse("Nenhum hidrômetro ativo encontrado para este lote.", status=404)
-    
-    # Calcular consumo no periodo
-    nomes_meses = [
-        'Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
-        'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro'
-    ]
-    consumo_total_periodo = 0.0
-    consumo_por_dia = {}
-    consumo_por_mes = {}
-
-    for hidrometro in hidrometros:
-        leituras = hidrometro.leituras.filter(
-            data_leitura__date__gte=data_inicio,
-            data_leitura__date__lte=data_fim
-        ).order_by('data_leitura')
-
-        for i in range(1, len(leituras)):
-            leitura_atual = leituras[i]
-            leitura_anterior = leituras[i - 1]
-            diferenca = float(leitura_atual.leitura - leitura_anterior.leitura)
-            if diferenca <= 0:
-                continue
-
-            consumo_litros = diferenca * 1000
-            consumo_total_periodo += consumo_litros
-
-            dia = leitura_atual.data_leitura.date()
-            consumo_por_dia[dia] = consumo_por_dia.get(dia, 0.0) + consumo_litros
-
-            mes_key = (leitura_atual.data_leitura.year, leitura_atual.data_leitura.month)
-            consumo_por_mes[mes_key] = consumo_por_mes.get(mes_key, 0.0) + consumo_litros
-
-    datas_periodo = []
-    dia_cursor = data_inicio
-    while dia_cursor <= data_fim:
-        datas_periodo.append(dia_cursor)
-        consumo_por_dia.setdefault(dia_cursor, 0.0)
-        dia_cursor += timedelta(days=1)
-
-    meses_periodo = []
-    mes_cursor = data_inicio.replace(day=1)
-    while mes_cursor <= data_fim:
-        meses_periodo.append((mes_cursor.year, mes_cursor.month))
-        if mes_cursor.month == 12:
-            mes_cursor = mes_cursor.replace(year=mes_cursor.year + 1, month=1)
-        else:
-            mes_cursor = mes_cursor.replace(month=mes_cursor.month + 1)
-    
-    
-    # Criar Excel
-    wb = Workbook()
-    
-    # Aba: Resumo
-    ws_resumo = wb.active
-    ws_resumo.title = "Resumo"
-    
-    # Título
-    ws_resumo['A1'] = f'Relatório de Consumo - Lote {lote.numero} ({periodo_label})'
-    ws_resumo['A1'].font = Font(size=16, bold=True, color='FFFFFF')
-    ws_resumo['A1'].fill = PatternFill(start_color='3498db', end_color='3498db', fill_type='solid')
-    ws_resumo['A1'].alignment = Alignment(horizontal='center')
-    ws_resumo.merge_cells('A1:C1')
-    
-    ws_resumo['A2'] = (
-        f'Tipo: {lote.get_tipo_display()} | Período: {data_inicio.strftime("%d/%m/%Y")} '
-        f'a {data_fim.strftime("%d/%m/%Y")} | Gerado em: {agora.strftime("%d/%m/%Y %H:%M")}'
-    )
-    ws_resumo['A2'].alignment = Alignment(horizontal='center')
-    ws_resumo.merge_cells('A2:C2')
-    
-    # Dados resumo
-    ws_resumo['A4'] = 'Indicador'
-    ws_resumo['B4'] = 'Valor'
-    ws_resumo['A4'].font = Font(bold=True)
-    ws_resumo['B4'].font = Font(bold=True)
-    
-    resumo_dados = [
-        ['Lote', lote.numero],
-        ['Tipo', lote.get_tipo_display()],
-        ['Período', periodo_label],
-        ['Consumo Total no Período', f'{consumo_total_periodo:,.0f} L'],
-        ['Hidrometros Ativos', hidrometros.count()],
-    ]
-    
-    for idx, (indicador, valor) in enumerate(resumo_dados, start=5):
-        ws_resumo[f'A{idx}'] = indicador
-        ws_resumo[f'B{idx}'] = valor
-    
-    ws_resumo.column_dimensions['A'].width = 30
-    ws_resumo.column_dimensions['B'].width = 20
-    
-    # Aba: Consumo Mensal
-    ws_mensal = wb.create_sheet("Consumo Mensal")
-    
-    ws_mensal['A1'] = 'Mês'
-    ws_mensal['B1'] = 'Consumo (L)'
-    ws_mensal['A1'].font = Font(bold=True)
-    ws_mensal['B1'].font = Font(bold=True)
-    
-    for idx, (ano, mes) in enumerate(meses_periodo, start=2):
-        ws_mensal[f'A{idx}'] = f'{nomes_meses[mes - 1]}/{str(ano)[-2:]}'
-        ws_mensal[f'B{idx}'] = round(consumo_por_mes.get((ano, mes), 0.0), 2)
-    
-    # Gerar gráfico com matplotlib (igual ao PDF)
-    plt.figure(figsize=(12, 6))
-    meses_labels = [f'{nomes_meses[mes - 1]}/{str(ano)[-2:]}' for (ano, mes) in meses_periodo]
-    valores_mensais = [consumo_por_mes.get((ano, mes), 0.0) for (ano, mes) in meses_periodo]
-    plt.bar(meses_labels, valores_mensais, color='#27ae60', alpha=0.7)
-    plt.title(f'Consumo Mensal - Lote {lote.numero} (Litros)', fontsize=14, fontweight='bold')
-    plt.xlabel('Mês', fontsize=11)
-    plt.ylabel('Consumo (L)', fontsize=11)
-    plt.xticks(rotation=45, ha='right')
-    plt.grid(axis='y', alpha=0.3)
-    plt.tight_layout()
-    
-    # Salvar gráfico em buffer
-    img_buffer_mensal = io.BytesIO()
-    plt.savefig(img_buffer_mensal, format='png', dpi=100, bbox_inches='tight')
-    img_buffer_mensal.seek(0)
-    plt.close()
-    
-    # Adicionar imagem ao Excel
-    from openpyxl.drawing.image import Image as XLImage
-    img_mensal = XLImage(img_buffer_mensal)
-    img_mensal.width = 600
-    img_mensal.height = 300
-    ws_mensal.add_image(img_mensal, "D2")
-    
-    ws_mensal.column_dimensions['A'].width = 15
-    ws_mensal.column_dimensions['B'].width = 15
-    
-    # Aba: Consumo Diário
-    ws_diario_lote = wb.create_sheet("Consumo Diário")
-    
-    ws_diario_lote['A1'] = 'Dia'
-    ws_diario_lote['B1'] = 'Consumo (L)'
-    ws_diario_lote['A1'].font = Font(bold=True)
-    ws_diario_lote['B1'].font = Font(bold=True)
-    
-    for idx, dia in enumerate(datas_periodo, start=2):
-        ws_diario_lote[f'A{idx}'] = dia.strftime('%d/%m/%Y')
-        ws_diario_lote[f'B{idx}'] = round(consumo_por_dia.get(dia, 0.0), 2)
-    
-    # Gerar gráfico com matplotlib (igual ao PDF)
-    plt.figure(figsize=(12, 6))
-    dias_labels = [d.strftime('%d/%m') for d in datas_periodo]
-    valores_diarios_lote = [consumo_por_dia.get(d, 0.0) for d in datas_periodo]
-    plt.plot(dias_labels, valores_diarios_lote, marker='o', color='#3498db', linewidth=2, markersize=4)
-    plt.title(f'Consumo Diário - Lote {lote.numero} ({periodo_label})', fontsize=14, fontweight='bold')
-    plt.xlabel('Dia', fontsize=11)
-    plt.ylabel('Consumo (L)', fontsize=11)
-    plt.xticks(rotation=45, ha='right')
-    plt.grid(axis='y', alpha=0.3)
-    plt.tight_layout()
-    
-    # Salvar gráfico em buffer
-    img_buffer_diario_lote = io.BytesIO()
-    plt.savefig(img_buffer_diario_lote, format='png', dpi=100, bbox_inches='tight')
-    img_buffer_diario_lote.seek(0)
-    plt.close()
-    
-    # Adicionar imagem ao Excel
-    img_diario_lote = XLImage(img_buffer_diario_lote)
-    img_diario_lote.width = 600
-    img_diario_lote.height = 300
-    ws_diario_lote.add_image(img_diario_lote, "D2")
-    
-    ws_diario_lote.column_dimensions['A'].width = 15
-    ws_diario_lote.column_dimensions['B'].width = 15
-
-    leituras_periodo = Leitura.objects.filter(
-        hidrometro__lote=lote,
-        data_leitura__date__gte=data_inicio,
-        data_leitura__date__lte=data_fim
-    ).select_related('hidrometro').order_by('data_leitura')
-
-    ws_leituras = wb.create_sheet("Leituras")
-    ws_leituras['A1'] = 'Data/Hora'
-    ws_leituras['B1'] = 'Hidrômetro'
-    ws_leituras['C1'] = 'Leitura (m³)'
-    ws_leituras['D1'] = 'Consumo (L)'
-    ws_leituras['E1'] = 'Responsável'
-    ws_leituras['F1'] = 'Observações'
-    ws_leituras['G1'] = 'Foto'
-
-    for col in ['A1', 'B1', 'C1', 'D1', 'E1', 'F1', 'G1']:
-        ws_leituras[col].font = Font(bold=True)
-
-    for idx, leitura in enumerate(leituras_periodo, start=2):
-        consumo_litros = leitura.consumo_desde_ultima_leitura_litros()
-        ws_leituras[f'A{idx}'] = leitura.data_leitura.strftime('%d/%m/%Y %H:%M')
-        ws_leituras[f'B{idx}'] = leitura.hidrometro.numero
-        ws_leituras[f'C{idx}'] = float(leitura.leitura)
-        ws_leituras[f'D{idx}'] = round(consumo_litros, 2)
-        ws_leituras[f'E{idx}'] = leitura.responsavel or 'N/A'
-        ws_leituras[f'F{idx}'] = leitura.observacoes or '—'
-
-        if leitura.foto:
-            foto_path = getattr(leitura.foto, 'path', '')
-            if foto_path and os.path.exists(foto_path):
-                img = XLImage(foto_path)
-                img.width = 120
-                img.height = 90
-                ws_leituras.add_image(img, f'G{idx}')
-                ws_leituras.row_dimensions[idx].height = 70
-
-    ws_leituras.column_dimensions['A'].width = 18
-    ws_leituras.column_dimensions['B'].width = 15
-    ws_leituras.column_dimensions['C'].width = 14
-    ws_leituras.column_dimensions['D'].width = 14
-    ws_leituras.column_dimensions['E'].width = 18
-    ws_leituras.column_dimensions['F'].width = 40
-    ws_leituras.column_dimensions['G'].width = 22
-    
-    # Salvar e retornar
-    buffer = io.BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-    
-    response = HttpResponse(
-        buffer.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = (
-        f'attachment; filename="relatorio_lote_{lote.numero}_{data_inicio.strftime("%Y%m%d")}_'
-        f'{data_fim.strftime("%Y%m%d")}.xlsx"'
-    )
-    
-    return response
-
+    return _exportar_lote(request, lote_id, relatorios.graficos_lote_excel)
@@ -110,6 +110,17 @@ DATABASES = {
 # }
 
 
+# Backend de agregação de consumo usado pelos gráficos e exportações:
+# 'python' (deltas calculados na aplicação), 'sql' (LAG() OVER + GROUP BY no banco)
+# ou 'numpy' (deltas e somas vetorizados com NumPy)
+CONSUMO_AGREGACAO = os.getenv('CONSUMO_AGREGACAO', 'python')
+
+# Recálculo dos gráficos com cache desatualizado (consumo/cache_graficos.py):
+# em uma thread, servindo a versão antiga enquanto isso (True), ou na própria
+# requisição (False, sem threads fora do ciclo da requisição; útil em testes)
+GRAFICOS_REVALIDACAO_EM_SEGUNDO_PLANO = os.getenv('GRAFICOS_REVALIDACAO_EM_SEGUNDO_PLANO', 'True') == 'True'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
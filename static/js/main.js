@@ -79,7 +79,141 @@ function formatarNumero(numero, casasDecimais = 3) {
     return parseFloat(numero).toFixed(casasDecimais);
 }
 
+function formatarLitros(numero) {
+    return Math.trunc(numero).toLocaleString('pt-BR');
+}
+
+// Gráficos sob demanda: cada elemento [data-conjunto] busca o seu conjunto na API
+// de gráficos quando fica visível. As buscas vão uma de cada vez, assim a primeira
+// aquece o cache do servidor para as seguintes.
+function carregarGraficosSobDemanda(urlDados, renderizadores, aoReceber) {
+    let fila = Promise.resolve();
+    const pedidos = new Set();
+
+    function buscar(nome) {
+        if (pedidos.has(nome) || !renderizadores[nome]) {
+            return;
+        }
+        pedidos.add(nome);
+        const url = new URL(urlDados, window.location.origin);
+        url.searchParams.set('conjunto', nome);
+        fila = fila
+            .then(() => fetch(url, { headers: { Accept: 'application/json' }, credentials: 'same-origin' }))
+            .then((resposta) => {
+                if (!resposta.ok) {
+                    throw new Error(`HTTP ${resposta.status}`);
+                }
+                return resposta.json();
+            })
+            .then((dados) => {
+                if (aoReceber) {
+                    aoReceber(dados);
+                }
+                renderizadores[nome](dados.conjuntos[nome], dados);
+            })
+            .catch((erro) => console.error(`Erro ao carregar o gráfico ${nome}:`, erro));
+    }
+
+    const elementos = document.querySelectorAll('[data-conjunto]');
+    if (!('IntersectionObserver' in window)) {
+        elementos.forEach((elemento) => buscar(elemento.dataset.conjunto));
+        return;
+    }
+    const observador = new IntersectionObserver((entradas) => {
+        entradas.forEach((entrada) => {
+            if (entrada.isIntersecting) {
+                observador.unobserve(entrada.target);
+                buscar(entrada.target.dataset.conjunto);
+            }
+        });
+    }, { rootMargin: '200px' });
+    elementos.forEach((elemento) => observador.observe(elemento));
+}
+
+function lerCookie(nome) {
+    const item = document.cookie.split('; ').find((parte) => parte.startsWith(`${nome}=`));
+    return item ? decodeURIComponent(item.split('=')[1]) : null;
+}
+
+// Exportações pela fila (/api/exportacoes/): enfileira o relatório, acompanha o
+// status e baixa o arquivo quando fica pronto. Sem JavaScript o link continua
+// baixando direto.
+function exportarEmSegundoPlano(link) {
+    const pedido = {
+        relatorio: link.dataset.exportacaoRelatorio,
+        formato: link.dataset.exportacaoFormato,
+    };
+    if (link.dataset.exportacaoLote) {
+        pedido.lote = link.dataset.exportacaoLote;
+    }
+    new URLSearchParams(window.location.search).forEach((valor, nome) => {
+        if (valor && ['periodo', 'data_inicio', 'data_fim'].includes(nome)) {
+            pedido[nome] = valor;
+        }
+    });
+
+    const textoOriginal = link.innerHTML;
+    link.innerHTML = '⏳ Gerando...';
+    link.setAttribute('aria-busy', 'true');
+    link.style.pointerEvents = 'none';
+    function restaurar() {
+        link.innerHTML = textoOriginal;
+        link.removeAttribute('aria-busy');
+        link.style.pointerEvents = '';
+    }
+
+    const cabecalhos = { 'Content-Type': 'application/json', Accept: 'application/json' };
+    const csrf = lerCookie('csrftoken');
+    if (csrf) {
+        cabecalhos['X-CSRFToken'] = csrf;
+    }
+    function lerResposta(resposta) {
+        if (!resposta.ok) {
+            throw new Error(`HTTP ${resposta.status}`);
+        }
+        return resposta.json();
+    }
+    function acompanhar(exportacao) {
+        if (exportacao.status === 'concluida') {
+            restaurar();
+            window.location.href = exportacao.url_download;
+            return null;
+        }
+        if (exportacao.status === 'erro') {
+            throw new Error(exportacao.erro || 'falha ao gerar o arquivo');
+        }
+        return new Promise((pronto) => setTimeout(pronto, 2000))
+            .then(() => fetch(exportacao.url, { headers: { Accept: 'application/json' }, credentials: 'same-origin' }))
+            .then(lerResposta)
+            .then(acompanhar);
+    }
+
+    fetch(link.dataset.exportacao, {
+        method: 'POST',
+        headers: cabecalhos,
+        credentials: 'same-origin',
+        body: JSON.stringify(pedido),
+    })
+        .then(lerResposta)
+        .then(acompanhar)
+        .catch((erro) => {
+            restaurar();
+            alert(`Não foi possível gerar o relatório: ${erro.message}`);
+        });
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('a[data-exportacao]').forEach((link) => {
+        link.addEventListener('click', function(event) {
+            event.preventDefault();
+            exportarEmSegundoPlano(link);
+        });
+    });
+});
+
 // Exportar funções
+window.formatarLitros = formatarLitros;
+window.carregarGraficosSobDemanda = carregarGraficosSobDemanda;
 window.formatarData = formatarData;
 window.formatarDataHora = formatarDataHora;
 window.formatarNumero = formatarNumero;